@@ -0,0 +1,262 @@
+"""
+Cache partagé entre workers du contexte de rendu des aperçus de planning,
+invalidé par compteurs de version (par semaine et par type).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+
+logger = logging.getLogger("BA38")
+
+PREFIXE_VERSION = "apercu"
+MAX_ENTREES = int(os.getenv("APERCU_CACHE_MAX", "500"))
+# Mise à jour de la date d'accès au plus toutes les N secondes (évite une écriture par lecture)
+DELAI_ACCES_S = 60
+
+# Type d'aperçu → table du planning
+TABLES_PLANNINGS = {
+    "ramasse": "plannings_ramasse",
+    "distribution": "plannings_distribution",
+    "palettes": "plannings_pal",
+    "pesee": "plannings_pesee",
+    "vif": "plannings_vif",
+}
+
+# Tables de référence → types d'aperçu qui en affichent des libellés
+TABLES_REFERENCE = {
+    "benevoles": tuple(TABLES_PLANNINGS),
+    "camions": ("ramasse",),
+    "tournees": ("ramasse",),
+    "tournees_fournisseurs": ("ramasse",),
+    "fournisseurs": ("ramasse",),
+}
+
+# Anciens triggers (version unique `plannings`, toutes semaines confondues)
+TABLES_ANCIENNE_VERSION = [
+    *TABLES_PLANNINGS.values(), "absences", "benevoles", "camions",
+    "tournees", "tournees_fournisseurs", "fournisseurs",
+]
+
+_lock = threading.Lock()
+_bases_installees = {}
+_caches_installes = set()
+_local = threading.local()
+
+
+# ============================
+# Triggers de version
+# ============================
+def _nom_trigger(table, operation):
+    return f"trg_apercu_v2_{table}_{operation.lower()}"
+
+
+def _incrementer(nom_sql):
+    """Instructions de trigger : +1 sur le compteur `nom_sql` (expression SQL)."""
+    return (
+        f"INSERT OR IGNORE INTO cache_versions (nom, version) VALUES ({nom_sql}, 0); "
+        f"UPDATE cache_versions SET version = version + 1 WHERE nom = {nom_sql};"
+    )
+
+
+def _nom_semaine(type_planning, ref):
+    return (
+        f"'{PREFIXE_VERSION}:{type_planning}:' || CAST({ref}.annee AS INTEGER) "
+        f"|| ':' || CAST({ref}.semaine AS INTEGER)"
+    )
+
+
+def _table_existe(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone() is not None
+
+
+def installer_triggers(conn):
+    """Triggers qui incrémentent les versions des aperçus à chaque écriture (idempotent)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            nom TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in TABLES_ANCIENNE_VERSION:
+        for operation in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_apercu_{table}_{operation}")
+
+    # Lignes de planning : semaine de l'ancienne et de la nouvelle ligne
+    for type_planning, table in TABLES_PLANNINGS.items():
+        if not _table_existe(conn, table):
+            continue
+        corps = {
+            "INSERT": _incrementer(_nom_semaine(type_planning, "NEW")),
+            "UPDATE": _incrementer(_nom_semaine(type_planning, "OLD"))
+                      + " " + _incrementer(_nom_semaine(type_planning, "NEW")),
+            "DELETE": _incrementer(_nom_semaine(type_planning, "OLD")),
+        }
+        for operation, instructions in corps.items():
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {_nom_trigger(table, operation)}
+                AFTER {operation} ON {table}
+                BEGIN {instructions} END
+            """)
+
+    # Tables de référence : toutes les semaines des types concernés
+    for table, types in TABLES_REFERENCE.items():
+        if not _table_existe(conn, table):
+            continue
+        instructions = " ".join(_incrementer(f"'{PREFIXE_VERSION}:{t}'") for t in types)
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {_nom_trigger(table, operation)}
+                AFTER {operation} ON {table}
+                BEGIN {instructions} END
+            """)
+    conn.commit()
+
+
+def _triggers_installes(conn, db_path):
+    """Sans triggers (migration pas encore passée), le cache serait périmé : on ne s'en sert pas."""
+    with _lock:
+        if _bases_installees.get(db_path):
+            return True
+    ok = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?",
+        (_nom_trigger("plannings_ramasse", "UPDATE"),),
+    ).fetchone() is not None
+    if ok:
+        with _lock:
+            _bases_installees[db_path] = True
+    return ok
+
+
+def version_donnees(conn, type_planning, annee, semaine):
+    """Version des données d'un aperçu : « type.semaine » (compteurs absents = 0)."""
+    nom_type = f"{PREFIXE_VERSION}:{type_planning}"
+    nom_semaine = f"{nom_type}:{int(annee)}:{int(semaine)}"
+    try:
+        versions = dict(conn.execute(
+            "SELECT nom, version FROM cache_versions WHERE nom IN (?, ?)",
+            (nom_type, nom_semaine),
+        ).fetchall())
+    except sqlite3.OperationalError:
+        versions = {}
+    return f"{versions.get(nom_type, 0)}.{versions.get(nom_semaine, 0)}"
+
+
+# ============================
+# Stockage partagé
+# ============================
+def _chemin_cache(db_path):
+    return f"{os.path.splitext(db_path)[0]}_apercus_cache.sqlite"
+
+
+def _connexion_cache(db_path):
+    """Connexion à la base du cache, une par thread (et par process) ; schéma installé une fois."""
+    chemin = _chemin_cache(db_path)
+    cache = getattr(_local, "connexions", None)
+    if cache is None or _local.pid != os.getpid():
+        cache = _local.connexions = {}
+        _local.pid = os.getpid()
+    conn = cache.get(chemin)
+    if conn is None:
+        conn = sqlite3.connect(chemin, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _lock:
+            a_installer = chemin not in _caches_installes
+        if a_installer:
+            # Version TEXT (« type.semaine ») : l'ancienne table (version entière,
+            # clé avec version) est remplacée
+            colonnes = {r[1]: r[2] for r in conn.execute("PRAGMA table_info(apercus)").fetchall()}
+            if colonnes and colonnes.get("version") != "TEXT":
+                conn.execute("DROP TABLE apercus")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS apercus (
+                    cle TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    contexte TEXT NOT NULL,
+                    dernier_acces REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_apercus_acces ON apercus (dernier_acces)")
+            conn.commit()
+            with _lock:
+                _caches_installes.add(chemin)
+        cache[chemin] = conn
+    return conn
+
+
+def _lire(db_path, cle, version):
+    conn = _connexion_cache(db_path)
+    row = conn.execute(
+        "SELECT contexte, dernier_acces FROM apercus WHERE cle = ? AND version = ?", (cle, version)
+    ).fetchone()
+    if row is None:
+        return None
+    maintenant = time.time()
+    if maintenant - row[1] > DELAI_ACCES_S:
+        conn.execute("UPDATE apercus SET dernier_acces = ? WHERE cle = ?", (maintenant, cle))
+        conn.commit()
+    return json.loads(row[0])
+
+
+def _ecrire(db_path, cle, version, contexte):
+    conn = _connexion_cache(db_path)
+    try:
+        # Remplace l'entrée d'une version précédente de la même semaine
+        conn.execute(
+            "INSERT OR REPLACE INTO apercus (cle, version, contexte, dernier_acces) VALUES (?, ?, ?, ?)",
+            (cle, version, json.dumps(contexte), time.time()),
+        )
+        # LRU
+        conn.execute("""
+            DELETE FROM apercus WHERE cle IN (
+                SELECT cle FROM apercus ORDER BY dernier_acces DESC LIMIT -1 OFFSET ?
+            )
+        """, (MAX_ENTREES,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# ============================
+# API
+# ============================
+def contexte_apercu(type_planning, annee, semaine, construire):
+    """
+    Contexte de rendu de l'aperçu d'une semaine : lu dans le cache si la
+    version des données n'a pas changé, sinon `construire()` (dict
+    sérialisable en JSON) puis mémorisé.
+    """
+    from utils import get_db_connection, get_db_path
+
+    db_path = get_db_path()
+    conn = get_db_connection()
+    try:
+        if not _triggers_installes(conn, db_path):
+            return construire()
+        version = version_donnees(conn, type_planning, annee, semaine)
+    finally:
+        conn.close()
+
+    cle = f"{type_planning}:{int(annee)}:{int(semaine)}"
+    try:
+        contexte = _lire(db_path, cle, version)
+        if contexte is not None:
+            return contexte
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Cache aperçus illisible : {e}")
+
+    contexte = construire()
+
+    try:
+        _ecrire(db_path, cle, version, contexte)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logger.warning(f"⚠️ Cache aperçus non écrit ({cle}) : {e}")
+    return contexte
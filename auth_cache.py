@@ -0,0 +1,157 @@
+"""
+Cache en mémoire des droits et des utilisateurs (par worker), invalidé entre
+workers par un compteur de version en base (TTL en secours).
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+from flask import g, has_app_context
+
+
+NOM_VERSION = "auth"
+_G_KEY = "_ba38_auth_version"
+TTL_S = float(os.getenv("AUTH_CACHE_TTL_S", "60"))
+
+
+class CacheTTL:
+    """Dictionnaire clé → valeur avec expiration, protégé par un verrou."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key):
+        """Retourne (trouvé, valeur)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expire, value = entry
+            if expire < time.monotonic():
+                del self._data[key]
+                return False, None
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def supprimer_si(self, predicat):
+        """Supprime les entrées pour lesquelles predicat(clé, valeur) est vrai."""
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicat(k, v)]:
+                del self._data[key]
+
+    def vider(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Clés : (chemin de la base, email en minuscules) / (chemin de la base, id utilisateur)
+# Valeurs : (version lue en base au moment de la mise en cache, donnée)
+_roles = CacheTTL(TTL_S)
+_users = CacheTTL(TTL_S)
+
+
+def _version(db_path):
+    """Version partagée des droits pour `db_path` (lue au plus une fois par requête)."""
+    memo = g.get(_G_KEY) if has_app_context() else None
+    if memo and db_path in memo:
+        return memo[db_path]
+
+    import db_pool
+
+    conn = db_pool.get_connection(db_path)
+    try:
+        row = conn.execute(
+            "SELECT version FROM cache_versions WHERE nom = ?", (NOM_VERSION,)
+        ).fetchone()
+        version = row[0] if row else 0
+    except sqlite3.OperationalError:
+        # Table pas encore créée (migration 4) : version 0
+        version = 0
+    finally:
+        conn.close()
+
+    if has_app_context():
+        if memo is None:
+            memo = {}
+            setattr(g, _G_KEY, memo)
+        memo[db_path] = version
+    return version
+
+
+def _lire(cache, db_path, key):
+    trouve, entree = cache.get(key)
+    if not trouve or entree[0] != _version(db_path):
+        return False, None
+    return True, entree[1]
+
+
+def roles_en_cache(db_path, email):
+    return _lire(_roles, db_path, (db_path, (email or "").lower()))
+
+
+def memoriser_roles(db_path, email, roles):
+    _roles.set((db_path, (email or "").lower()), (_version(db_path), list(roles)))
+
+
+def user_en_cache(db_path, user_id):
+    return _lire(_users, db_path, (db_path, str(user_id)))
+
+
+def memoriser_user(db_path, user_id, user_row):
+    _users.set((db_path, str(user_id)), (_version(db_path), dict(user_row)))
+
+
+def _incrementer_version():
+    """Fait expirer les entrées de tous les workers pour la base courante."""
+    from utils import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                nom TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("""
+            INSERT INTO cache_versions (nom, version) VALUES (?, 1)
+            ON CONFLICT(nom) DO UPDATE SET version = version + 1
+        """, (NOM_VERSION,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    if has_app_context():
+        g.pop(_G_KEY, None)
+
+
+def invalider_utilisateur(email=None, user_id=None):
+    """
+    Oublie les droits et la fiche d'un utilisateur (toutes bases confondues)
+    et incrémente la version partagée de la base courante : les autres
+    workers relisent leurs entrées à la requête suivante.
+    Sans argument : vide tout le cache.
+    """
+    _incrementer_version()
+
+    if email is None and user_id is None:
+        _roles.vider()
+        _users.vider()
+        return
+
+    email = (email or "").lower()
+    user_id = str(user_id) if user_id is not None else None
+
+    if email:
+        _roles.supprimer_si(lambda k, v: k[1] == email)
+    _users.supprimer_si(
+        lambda k, v: (email and (v[1].get("email") or "").lower() == email)
+        or (user_id is not None and k[1] == user_id)
+    )
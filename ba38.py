@@ -19,7 +19,6 @@ else:
 
 import sys
 import io
-import pandas as pd
 import sqlite3
 import logging
 
@@ -67,12 +66,10 @@ from wtforms import StringField, PasswordField, SubmitField, SelectField
 from wtforms.validators import Optional, DataRequired, Email, Length, EqualTo, ValidationError
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from docx import Document
-from fpdf import FPDF
-from weasyprint import HTML
+# ⏱️ Dépendances lourdes (pandas, WeasyPrint, reportlab, Google, OpenAI...) :
+# importées à la première utilisation dans les blueprints, pas au démarrage
+# du worker (mesure : scripts/bench_demarrage.py)
 from forms import LoginForm, RegistrationForm, ResetPasswordForm
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
 from pathlib import Path
 import jwt
 import re
@@ -100,6 +97,7 @@ from ba38_fiches_visite import fiches_visite_bp
 from ba38_mail import mail_bp
 from ba38_evenements import evenements_bp
 from ba38_factures import factures_bp
+from ba38_recherche import recherche_bp
 from ba38_mail_benevoles import mail_bene_bp
 from ba38_planning_report import planning_report_bp
 
@@ -141,6 +139,20 @@ login_manager = LoginManager()
 login_manager.login_view = "login"
 login_manager.init_app(app)
 
+# ✅ Connexions SQLite poolées (une par requête, rendue au teardown)
+import db_pool
+db_pool.init_app(app)
+import auth_cache
+from auth_cache import invalider_utilisateur
+import presence
+import sessions_sqlite
+import config_cache
+import photos
+
+# ✅ Migrations d'index versionnées (idempotentes)
+import db_migrations
+db_migrations.appliquer_migrations_env()
+
 
 
 # ✅ Enregistrement des blueprints
@@ -167,6 +179,7 @@ app.register_blueprint(evenements_bp)
 app.register_blueprint(factures_bp)
 app.register_blueprint(mail_bene_bp)
 app.register_blueprint(planning_report_bp)
+app.register_blueprint(recherche_bp)
 
 
 
@@ -175,6 +188,8 @@ app.register_blueprint(planning_report_bp)
 
 # Enregistrement de la fonction has_access dans l’environnement Jinja
 app.jinja_env.globals['has_access'] = has_access
+# URL des photos de bénévoles (vignettes à empreinte, voir photos)
+app.jinja_env.globals['photo_url'] = photos.url
 
 
 @app.context_processor
@@ -182,19 +197,9 @@ def inject_benevole_options():
     # Options de type_benevole depuis la table parametres
     type_opts = []
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        rows = cur.execute(
-            "SELECT param_value FROM parametres WHERE param_name='type_benevole' ORDER BY id"
-        ).fetchall()
-        type_opts = [r["param_value"] for r in rows] or ["benevole"]
+        type_opts = config_cache.valeurs_parametre("type_benevole") or ["benevole"]
     except Exception:
         type_opts = ["benevole"]
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
     civilite_opts = ["-- Choisir --", "Mme", "M.", "Mx"]
 
@@ -319,7 +324,7 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY", "une_clé_secrète_ultra_sécuris
 
 @app.route("/debug_env_session")
 def debug_env_session():
-    return f"ENV={ENVIRONMENT} — Dossier de session : {app.config['SESSION_FILE_DIR']}"
+    return f"ENV={ENVIRONMENT} — Sessions : {app.config.get('SESSION_SQLITE_PATH') or app.config.get('SESSION_FILE_DIR')}"
 
 
 
@@ -340,16 +345,29 @@ if not os.path.exists(SESSION_DIR):
 
 # write_log(f"✅ ENV={ENVIRONMENT.upper()} — dossier SESSION = {SESSION_DIR}")
 
+# 🗄️ Sessions en base SQLite dédiée (sessions_sqlite) ;
+# SESSION_BACKEND=filesystem revient à l'ancien stockage Flask-Session
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite").lower()
+
 app.config.update(
-    SESSION_TYPE="filesystem",
-    SESSION_FILE_DIR=SESSION_DIR,
     SESSION_PERMANENT=False,
-    SESSION_USE_SIGNER=True,
-    SESSION_KEY_PREFIX="ba38_",
     SESSION_COOKIE_NAME="ba38_session"
 )
 
-Session(app)
+if SESSION_BACKEND == "filesystem":
+    app.config.update(
+        SESSION_TYPE="filesystem",
+        SESSION_FILE_DIR=SESSION_DIR,
+        SESSION_USE_SIGNER=True,
+        SESSION_KEY_PREFIX="ba38_",
+    )
+    Session(app)
+else:
+    sessions_sqlite.init_app(
+        app,
+        os.getenv("SESSION_DB") or os.path.join(SESSION_DIR, "sessions.sqlite"),
+        ENVIRONMENT,
+    )
 
 
 
@@ -383,17 +401,6 @@ SERVICE_ACCOUNT_FILE = os.getenv("SERVICE_ACCOUNT_FILE")
 
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 
-try:
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
-    )
-    drive_service = build("drive", "v3", credentials=credentials)
-    # write_log(f"✅ Compte authentifié utilisé : {credentials.service_account_email}")
-
-except Exception as e:
-    write_log(f"❌ Erreur d'authentification avec Google Drive : {e}")
-    drive_service = None
-
 # Vérifier l'accès au dossier Google Drive
 FOLDER_ID = "18UHHGeGn7kepW7YjOF0YBO0XcEPG_D4L"
 
@@ -401,15 +408,25 @@ FOLDER_ID = "18UHHGeGn7kepW7YjOF0YBO0XcEPG_D4L"
 
 
 def list_drive_files():
-    if drive_service is None:
-        write_log("❌ Service Google Drive non disponible.")
+    import google_clients
+    import drive_cache
+
+    try:
+        # Client Drive partagé du thread (cf. google_clients)
+        drive_service = google_clients.drive()
+    except Exception as e:
+        write_log(f"❌ Service Google Drive non disponible : {e}")
         return []
+
     try:
-        results = drive_service.files().list(
-            q=f"'{FOLDER_ID}' in parents and trashed=false",
-            fields="files(id, name)"
-        ).execute()
-        files = results.get("files", [])
+        files = drive_cache.liste(
+            FOLDER_ID,
+            "tous",
+            lambda: drive_service.files().list(
+                q=f"'{FOLDER_ID}' in parents and trashed=false",
+                fields="files(id, name)"
+            ).execute().get("files", []),
+        )
         if not files:
             write_log("⚠️ Aucun fichier trouvé dans le Drive Partagé.")
         else:
@@ -520,24 +537,19 @@ def check_maintenance_mode():
 def set_user_roles():
     if current_user.is_authenticated:
         roles = get_user_roles(current_user.email)
-        session["roles"] = roles
+        # N'écrire la session que si les droits ont changé (sinon réécriture à chaque requête)
+        if session.get("roles") != roles:
+            session["roles"] = roles
+        # Droits détaillés (has_access) : rafraîchis après invalidation du cache
+        if session.get("user_role") != "admin" and session.get("roles_utilisateurs") != roles:
+            session["roles_utilisateurs"] = roles
         # write_log(f"👤 Rôles chargés pour {current_user.email} → {roles}")
 
 @app.before_request
 def update_last_seen():
     if current_user.is_authenticated:
-        from datetime import datetime
-        from utils import get_db_connection
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE log_connexions
-            SET last_seen = ?
-            WHERE email = ? AND environ = ?
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """, (datetime.utcnow().isoformat(), current_user.email, os.getenv("ENVIRONMENT")))
-        conn.commit()
+        # 🟢 En mémoire : écrit dans log_connexions par lots (presence.py)
+        presence.touch(get_db_path(), current_user.email, os.getenv("ENVIRONMENT"), current_user.username)
 
 
 
@@ -565,6 +577,7 @@ def reset_password(token):
         conn.execute("UPDATE users SET password_hash = ? WHERE email = ?", (hashed_password, email))
         conn.commit()
         conn.close()
+        invalider_utilisateur(email)
 
         flash("Votre mot de passe a été mis à jour !", "success")
         return redirect(url_for('login'))
@@ -635,55 +648,52 @@ def load_user_role():
 
 
 
+def _utilisateurs_connectes(chemin_sessions=None, db_path=None, environ=None):
+    """
+    [{user, username, role, environ, ip, last_seen}] : base des sessions si
+    elle est utilisée, sinon last_seen de log_connexions (presence).
+    """
+    if chemin_sessions:
+        return [
+            {**u, "user": u["user_id"]}
+            for u in sessions_sqlite.connectes(chemin_sessions, environ=environ)
+        ]
+    return [
+        {**u, "user": u["email"], "role": None}
+        for u in presence.utilisateurs_actifs(db_path)
+    ]
+
 @app.route('/active_sessions')
 @login_required
 def active_sessions():
     if g.user_role != 'admin':
         return "⛔ Accès refusé", 403
 
-    session_dir = app.config['SESSION_FILE_DIR']
-    users = []
-
-    for filename in os.listdir(session_dir):
-        path = os.path.join(session_dir, filename)
-        try:
-            with open(path, 'rb') as f:
-                data = f.read()
-                # Flask commence souvent par b'\x80' → pickle
-                try:
-                    raw = data.decode()
-                    session_data = serializer.loads(raw)
-                except Exception:
-                    continue
-                    user_id = session_data.get('user_id')
-                    username = session_data.get('username')
-                    role = session_data.get('user_role')
-
-                    if user_id:
-                        users.append({
-                            "session": filename,
-                            "user_id": user_id,
-                            "username": username,
-                            "role": role
-                        })
-        except Exception as e:
-            continue
+    users = _utilisateurs_connectes(
+        app.config.get("SESSION_SQLITE_PATH"), get_db_path(), ENVIRONMENT
+    )
 
     if not users:
         return "Aucune session utilisateur actuellement active."
 
     # Générer un petit tableau HTML
     rows = [
-        f"<tr><td>{u['session']}</td><td>{u['user_id']}</td><td>{u['username']}</td><td>{u['role']}</td></tr>"
+        f"<tr><td>{u['user']}</td><td>{u['username']}</td><td>{u['role'] or ''}</td><td>{u['environ']}</td><td>{u['ip']}</td><td>{u['last_seen']}</td></tr>"
         for u in users
     ]
-    table = "<table class='table table-bordered'><tr><th>Session</th><th>User ID</th><th>Nom</th><th>Rôle</th></tr>" + "\n".join(rows) + "</table>"
-    return f"<h3>📋 Sessions utilisateur actives :</h3>{table}"
+    table = "<table class='table table-bordered'><tr><th>Utilisateur</th><th>Nom</th><th>Rôle</th><th>Env</th><th>IP</th><th>Dernière activité (UTC)</th></tr>" + "\n".join(rows) + "</table>"
+    return f"<h3>📋 Sessions utilisateur actives ({sessions_sqlite.FENETRE_ACTIF_MIN} dernières minutes) :</h3>{table}"
 
 # temporaire a supprimer : 
 @app.route("/debug_session_dir")
 def debug_session_dir():
-    return f"Session file dir utilisé : {app.config['SESSION_FILE_DIR']}"
+    return f"Sessions stockées dans : {app.config.get('SESSION_SQLITE_PATH') or app.config.get('SESSION_FILE_DIR')}"
+
+# Base des sessions de chaque environnement (une installation par environnement)
+BASES_SESSIONS = {
+    "dev": os.getenv("SESSION_DB_DEV", "/home/ndprz/dev/flask_sessions/sessions.sqlite"),
+    "prod": os.getenv("SESSION_DB_PROD", "/home/ndprz/ba380/flask_sessions/sessions.sqlite"),
+}
 
 @app.route('/sessions_globales')
 @login_required
@@ -691,51 +701,32 @@ def sessions_globales():
     if g.user_role != 'admin':
         return "⛔ Accès refusé", 403
 
-    import pickle
-
-    base_dirs = {
-        "DEV": "/home/ndprz/dev/flask_sessions",
-        "PROD": "/home/ndprz/ba380/flask_sessions"
-    }
+    from utils import get_db_path_by_env
 
     all_sessions = []
 
-    for env, session_dir in base_dirs.items():
-        if not os.path.exists(session_dir):
-            continue
-
-        for filename in os.listdir(session_dir):
-            path = os.path.join(session_dir, filename)
-            try:
-                with open(path, "rb") as f:
-                    data = f.read()
-                    if not data.startswith(b'\x80'):
-                        continue  # ignorer les formats non pickle
-                    session_data = pickle.loads(data)
-
-                    user_id = session_data.get('user_id')
-                    username = session_data.get('username')
-                    role = session_data.get('user_role')
-
-                    if user_id:
-                        all_sessions.append({
-                            "env": env,
-                            "session": filename,
-                            "user_id": user_id,
-                            "username": username,
-                            "role": role
-                        })
-            except Exception as e:
+    for env in ("dev", "prod"):
+        try:
+            chemin_sessions = None
+            if SESSION_BACKEND != "filesystem" and os.path.exists(BASES_SESSIONS[env]):
+                chemin_sessions = BASES_SESSIONS[env]
+            db_path = get_db_path_by_env(env)
+            if not chemin_sessions and not os.path.exists(db_path):
                 continue
+            for s in _utilisateurs_connectes(chemin_sessions, db_path):
+                all_sessions.append({**s, "env": env.upper()})
+        except Exception as e:
+            write_log(f"⚠️ Sessions {env.upper()} illisibles : {e}")
+            continue
 
     if not all_sessions:
         return "Aucune session utilisateur active trouvée en DEV ou PROD."
 
     # Affichage HTML
     html = "<h3>🧾 Sessions actives (DEV + PROD)</h3>"
-    html += "<table class='table table-striped'><thead><tr><th>ENV</th><th>Session</th><th>User ID</th><th>Nom</th><th>Rôle</th></tr></thead><tbody>"
+    html += "<table class='table table-striped'><thead><tr><th>ENV</th><th>Utilisateur</th><th>Nom</th><th>Rôle</th><th>IP</th><th>Dernière activité (UTC)</th></tr></thead><tbody>"
     for s in all_sessions:
-        html += f"<tr><td>{s['env']}</td><td>{s['session']}</td><td>{s['user_id']}</td><td>{s['username']}</td><td>{s['role']}</td></tr>"
+        html += f"<tr><td>{s['env']}</td><td>{s['user']}</td><td>{s['username']}</td><td>{s['role'] or ''}</td><td>{s['ip']}</td><td>{s['last_seen']}</td></tr>"
     html += "</tbody></table>"
 
     return html
@@ -745,9 +736,15 @@ def sessions_globales():
 
 @login_manager.user_loader
 def load_user(user_id):
-    conn = get_db_connection()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
+    # 🧠 Fiche utilisateur en cache (invalidée par les routes d'administration)
+    db_path = get_db_path()
+    trouve, user = auth_cache.user_en_cache(db_path, user_id)
+    if not trouve:
+        conn = get_db_connection()
+        user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        conn.close()
+        if user:
+            auth_cache.memoriser_user(db_path, user_id, user)
 
     if user:
         return User(user['id'], user['username'], user['email'], user['password_hash'], user['role'])
@@ -818,6 +815,7 @@ def register():
                 )
             )
             conn.commit()
+            invalider_utilisateur(form.email.data)
 
             if cursor.rowcount == 0:
                 write_log("⚠️ Échec de l'insertion SQL")
@@ -932,21 +930,7 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
-    from flask import request
-    import os
-
-    session_id = request.cookies.get("ba38_session")
-    session_dir = app.config.get("SESSION_FILE_DIR")
-
-    # 🔥 Supprimer le fichier de session si possible
-    if session_id and session_dir:
-        session_file = os.path.join(session_dir, session_id)
-        try:
-            if os.path.exists(session_file):
-                os.remove(session_file)
-                write_log(f"🧹 Session supprimée à la déconnexion : {session_file}")
-        except Exception as e:
-            write_log(f"⚠️ Erreur suppression session fichier : {e}")
+    # 🔥 La session vidée (session.clear() ci-dessous) est supprimée du stockage
 
     from utils import write_connexion_log
     write_connexion_log(session.get("user_id"), session.get("username"), action="logout")
@@ -997,11 +981,13 @@ def maj_parametres():
                 WHERE id = ?
             """, (param_name, param_value, phone, mail, param_id))
             conn.commit()
+            config_cache.marquer_modifie(conn)
             flash(f"✅ Paramètre modifié (ID = {param_id})", "success")
             upload_database()  # Sauvegarde automatique sur Google Drive
         elif action == 'supprimer':
             cursor.execute("DELETE FROM parametres WHERE id = ?", (param_id,))
             conn.commit()
+            config_cache.marquer_modifie(conn)
             upload_database()  # Sauvegarde automatique sur Google Drive
             flash(f"🗑️ Paramètre supprimé (ID = {param_id})", "warning")
 
@@ -1033,6 +1019,7 @@ def ajouter_parametre():
             VALUES (?, ?, ?, ?)
         """, (param_name, param_value, phone, mail))
         conn.commit()
+        config_cache.marquer_modifie(conn)
         flash("✅ Nouveau paramètre ajouté avec succès.", "success")
     except Exception as e:
         flash(f"❌ Erreur lors de l'ajout : {e}", "danger")
@@ -1045,12 +1032,8 @@ def ajouter_parametre():
 
 def get_car_options():
     try:
-        conn = get_db_connection()
-        car_options = conn.execute("SELECT param_name, param_value FROM parametres").fetchall()
-        conn.close()
         # Filtrer en ignorant la casse (car vs CAR)
-        car_list = [row['param_value'] for row in car_options if row['param_name'].lower() == 'car']
-        return car_list
+        return config_cache.valeurs_parametre("car", ignorer_casse=True)
     except Exception as e:
         write_log("ERREUR - get_car_options :", str(e))
         return []
@@ -1076,33 +1059,6 @@ def query_db(query, args=(), one=False):
 
 
 
-class PDF(FPDF):
-    def header(self):
-        """ Ajout du logo en haut à gauche de chaque page (avec vérification du chemin) """
-        logo_path = "static/images/logo.png"  # Assurez-vous que ce fichier existe !
-        if os.path.exists(logo_path):
-            self.image(logo_path, 10, 8, 12.5)  # Taille réduite du logo
-        else:
-            write_log(f"⚠ Logo non trouvé : {logo_path}")
-
-        self.set_font("Arial", 'B', 12)
-        self.cell(200, 10, "Fiche de Visite", ln=True, align="C")
-        self.ln(5)  # Petit espace après le titre
-
-    def footer(self):
-        """ Ajout d'un pied de page """
-        self.set_y(-15)  # Position à 15 unités du bas
-        self.set_font("Arial", size=10)
-
-        # Texte à gauche
-        self.cell(0, 10, "Banque Alimentaire de l'Isère - Service Partenariat", align="L")
-
-        # Date à droite
-        date_du_jour = datetime.today().strftime('%d/%m/%Y')
-        self.cell(0, 10, date_du_jour, align="R")
-
-
-
 @app.route('/maj_champs', methods=['GET', 'POST'])
 def maj_champs():
     provenance = request.args.get("source", "index")
@@ -1132,6 +1088,7 @@ def maj_champs():
                 champ_id = int(request.form["delete_id"])
                 cursor.execute("DELETE FROM field_groups WHERE id = ?", (champ_id,))
                 conn.commit()
+                config_cache.marquer_modifie(conn)
                 flash("🗑️ Champ supprimé.", "warning")
                 return redirect(url_for("maj_champs", source=provenance))
 
@@ -1148,6 +1105,7 @@ def maj_champs():
                     VALUES (?, ?, ?, ?, ?)
                 """, (new_field, new_group, display_order, new_type, table))
                 conn.commit()
+                config_cache.marquer_modifie(conn)
                 flash("✅ Nouveau champ ajouté.", "success")
                 return redirect(url_for("maj_champs", source=provenance))
 
@@ -1169,39 +1127,26 @@ def maj_champs():
                         """, (new_field_name, new_group, display_order, new_type, field_id))
 
                 conn.commit()
+                config_cache.marquer_modifie(conn)
                 flash("✅ Modifications enregistrées.", "success")
                 upload_database()
                 return redirect(url_for("maj_champs", source=provenance))
 
             # 🧩 Lecture des champs disponibles
             champs_table = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
-            champs_config = {row["field_name"] for row in cursor.execute(
-                "SELECT field_name FROM field_groups WHERE appli = ?", (table,)
-            ).fetchall()}
+            fields = config_cache.champs(table)
+            champs_config = {f["field_name"] for f in fields}
             champs_disponibles = sorted(champs_table - champs_config)
 
-            fields = cursor.execute("""
-                SELECT * FROM field_groups
-                WHERE appli = ?
-                ORDER BY display_order
-            """, (table,)).fetchall()
-
-            grouped_fields = {}
-            for f in fields:
-                g = f["group_name"].strip() if f["group_name"] else "Sans"
-                grouped_fields.setdefault(g, []).append(f)
-
-            available_groups = [r["group_name"] for r in cursor.execute(
-                "SELECT DISTINCT group_name FROM field_groups WHERE appli = ?", (table,)
-            ).fetchall()]
-            available_groups = [g.strip() if g and g.strip() else "Sans" for g in available_groups]
+            grouped_fields = config_cache.champs_groupes(table)
+
+            available_groups = list(dict.fromkeys(
+                (f["group_name"] or "").strip() or "Sans" for f in fields
+            ))
             if "Sans" not in available_groups:
                 available_groups.append("Sans")
 
-            types = cursor.execute("""
-                SELECT param_value FROM parametres WHERE param_name = 'type_champ'
-            """).fetchall()
-            available_types = [r["param_value"] for r in types]
+            available_types = config_cache.valeurs_parametre("type_champ")
 
         return render_template("maj_champs.html",
             grouped_fields=grouped_fields,
@@ -1239,6 +1184,7 @@ def update_field_groups():
                 cursor.execute("UPDATE field_groups SET display_order = ? WHERE id = ?", (int(value), field_id))
 
         conn.commit()
+        config_cache.marquer_modifie(conn)
         conn.close()
 
         write_log("✅ Mise à jour de la base confirmée !")
@@ -1320,7 +1266,9 @@ def internal_error(error):
 @app.route("/test_upload")
 def test_upload():
     try:
+        import drive_replication
         upload_database()
+        drive_replication.flush()
         return "✅ Upload manuel lancé avec succès."
     except Exception as e:
         return f"❌ Erreur pendant upload : {e}"
@@ -1412,6 +1360,7 @@ def reset_password_ui():
                     (hashed, email)
                 )
                 conn.commit()
+            invalider_utilisateur(email)
             flash(f"✅ Mot de passe réinitialisé pour {email}.", "success")
 
     # Liste des utilisateurs
@@ -1433,6 +1382,19 @@ def test_flash():
     return redirect(url_for("index"))
 
 
+# ============================
+# 🏭 Point d'entrée WSGI
+# ============================
+def create_app():
+    """
+    Application configurée (routes, blueprints, sessions, migrations faits à
+    l'import de ce module). Point d'entrée de gunicorn : `wsgi:application`.
+    Les dépendances lourdes (pandas, reportlab, WeasyPrint, pdf2image,
+    openai, Google) sont importées dans les routes qui s'en servent.
+    """
+    return app
+
+
 if __name__ == "__main__":
     FLASK_ENV = os.getenv("FLASK_ENV", "prod")
     debug_mode = FLASK_ENV == "dev"
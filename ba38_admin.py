@@ -5,6 +5,7 @@ from utils import (
     get_db_info, get_all_users, has_access
 )
 from forms import RegistrationForm
+from auth_cache import invalider_utilisateur
 from werkzeug.security import generate_password_hash
 
 admin_bp = Blueprint("admin", __name__)
@@ -71,12 +72,18 @@ def gestion_roles():
                         VALUES (?, ?, ?)
                     """, (email, appli, droit))
                     conn.commit()
+                    invalider_utilisateur(email)
                     flash("✅ Rôle ajouté avec succès.", "success")
 
             elif action.startswith("supprimer_"):
                 role_id = int(action.replace("supprimer_", ""))
+                role = cursor.execute(
+                    "SELECT user_email FROM roles_utilisateurs WHERE id = ?", (role_id,)
+                ).fetchone()
                 cursor.execute("DELETE FROM roles_utilisateurs WHERE id = ?", (role_id,))
                 conn.commit()
+                if role:
+                    invalider_utilisateur(role["user_email"])
                 flash("🗑️ Rôle supprimé.", "info")
 
         if filtre:
@@ -146,6 +153,8 @@ def update_user():
 
         conn.commit()
 
+    invalider_utilisateur(email)
+
     return redirect(url_for("admin.gestion_utilisateurs"))
 
 # --- Suppression utilisateur (avec rôles) ---
@@ -169,6 +178,8 @@ def supprimer_utilisateur(user_id):
         cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
         conn.commit()
 
+    invalider_utilisateur(email_row["email"] if email_row else None, user_id=user_id)
+
     upload_database()
     flash("🗑️ Utilisateur et rôles associés supprimés.", "success")
     return redirect(url_for('admin.gestion_utilisateurs'))
@@ -187,6 +198,8 @@ def ajouter_utilisateur():
             )
             conn.commit()
 
+        invalider_utilisateur(form.email.data)
+
         upload_database()
         flash("Utilisateur ajouté avec succès.", "success")
         return redirect(url_for('admin.gestion_utilisateurs'))
@@ -1,9 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory
 from flask_login import login_required, current_user
 from utils import get_db_connection, upload_database, write_log, has_access, is_valid_email, is_valid_phone
+import config_cache
+import listes_api
+import photos
 from werkzeug.security import generate_password_hash
-from PIL import Image, ExifTags
-import os
 import re
 import sqlite3
 from urllib.parse import urlencode
@@ -17,14 +18,10 @@ TYPE_BENE_PARAM = "type_benevole"
 def get_type_benevole_options(conn):
     """
     Lit les valeurs autorisées dans parametres (param_name=type_benevole).
-    Retourne une liste ordonnée.
+    Retourne une liste ordonnée (lecture via config_cache, `conn` inutilisé).
     """
-    cur = conn.cursor()
-    rows = cur.execute(
-        "SELECT param_value FROM parametres WHERE param_name = ? ORDER BY id",
-        (TYPE_BENE_PARAM,)
-    ).fetchall()
-    return [str(r[0]).strip() for r in rows if r and str(r[0]).strip()]
+    valeurs = config_cache.valeurs_parametre(TYPE_BENE_PARAM)
+    return [str(v).strip() for v in valeurs if v is not None and str(v).strip()]
 
 
     
@@ -133,31 +130,13 @@ def api_quick_create_benevole():
 
     
     
-@benevoles_bp.route('/benevoles', methods=['GET'])
-@login_required
-def benevoles():
+def _selection_colonnes_benevoles():
     """
-    Affiche la liste des bénévoles avec sélection dynamique des colonnes
-    et persistance du champ de recherche (comme partenaires).
+    Groupes de champs (coordonnées principales en tête), colonnes et groupes
+    sélectionnés, lus dans request.args (page /benevoles et son API).
     """
-    if not has_access("benevoles", "lecture"):
-        flash("⛔ Accès refusé à la gestion des bénévoles", "danger")
-        return redirect(url_for("index"))
-
-    # 📌 Redirection si mobile vers la prise de photo
-    user_agent = request.headers.get('User-Agent', '').lower()
-    if any(mobile in user_agent for mobile in ["iphone", "android"]):
-        return redirect(url_for('benevoles.photo_benevole_mobile'))
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     # 🔹 Récupérer les groupes de champs
-    fields_data = cursor.execute("""
-        SELECT * FROM field_groups
-        WHERE appli = 'benevoles'
-        ORDER BY display_order
-    """).fetchall()
+    fields_data = config_cache.champs("benevoles")
 
     # Ne garder que les champs affichables
     fields_data = [f for f in fields_data if f["display_order"] and int(f["display_order"]) > 0]
@@ -172,7 +151,6 @@ def benevoles():
     selected_columns = request.args.getlist("columns")
     selected_groups = request.args.getlist("selected_groups")
     has_interacted = request.args.get("has_interacted") == "1"
-    search_term = request.args.get("search_term", "").strip()  # ✅ persistance recherche
 
     # Mode TEST → pré-sélectionner coordonnées principales
     test_mode = session.get("test_user", False)
@@ -212,34 +190,6 @@ def benevoles():
     # Supprimer doublons et champs non désirés
     selected_columns = [c for i, c in enumerate(selected_columns) if c not in ['id'] and c not in selected_columns[:i]]
 
-    # Construire la clause SQL
-    escaped_columns = [f"`{col}`" for col in selected_columns if col not in ['id', 'nom']]
-    columns_clause = ", ".join(["id", "`nom`"] + escaped_columns)
-
-    query = f"""
-        SELECT {columns_clause}
-        FROM benevoles
-        ORDER BY nom COLLATE NOCASE
-    """
-    rows = cursor.execute(query).fetchall()
-    conn.close()
-
-    # Photos disponibles
-    photo_dir = os.path.join(os.path.dirname(__file__), "static", "photos_benevoles")
-    photo_ids = set()
-    if os.path.isdir(photo_dir):
-        for filename in os.listdir(photo_dir):
-            if filename.endswith(".jpg"):
-                try:
-                    bene_id = int(filename.split(".")[0])
-                    photo_ids.add(bene_id)
-                except ValueError:
-                    continue
-
-    # Droits utilisateur
-    user_role = current_user.role.lower()
-    lecture_seule = not has_access("benevoles", "ecriture")
-
     # Forcer coordonnées principales en premier
     grouped_fields_ordered = {}
     if "coordonnées principales" in grouped_fields:
@@ -250,18 +200,107 @@ def benevoles():
     else:
         grouped_fields_ordered = grouped_fields
 
+    return grouped_fields_ordered, selected_columns, selected_groups
+
+
+def _page_benevoles(selected_columns, recherche=None):
+    """
+    Une page de la liste (pagination par clé, voir listes_api) avec les
+    colonnes sélectionnées ; `recherche` remplace le paramètre q si fourni.
+    """
+    args = listes_api.parametres(request.args, "nom")
+    if recherche is not None and not args["recherche"]:
+        args["recherche"] = recherche
+
+    colonnes = ["nom"] + [c for c in selected_columns if c != "nom"]
+    conn = get_db_connection()
+    try:
+        resultat = listes_api.page(
+            conn, "benevoles", colonnes,
+            # La recherche ignore user_modif (comme l'ancien filtre côté navigateur)
+            colonnes_recherche=[c for c in colonnes if c != "user_modif"],
+            tri_defaut="nom",
+            **args,
+        )
+    finally:
+        conn.close()
+
+    # Photos disponibles (manifeste en mémoire, voir photos)
+    avec_photo = photos.ids_avec_photo()
+    resultat["photo_ids"] = {r["id"] for r in resultat["lignes"] if r["id"] in avec_photo}
+    resultat["recherche"] = args["recherche"]
+    return resultat
+
+
+@benevoles_bp.route('/benevoles', methods=['GET'])
+@login_required
+def benevoles():
+    """
+    Affiche la liste des bénévoles avec sélection dynamique des colonnes
+    et persistance du champ de recherche (comme partenaires).
+
+    Seule la première page est rendue ici ; les suivantes (défilement,
+    recherche, tri) viennent de /benevoles/api/liste.
+    """
+    if not has_access("benevoles", "lecture"):
+        flash("⛔ Accès refusé à la gestion des bénévoles", "danger")
+        return redirect(url_for("index"))
+
+    # 📌 Redirection si mobile vers la prise de photo
+    user_agent = request.headers.get('User-Agent', '').lower()
+    if any(mobile in user_agent for mobile in ["iphone", "android"]):
+        return redirect(url_for('benevoles.photo_benevole_mobile'))
+
+    grouped_fields, selected_columns, selected_groups = _selection_colonnes_benevoles()
+    search_term = request.args.get("search_term", "").strip()  # ✅ persistance recherche
+
+    resultat = _page_benevoles(selected_columns, recherche=search_term)
+    selected_columns = [c for c in selected_columns if c in resultat["colonnes"]]
+
+    # Droits utilisateur
+    user_role = current_user.role.lower()
+    lecture_seule = not has_access("benevoles", "ecriture")
+
+    # Paramètres repris par les appels à l’API de la liste
+    params_liste = urlencode([("has_interacted", "1")] + [("columns", c) for c in selected_columns])
+
     return render_template(
         "benevoles.html",
-        benevoles=rows,
-        grouped_fields=grouped_fields_ordered,
+        benevoles=resultat["lignes"],
+        page=resultat,
+        params_liste=params_liste,
+        grouped_fields=grouped_fields,
         selected_columns=selected_columns,
         selected_groups=selected_groups,
         user_role=user_role,
         lecture_seule=lecture_seule,
-        photo_ids=photo_ids,
-        search_term=search_term  # ✅ pour préremplir le champ de recherche
+        photo_ids=resultat["photo_ids"],
+        search_term=resultat["recherche"]  # ✅ pour préremplir le champ de recherche
     )
 
+
+@benevoles_bp.route('/benevoles/api/liste', methods=['GET'])
+@login_required
+def api_liste_benevoles():
+    """
+    Liste des bénévoles paginée (JSON) : mêmes paramètres de colonnes que
+    /benevoles, plus q (recherche), tri, sens, apres (curseur) et limite.
+    """
+    if not has_access("benevoles", "lecture"):
+        return jsonify({"error": "Accès refusé"}), 403
+
+    _, selected_columns, _ = _selection_colonnes_benevoles()
+    resultat = _page_benevoles(selected_columns)
+    selected_columns = [c for c in selected_columns if c in resultat["colonnes"]]
+
+    html = render_template(
+        "partials/benevoles_lignes.html",
+        benevoles=resultat["lignes"],
+        selected_columns=selected_columns,
+        photo_ids=resultat["photo_ids"],
+    )
+    return jsonify(listes_api.reponse(resultat, html))
+
 @benevoles_bp.route("/edition_tableau_benevoles")
 @login_required
 def edition_tableau_benevoles():
@@ -270,11 +309,7 @@ def edition_tableau_benevoles():
     cursor = conn.cursor()
 
     # Lire les champs disponibles
-    fields_data = cursor.execute("""
-        SELECT * FROM field_groups
-        WHERE appli = 'benevoles'
-        ORDER BY display_order
-    """).fetchall()
+    fields_data = config_cache.champs("benevoles")
 
     grouped_fields = {}
     for row in fields_data:
@@ -327,11 +362,7 @@ def create_benevole():
     type_benevole_options = get_type_benevole_options(conn)
 
     # 🔄 On stocke la version brute
-    rows = cursor.execute("""
-        SELECT * FROM field_groups
-        WHERE appli = 'benevoles'
-        ORDER BY display_order
-    """).fetchall()
+    rows = config_cache.champs("benevoles")
 
     # On transforme les rows en dictionnaires modifiables
     fields_data = [dict(row) for row in rows]
@@ -534,11 +565,7 @@ def update_benevole(benevole_id):
     benevole_dict = dict(benevole)
     previous_id, next_id = get_neighbor_benevole_ids_alphabetically(conn, benevole_id)
 
-    rows = cursor.execute("""
-        SELECT * FROM field_groups
-        WHERE appli = 'benevoles'
-        ORDER BY display_order
-    """).fetchall()
+    rows = config_cache.champs("benevoles")
     fields_data = [dict(row) for row in rows]
     for field in fields_data:
         field["value"] = benevole_dict.get(field["field_name"], "")
@@ -564,18 +591,12 @@ def update_benevole(benevole_id):
     if request.method == 'POST':
         opts_type_bene = get_type_benevole_options(conn)
         do_upload = request.form.get("do_upload", "1")
-        PHOTO_DIR = os.path.join(os.path.dirname(__file__), "static", "photos_benevoles")
-        os.makedirs(PHOTO_DIR, exist_ok=True)
 
-        # 📸 Photo
+        # 📸 Photo (référence + vignettes, voir photos)
         photo = request.files.get('photo')
         if photo and photo.filename:
             try:
-                filename = f"{benevole_id}.jpg"
-                full_path = os.path.join(PHOTO_DIR, filename)
-                image = Image.open(photo)
-                image.thumbnail((300, 300))
-                image.save(full_path, format="JPEG", quality=80)
+                filename = photos.enregistrer(benevole_id, photo.stream)
                 cursor.execute("""
                     INSERT INTO photos_benevoles (benevole_id, filename)
                     VALUES (?, ?)
@@ -700,9 +721,7 @@ def update_benevole(benevole_id):
     benevole_prenom = benevole_dict.get("prenom", "")
 
     photo_filename = None
-    photo_folder = os.path.join(os.path.dirname(__file__), "static", "photos_benevoles")
-    photo_path = os.path.join(photo_folder, f"{benevole_id}.jpg")
-    if os.path.exists(photo_path):
+    if benevole_id in photos.ids_avec_photo():
         photo_filename = f"{benevole_id}.jpg"
     else:
         row = conn.execute("SELECT filename FROM photos_benevoles WHERE benevole_id = ?", (benevole_id,)).fetchone()
@@ -867,10 +886,7 @@ def update_benevoles_table():
         # 🔁 Rechargement config des champs pour les listes déroulantes
         conn = get_db_connection()
         cursor = conn.cursor()
-        field_config = cursor.execute("""
-            SELECT field_name, type_champ FROM field_groups
-            WHERE appli = 'benevoles'
-        """).fetchall()
+        field_config = config_cache.champs("benevoles")
 
         type_benevole_options = get_type_benevole_options(conn)
         
@@ -939,38 +955,8 @@ def upload_photo_benevole(benevole_id):
         return redirect(url_for('benevoles.update_benevole', benevole_id=benevole_id))
 
     try:
-        img = Image.open(file.stream)
-
-        # ✅ Corrige orientation EXIF si nécessaire
-        try:
-            for orientation in ExifTags.TAGS.keys():
-                if ExifTags.TAGS[orientation] == 'Orientation':
-                    break
-            exif = img._getexif()
-            if exif and orientation in exif:
-                if exif[orientation] == 3:
-                    img = img.rotate(180, expand=True)
-                elif exif[orientation] == 6:
-                    img = img.rotate(270, expand=True)
-                elif exif[orientation] == 8:
-                    img = img.rotate(90, expand=True)
-        except Exception as e:
-            print(f"⚠️ Impossible d’appliquer l’orientation EXIF : {e}")
-
-        # ✅ Conversion et redimensionnement
-        img = img.convert("RGB")
-        img.thumbnail((400, 400))
-
-        # ✅ Détermine le bon répertoire
-        environment = os.getenv("ENVIRONMENT", "dev")
-        base_dir = "/home/ndprz/ba380" if environment == "prod" else "/home/ndprz/dev"
-        static_dir = os.path.join(base_dir, "static", "photos_benevoles")
-        os.makedirs(static_dir, exist_ok=True)
-
-        # ✅ Sauvegarde du fichier
-        save_path = os.path.join(static_dir, f"{benevole_id}.jpg")
-        img.info.pop('exif', None)
-        img.save(save_path, "JPEG", quality=85)
+        # ✅ Orientation EXIF, photo de référence 400 px et vignettes (voir photos)
+        photos.enregistrer(benevole_id, file.stream)
 
         flash("✅ Photo enregistrée avec succès", "success")
 
@@ -1092,18 +1078,24 @@ def supprimer_definitivement_benevole(benevole_id):
     return redirect(url_for("benevoles.benevoles_archives"))
 
 
+@benevoles_bp.route('/photos_benevoles/v/<path:nom>')
+def photo_variante(nom):
+    """
+    Vignette de photo (nom à empreinte de contenu, voir photos) : cache
+    navigateur d'un an, comme les fichiers statiques du dossier photos.
+    """
+    reponse = send_from_directory(photos.VARIANTES_DIR, nom, max_age=photos.CACHE_MAX_AGE_S)
+    reponse.headers["Cache-Control"] = f"public, max-age={photos.CACHE_MAX_AGE_S}, immutable"
+    return reponse
+
+
 @benevoles_bp.route('/supprimer_photo_benevole/<int:benevole_id>', methods=['POST'])
 @login_required
 def supprimer_photo_benevole(benevole_id):
     """Supprime la photo du bénévole (fichier et enregistrement DB)"""
     try:
-        environment = os.getenv("ENVIRONMENT", "dev")
-        base_dir = "/home/ndprz/ba380" if environment == "prod" else "/home/ndprz/dev"
-        photo_path = os.path.join(base_dir, "static", "photos_benevoles", f"{benevole_id}.jpg")
-
-        # Supprimer le fichier s'il existe
-        if os.path.exists(photo_path):
-            os.remove(photo_path)
+        # Supprimer le fichier et ses vignettes
+        photos.supprimer(benevole_id)
 
         # Supprimer aussi l’entrée éventuelle dans la table photos_benevoles
         conn = get_db_connection()
@@ -4,34 +4,38 @@
 # Fonctionnalités :
 # - Création / modification / suppression d'événements
 # - Upload de fichiers (vidéo, image, PDF, PPTX)
-# - Conversion automatique PPTX -> PDF (LibreOffice), puis PDF -> images (pdf2image)
-# - Conversion automatique PDF -> images
+# - Conversion PPTX -> PDF -> images en tâche de fond (voir conversions_evenements),
+#   statut affiché dans la gestion
 # - Nettoyage des fichiers liés lors d'une suppression ou d'un remplacement
 # - API /affichage_evenement + /api/evenements_actifs pour le front
+#   (document versionné + ETag, flux SSE optionnel : voir evenements_affichage)
 # - Logs via write_log(), chemins dynamiques DEV/PROD via get_static_event_dir()
 
 import os
-import re
 import glob
+import time
 import sqlite3
-import subprocess
 from datetime import datetime, timedelta
 import shutil
 
 from flask import (
-    Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
+    Blueprint, render_template, request, redirect, url_for, flash, jsonify, session,
+    Response, stream_with_context
 )
 from flask_login import login_required
 from werkzeug.utils import secure_filename
-from pdf2image import convert_from_path
+from dotenv import load_dotenv
 
 
 
 
 # Utils maison
 from utils import (
-    get_db_connection, upload_database, write_log, get_static_event_dir
+    get_db_connection, get_db_path, upload_database, write_log, get_static_event_dir
 )
+import photos
+import evenements_affichage
+import conversions_evenements
 
 
 
@@ -68,6 +72,12 @@ def get_upload_dir():
 
 ALLOWED_EXTENSIONS = {"pdf", "pptx", "mp4", "webm", "mov", "jpg", "jpeg", "png", "gif", "webp"}
 
+# 📡 Flux SSE de l'écran public (désactivé par défaut : une connexion ouverte
+# occupe un worker gunicorn synchrone pendant DUREE_FLUX_SSE_S)
+SSE_ACTIF = os.getenv("EVENEMENTS_SSE", "0") == "1"
+INTERVALLE_SSE_S = int(os.getenv("EVENEMENTS_SSE_INTERVALLE_S", "5"))
+DUREE_FLUX_SSE_S = int(os.getenv("EVENEMENTS_SSE_DUREE_S", "300"))
+
 # ============================================================
 # 🧰 Utilitaires
 # ============================================================
@@ -137,100 +147,65 @@ def remove_files_for_base(base: str):
         write_log(f"🧹 {deleted} fichier(s) supprimé(s) pour base '{base}'.")
 
 # ============================================================
-# 🔄 Conversions
+# 💾 Gestion fichiers uploadés
 # ============================================================
 
-def convertir_pdf_en_images(pdf_abs_path: str) -> list[str]:
-    web_images = []
+def lister_diapos(fichier_web: str) -> list[str]:
+    """
+    Pages converties d'un fichier retrouvées sur disque (événements enregistrés
+    avant le stockage des diapos ; ensuite, la liste vient de la conversion).
+    """
+    if not fichier_web:
+        return []
+    base = base_noext(to_abs_path(fichier_web))
     upload_dir = get_upload_dir()
-    try:
-        write_log(f"🖨️ Conversion PDF -> images : {pdf_abs_path}")
-        images = convert_from_path(pdf_abs_path, dpi=150)
-        base = base_noext(pdf_abs_path)
-        for i, img in enumerate(images, start=1):
-            out_abs = os.path.join(upload_dir, f"{base}_page_{i}.jpg")
-            img.save(out_abs, "JPEG")
-            web_images.append(to_web_path(out_abs))
-        write_log(f"✅ PDF -> {len(web_images)} image(s).")
-    except Exception as e:
-        import traceback
-        write_log(f"❌ Erreur PDF->images : {e}\n{traceback.format_exc()}")
-    return web_images
-
-def libreoffice_available() -> bool:
-    try:
-        r = subprocess.run(["which", "libreoffice"], capture_output=True, text=True, check=False)
-        return bool(r.stdout.strip())
-    except Exception:
-        return False
-
-def convertir_pptx_en_pdf(pptx_abs_path: str) -> str | None:
-    pdf_abs = os.path.splitext(pptx_abs_path)[0] + ".pdf"
-    if not libreoffice_available():
-        write_log("⚠️ LibreOffice indisponible — conversion PPTX->PDF impossible.")
-        return None
-    try:
-        write_log(f"📑 Conversion PPTX -> PDF via LibreOffice : {pptx_abs_path}")
-        outdir = os.path.dirname(pptx_abs_path)
-        res = subprocess.run(
-            ["libreoffice", "--headless", "--convert-to", "pdf", "--outdir", outdir, pptx_abs_path],
-            capture_output=True, text=True, check=False
-        )
-        if res.returncode != 0:
-            write_log(f"❌ LibreOffice retour {res.returncode} : {res.stderr or res.stdout}")
-            return None
-        if not os.path.exists(pdf_abs):
-            write_log("❌ PDF attendu non trouvé après conversion.")
-            return None
-        write_log(f"✅ PPTX -> PDF OK : {pdf_abs}")
-        return pdf_abs
-    except Exception as e:
-        import traceback
-        write_log(f"❌ Erreur PPTX->PDF : {e}\n{traceback.format_exc()}")
-        return None
-
-# ============================================================
-# 💾 Gestion fichiers uploadés
-# ============================================================
+    patterns = [
+        os.path.join(upload_dir, f"{base}_page_*.jpg"),
+        os.path.join(upload_dir, f"{base}_slide_*.jpg"),
+        os.path.join(upload_dir, f"{base}_*.jpg"),
+    ]
+    found = []
+    for pat in patterns:
+        found.extend(sorted(glob.glob(pat)))
+    diapos = []
+    seen = set()
+    for fp in found:
+        if fp not in seen:
+            seen.add(fp)
+            diapos.append(to_web_path(fp))
+    return diapos
 
 def save_uploaded_file(file_storage) -> str:
+    """
+    Enregistre le fichier et renvoie son chemin web. Les PDF / PPTX sont
+    convertis ensuite en tâche de fond (`conversions_evenements.creer_job`,
+    une fois l'événement enregistré).
+    """
     upload_dir = get_upload_dir()
     filename = secure_filename(file_storage.filename)
     abs_path = os.path.join(upload_dir, filename)
     os.makedirs(upload_dir, exist_ok=True)
     file_storage.save(abs_path)
     write_log(f"💾 Fichier sauvegardé : {abs_path}")
-
-    ext = os.path.splitext(filename)[1].lower()
-    if ext == ".pptx":
-        pdf_abs = convertir_pptx_en_pdf(abs_path)
-        if pdf_abs:
-            convertir_pdf_en_images(pdf_abs)
-            return to_web_path(pdf_abs)
-        return to_web_path(abs_path)
-    if ext == ".pdf":
-        convertir_pdf_en_images(abs_path)
-        return to_web_path(abs_path)
     return to_web_path(abs_path)
 
+def lancer_conversion(evenement_id, fichier_web: str) -> bool:
+    """Met en file la conversion d'un PDF / PPTX ; False si rien à convertir."""
+    if not conversions_evenements.a_convertir(fichier_web):
+        return False
+    conversions_evenements.creer_job(get_db_path(), evenement_id, to_abs_path(fichier_web), fichier_web)
+    return True
+
 # ============================================================
 # 👥 Photo bénévole
 # ============================================================
 
 def get_benevole_photo_path(benevole_id) -> str | None:
+    """Photo 400 px (WebP à empreinte si générée, voir photos) ; None sans photo."""
     if not benevole_id:
         return None
     try:
-        conn = get_db_connection()
-        row = conn.execute(
-            "SELECT filename FROM photos_benevoles WHERE benevole_id = ? ORDER BY id DESC LIMIT 1",
-            (benevole_id,)
-        ).fetchone()
-        conn.close()
-        if not row:
-            return None
-        filename = row["filename"] if isinstance(row, sqlite3.Row) else row[0]
-        return f"/static/photos_benevoles/{filename}"
+        return photos.url(benevole_id, "moyenne")
     except Exception as e:
         write_log(f"⚠️ get_benevole_photo_path : {e}")
         return None
@@ -304,6 +279,9 @@ def gestion_evenements():
                             except Exception as e:
                                 write_log(f"⚠️ Erreur suppression sous-titres {sub_path} : {e}")
 
+                # ⏹️ conversion éventuellement en cours
+                conversions_evenements.annuler(eid)
+
                 # 🧱 suppression de la ligne en base
                 cur.execute("DELETE FROM evenements WHERE id = ?", (eid,))
                 conn.commit()
@@ -376,44 +354,65 @@ def gestion_evenements():
                       date_debut, date_fin, recurrence, duree]
             sql = f"UPDATE evenements SET {', '.join([c+'=?' for c in champs])}"
             if new_file_web:
-                sql += ", fichier_path=?"
-                params.append(new_file_web)
+                # Diapos remplies par la conversion ; statut remis à zéro
+                sql += ", fichier_path=?, diapos=?, conversion_statut=NULL, conversion_message=NULL"
+                params += [new_file_web, evenements_affichage.encoder_diapos([])]
             sql += " WHERE id=?"
             params.append(eid)
             cur.execute(sql, params)
             conn.commit()
+            if new_file_web and lancer_conversion(eid, new_file_web):
+                flash("⏳ Conversion du document en cours (voir la colonne Fichier).", "info")
             upload_database()
             flash("💾 Événement modifié.", "success")
             return redirect(url_for("evenements.gestion_evenements"))
 
         cur.execute("""
             INSERT INTO evenements
-              (type, titre, contenu, fichier_path, benevole_id, image_path,
+              (type, titre, contenu, fichier_path, diapos, benevole_id, image_path,
                date_debut, date_fin, recurrence, duree_affichage, actif)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-        """, (type_ev, titre, contenu, new_file_web, benevole_id, image_path,
-              date_debut, date_fin, recurrence, duree))
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+        """, (type_ev, titre, contenu, new_file_web,
+              evenements_affichage.encoder_diapos([]) if new_file_web else None,
+              benevole_id, image_path, date_debut, date_fin, recurrence, duree))
         conn.commit()
+        if new_file_web and lancer_conversion(cur.lastrowid, new_file_web):
+            flash("⏳ Conversion du document en cours (voir la colonne Fichier).", "info")
         upload_database()
         flash("✅ Événement ajouté.", "success")
         return redirect(url_for("evenements.gestion_evenements"))
 
     ev_rows = cur.execute("SELECT * FROM evenements ORDER BY date_debut DESC, id DESC").fetchall()
     ben_rows = cur.execute("SELECT id, nom, prenom FROM benevoles ORDER BY nom, prenom").fetchall()
+    conversions = conversions_evenements.etats(conn)
     conn.close()
 
     evenements = [dict(r) for r in ev_rows]
     benevoles = [dict(r) for r in ben_rows]
-    return render_template("gestion_evenements.html", evenements=evenements, benevoles=benevoles)
+    return render_template("gestion_evenements.html", evenements=evenements, benevoles=benevoles,
+                           conversions=conversions)
+
+@evenements_bp.route("/evenements/conversions")
+@login_required
+def etat_conversions():
+    """{id: {statut, message}} des conversions en cours ou en erreur (suivi de la gestion)."""
+    if not role_autorise_evenements():
+        return jsonify({"error": "Accès refusé"}), 403
+    conn = get_db_connection()
+    try:
+        return jsonify(conversions_evenements.etats(conn))
+    finally:
+        conn.close()
 
 # ============================================================
 # 🌍 API : événements actifs
 # ============================================================
 
-@evenements_bp.route("/api/evenements_actifs")
-def api_evenements_actifs():
-    now = (datetime.utcnow() + timedelta(hours=2)).isoformat(timespec="minutes")
-    conn = get_db_connection()
+def _maintenant() -> str:
+    return (datetime.utcnow() + timedelta(hours=2)).isoformat(timespec="minutes")
+
+def _construire_evenements_actifs(conn, now: str) -> list[dict]:
+    """Événements actifs à `now`, avec leurs diapos (`images`) stockées."""
     conn.row_factory = sqlite3.Row
     rows = conn.execute("""
         SELECT * FROM evenements
@@ -422,49 +421,87 @@ def api_evenements_actifs():
           AND date_fin   >= ?
         ORDER BY date_debut, id
     """, (now, now)).fetchall()
-    conn.close()
 
     data = []
     for r in rows:
         d = dict(r)
         fichier_web = (d.get("fichier_path") or "").strip()
-        images = []
-
-        if fichier_web:
-            base = base_noext(to_abs_path(fichier_web))
-            upload_dir = get_upload_dir()
-            patterns = [
-                os.path.join(upload_dir, f"{base}_page_*.jpg"),
-                os.path.join(upload_dir, f"{base}_slide_*.jpg"),
-                os.path.join(upload_dir, f"{base}_*.jpg"),
-            ]
-            found = []
-            for pat in patterns:
-                found.extend(sorted(glob.glob(pat)))
-            seen = set()
-            for fp in found:
-                if fp not in seen:
-                    seen.add(fp)
-                    images.append(to_web_path(fp))
+        images = evenements_affichage.decoder_diapos(d.pop("diapos", None))
+        d.pop("conversion_statut", None)
+        d.pop("conversion_message", None)
+
+        if images is None and fichier_web:
+            # Événement antérieur aux diapos stockées : recherche sur disque, une seule fois
+            images = lister_diapos(fichier_web)
+            try:
+                conn.execute("UPDATE evenements SET diapos = ? WHERE id = ?",
+                             (evenements_affichage.encoder_diapos(images), d["id"]))
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                write_log(f"⚠️ Diapos non stockées (événement {d['id']}) : {e}")
         if images:
             d["images"] = images
         data.append(d)
-    return jsonify(data)
+    return data
+
+def _document_evenements_actifs() -> tuple[str, str]:
+    conn = get_db_connection()
+    try:
+        return evenements_affichage.document(
+            conn, get_db_path(), _maintenant(), _construire_evenements_actifs
+        )
+    finally:
+        conn.close()
+
+@evenements_bp.route("/api/evenements_actifs")
+def api_evenements_actifs():
+    """Liste JSON des événements actifs ; 304 si l'ETag envoyé est à jour."""
+    corps, etag = _document_evenements_actifs()
+    resp = Response(corps, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+@evenements_bp.route("/api/evenements_actifs/flux")
+def flux_evenements_actifs():
+    """
+    Flux SSE (EVENEMENTS_SSE=1) : le document est poussé dès qu'il change.
+    Fermé après DUREE_FLUX_SSE_S ; EventSource se reconnecte seul et renvoie
+    le dernier ETag reçu (Last-Event-ID).
+    """
+    if not SSE_ACTIF:
+        return jsonify({"error": "Flux désactivé"}), 404
+
+    dernier = request.headers.get("Last-Event-ID")
+
+    def generer(dernier):
+        fin = time.monotonic() + DUREE_FLUX_SSE_S
+        yield "retry: 5000\n\n"
+        while time.monotonic() < fin:
+            corps, etag = _document_evenements_actifs()
+            if etag != dernier:
+                dernier = etag
+                yield f"id: {etag}\nevent: evenements\ndata: {corps}\n\n"
+            else:
+                yield ": ping\n\n"
+            time.sleep(INTERVALLE_SSE_S)
+
+    return Response(
+        stream_with_context(generer(dernier)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 
 # ============================================================
 # 🎙 Génération automatique des sous-titres (API Whisper)
 # ============================================================
-from flask import jsonify
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-from utils import write_log, get_db_connection, get_static_event_dir
-
 @evenements_bp.route("/evenements/generer_sous_titres/<int:event_id>", methods=["POST"])
 @login_required
 def generer_sous_titres(event_id):
+    from openai import OpenAI
+
     load_dotenv()
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -566,4 +603,4 @@ def save_srt(eid):
 
 @evenements_bp.route("/affichage_evenement")
 def affichage_evenement():
-    return render_template("affichage_evenement.html")
+    return render_template("affichage_evenement.html", sse_actif=SSE_ACTIF)
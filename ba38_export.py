@@ -1,11 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_required, current_user
-from utils import get_db_connection, get_db_path, write_log
-from weasyprint import HTML
-from docx import Document
-import pandas as pd
+from utils import get_db_path, write_log
+import config_cache
+import export_engine
+import recherche_fts
 import os
-import io
 import json
 import sqlite3
 
@@ -30,7 +29,6 @@ def generateur_excel():
     filters = {}
     mode_or_val = 0
     selected_columns = []
-    preview_data = None
     total_count = 0
 
     db_path = get_db_path()
@@ -52,15 +50,7 @@ def generateur_excel():
     # write_log(f"➡️ Action demandée = {action}, data_type = {data_type}")
 
     # Lecture des métadonnées
-    fields_data = cursor.execute(
-        """
-        SELECT field_name, group_name, display_order, type_champ
-        FROM field_groups
-        WHERE appli = ?
-        ORDER BY display_order
-        """,
-        (data_type,),
-    ).fetchall()
+    fields_data = config_cache.champs(data_type)
     # write_log(f"📋 {len(fields_data)} champs trouvés pour {data_type}")
 
     # Regroupement
@@ -79,12 +69,7 @@ def generateur_excel():
         ordered_grouped_fields[k] = v
     grouped_fields = ordered_grouped_fields
 
-    bene_values = [
-        r[0]
-        for r in cursor.execute(
-            "SELECT DISTINCT param_value FROM parametres WHERE param_name='type_benevole'"
-        ).fetchall()
-    ]
+    bene_values = list(dict.fromkeys(config_cache.valeurs_parametre("type_benevole")))
     # write_log(f"📊 Valeurs type_benevole = {bene_values}")
 
     # ===================================================================
@@ -192,8 +177,14 @@ def generateur_excel():
         params.extend(c[1] for c in oui_non_clauses)
 
     if search:
-        where_clauses.append("(nom LIKE ? OR prenom LIKE ?)")
-        params.extend([f"%{search}%", f"%{search}%"])
+        # 🔎 Index plein texte (sans accents) si installé, sinon LIKE
+        fts = recherche_fts.condition(conn, data_type, search, colonnes=["nom", "prenom"])
+        if fts:
+            where_clauses.append(fts[0])
+            params.extend(fts[1])
+        else:
+            where_clauses.append("(nom LIKE ? OR prenom LIKE ?)")
+            params.extend([f"%{search}%", f"%{search}%"])
 
     where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
     columns_sql = ", ".join(selected_columns) if selected_columns else "id"
@@ -205,12 +196,10 @@ def generateur_excel():
     # 📊 Actions principales
     # ===================================================================
     if request.method == "POST" and not just_switching:
-        df = pd.read_sql_query(query, conn, params=params)
-        total_count = len(df)
-        # write_log(f"📈 {total_count} lignes trouvées")
 
         if action == "preview":
-            preview_data = df.head(20)
+            # LIMIT pour l'affichage + COUNT(*) séparé : rien d'autre n'est chargé
+            preview_columns, preview_rows, total_count = export_engine.apercu(conn, query, params)
             conn.close()
             # write_log("👀 Aperçu du résultat généré")
             return render_template(
@@ -223,7 +212,8 @@ def generateur_excel():
                 selected_columns=selected_columns,
                 search=search,
                 type_benevole_values=bene_values,
-                preview_data=preview_data,
+                preview_columns=preview_columns,
+                preview_rows=preview_rows,
                 total_count=total_count,
                 sql_debug=f"{query}\nPARAMS = {params}",
                 presets=presets,
@@ -291,17 +281,16 @@ def generateur_excel():
                 # write_log("⚠️ Tentative de suppression sans preset sélectionné")
 
 
-        if action == "export":
+        if action in ("export", "export_csv"):
             # write_log("📤 Export Excel demandé")
-            output = io.BytesIO()
-            df.to_excel(output, index=False, engine="openpyxl")
-            output.seek(0)
             conn.close()
-            return send_file(
-                output,
-                as_attachment=True,
-                download_name=f"export_{data_type}.xlsx",
-                mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            return export_engine.reponse_export(
+                db_path,
+                query,
+                params,
+                nom_fichier=f"export_{data_type}",
+                format="csv" if action == "export_csv" else "xlsx",
+                feuille=data_type,
             )
 
     conn.close()
@@ -334,21 +323,21 @@ def generation_fichiers():
 
     if request.method == "POST":
         data_type = request.form.get("data_type", "all")
-        conn = get_db_connection()
+        format_fichier = request.form.get("format", "xlsx")
 
         queries = {
-            "all": ("SELECT * FROM associations", "extraction_toutes_associations.xlsx"),
-            "active": ("SELECT * FROM associations WHERE validite = 'oui'", "extraction_associations_actives.xlsx"),
-            "inactive": ("SELECT * FROM associations WHERE validite != 'oui'", "extraction_associations_inactives.xlsx"),
+            "all": ("SELECT * FROM associations", "extraction_toutes_associations"),
+            "active": ("SELECT * FROM associations WHERE validite = 'oui'", "extraction_associations_actives"),
+            "inactive": ("SELECT * FROM associations WHERE validite != 'oui'", "extraction_associations_inactives"),
             "indicateurs_etats": ("""
                 SELECT code_VIF, nom_association, responsable_IE, tel_resp_IE, courriel_resp_IE1, courriel_resp_IE2, car
                 FROM associations
-            """, "extraction_indicateurs_etats.xlsx"),
+            """, "extraction_indicateurs_etats"),
             "besoins": ("""
                 SELECT Code_VIF, nom_association, besoins_particuliers, Validite, heure_de_passage
                 FROM associations
-            """, "extraction_associations_besoins.xlsx"),
-            "benevoles_complet": ("SELECT * FROM benevoles", "benevoles.xlsx"),
+            """, "extraction_associations_besoins"),
+            "benevoles_complet": ("SELECT * FROM benevoles", "benevoles"),
         }
 
         if data_type not in queries:
@@ -356,28 +345,16 @@ def generation_fichiers():
             return redirect(url_for("export_data.generation_fichiers"))
 
         query, file_name = queries[data_type]
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-
-        output = io.BytesIO()
-        df.to_excel(output, index=False, engine="openpyxl")
-        output.seek(0)
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=file_name,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        return export_engine.reponse_export(
+            get_db_path(),
+            query,
+            nom_fichier=file_name,
+            format=format_fichier,
+            feuille=data_type,
         )
 
     # --- Rendu initial de la page
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    fields_data = cursor.execute("""
-        SELECT * FROM field_groups
-        WHERE appli = 'associations'
-        ORDER BY display_order
-    """).fetchall()
-    conn.close()
+    fields_data = config_cache.champs("associations")
 
     grouped_fields = {}
     for row in fields_data:
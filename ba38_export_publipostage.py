@@ -1,10 +1,9 @@
 from utils import envoyer_mail, get_google_services, write_log, get_db_path
 from flask import Blueprint, request, jsonify, current_app
-import pandas as pd
 import os
 import re
 import sqlite3
-from googleapiclient.discovery import build
+import google_clients
 
 export_bp = Blueprint("export", __name__, url_prefix="/export_publipostage")
 
@@ -79,6 +78,8 @@ def export_dataframe_to_drive(df, sheet_name, client, drive_service, folder_id):
 
 @export_bp.route("/export_mail_ie", methods=["POST"])
 def export_mail_ie_route():
+    import pandas as pd
+
     try:
         client, drive_service, creds = get_google_services()
         if not client or not drive_service:
@@ -123,7 +124,7 @@ def export_mail_ie_route():
 
         sheet.insert_rows([df.columns.tolist()] + df.values.tolist())
 
-        sheets_service = build("sheets", "v4", credentials=creds)
+        sheets_service = google_clients.sheets()
         requests = [{
             "autoResizeDimensions": {
                 "dimensions": {
@@ -147,6 +148,8 @@ def export_mail_ie_route():
 
 @export_bp.route("/all", methods=["POST"])
 def export_all_publipostage():
+    import pandas as pd
+
     write_log("🚀 Export complet publipostage lancé")
     client, drive_service, _ = get_google_services()
     if not client or not drive_service:
@@ -5,7 +5,6 @@ et gère automatiquement le nettoyage (auto et immédiat).
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, send_from_directory
-from pypdf import PdfReader, PdfWriter
 from pathlib import Path
 import re, os, unicodedata, zipfile, datetime, shutil
 from utils import get_static_factures_dir, write_log
@@ -80,6 +79,9 @@ def delete_batch(horodatage):
 @factures_bp.route("/decouper_factures", methods=["GET", "POST"])
 def decouper_factures():
     if request.method == "POST":
+        from pypdf import PdfReader, PdfWriter
+
+
         file = request.files.get("pdf_file")
         if not file:
             flash("Aucun fichier PDF fourni.", "danger")
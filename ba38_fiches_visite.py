@@ -11,7 +11,6 @@ from datetime import datetime
 from flask import send_file, render_template, request
 from flask_login import login_required
 from utils import get_db_connection, write_log, get_db_path
-from weasyprint import HTML
 import io
 import os
         
@@ -251,6 +250,8 @@ def pdf(fiche_id):
             lecture_seule=True
         )
 
+        from weasyprint import HTML
+
         pdf_io = io.BytesIO()
         HTML(string=rendered_html, base_url=request.url_root).write_pdf(pdf_io)
         pdf_io.seek(0)
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, flash, url_for
+from flask import Blueprint, render_template, request, redirect, flash, url_for, jsonify
 from flask_login import current_user, login_required
 
 import sqlite3
@@ -6,29 +6,31 @@ import pytz
 import base64
 from datetime import datetime
 from utils import get_db_path, get_db_connection, upload_database, has_access, write_log, is_valid_email, is_valid_phone, row_get
+import config_cache
+import listes_api
 
 
 fournisseurs_bp = Blueprint('fournisseurs', __name__)
 
-# Colonnes à afficher (on exclut lundi/mardi/mercredi/jeudi + horaires)
+# Colonnes à afficher dans la liste, après ID / Nom / Drive
+# (on exclut lundi/mardi/mercredi/jeudi + horaires)
 COLUMNS = [
-    ("id", "ID"),
-    ("nom", "Nom"),
+    ("code_vif", "Code VIF"),
     ("enseigne", "Enseigne"),
     ("societe", "Société"),
-    ("Type_frs", "Type"),
+    ("type_frs", "Type"),
     ("tel_mobile", "Mobile"),
     ("tel", "Téléphone"),
     ("mail", "Email"),
-    ("adresse", "Adresse 1"),
+    ("adresse", "Adresse"),
     ("adresse2", "Adresse 2"),
     ("cp", "CP"),
     ("ville", "Ville"),
     ("notes", "Notes"),
     ("actif", "Actif"),
-    ("date_creation", "Créé le"),
-    ("date_modif", "Modifié le"),
-    ("user_modif", "Par"),
+    ("date_creation", "Date création"),
+    ("date_modif", "Date modif"),
+    ("user_modif", "Utilisateur"),
 ]
 
 def _connect():
@@ -36,39 +38,57 @@ def _connect():
     conn.row_factory = sqlite3.Row
     return conn
 
-@fournisseurs_bp.route('/fournisseurs')
-@login_required
-def liste_fournisseurs():
-    q = request.args.get('q', '').strip()
-
+def _page_fournisseurs():
+    """
+    Une page de la liste (pagination par clé, voir listes_api).
+    La recherche porte sur les colonnes affichées, hors dates.
+    """
+    colonnes = ["nom", "drive_link"] + [c for c, _ in COLUMNS]
     with _connect() as conn:
-        # 🔍 Récupérer la liste des colonnes de la table
-        cursor = conn.execute("PRAGMA table_info(fournisseurs)")
-        columns_info = cursor.fetchall()
-        columns = [col[1] for col in columns_info]  # col[1] = nom de la colonne
-
-        # Construire la requête SELECT dynamique
-        cols_sql = ", ".join([f"COALESCE({c}, '') AS {c}" for c in columns])
-        sql = f"SELECT {cols_sql} FROM fournisseurs"
-        params = []
-
-        # Si recherche → WHERE dynamique sur toutes les colonnes texte
-        if q:
-            like_cols = [c for c in columns if c not in ("id", "date_creation", "date_modif")]
-            where = " OR ".join([f"{c} LIKE ?" for c in like_cols])
-            sql += f" WHERE {where}"
-            params = [f"%{q}%"] * len(like_cols)
+        resultat = listes_api.page(
+            conn, "fournisseurs", colonnes,
+            colonnes_recherche=[c for c in colonnes if c not in ("drive_link", "date_creation", "date_modif")],
+            tri_defaut="nom",
+            **listes_api.parametres(request.args, "nom"),
+        )
+    resultat["colonnes_affichees"] = [c for c, _ in COLUMNS if c in resultat["colonnes"]]
+    return resultat
 
-        sql += " ORDER BY nom COLLATE NOCASE"
 
-        rows = conn.execute(sql, params).fetchall()
+@fournisseurs_bp.route('/fournisseurs')
+@login_required
+def liste_fournisseurs():
+    """
+    Liste des fournisseurs : seule la première page est rendue ici ; les
+    suivantes (défilement, recherche, tri) viennent de /fournisseurs/api/liste.
+    """
+    resultat = _page_fournisseurs()
+    libelles = dict(COLUMNS)
 
     return render_template(
         "fournisseurs.html",
-        columns=columns,  # ⬅️ plus besoin de COLUMNS fixe
-        rows=rows,
-        q=q
+        columns=[(c, libelles[c]) for c in resultat["colonnes_affichees"]],
+        colonnes_affichees=resultat["colonnes_affichees"],
+        rows=resultat["lignes"],
+        page=resultat,
+        q=request.args.get('q', '').strip(),
+    )
+
+
+@fournisseurs_bp.route('/fournisseurs/api/liste')
+@login_required
+def api_liste_fournisseurs():
+    """
+    Liste des fournisseurs paginée (JSON) : q (recherche), tri, sens,
+    apres (curseur) et limite.
+    """
+    resultat = _page_fournisseurs()
+    html = render_template(
+        "partials/fournisseurs_lignes.html",
+        rows=resultat["lignes"],
+        colonnes_affichees=resultat["colonnes_affichees"],
     )
+    return jsonify(listes_api.reponse(resultat, html))
 
 
 @fournisseurs_bp.route('/fournisseurs/<int:fournisseur_id>/update', methods=['GET', 'POST'])
@@ -103,11 +123,7 @@ def update_fournisseur(fournisseur_id):
     fournisseur_dict = dict(fournisseur)
 
     # 🔢 Champs dynamiques
-    fields = cursor.execute("""
-        SELECT * FROM field_groups
-        WHERE appli = 'fournisseurs'
-        ORDER BY display_order
-    """).fetchall()
+    fields = config_cache.champs("fournisseurs")
 
     fields_data = []
     for row in fields:
@@ -207,7 +223,7 @@ def update_fournisseur(fournisseur_id):
     form_hash = base64.b64encode("|#|".join(inputs_for_hash).encode("utf-8")).decode("utf-8")
 
     # 📋 Charger paramètres (type_frs etc.)
-    params = cursor.execute("SELECT param_name, param_value FROM parametres").fetchall()
+    params = config_cache.tous_parametres()
     param_dict = {}
     for row in params:
         param_dict.setdefault(row["param_name"], []).append(row["param_value"])
@@ -243,7 +259,7 @@ def create_fournisseur():
     cursor = conn.cursor()
 
     # Charger les paramètres (enseigne, type_frs)
-    params = cursor.execute("SELECT param_name, param_value FROM parametres").fetchall()
+    params = config_cache.tous_parametres()
     param_dict = {}
     for row in params:
         param_dict.setdefault(row["param_name"], []).append(row["param_value"])
@@ -518,11 +534,6 @@ def export_fournisseurs_excel():
 
 from flask import send_file, flash, redirect, url_for
 from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph
-from reportlab.lib.units import cm
 import sqlite3
 from datetime import datetime
 
@@ -535,6 +546,10 @@ def export_fiche_fournisseur(fournisseur_id):
     - Notes et adresses sur plusieurs lignes si nécessaire.
     - Liste des contacts du fournisseur.
     """
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph
 
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -2,10 +2,11 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_required
 from utils import upload_database, write_log, get_db_connection
+import apercu_cache
 from ba38_planning_utils import get_parametre_valeur
 
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import timedelta
 from ba38_planning_utils import (
     get_lundi_de_la_semaine,
     get_benevole_infos,
@@ -17,14 +18,22 @@ from ba38_planning_utils import (
     get_fournisseurs_par_tournee_id,
     get_fournisseurs_pour_tournee,
     get_nom_tournee,
-    get_absents_par_jour,
-    filtrer
+    charger_absents_par_jour,
+    filtrer,
+    ResolveurNoms
 )
 
 
 
 planning_dist_bp = Blueprint('planning_dist', __name__)
 
+# Postes d'une ligne de planning distribution
+ROLES_DISTRIBUTION = [
+    "froid1", "froid2", "froid3", "froid4",
+    "frais_sec1", "frais_sec2", "frais_sec3", "frais_sec4",
+]
+ROLES_DISTRIBUTION_IDS = [f"{r}_id" for r in ROLES_DISTRIBUTION]
+
 @planning_dist_bp.route("/planning_main")
 @login_required
 def planning_main():
@@ -109,7 +118,7 @@ def creation_planning_distribution():
 
     from utils import get_db_connection
     from ba38_planning_utils import get_lundi_de_la_semaine
-    from datetime import datetime, timedelta
+    from datetime import timedelta
 
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -185,37 +194,22 @@ def creation_planning_distribution():
     modele = [dict(l) for l in modele]
 
     # --------------------------------------------------
-    # 5️⃣ Charger les bénévoles (ID → Nom Prénom)
+    # 5️⃣ Noms des bénévoles du modèle (ID → Prénom Nom)
     # --------------------------------------------------
-    benevoles_map = {
-        b["id"]: f"{b['prenom']} {b['nom']}"
-        for b in cursor.execute(
-            "SELECT id, prenom, nom FROM benevoles"
-        ).fetchall()
-    }
+    noms = ResolveurNoms.depuis_lignes(conn, modele, champs_benevoles=ROLES_DISTRIBUTION_IDS)
 
     # --------------------------------------------------
     # 6️⃣ Charger les absences
     # --------------------------------------------------
-    absences = cursor.execute(
-        "SELECT benevole_id, date_debut, date_fin FROM absences"
-    ).fetchall()
-
-    absences = [
-        {
-            "benevole_id": a["benevole_id"],
-            "debut": datetime.strptime(a["date_debut"], "%d/%m/%Y").date(),
-            "fin": datetime.strptime(a["date_fin"], "%d/%m/%Y").date(),
-        }
-        for a in absences
-    ]
+    absents_par_jour = charger_absents_par_jour(
+        conn, {j: lundi + timedelta(i) for i, j in enumerate(jours)}
+    )
 
     # --------------------------------------------------
     # 7️⃣ Génération du pré-planning
     # --------------------------------------------------
     for ligne in modele:
         jour = ligne["jour"].lower()
-        date_jour = lundi + timedelta(jours.index(jour))
 
         row = {
             "jour": ligne["jour"],
@@ -225,94 +219,87 @@ def creation_planning_distribution():
         for i in range(1, 5):
             bid = ligne.get(f"froid{i}_id")
 
-            est_absent = any(
-                a["benevole_id"] == bid
-                and a["debut"] <= date_jour <= a["fin"]
-                for a in absences
-            ) if bid else False
+            est_absent = bid in absents_par_jour.get(jour, set()) if bid else False
 
             row[f"froid{i}_id"] = bid
             row[f"froid{i}_remplacant"] = None
             row[f"froid{i}_absent"] = "oui" if est_absent else "non"
-            row[f"froid{i}_nom"] = benevoles_map.get(bid, "") if bid else ""
+            row[f"froid{i}_nom"] = noms.benevole(bid, defaut="") if bid else ""
             row[f"froid{i}_remplacant_nom"] = ""
 
         # ----------- FRAIS SEC ----------- #
         for i in range(1, 5):
             bid = ligne.get(f"frais_sec{i}_id")
 
-            est_absent = any(
-                a["benevole_id"] == bid
-                and a["debut"] <= date_jour <= a["fin"]
-                for a in absences
-            ) if bid else False
+            est_absent = bid in absents_par_jour.get(jour, set()) if bid else False
 
             row[f"frais_sec{i}_id"] = bid
             row[f"frais_sec{i}_remplacant"] = None
             row[f"frais_sec{i}_absent"] = "oui" if est_absent else "non"
-            row[f"frais_sec{i}_nom"] = benevoles_map.get(bid, "") if bid else ""
+            row[f"frais_sec{i}_nom"] = noms.benevole(bid, defaut="") if bid else ""
             row[f"frais_sec{i}_remplacant_nom"] = ""
 
         planning.append(row)
 
-        # --------------------------------------------------
-        # 7bis️⃣ Enregistrement en base du planning généré
-        # --------------------------------------------------
+    # --------------------------------------------------
+    # 7bis️⃣ Enregistrement en base du planning généré
+    #       (une seule fois, après la génération complète)
+    # --------------------------------------------------
 
-        # Suppression préalable si régénération
-        cursor.execute(
-            "DELETE FROM plannings_distribution WHERE annee = ? AND semaine = ?",
-            (annee, numero_semaine)
-        )
+    # Suppression préalable si régénération
+    cursor.execute(
+        "DELETE FROM plannings_distribution WHERE annee = ? AND semaine = ?",
+        (annee, numero_semaine)
+    )
 
-        insert_sql = """
-            INSERT INTO plannings_distribution (
-                annee, semaine, jour,
+    insert_sql = """
+        INSERT INTO plannings_distribution (
+            annee, semaine, jour,
 
-                froid1_id, froid1_absent, froid1_remplacant,
-                froid2_id, froid2_absent, froid2_remplacant,
-                froid3_id, froid3_absent, froid3_remplacant,
-                froid4_id, froid4_absent, froid4_remplacant,
+            froid1_id, froid1_absent, froid1_remplacant,
+            froid2_id, froid2_absent, froid2_remplacant,
+            froid3_id, froid3_absent, froid3_remplacant,
+            froid4_id, froid4_absent, froid4_remplacant,
 
-                frais_sec1_id, frais_sec1_absent, frais_sec1_remplacant,
-                frais_sec2_id, frais_sec2_absent, frais_sec2_remplacant,
-                frais_sec3_id, frais_sec3_absent, frais_sec3_remplacant,
-                frais_sec4_id, frais_sec4_absent, frais_sec4_remplacant
-            )
-            VALUES (
-                ?, ?, ?,
-
-                ?, ?, ?,
-                ?, ?, ?,
-                ?, ?, ?,
-                ?, ?, ?,
-
-                ?, ?, ?,
-                ?, ?, ?,
-                ?, ?, ?,
-                ?, ?, ?
-            )
-        """
+            frais_sec1_id, frais_sec1_absent, frais_sec1_remplacant,
+            frais_sec2_id, frais_sec2_absent, frais_sec2_remplacant,
+            frais_sec3_id, frais_sec3_absent, frais_sec3_remplacant,
+            frais_sec4_id, frais_sec4_absent, frais_sec4_remplacant
+        )
+        VALUES (
+            ?, ?, ?,
+
+            ?, ?, ?,
+            ?, ?, ?,
+            ?, ?, ?,
+            ?, ?, ?,
+
+            ?, ?, ?,
+            ?, ?, ?,
+            ?, ?, ?,
+            ?, ?, ?
+        )
+    """
 
-        for row in planning:
-            cursor.execute(insert_sql, (
-                annee,
-                numero_semaine,
-                row["jour"],
+    for row in planning:
+        cursor.execute(insert_sql, (
+            annee,
+            numero_semaine,
+            row["jour"],
 
-                row["froid1_id"], row["froid1_absent"], None,
-                row["froid2_id"], row["froid2_absent"], None,
-                row["froid3_id"], row["froid3_absent"], None,
-                row["froid4_id"], row["froid4_absent"], None,
+            row["froid1_id"], row["froid1_absent"], None,
+            row["froid2_id"], row["froid2_absent"], None,
+            row["froid3_id"], row["froid3_absent"], None,
+            row["froid4_id"], row["froid4_absent"], None,
 
-                row["frais_sec1_id"], row["frais_sec1_absent"], None,
-                row["frais_sec2_id"], row["frais_sec2_absent"], None,
-                row["frais_sec3_id"], row["frais_sec3_absent"], None,
-                row["frais_sec4_id"], row["frais_sec4_absent"], None,
-            ))
+            row["frais_sec1_id"], row["frais_sec1_absent"], None,
+            row["frais_sec2_id"], row["frais_sec2_absent"], None,
+            row["frais_sec3_id"], row["frais_sec3_absent"], None,
+            row["frais_sec4_id"], row["frais_sec4_absent"], None,
+        ))
 
-        conn.commit()
-        upload_database()
+    conn.commit()
+    upload_database()
 
 
     conn.close()
@@ -366,17 +353,7 @@ def gestion_planning_distribution():
     lignes = [dict(l) for l in lignes]
 
     # 📦 Charger les absences
-    absences = cursor.execute("SELECT benevole_id, date_debut, date_fin FROM absences").fetchall()
-    absents_par_jour = {j: set() for j in jours_dates}
-    for a in absences:
-        try:
-            debut = datetime.strptime(a["date_debut"], "%d/%m/%Y").date()
-            fin = datetime.strptime(a["date_fin"], "%d/%m/%Y").date()
-            for jour, date_j in jours_dates.items():
-                if debut <= date_j <= fin:
-                    absents_par_jour[jour].add(a["benevole_id"])
-        except:
-            continue
+    absents_par_jour = charger_absents_par_jour(conn, jours_dates)
 
 
     # 📋 Liste des bénévoles, filtrée et triée
@@ -573,6 +550,15 @@ def apercu_planning_distribution():
 
     lundi = get_lundi_de_la_semaine(semaine)
 
+    contexte = apercu_cache.contexte_apercu(
+        "distribution", annee, num_semaine,
+        lambda: _contexte_apercu_distribution(semaine, annee, num_semaine, lundi),
+    )
+    return render_template("apercu_planning_distribution.html", **contexte)
+
+
+def _contexte_apercu_distribution(semaine, annee, num_semaine, lundi):
+    """Contexte de l'aperçu d'une semaine de distribution (mis en cache par apercu_cache)."""
     conn = get_db_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
@@ -581,9 +567,11 @@ def apercu_planning_distribution():
     lignes = cursor.execute("SELECT * FROM plannings_distribution WHERE annee = ? AND semaine = ?", (annee, num_semaine)).fetchall()
     lignes = [dict(l) for l in lignes]
 
-    # Lecture des noms de tous les bénévoles
-    benevoles = cursor.execute("SELECT id, nom, prenom FROM benevoles").fetchall()
-    bene_dict = {b["id"]: f"{b['nom']} {b['prenom']}" for b in benevoles}
+    # Noms des seuls bénévoles présents dans la semaine
+    noms = ResolveurNoms.depuis_lignes(
+        conn, lignes,
+        champs_benevoles=ROLES_DISTRIBUTION_IDS + [f"{r}_remplacant" for r in ROLES_DISTRIBUTION],
+    )
 
     # Ajout des noms pour affichage
     for ligne in lignes:
@@ -591,8 +579,8 @@ def apercu_planning_distribution():
             titulaire_id = ligne.get(f"{role}_id")
             remplaçant_id = ligne.get(f"{role}_remplacant")
 
-            ligne[f"{role}_nom"] = bene_dict.get(titulaire_id, "") if titulaire_id else ""
-            ligne[f"remplacant_{role}_nom"] = bene_dict.get(remplaçant_id, "") if remplaçant_id else ""
+            ligne[f"{role}_nom"] = noms.benevole(titulaire_id, defaut="", nom_d_abord=True) if titulaire_id else ""
+            ligne[f"remplacant_{role}_nom"] = noms.benevole(remplaçant_id, defaut="", nom_d_abord=True) if remplaçant_id else ""
 
     jours_dates = {j: (lundi + timedelta(days=i)) for i, j in enumerate(["lundi", "mardi", "mercredi", "jeudi", "vendredi"])}
     for l in lignes:
@@ -600,7 +588,7 @@ def apercu_planning_distribution():
         l["date_jour"] = jours_dates[jour].strftime("%d/%m/%Y")
 
     conn.close()
-    return render_template("apercu_planning_distribution.html", semaine=semaine, lignes=lignes)
+    return {"semaine": semaine, "lignes": lignes}
 
 
 
@@ -1,12 +1,16 @@
 # ba38_planning_palettes.py
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required
-from datetime import datetime, timedelta
+from datetime import timedelta
 from utils import get_db_connection, write_log, upload_database, get_db_connection
-from ba38_planning_utils import get_lundi_de_la_semaine, parse_id, get_nom, get_type_benevole_options
+import apercu_cache
+from ba38_planning_utils import get_lundi_de_la_semaine, parse_id, get_type_benevole_options, charger_absents_par_jour, ResolveurNoms
 
 planning_palettes_bp = Blueprint('planning_palettes', __name__)
 
+# Postes d'une ligne de planning palettes (pal01 … pal10)
+POSTES_PALETTES = [f"pal{str(i).zfill(2)}" for i in range(1, 11)]
+
 
 @planning_palettes_bp.route("/creation_planning_palettes", methods=["GET", "POST"])
 @login_required
@@ -65,17 +69,10 @@ def creation_planning_palettes():
 
 
     # 📦 Lire les absences connues
-    absences = cursor.execute("SELECT benevole_id, date_debut, date_fin FROM absences").fetchall()
-    absents_par_jour = {j: set() for j in jours_dates}
-    for a in absences:
-        try:
-            debut = datetime.strptime(a["date_debut"], "%d/%m/%Y").date()
-            fin = datetime.strptime(a["date_fin"], "%d/%m/%Y").date()
-            for jour, date_obj in jours_dates.items():
-                if debut <= date_obj <= fin:
-                    absents_par_jour[jour].add(a["benevole_id"])
-        except:
-            continue
+    absents_par_jour = charger_absents_par_jour(conn, jours_dates)
+
+    # 🔎 Noms des bénévoles du modèle en une requête
+    noms = ResolveurNoms.depuis_lignes(conn, modeles, champs_benevoles=[f"{p}_id" for p in POSTES_PALETTES])
 
     # 🏗️ Générer les lignes du planning
     planning = []
@@ -97,7 +94,7 @@ def creation_planning_palettes():
             ligne[champ_remp] = None
 
             # 👤 Pour affichage immédiat
-            titulaire = get_nom(bene_id, "benevoles", ["prenom", "nom"])
+            titulaire = noms.benevole(bene_id)
             remplacant = None
             ligne[f"{champ}_nom"] = remplacant if ligne[champ_abs] == "oui" and remplacant else titulaire
             ligne[f"{champ}_remplacant_nom"] = remplacant
@@ -149,6 +146,15 @@ def apercu_planning_palettes():
 
     lundi = get_lundi_de_la_semaine(semaine_iso)
 
+    contexte = apercu_cache.contexte_apercu(
+        "palettes", annee, numero_semaine,
+        lambda: _contexte_apercu_palettes(semaine_iso, annee, numero_semaine, lundi),
+    )
+    return render_template("apercu_planning_palettes.html", **contexte)
+
+
+def _contexte_apercu_palettes(semaine_iso, annee, numero_semaine, lundi):
+    """Contexte de l'aperçu d'une semaine de palettes (mis en cache par apercu_cache)."""
     conn = get_db_connection()
     
     cursor = conn.cursor()
@@ -169,10 +175,11 @@ def apercu_planning_palettes():
         """, (annee, numero_semaine)).fetchall()
     lignes = [dict(l) for l in lignes_raw]
 
-    # 👤 Dictionnaire des noms de bénévoles
-    benevoles = cursor.execute("SELECT id, nom, prenom FROM benevoles").fetchall()
-    benevoles = [dict(b) for b in benevoles]
-    bene_dict = {b["id"]: f"{b['nom']} {b['prenom']}" for b in benevoles}
+    # 👤 Noms des seuls bénévoles présents dans la semaine
+    noms = ResolveurNoms.depuis_lignes(
+        conn, lignes,
+        champs_benevoles=[f"{p}_{suffixe}" for p in POSTES_PALETTES for suffixe in ("id", "remplacant")],
+    )
 
     # 🧠 Ajout des noms formatés pour chaque poste
     for ligne in lignes:
@@ -181,8 +188,8 @@ def apercu_planning_palettes():
             champ = f"pal{str(i).zfill(2)}"
             titulaire_id = ligne.get(f"{champ}_id")
             remplacant_id = ligne.get(f"{champ}_remplacant")
-            ligne[f"{champ}_nom"] = bene_dict.get(titulaire_id, "") if titulaire_id else ""
-            ligne[f"{champ}_remplacant_nom"] = bene_dict.get(remplacant_id, "") if remplacant_id else ""
+            ligne[f"{champ}_nom"] = noms.benevole(titulaire_id, defaut="", nom_d_abord=True) if titulaire_id else ""
+            ligne[f"{champ}_remplacant_nom"] = noms.benevole(remplacant_id, defaut="", nom_d_abord=True) if remplacant_id else ""
 
     # 🗓️ Ajout de la date de chaque jour
     jours = ["lundi", "mardi", "mercredi", "jeudi", "vendredi"]
@@ -192,9 +199,7 @@ def apercu_planning_palettes():
         l["date_jour"] = jours_dates.get(jour, lundi).strftime("%d/%m/%Y")
 
     conn.close()
-    return render_template("apercu_planning_palettes.html",
-                           lignes=lignes,
-                           semaine=semaine_iso)
+    return {"lignes": lignes, "semaine": semaine_iso}
 
 
 @planning_palettes_bp.route("/maj_modele_planning_palettes", methods=["GET", "POST"])
@@ -281,7 +286,7 @@ def gestion_planning_palettes():
     # ------------------------------------------------------------
     from utils import get_db_connection, upload_database
     from ba38_planning_utils import get_lundi_de_la_semaine, get_type_benevole_options
-    from datetime import datetime, timedelta
+    from datetime import timedelta
 
     # ------------------------------------------------------------
     # Paramètre semaine
@@ -360,25 +365,14 @@ def gestion_planning_palettes():
     # ------------------------------------------------------------
     # 🔁 Relecture des absences
     # ------------------------------------------------------------
-    absences = cursor.execute("""
-        SELECT benevole_id, date_debut, date_fin
-        FROM absences
-    """).fetchall()
-
-    absences = [
-        {
-            "benevole_id": a["benevole_id"],
-            "debut": datetime.strptime(a["date_debut"], "%d/%m/%Y").date(),
-            "fin":   datetime.strptime(a["date_fin"], "%d/%m/%Y").date(),
-        }
-        for a in absences
-    ]
+    absents_par_jour = charger_absents_par_jour(
+        conn, {j: lundi + timedelta(i) for i, j in enumerate(jours)}
+    )
 
     planning_auto_modified = False  # 🔔 flag UI
 
     for ligne in lignes:
         jour = ligne["jour"].lower()
-        date_jour = lundi + timedelta(jours.index(jour))
 
         sql_updates = []
         sql_params = []
@@ -395,10 +389,7 @@ def gestion_planning_palettes():
             if not bene_id:
                 continue
 
-            est_absent = any(
-                a["benevole_id"] == bene_id and a["debut"] <= date_jour <= a["fin"]
-                for a in absences
-            )
+            est_absent = bene_id in absents_par_jour.get(jour, set())
 
             db_absent = (ligne.get(champ_abs) or "non").lower() == "oui"
 
@@ -3,8 +3,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required
 from utils import get_db_connection, upload_database, write_log
-from ba38_planning_utils import get_lundi_de_la_semaine, get_benevole_infos, get_nom, get_absents_par_jour, parse_numero_semaine, get_type_benevole_options
-from datetime import datetime, timedelta
+import apercu_cache
+from ba38_planning_utils import get_lundi_de_la_semaine, get_benevole_infos, charger_absents_par_jour, parse_numero_semaine, get_type_benevole_options, ResolveurNoms
+from datetime import timedelta
 from collections import defaultdict
 
 
@@ -128,12 +129,12 @@ def creation_planning_pesee():
         jours = [j for j in jours if j != "vendredi"]
 
     benevoles_raw = cursor.execute("SELECT id, nom, prenom, prep_pesee FROM benevoles").fetchall()
-    absences = cursor.execute("SELECT benevole_id, date_debut, date_fin FROM absences").fetchall()
     jours_dates = {j: lundi + timedelta(days=i) for i, j in enumerate(["lundi", "mardi", "mercredi", "jeudi", "vendredi"])}
-    absents_par_jour = get_absents_par_jour(absences, jours_dates)
+    absents_par_jour = charger_absents_par_jour(conn, jours_dates)
 
     model = cursor.execute("SELECT * FROM planning_standard_pesee_ids").fetchall()
     poste_mapping = {f"pesee{str(i).zfill(2)}_id": f"pesee{str(i).zfill(2)}" for i in range(1, 9)}
+    noms = ResolveurNoms.depuis_lignes(conn, model, champs_benevoles=list(poste_mapping))
 
     planning = []
 
@@ -147,7 +148,7 @@ def creation_planning_pesee():
             bloc[f"{champ_final}_id"] = bene_id
             bloc[f"{champ_final}_absent"] = "oui" if bene_id in absents_par_jour.get(jour, set()) else "non"
             bloc[f"{champ_final}_remplacant"] = None
-            bloc[f"{champ_final}_nom"] = get_nom(bene_id, "benevoles", ["prenom", "nom"]) if bene_id else ""
+            bloc[f"{champ_final}_nom"] = noms.benevole(bene_id) if bene_id else ""
         planning.append(bloc)
 
     if planning_existe:
@@ -201,6 +202,15 @@ def apercu_planning_pesee():
     
     lundi = get_lundi_de_la_semaine(semaine)
 
+    contexte = apercu_cache.contexte_apercu(
+        "pesee", annee, num_semaine,
+        lambda: _contexte_apercu_pesee(semaine, annee, num_semaine, lundi),
+    )
+    return render_template("apercu_planning_pesee.html", **contexte)
+
+
+def _contexte_apercu_pesee(semaine, annee, num_semaine, lundi):
+    """Contexte de l'aperçu d'une semaine de pesée (mis en cache par apercu_cache)."""
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -215,6 +225,12 @@ def apercu_planning_pesee():
     jours = ["lundi", "mardi", "mercredi", "jeudi", "vendredi"]
     jours_dates = {j: lundi + timedelta(days=i) for i, j in enumerate(jours)}
 
+    # 🔎 Noms des titulaires et remplaçants de la semaine en une requête
+    noms = ResolveurNoms.depuis_lignes(
+        conn, lignes,
+        champs_benevoles=[f"pesee{i:02d}_{suffixe}" for i in range(1, 9) for suffixe in ("id", "remplacant")],
+    )
+
     # 🔄 Traitement de chaque ligne de planning
     for l in lignes:
         jour = l["jour"].lower()
@@ -234,8 +250,8 @@ def apercu_planning_pesee():
             if remp_val in ["", "None", None]:
                 remp_val = None
 
-            l[f"{champ}_nom"] = get_nom(id_val, "benevoles", ["nom", "prenom"]) if id_val else ""
-            l[f"{champ}_remplacant_nom"] = get_nom(remp_val, "benevoles", ["nom", "prenom"]) if remp_val else ""
+            l[f"{champ}_nom"] = noms.benevole(id_val, nom_d_abord=True) if id_val else ""
+            l[f"{champ}_remplacant_nom"] = noms.benevole(remp_val, nom_d_abord=True) if remp_val else ""
 
         write_log(f"🔍 {l['jour']} | ID: {l.get('pesee01_id')} | NOM: {l.get('pesee01_nom')}")
 
@@ -244,7 +260,7 @@ def apercu_planning_pesee():
     ordre_jours = ["lundi", "mardi", "mercredi", "jeudi", "vendredi"]
     lignes.sort(key=lambda l: ordre_jours.index(l["jour"].lower()))
 
-    return render_template("apercu_planning_pesee.html", semaine=semaine, planning=lignes)
+    return {"semaine": semaine, "planning": lignes}
 
 
 
@@ -333,23 +349,7 @@ def gestion_planning_pesee():
     # -------------------------
     planning_auto_modified = False
 
-    absences_rows = cursor.execute(
-        "SELECT benevole_id, date_debut, date_fin FROM absences"
-    ).fetchall()
-
-    absents_par_jour = {j: set() for j in jours}
-    for a in absences_rows:
-        try:
-            debut = datetime.strptime(a["date_debut"], "%d/%m/%Y").date()
-            fin = datetime.strptime(a["date_fin"], "%d/%m/%Y").date()
-            bid = to_int_or_none(a["benevole_id"])
-            if not bid:
-                continue
-            for jour, date_obj in jours_dates.items():
-                if debut <= date_obj <= fin:
-                    absents_par_jour[jour].add(bid)
-        except Exception:
-            continue
+    absents_par_jour = charger_absents_par_jour(conn, jours_dates)
 
     # Si nouvel absent détecté => on force peseeXX_absent='oui' en base
     for l in lignes:
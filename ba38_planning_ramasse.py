@@ -1,10 +1,11 @@
 # ba38_planning_ramasse.py
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, flash
+from flask import Blueprint, render_template, request, flash, redirect, url_for, flash, send_file
 from ba38_planning_utils import get_type_benevole_options
 from flask_login import login_required
-from datetime import datetime, timedelta
+from datetime import timedelta
 from utils import get_db_connection, write_log, upload_database
+import apercu_cache
 
 from ba38_planning_utils import (
     get_lundi_de_la_semaine,
@@ -12,13 +13,10 @@ from ba38_planning_utils import (
     parse_id,
     parse_numero_semaine,
     get_nom,
-    get_nom_benevole,
-    get_nom_camion,
-    get_fournisseurs_par_tournee_id,
     get_fournisseurs_pour_tournee,
-    get_nom_tournee,
-    get_absents_par_jour,
-    filtrer
+    charger_absents_par_jour,
+    filtrer,
+    ResolveurNoms
 )
 
 import sqlite3
@@ -34,6 +32,15 @@ def safe(row, key):
     return row[key] if key in row.keys() and row[key] else "-"
 
 
+# Colonnes bénévoles d'une ligne de planning ramasse (titulaires et remplaçants)
+ROLES_RAMASSE_IDS = [
+    "chauffeur_id", "responsable_id", "equipier_id",
+    "ramasse_tri1_id", "ramasse_tri2_id", "ramasse_tri3_id",
+    "remplacant_chauffeur_id", "remplacant_responsable_id", "remplacant_equipier_id",
+    "remplacant_ramasse_tri1_id", "remplacant_ramasse_tri2_id", "remplacant_ramasse_tri3_id",
+]
+
+
 # def enregistrer_planning_semaine(semaine, lignes):
 #     conn = get_db_connection()
 #     cursor = conn.cursor()
@@ -58,7 +65,7 @@ def safe(row, key):
 #     conn.close()
 
 def purge_plannings_ramasse():
-    from datetime import datetime, timedelta
+    from datetime import datetime
     semaine_limite = datetime.now().isocalendar()[1] - 4  # Garde 4 semaines
     conn = get_db_connection()
     conn.execute("DELETE FROM plannings_ramasse WHERE semaine < ?", (semaine_limite,))
@@ -99,8 +106,7 @@ def creation_planning_ramasse():
         # Détection des absences
         lundi = get_lundi_de_la_semaine(semaine)
         jours_dates = {j: lundi + timedelta(days=i) for i, j in enumerate(jours)}
-        absences = cursor.execute("SELECT benevole_id, date_debut, date_fin FROM absences").fetchall()
-        absents_par_jour = get_absents_par_jour(absences, jours_dates)
+        absents_par_jour = charger_absents_par_jour(conn, jours_dates)
 
         # Modèle de planning
         lignes = cursor.execute("SELECT * FROM planning_standard_ramasse_ids ORDER BY jour, numero").fetchall()
@@ -109,6 +115,13 @@ def creation_planning_ramasse():
             flash("⚠️ Aucun modèle de planning trouvé. Veuillez d’abord définir le modèle avant de générer un planning.", "warning")
             return render_template("creation_planning_ramasse.html", semaine=semaine_iso, planning_existe=False)
 
+        # 🔎 Tous les libellés du modèle en quelques requêtes
+        noms = ResolveurNoms.depuis_lignes(
+            conn, lignes,
+            champs_benevoles=ROLES_RAMASSE_IDS,
+            champs_camions=["camion_id"],
+            champs_tournees=["tournee_id"],
+        )
 
         for ligne in lignes:
             jour = ligne['jour'].strip().lower()
@@ -126,14 +139,14 @@ def creation_planning_ramasse():
             planning.append({
                 "jour": jour,
                 "tournee_id": ligne["tournee_id"],
-                "tournee": f"{get_nom_tournee(ligne['tournee_id'])} — {get_fournisseurs_par_tournee_id(ligne['tournee_id'])}",
-                "chauffeur": get_nom_benevole(c_id), "chauffeur_id": c_id,
-                "responsable": get_nom_benevole(r_id), "responsable_id": r_id,
-                "equipier": get_nom_benevole(e_id), "equipier_id": e_id,
-                "camion": get_nom_camion(ligne["camion_id"]), "camion_id": ligne["camion_id"],
-                "ramasse_tri1": get_nom_benevole(t1_id), "ramasse_tri1_id": t1_id,
-                "ramasse_tri2": get_nom_benevole(t2_id), "ramasse_tri2_id": t2_id,
-                "ramasse_tri3": get_nom_benevole(t3_id), "ramasse_tri3_id": t3_id,
+                "tournee": f"{noms.tournee(ligne['tournee_id'])} — {noms.fournisseurs(ligne['tournee_id'])}",
+                "chauffeur": noms.benevole(c_id), "chauffeur_id": c_id,
+                "responsable": noms.benevole(r_id), "responsable_id": r_id,
+                "equipier": noms.benevole(e_id), "equipier_id": e_id,
+                "camion": noms.camion(ligne["camion_id"]), "camion_id": ligne["camion_id"],
+                "ramasse_tri1": noms.benevole(t1_id), "ramasse_tri1_id": t1_id,
+                "ramasse_tri2": noms.benevole(t2_id), "ramasse_tri2_id": t2_id,
+                "ramasse_tri3": noms.benevole(t3_id), "ramasse_tri3_id": t3_id,
                 "absent": any(i in absents for i in [c_id, r_id, e_id, t1_id, t2_id, t3_id]),
                 "chauffeur_absent": "oui" if c_id in absents else "non",
                 "responsable_absent": "oui" if r_id in absents else "non",
@@ -200,7 +213,7 @@ def gestion_planning_ramasse():
     """
 
     from ba38_planning_utils import get_lundi_de_la_semaine, get_type_benevole_options
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     import sqlite3
 
     # ------------------------------------------------------------------
@@ -382,23 +395,7 @@ def gestion_planning_ramasse():
         "vendredi": lundi + timedelta(days=4),
     }
 
-    absences = cursor.execute("""
-        SELECT benevole_id, date_debut, date_fin
-        FROM absences
-    """).fetchall()
-
-    absents_par_jour = {j: set() for j in jours_dates}
-
-    for a in absences:
-        try:
-            debut = datetime.strptime(a["date_debut"], "%d/%m/%Y").date()
-            fin = datetime.strptime(a["date_fin"], "%d/%m/%Y").date()
-
-            for jour, d in jours_dates.items():
-                if debut <= d <= fin:
-                    absents_par_jour[jour].add(a["benevole_id"])
-        except Exception:
-            continue
+    absents_par_jour = charger_absents_par_jour(conn, jours_dates)
 
     updated = False
 
@@ -630,20 +627,12 @@ def print_planning_ramasse():
             END, id ASC
     """, (annee, numero_semaine,)).fetchall()
 
-    # def get_nom_benevole(bid):
-    #     if not bid: return "-"
-    #     conn = get_db_connection()
-    #     r = conn.execute("SELECT prenom, nom FROM benevoles WHERE id = ?", (bid,)).fetchone()
-    #     conn.close()
-    #     return f"{r['prenom']} {r['nom']}" if r else "-"
-    
-    # def get_nom_camion(cid):
-    #     if not cid: return "-"
-    #     conn = get_db_connection()
-    #     r = conn.execute("SELECT nom, immat FROM camions WHERE id = ?", (cid,)).fetchone()
-    #     conn.close()
-    #     return f"{r['nom']} ({r['immat']})" if r else "-"
-    
+    noms = ResolveurNoms.depuis_lignes(
+        conn, lignes,
+        champs_benevoles=["chauffeur_id", "responsable_id", "equipier_id"],
+        champs_camions=["camion_id"],
+    )
+
     conn.close()
 
     buffer = BytesIO()
@@ -675,10 +664,10 @@ def print_planning_ramasse():
             y = hauteur - 2 * cm
         pdf.drawString(x, y, ligne["jour"].capitalize())
         pdf.drawString(x + 3*cm, y, ligne["tournee"] or "-")
-        pdf.drawString(x + 8*cm, y, get_nom_benevole(ligne["chauffeur_id"]))
-        pdf.drawString(x + 13*cm, y, get_nom_benevole(ligne["responsable_id"]))
-        pdf.drawString(x + 18*cm, y, get_nom_benevole(ligne["equipier_id"]))
-        pdf.drawString(x + 23*cm, y, get_nom_camion(ligne["camion_id"]))
+        pdf.drawString(x + 8*cm, y, noms.benevole(ligne["chauffeur_id"]))
+        pdf.drawString(x + 13*cm, y, noms.benevole(ligne["responsable_id"]))
+        pdf.drawString(x + 18*cm, y, noms.benevole(ligne["equipier_id"]))
+        pdf.drawString(x + 23*cm, y, noms.camion(ligne["camion_id"]))
         y -= line_height
 
     pdf.save()
@@ -693,8 +682,7 @@ def print_planning_ramasse():
 @planning_bp.route('/apercu_planning_ramasse', methods=['GET'], endpoint='apercu_planning_ramasse')
 @login_required
 def apercu_planning_ramasse():
-    from datetime import datetime, timedelta
-    from utils import get_db_connection, write_log
+    from datetime import datetime
 
     semaine = request.args.get("semaine")
     if not semaine or "-W" not in semaine:
@@ -704,6 +692,15 @@ def apercu_planning_ramasse():
     annee, num_semaine = map(int, semaine.split("-W"))
     lundi = datetime.fromisocalendar(annee, num_semaine, 1).date()
 
+    contexte = apercu_cache.contexte_apercu(
+        "ramasse", annee, num_semaine,
+        lambda: _contexte_apercu_ramasse(semaine, annee, num_semaine, lundi),
+    )
+    return render_template("apercu_planning_ramasse.html", **contexte)
+
+
+def _contexte_apercu_ramasse(semaine, annee, num_semaine, lundi):
+    """Contexte de l'aperçu d'une semaine de ramasse (mis en cache par apercu_cache)."""
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -722,20 +719,16 @@ def apercu_planning_ramasse():
             id ASC
     """, (annee, num_semaine,)).fetchall()
 
-    def get_nom(table, id, champs):
-        if not id:
-            return ""
-        r = cursor.execute(f"SELECT {', '.join(champs)} FROM {table} WHERE id = ?", (id,)).fetchone()
-        return " ".join([str(r[c]) for c in champs]) if r else ""
-
-    def get_nom_camion(cid):
-        if not cid:
-            return ""
-        r = cursor.execute("SELECT nom, immat FROM camions WHERE id = ?", (cid,)).fetchone()
-        return f"{r['nom']} ({r['immat']})" if r else ""
-
     lignes = [dict(l) for l in lignes]
 
+    # 🔎 Tous les libellés de la semaine en quelques requêtes
+    noms = ResolveurNoms.depuis_lignes(
+        conn, lignes,
+        champs_benevoles=ROLES_RAMASSE_IDS,
+        champs_camions=["camion_id"],
+        champs_tournees=["tournee_id"],
+    )
+
     # ✅ Conversion des champs *_absent en booléens
     for l in lignes:
         for champ in [
@@ -752,84 +745,71 @@ def apercu_planning_ramasse():
         # Chauffeur
         if l.get("remplacant_chauffeur_id"):
             id_chauffeur = l["remplacant_chauffeur_id"]
-            l["chauffeur"] = get_nom("benevoles", id_chauffeur, ["prenom", "nom"]) + " <span class='remplacant'>(remplaçant)</span>"
+            l["chauffeur"] = noms.benevole(id_chauffeur, defaut="") + " <span class='remplacant'>(remplaçant)</span>"
         else:
             id_chauffeur = l["chauffeur_id"]
-            l["chauffeur"] = get_nom("benevoles", id_chauffeur, ["prenom", "nom"])
+            l["chauffeur"] = noms.benevole(id_chauffeur, defaut="")
             if l["chauffeur_absent"]:
                 l["chauffeur"] += " <span class='absent'>(absent)</span>"
 
         # Responsable
         if l.get("remplacant_responsable_id"):
             id_responsable = l["remplacant_responsable_id"]
-            l["responsable"] = get_nom("benevoles", id_responsable, ["prenom", "nom"]) + " <span class='remplacant'>(remplaçant)</span>"
+            l["responsable"] = noms.benevole(id_responsable, defaut="") + " <span class='remplacant'>(remplaçant)</span>"
         else:
             id_responsable = l["responsable_id"]
-            l["responsable"] = get_nom("benevoles", id_responsable, ["prenom", "nom"])
+            l["responsable"] = noms.benevole(id_responsable, defaut="")
             if l["responsable_absent"]:
                 l["responsable"] += " <span class='absent'>(absent)</span>"
 
         # Équipier
         if l.get("remplacant_equipier_id"):
             id_equipier = l["remplacant_equipier_id"]
-            l["equipier"] = get_nom("benevoles", id_equipier, ["prenom", "nom"]) + " <span class='remplacant'>(remplaçant)</span>"
+            l["equipier"] = noms.benevole(id_equipier, defaut="") + " <span class='remplacant'>(remplaçant)</span>"
         else:
             id_equipier = l["equipier_id"]
-            l["equipier"] = get_nom("benevoles", id_equipier, ["prenom", "nom"])
+            l["equipier"] = noms.benevole(id_equipier, defaut="")
             if l["equipier_absent"]:
                 l["equipier"] += " <span class='absent'>(absent)</span>"
 
         # Tri 1
         if l.get("remplacant_ramasse_tri1_id"):
             id_tri1 = l["remplacant_ramasse_tri1_id"]
-            l["ramasse_tri1"] = get_nom("benevoles", id_tri1, ["prenom", "nom"]) + " <span class='remplacant'>(remplaçant)</span>"
+            l["ramasse_tri1"] = noms.benevole(id_tri1, defaut="") + " <span class='remplacant'>(remplaçant)</span>"
         else:
             id_tri1 = l["ramasse_tri1_id"]
-            l["ramasse_tri1"] = get_nom("benevoles", id_tri1, ["prenom", "nom"])
+            l["ramasse_tri1"] = noms.benevole(id_tri1, defaut="")
             if l["ramasse_tri1_absent"]:
                 l["ramasse_tri1"] += " <span class='absent'>(absent)</span>"
 
         # Tri 2
         if l.get("remplacant_ramasse_tri2_id"):
             id_tri2 = l["remplacant_ramasse_tri2_id"]
-            l["ramasse_tri2"] = get_nom("benevoles", id_tri2, ["prenom", "nom"]) + " <span class='remplacant'>(remplaçant)</span>"
+            l["ramasse_tri2"] = noms.benevole(id_tri2, defaut="") + " <span class='remplacant'>(remplaçant)</span>"
         else:
             id_tri2 = l["ramasse_tri2_id"]
-            l["ramasse_tri2"] = get_nom("benevoles", id_tri2, ["prenom", "nom"])
+            l["ramasse_tri2"] = noms.benevole(id_tri2, defaut="")
             if l["ramasse_tri2_absent"]:
                 l["ramasse_tri2"] += " <span class='absent'>(absent)</span>"
 
         # Tri 3
         if l.get("remplacant_ramasse_tri3_id"):
             id_tri3 = l["remplacant_ramasse_tri3_id"]
-            l["ramasse_tri3"] = get_nom("benevoles", id_tri3, ["prenom", "nom"]) + " <span class='remplacant'>(remplaçant)</span>"
+            l["ramasse_tri3"] = noms.benevole(id_tri3, defaut="") + " <span class='remplacant'>(remplaçant)</span>"
         else:
             id_tri3 = l["ramasse_tri3_id"]
-            l["ramasse_tri3"] = get_nom("benevoles", id_tri3, ["prenom", "nom"])
+            l["ramasse_tri3"] = noms.benevole(id_tri3, defaut="")
             if l["ramasse_tri3_absent"]:
                 l["ramasse_tri3"] += " <span class='absent'>(absent)</span>"
 
         # Camion
-        l["camion"] = get_nom_camion(l["camion_id"])
+        l["camion"] = noms.camion(l["camion_id"], defaut="", parentheses=True)
 
         # Tournée
         tournee_id = l.get("tournee_id")
         if tournee_id:
-            nom_tournee = cursor.execute("""
-                SELECT nom FROM tournees_fournisseurs
-                WHERE tournee_id = ? AND nom IS NOT NULL
-                LIMIT 1
-            """, (tournee_id,)).fetchone()
-
-            fournisseurs = cursor.execute("""
-                SELECT f.nom
-                FROM tournees_fournisseurs tf
-                JOIN fournisseurs f ON tf.fournisseur_id = f.id
-                WHERE tf.tournee_id = ?
-            """, (tournee_id,)).fetchall()
-
-            noms_fournisseurs = " / ".join(f["nom"] for f in fournisseurs)
-            nom_affiche = nom_tournee["nom"] if nom_tournee else f"Tournée {tournee_id}"
+            noms_fournisseurs = noms.fournisseurs(tournee_id, defaut="")
+            nom_affiche = noms.tournee(tournee_id)
             l["tournee"] = f"{nom_affiche} — {noms_fournisseurs}" if noms_fournisseurs else nom_affiche
         else:
             l["tournee"] = l.get("tournee", "-")
@@ -838,13 +818,12 @@ def apercu_planning_ramasse():
     date_fin = (lundi + timedelta(days=4)).strftime("%d/%m/%Y")
 
     conn.close()
-    return render_template(
-        "apercu_planning_ramasse.html",
-        lignes=lignes,
-        semaine=semaine,
-        date_debut=date_debut,
-        date_fin=date_fin
-    )
+    return {
+        "lignes": lignes,
+        "semaine": semaine,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+    }
 
 
 @planning_bp.route('/apercu_modele_planning_ramasse')
@@ -880,27 +859,11 @@ def apercu_modele_planning_ramasse():
 
     # 📦 Noms des tournées + fournisseurs
     tournee_ids = {ligne["tournee_id"] for ligne in model if ligne["tournee_id"]}
-    tournees_dict = {}
-    for tid in tournee_ids:
-        # Récupérer le nom unique de la tournée (non NULL)
-        nom_row = cursor.execute("""
-            SELECT nom FROM tournees_fournisseurs
-            WHERE tournee_id = ? AND nom IS NOT NULL
-            ORDER BY id LIMIT 1
-        """, (tid,)).fetchone()
-        nom = nom_row["nom"] if nom_row else f"Tournee{tid}"
-
-        # Récupérer les fournisseurs associés à cette tournée
-        rows = cursor.execute("""
-            SELECT f.nom AS nom_fournisseur
-            FROM tournees_fournisseurs tf
-            JOIN fournisseurs f ON f.id = tf.fournisseur_id
-            WHERE tf.tournee_id = ?
-            ORDER BY tf.ordre
-        """, (tid,)).fetchall()
-        fournisseurs = " / ".join(r["nom_fournisseur"] for r in rows)
-
-        tournees_dict[tid] = f"{nom} – {fournisseurs}"
+    noms = ResolveurNoms(conn, tournee_ids=tournee_ids)
+    tournees_dict = {
+        tid: f"{noms.tournee(tid)} – {noms.fournisseurs(tid, defaut='')}"
+        for tid in tournee_ids
+    }
 
 
     conn.close()
@@ -934,9 +897,10 @@ def maj_modele_planning_ramasse():
         ORDER BY nom
     """).fetchall()
 
-    # Remplacer les noms None par get_nom_tournee
+    # Remplacer les noms None par le nom résolu de la tournée
+    noms = ResolveurNoms(conn, tournee_ids=[t["tournee_id"] for t in tournees])
     tournees = [
-        dict(tournee) | {"nom": get_nom_tournee(tournee["tournee_id"])}
+        dict(tournee) | {"nom": noms.tournee(tournee["tournee_id"])}
         for tournee in tournees
     ]
 
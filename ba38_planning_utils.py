@@ -233,6 +233,121 @@ def get_nom_tournee(tournee_id):
     return row[0] if row and row[0] else f"Tournée {tournee_id}"
 
 
+def _par_paquets(ids, taille=500):
+    """Découpe une liste d'IDs en paquets (limite des paramètres SQLite)."""
+    ids = list(ids)
+    for i in range(0, len(ids), taille):
+        yield ids[i:i + taille]
+
+
+def collecter_ids(lignes, champs):
+    """Ensemble des IDs non vides trouvés dans `lignes` pour les `champs` donnés."""
+    ids = set()
+    for ligne in lignes:
+        keys = ligne.keys()
+        for champ in champs:
+            if champ not in keys:
+                continue
+            val = parse_id(ligne[champ])
+            if val:
+                ids.add(val)
+    return ids
+
+
+class ResolveurNoms:
+    """
+    Résolution groupée des libellés d'un planning (bénévoles, camions,
+    tournées et leurs fournisseurs) : quelques requêtes ensemblistes
+    au lieu d'un SELECT par nom affiché.
+
+    Les formats rendus sont ceux de get_nom_benevole, get_nom_camion,
+    get_nom_tournee et get_fournisseurs_par_tournee_id.
+    """
+
+    def __init__(self, conn, benevole_ids=(), camion_ids=(), tournee_ids=()):
+        self.benevoles = {}
+        self.camions = {}
+        self.tournees = {}
+        self.fournisseurs_tournee = {}
+
+        cursor = conn.cursor()
+
+        for paquet in _par_paquets({i for i in benevole_ids if i}):
+            rows = cursor.execute(
+                f"SELECT id, prenom, nom FROM benevoles WHERE id IN ({','.join('?' * len(paquet))})",
+                paquet
+            ).fetchall()
+            self.benevoles.update({r[0]: (r[1], r[2]) for r in rows})
+
+        for paquet in _par_paquets({i for i in camion_ids if i}):
+            rows = cursor.execute(
+                f"SELECT id, nom, immat FROM camions WHERE id IN ({','.join('?' * len(paquet))})",
+                paquet
+            ).fetchall()
+            self.camions.update({r[0]: (r[1], r[2]) for r in rows})
+
+        for paquet in _par_paquets({i for i in tournee_ids if i}):
+            marqueurs = ','.join('?' * len(paquet))
+            rows = cursor.execute(f"""
+                SELECT tournee_id, nom FROM tournees_fournisseurs
+                WHERE tournee_id IN ({marqueurs}) AND nom IS NOT NULL
+                ORDER BY id
+            """, paquet).fetchall()
+            for r in rows:
+                if r[1]:
+                    self.tournees.setdefault(r[0], r[1])
+
+            rows = cursor.execute(f"""
+                SELECT tf.tournee_id, f.nom FROM tournees_fournisseurs tf
+                JOIN fournisseurs f ON f.id = tf.fournisseur_id
+                WHERE tf.tournee_id IN ({marqueurs})
+                ORDER BY tf.tournee_id, tf.ordre, tf.id
+            """, paquet).fetchall()
+            for r in rows:
+                self.fournisseurs_tournee.setdefault(r[0], []).append(r[1])
+
+    @classmethod
+    def depuis_lignes(cls, conn, lignes, champs_benevoles=(), champs_camions=(), champs_tournees=()):
+        """Construit le résolveur à partir des IDs présents dans les lignes d'un planning."""
+        lignes = list(lignes)
+        return cls(
+            conn,
+            benevole_ids=collecter_ids(lignes, champs_benevoles),
+            camion_ids=collecter_ids(lignes, champs_camions),
+            tournee_ids=collecter_ids(lignes, champs_tournees),
+        )
+
+    def benevole(self, bid, defaut="-", nom_d_abord=False):
+        """« Prénom Nom » (ou « Nom Prénom ») du bénévole, `defaut` si inconnu."""
+        r = self.benevoles.get(parse_id(bid))
+        if not r:
+            return defaut
+        prenom, nom = r
+        parts = (nom, prenom) if nom_d_abord else (prenom, nom)
+        return " ".join(str(p) for p in parts if p) or defaut
+
+    def camion(self, cid, defaut="-", parentheses=False):
+        """« Nom immat » (ou « Nom (immat) ») du camion, `defaut` si inconnu."""
+        r = self.camions.get(parse_id(cid))
+        if not r:
+            return defaut
+        nom, immat = r
+        if parentheses:
+            return f"{nom} ({immat})"
+        return " ".join(str(p) for p in (nom, immat) if p) or defaut
+
+    def tournee(self, tid):
+        """Nom de la tournée, « Tournée N » à défaut."""
+        if not tid:
+            return ""
+        return self.tournees.get(parse_id(tid)) or f"Tournée {tid}"
+
+    def fournisseurs(self, tid, defaut="-"):
+        """Fournisseurs de la tournée, séparés par « / »."""
+        noms = self.fournisseurs_tournee.get(parse_id(tid))
+        return " / ".join(noms) if noms else defaut
+
+
 def get_absents_par_jour(absences, jours_dates):
     absents_par_jour = {j: set() for j in jours_dates}
     for a in absences:
@@ -246,6 +361,128 @@ def get_absents_par_jour(absences, jours_dates):
             continue
     return absents_par_jour
 
+
+# ============================
+# Absences : colonnes ISO indexées
+# ============================
+# date_debut / date_fin restent en jj/mm/aaaa (saisie, affichage, anciens
+# scripts). debut_iso / fin_iso (AAAA-MM-JJ) sont tenues à jour par
+# triggers et indexées : une semaine de planning ne lit que les absences
+# qui la chevauchent, quel que soit l'historique.
+
+def _sql_date_iso(colonne):
+    """Expression SQL : jj/mm/aaaa -> AAAA-MM-JJ (NULL si format invalide)."""
+    return (
+        f"date(substr(trim({colonne}), 7, 4) || '-' || "
+        f"substr(trim({colonne}), 4, 2) || '-' || substr(trim({colonne}), 1, 2))"
+    )
+
+
+def normaliser_date_absence(valeur):
+    """Valide une date saisie et la renvoie au format jj/mm/aaaa sur 10 caractères."""
+    return datetime.strptime((valeur or "").strip(), "%d/%m/%Y").strftime("%d/%m/%Y")
+
+
+def _date_iso_python(valeur):
+    try:
+        return datetime.strptime((valeur or "").strip(), "%d/%m/%Y").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+_bases_absences_migrees = set()
+
+
+def migrer_absences_iso(conn):
+    """
+    Migration idempotente de la table absences :
+    colonnes debut_iso / fin_iso, index de chevauchement, triggers de
+    synchronisation et remplissage des lignes existantes.
+    """
+    cursor = conn.cursor()
+    colonnes = {c[1] for c in cursor.execute("PRAGMA table_info(absences)").fetchall()}
+    if not colonnes:
+        return
+
+    for colonne in ("debut_iso", "fin_iso"):
+        if colonne not in colonnes:
+            cursor.execute(f"ALTER TABLE absences ADD COLUMN {colonne} TEXT")
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_absences_periode
+        ON absences (fin_iso, debut_iso, benevole_id)
+    """)
+
+    for nom, evenement in (
+        ("trg_absences_iso_insert", "AFTER INSERT ON absences"),
+        ("trg_absences_iso_update", "AFTER UPDATE OF date_debut, date_fin ON absences"),
+    ):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {nom} {evenement}
+            BEGIN
+                UPDATE absences
+                SET debut_iso = {_sql_date_iso("NEW.date_debut")},
+                    fin_iso = {_sql_date_iso("NEW.date_fin")}
+                WHERE id = NEW.id;
+            END
+        """)
+
+    # Anciennes lignes : conversion tolérante (j/m/aaaa accepté comme avant)
+    a_remplir = cursor.execute("""
+        SELECT id, date_debut, date_fin FROM absences
+        WHERE debut_iso IS NULL OR fin_iso IS NULL
+    """).fetchall()
+    maj = [
+        (_date_iso_python(a[1]), _date_iso_python(a[2]), a[0])
+        for a in a_remplir
+    ]
+    maj = [m for m in maj if m[0] and m[1]]
+    if maj:
+        cursor.executemany("UPDATE absences SET debut_iso = ?, fin_iso = ? WHERE id = ?", maj)
+
+    conn.commit()
+
+
+def _assurer_absences_iso(conn):
+    """Applique la migration une fois par base et par process."""
+    base = conn.execute("PRAGMA database_list").fetchone()[2]
+    if base in _bases_absences_migrees:
+        return
+    migrer_absences_iso(conn)
+    _bases_absences_migrees.add(base)
+
+
+def charger_absents_par_jour(conn, jours_dates):
+    """
+    Absents par jour pour les dates demandées, en une requête indexée.
+
+    :param jours_dates: dict {"lundi": date, ...}
+    :return: dict {"lundi": {benevole_id, ...}, ...}
+    """
+    absents_par_jour = {j: set() for j in jours_dates}
+    if not jours_dates:
+        return absents_par_jour
+
+    _assurer_absences_iso(conn)
+
+    debut = min(jours_dates.values()).isoformat()
+    fin = max(jours_dates.values()).isoformat()
+    absences = conn.execute("""
+        SELECT benevole_id, debut_iso, fin_iso
+        FROM absences
+        WHERE fin_iso >= ? AND debut_iso <= ?
+    """, (debut, fin)).fetchall()
+
+    jours_iso = {j: d.isoformat() for j, d in jours_dates.items()}
+    for a in absences:
+        bid = parse_id(a[0])
+        if not bid:
+            continue
+        for jour, date_iso in jours_iso.items():
+            if a[1] <= date_iso <= a[2]:
+                absents_par_jour[jour].add(bid)
+    return absents_par_jour
+
 def filtrer(role, benevoles):
     """
     Filtre les bénévoles en fonction de leur rôle : chauffeur, responsable ou équipier.
@@ -273,11 +510,8 @@ def filtrer(role, benevoles):
 
 
 def get_parametre_valeur(cle, default=""):
-    with get_db_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT param_value FROM parametres WHERE param_name = ?", (cle,))
-        result = cur.fetchone()
-        return result[0] if result else default
+    import config_cache
+    return config_cache.parametre(cle, default)
 
 
 @planning_utils_bp.route("/planning_absences", methods=["GET", "POST"])
@@ -302,15 +536,12 @@ def planning_absences():
                 if not existe:
                     raise ValueError("Bénévole inexistant")
 
-                # 2) Dates (on vérifie juste le format jj/mm/aaaa)
-                from datetime import datetime
-                date_debut = (request.form.get("date_debut") or "").strip()
-                date_fin   = (request.form.get("date_fin") or "").strip()
-                # Validation rapide du format attendu
-                datetime.strptime(date_debut, "%d/%m/%Y")
-                datetime.strptime(date_fin,   "%d/%m/%Y")
+                # 2) Dates : format jj/mm/aaaa, normalisé sur 10 caractères
+                date_debut = normaliser_date_absence(request.form.get("date_debut"))
+                date_fin   = normaliser_date_absence(request.form.get("date_fin"))
 
-                # 3) Insertion
+                # 3) Insertion (debut_iso / fin_iso remplis par trigger)
+                _assurer_absences_iso(conn)
                 cur.execute("""
                     INSERT INTO absences (benevole_id, date_debut, date_fin)
                     VALUES (?, ?, ?)
@@ -326,31 +557,19 @@ def planning_absences():
 
         elif action == "purger_absences":
             try:
+                _assurer_absences_iso(conn)
+
                 # 1) Combien seraient supprimées ?
                 to_delete = cur.execute("""
                     SELECT COUNT(*)
                     FROM absences
-                    WHERE length(trim(date_fin)) = 10
-                    AND substr(trim(date_fin), 3, 1) = '/'
-                    AND substr(trim(date_fin), 6, 1) = '/'
-                    AND date(
-                            substr(trim(date_fin), 7, 4) || '-' ||
-                            substr(trim(date_fin), 4, 2) || '-' ||
-                            substr(trim(date_fin), 1, 2)
-                        ) <= date('now','localtime')
+                    WHERE fin_iso <= date('now','localtime')
                 """).fetchone()[0]
 
                 # 2) Suppression effective
                 cur.execute("""
                     DELETE FROM absences
-                    WHERE length(trim(date_fin)) = 10
-                    AND substr(trim(date_fin), 3, 1) = '/'
-                    AND substr(trim(date_fin), 6, 1) = '/'
-                    AND date(
-                            substr(trim(date_fin), 7, 4) || '-' ||
-                            substr(trim(date_fin), 4, 2) || '-' ||
-                            substr(trim(date_fin), 1, 2)
-                        ) <= date('now','localtime')
+                    WHERE fin_iso <= date('now','localtime')
                 """)
                 conn.commit()
                 upload_database()
@@ -390,11 +609,12 @@ def modifier_absence(absence_id):
         flash("❌ Les deux dates sont obligatoires.", "danger")
     else:
         try:
-            # Validation rapide format jj/mm/aaaa
-            for d in [date_debut, date_fin]:
-                datetime.strptime(d, "%d/%m/%Y")  # ➜ lève une exception si invalide
+            # Validation format jj/mm/aaaa (➜ lève une exception si invalide)
+            date_debut = normaliser_date_absence(date_debut)
+            date_fin = normaliser_date_absence(date_fin)
 
             conn = get_db_connection()
+            _assurer_absences_iso(conn)
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE absences SET date_debut = ?, date_fin = ?
@@ -434,36 +654,13 @@ def supprimer_absence(absence_id):
 def get_type_benevole_options(conn=None):
     """
     Lit la table `parametres` et renvoie la liste des valeurs pour param_name='type_benevole',
-    triées alphabétiquement (insensible à la casse). Si `conn` est None, ouvre/ferme sa propre connexion.
+    triées alphabétiquement (insensible à la casse).
+    `conn` est conservé pour compatibilité : la lecture passe par config_cache.
     """
-    close_after = False
-    if conn is None:
-        from utils import get_db_connection
-        conn = get_db_connection()
-        close_after = True
+    import config_cache
 
-    cur = conn.cursor()
-    rows = cur.execute("""
-        SELECT param_value
-        FROM parametres
-        WHERE param_name = 'type_benevole'
-        ORDER BY param_value COLLATE NOCASE
-    """).fetchall()
-
-    # rows peut être sqlite3.Row ou tuple -> on gère les deux
-    vals = []
-    for r in rows:
-        try:
-            v = (r["param_value"] if isinstance(r, dict) or hasattr(r, "keys") else r[0]) or ""
-        except Exception:
-            v = (r[0] if isinstance(r, (list, tuple)) and r else "") or ""
-        v = v.strip()
-        if v:
-            vals.append(v)
-
-    if close_after:
-        conn.close()
-    return vals
+    vals = [(v or "").strip() for v in config_cache.valeurs_parametre("type_benevole")]
+    return sorted((v for v in vals if v), key=str.lower)
 
 def get_civilite_options():
     # si un jour tu les stockes en base, tu feras la même logique que ci-dessus
@@ -1,9 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required
 from utils import get_db_connection, write_log, upload_database
-from ba38_planning_utils import get_lundi_de_la_semaine, get_nom, get_absents_par_jour
+import apercu_cache
+from ba38_planning_utils import get_lundi_de_la_semaine, charger_absents_par_jour, ResolveurNoms
 from datetime import timedelta
-from datetime import datetime, timedelta
 
 
 
@@ -145,23 +145,11 @@ def creation_planning_vif():
         jours.remove("vendredi")
 
     benevoles = {b["id"]: b for b in cursor.execute("SELECT id, nom, prenom, prep_pesee FROM benevoles").fetchall()}
-    absences = cursor.execute("""
-        SELECT benevole_id, date_debut, date_fin
-        FROM absences
-    """).fetchall()
-
-    absences = [
-        {
-            "benevole_id": a["benevole_id"],
-            "debut": datetime.strptime(a["date_debut"], "%d/%m/%Y").date(),
-            "fin":   datetime.strptime(a["date_fin"], "%d/%m/%Y").date(),
-        }
-        for a in absences
-        if a["benevole_id"]
-    ]
+    absents_par_jour = charger_absents_par_jour(conn, jours_dates)
 
     model = cursor.execute("SELECT * FROM planning_standard_vif_ids").fetchall()
     champs = ["vif01", "vif02"]
+    noms = ResolveurNoms.depuis_lignes(conn, model, champs_benevoles=[f"{c}_id" for c in champs])
 
     planning = []
     for ligne in model:
@@ -172,15 +160,10 @@ def creation_planning_vif():
         for champ in champs:
             bene_id = ligne[f"{champ}_id"]
             bloc[f"{champ}_id"] = bene_id
-            date_jour = jours_dates[jour]
 
-            est_absent = any(
-                a["benevole_id"] == bene_id
-                and a["debut"] <= date_jour <= a["fin"]
-                for a in absences
-            )
+            est_absent = bene_id in absents_par_jour.get(jour, set())
 
-            titulaire = get_nom(bene_id, "benevoles", ["prenom", "nom"]) if bene_id else ""
+            titulaire = noms.benevole(bene_id) if bene_id else ""
             bloc[f"{champ}_absent"] = "oui" if est_absent else "non"
             bloc[f"{champ}_remplacant"] = None
 
@@ -234,10 +217,10 @@ def creation_planning_vif():
                 rid = None
 
             l[f"vif{i:02d}_nom"] = (
-                get_nom(tid, "benevoles", ["prenom", "nom"]) if tid else ""
+                noms.benevole(tid) if tid else ""
             )
             l[f"vif{i:02d}_remplacant_nom"] = (
-                get_nom(rid, "benevoles", ["prenom", "nom"]) if rid else ""
+                noms.benevole(rid) if rid else ""
             )
 
 
@@ -268,7 +251,7 @@ def gestion_planning_vif():
     # -------------------------------------------------
     # Imports locaux nécessaires
     # -------------------------------------------------
-    from datetime import datetime, timedelta
+    from datetime import timedelta
 
     # -------------------------------------------------
     # Utilitaire de conversion ID
@@ -332,24 +315,23 @@ def gestion_planning_vif():
     # -------------------------------------------------
     # Préchargement des noms (titulaire / remplaçant)
     # -------------------------------------------------
+    noms = ResolveurNoms.depuis_lignes(
+        conn, lignes,
+        champs_benevoles=[f"vif{i:02d}_{suffixe}" for i in range(1, 3) for suffixe in ("id", "remplacant")],
+    )
     for l in lignes:
         for i in range(1, 3):
             tid = to_int_or_none(l.get(f"vif{i:02d}_id"))
             rid = to_int_or_none(l.get(f"vif{i:02d}_remplacant"))
 
-            l[f"vif{i:02d}_nom"] = get_nom(tid, "benevoles", ["prenom", "nom"]) if tid else ""
-            l[f"vif{i:02d}_remplacant_nom"] = get_nom(rid, "benevoles", ["prenom", "nom"]) if rid else ""
+            l[f"vif{i:02d}_nom"] = noms.benevole(tid) if tid else ""
+            l[f"vif{i:02d}_remplacant_nom"] = noms.benevole(rid) if rid else ""
 
     # -------------------------------------------------
     # Relecture des absences (LOGIQUE PALETTES)
     # -------------------------------------------------
-    absences = cursor.execute("""
-        SELECT benevole_id, date_debut, date_fin
-        FROM absences
-    """).fetchall()
-
     # 🔁 construction absents_par_jour (SOURCE DE VÉRITÉ)
-    absents_par_jour = get_absents_par_jour(absences, jours_dates)
+    absents_par_jour = charger_absents_par_jour(conn, jours_dates)
 
     planning_auto_modified = False
 
@@ -486,6 +468,15 @@ def apercu_planning_vif():
         return redirect(url_for("planning_vif.creation_planning_vif"))
     lundi = get_lundi_de_la_semaine(semaine)
 
+    contexte = apercu_cache.contexte_apercu(
+        "vif", annee, num_semaine,
+        lambda: _contexte_apercu_vif(semaine, annee, num_semaine, lundi),
+    )
+    return render_template("apercu_planning_vif.html", **contexte)
+
+
+def _contexte_apercu_vif(semaine, annee, num_semaine, lundi):
+    """Contexte de l'aperçu d'une semaine VIF (mis en cache par apercu_cache)."""
     conn = get_db_connection()
     cursor = conn.cursor()
     lignes = cursor.execute("SELECT * FROM plannings_vif WHERE annee = ? AND semaine = ? ORDER BY jour, id", (annee, num_semaine    )).fetchall()
@@ -494,6 +485,11 @@ def apercu_planning_vif():
     jours = ["lundi", "mardi", "mercredi", "jeudi", "vendredi"]
     jours_dates = {j: lundi + timedelta(days=i) for i, j in enumerate(jours)}
 
+    noms = ResolveurNoms.depuis_lignes(
+        conn, lignes,
+        champs_benevoles=[f"{c}_{suffixe}" for c in ("vif01", "vif02") for suffixe in ("id", "remplacant")],
+    )
+
     for l in lignes:
         jour = l["jour"].lower()
         delta = jours.index(jour)
@@ -505,9 +501,9 @@ def apercu_planning_vif():
                 id_val = None
             if remp_val in ["", "None", None]:
                 remp_val = None
-            l[f"{champ}_nom"] = get_nom(id_val, "benevoles", ["nom", "prenom"]) if id_val else ""
-            l[f"{champ}_remplacant_nom"] = get_nom(remp_val, "benevoles", ["nom", "prenom"]) if remp_val else ""
+            l[f"{champ}_nom"] = noms.benevole(id_val, nom_d_abord=True) if id_val else ""
+            l[f"{champ}_remplacant_nom"] = noms.benevole(remp_val, nom_d_abord=True) if remp_val else ""
 
     conn.close()
     lignes.sort(key=lambda l: jours.index(l["jour"].lower()))
-    return render_template("apercu_planning_vif.html", semaine=semaine, planning=lignes)
+    return {"semaine": semaine, "planning": lignes}
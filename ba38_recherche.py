@@ -0,0 +1,84 @@
+"""
+ba38_recherche.py
+Recherche globale (associations, bénévoles, fournisseurs, contacts) sur
+l'index plein texte FTS5 (voir recherche_fts), résultats classés.
+"""
+
+from flask import Blueprint, request, jsonify, url_for
+from flask_login import login_required
+from utils import get_db_connection, has_access
+import recherche_fts
+
+recherche_bp = Blueprint("recherche", __name__)
+
+LIMITE_MAX = 100
+
+# table : (droit requis, libellé, titre, détail, lien)
+AFFICHAGE = {
+    "associations": (
+        "associations", "Association",
+        lambda v: v.get("nom_association") or "",
+        lambda v: " ".join(x for x in (v.get("CP"), v.get("COMMUNE")) if x),
+        lambda i, v: url_for("partenaires.update_partner", partner_id=i),
+    ),
+    "benevoles": (
+        "benevoles", "Bénévole",
+        lambda v: " ".join(x for x in (v.get("nom"), v.get("prenom")) if x),
+        lambda v: v.get("ville") or v.get("email") or "",
+        lambda i, v: url_for("benevoles.update_benevole", benevole_id=i),
+    ),
+    "fournisseurs": (
+        "fournisseurs", "Fournisseur",
+        lambda v: v.get("nom") or "",
+        lambda v: " ".join(x for x in (v.get("enseigne"), v.get("ville")) if x),
+        lambda i, v: url_for("fournisseurs.update_fournisseur", fournisseur_id=i),
+    ),
+    "fournisseurs_contacts": (
+        "fournisseurs", "Contact fournisseur",
+        lambda v: " ".join(x for x in (v.get("prenom"), v.get("nom")) if x),
+        lambda v: v.get("fonction") or v.get("email") or "",
+        lambda i, v: url_for("fournisseurs.liste_contacts_fournisseur", fournisseur_id=v.get("fournisseur_id"))
+        if v.get("fournisseur_id") else None,
+    ),
+}
+
+
+@recherche_bp.route("/recherche", methods=["GET"])
+@login_required
+def recherche_globale():
+    """
+    GET /recherche?q=...&limite=20
+    Résultats classés (bm25) de toutes les entités lisibles par l'utilisateur :
+    [{type, libelle, id, titre, detail, url, score}, ...]
+    """
+    q = request.args.get("q", "").strip()
+    try:
+        limite = max(1, min(int(request.args.get("limite", 20)), LIMITE_MAX))
+    except ValueError:
+        limite = 20
+
+    tables = [t for t, (droit, *_) in AFFICHAGE.items() if has_access(droit, "lecture")]
+    if not q or not tables:
+        return jsonify({"q": q, "resultats": []})
+
+    conn = get_db_connection()
+    try:
+        trouves = recherche_fts.rechercher(conn, q, tables=tables, limite=limite)
+    finally:
+        conn.close()
+
+    resultats = []
+    for r in trouves:
+        _, libelle, titre, detail, lien = AFFICHAGE[r["table"]]
+        v = r["valeurs"]
+        resultats.append({
+            "type": r["table"],
+            "libelle": libelle,
+            "id": r["id"],
+            "titre": titre(v),
+            "detail": detail(v),
+            "url": lien(r["id"], v),
+            "score": -r["score"],
+        })
+
+    return jsonify({"q": q, "resultats": resultats})
@@ -1,38 +1,24 @@
 # ba38_traitements.py
-import io, re, os
-import pandas as pd
+import io, os
 import sqlite3
 import json
 import tempfile
 import uuid
-import tempfile
-import json
 from pathlib import Path
 
 
 from flask import Blueprint, request, render_template, flash, redirect, url_for, send_file,abort,current_app, session
 from flask_login import login_required
 
-from utils import get_google_services, write_log, envoyer_mail,get_db_path,upload_file_to_drive_path,slugify_filename
+from utils import get_google_services, write_log, get_db_path,delete_drive_files_batch
 from utils import get_drive_folder_id_from_path
 
 
 from datetime import datetime
 from collections import defaultdict
-from pathlib import Path
-from openpyxl.utils import get_column_letter
-
-
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
-from googleapiclient.discovery_cache.base import Cache
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 
-
-
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
+# ⏱️ pandas, openpyxl, googleapiclient et reportlab sont importés dans les
+# fonctions qui s'en servent (pas au démarrage du worker)
 
 # ===============================
 # 📌 Blueprint
@@ -67,12 +53,18 @@ def traitement_drive():
         flash("❌ Connexion Google Drive impossible", "danger")
         return "Erreur Drive"
 
+    import drive_cache
+
     try:
-        results = drive_service.files().list(
-            q=f"'{FOLDER_ID_TRAITEMENTS}' in parents and trashed=false",
-            fields="files(id, name)",
-        ).execute()
-        fichiers = results.get("files", [])
+        fichiers = drive_cache.liste(
+            FOLDER_ID_TRAITEMENTS,
+            "tous",
+            lambda: drive_service.files().list(
+                q=f"'{FOLDER_ID_TRAITEMENTS}' in parents and trashed=false",
+                fields="files(id, name)",
+            ).execute().get("files", []),
+            rafraichir=request.args.get("rafraichir") == "1",
+        )
     except Exception as e:
         write_log(f"❌ Erreur accès Drive : {e}")
         flash("Erreur d’accès au dossier Google Drive", "danger")
@@ -84,6 +76,9 @@ def traitement_drive():
             flash("❌ Aucun fichier sélectionné", "danger")
         else:
             try:
+                import pandas as pd
+                from googleapiclient.http import MediaIoBaseDownload
+
                 request_dl = drive_service.files().get_media(fileId=file_id)
                 fh = io.BytesIO()
                 downloader = MediaIoBaseDownload(fh, request_dl)
@@ -120,33 +115,28 @@ def jour_semaine(date_str):
 
 # ===============================================
 # 🧹 Supprimer complètement le contenu d’un dossier Drive
-# (Drive partagé, pagination, attente réelle)
+# (Drive partagé, pagination, suppression par batch)
 # ===============================================
-def delete_drive_folder_contents(drive_path, wait_until_empty=True, timeout=30):
+def delete_drive_folder_contents(drive_path, timeout=30):
     """
     Supprime TOUS les fichiers d'un dossier Google Drive existant
     (Drive partagé compatible), avec pagination.
-    Optionnellement attend que le dossier soit réellement vide.
+    Les suppressions partent par batch et sont confirmées une à une par
+    les réponses du batch.
+    Retourne True si le dossier est vide, False sinon.
     """
 
     import os
-    import time
-    from utils import write_log, SERVICE_ACCOUNT_FILE
-    from google.oauth2 import service_account
-    from googleapiclient.discovery import build
+    import google_clients
+    from utils import write_log
 
     try:
         BA380_SHARED_DRIVE_ID = os.getenv("BA380_SHARED_DRIVE_ID")
         if not BA380_SHARED_DRIVE_ID:
             write_log("❌ BA380_SHARED_DRIVE_ID non défini")
-            return
-
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE,
-            scopes=["https://www.googleapis.com/auth/drive"]
-        )
+            return False
 
-        service = build("drive", "v3", credentials=credentials)
+        service = google_clients.drive()
 
         # 🔎 Résolution du dossier (sans création)
         folder_id = get_drive_folder_id_from_path(
@@ -157,7 +147,7 @@ def delete_drive_folder_contents(drive_path, wait_until_empty=True, timeout=30):
 
         if not folder_id:
             write_log(f"⚠️ Dossier Drive inexistant : {drive_path}")
-            return
+            return True
 
         write_log(f"🧹 Nettoyage dossier Drive : {drive_path}")
 
@@ -187,50 +177,41 @@ def delete_drive_folder_contents(drive_path, wait_until_empty=True, timeout=30):
 
         if not files:
             write_log("ℹ️ Aucun fichier à supprimer.")
-            return
+            return True
 
         write_log(f"🗑️ {len(files)} fichiers à supprimer…")
 
         # ============================
-        # 🗑️ SUPPRESSION
+        # 🗑️ SUPPRESSION (batch : 100 fichiers par aller-retour)
         # ============================
-        for i, f in enumerate(files, start=1):
-            service.files().delete(
-                fileId=f["id"],
-                supportsAllDrives=True
-            ).execute()
-            write_log(f"🗑️ [{i}/{len(files)}] Supprimé : {f['name']}")
+        supprimes, erreurs = delete_drive_files_batch(
+            service,
+            [f["id"] for f in files],
+            timeout=timeout
+        )
 
-        write_log("✅ Suppression demandée pour tous les fichiers.")
+        import drive_cache
+        drive_cache.invalider_liste(folder_id)
 
         # ============================
-        # ⏳ ATTENTE VIDAGE RÉEL
+        # ✅ CONFIRMATION
         # ============================
-        if wait_until_empty:
-            write_log("⏳ Attente vidage réel du dossier Drive…")
-            start = time.time()
-
-            while time.time() - start < timeout:
-                remaining = service.files().list(
-                    q=f"'{folder_id}' in parents and trashed=false",
-                    corpora="drive",
-                    driveId=BA380_SHARED_DRIVE_ID,
-                    supportsAllDrives=True,
-                    includeItemsFromAllDrives=True,
-                    fields="files(id)",
-                    pageSize=10
-                ).execute().get("files", [])
-
-                if not remaining:
-                    write_log("✅ Dossier Drive confirmé vide.")
-                    return
-
-                time.sleep(1)
+        # Chaque réponse du batch confirme sa suppression : plus d'attente
+        # en boucle sur la liste du dossier.
+        noms = {f["id"]: f["name"] for f in files}
+        for file_id, message in erreurs.items():
+            write_log(f"⚠️ Non supprimé : {noms.get(file_id, file_id)} — {message}")
+
+        if erreurs:
+            write_log(f"⚠️ {len(supprimes)}/{len(files)} fichiers supprimés ({len(erreurs)} en erreur)")
+            return False
 
-            write_log("⚠️ Timeout attente vidage Drive (poursuite quand même)")
+        write_log(f"✅ Dossier Drive vidé ({len(supprimes)} fichiers supprimés).")
+        return True
 
     except Exception as e:
         write_log(f"❌ Erreur delete_drive_folder_contents : {e}")
+        return False
 
 # ===============================
 # 📂 Traitement fichier participation
@@ -247,9 +228,10 @@ def traitement_participation():
     - Dépose 3 fichiers dedans (corrigé, lignes_supprimées, analyse),
       suffixés par _TrimN_YYYY
     """
-    import io, os, re
-    from datetime import datetime
-    from collections import OrderedDict
+    import os
+    import shutil
+    import parsol
+    import drive_cache
 
     DOSSIER_PARTICIPATION = os.getenv("DOSSIER_PARTICIPATION")
 
@@ -301,15 +283,15 @@ def traitement_participation():
             # Garde le plus récent
             folders.sort(key=lambda x: x.get("createdTime", ""), reverse=True)
             folder_id = folders[0]["id"]
-            # Supprime les doublons homonymes plus anciens
-            for dup in folders[1:]:
-                try:
-                    service.files().delete(
-                        fileId=dup["id"], supportsAllDrives=True
-                    ).execute()
-                    write_log(f"🗑️ Dossier dupliqué supprimé: {dup['id']}")
-                except Exception as e:
-                    write_log(f"⚠️ Impossible de supprimer un doublon: {e}")
+            # Supprime les doublons homonymes plus anciens (un seul batch)
+            if folders[1:]:
+                supprimes, erreurs = delete_drive_files_batch(
+                    service, [dup["id"] for dup in folders[1:]]
+                )
+                for dup_id in supprimes:
+                    write_log(f"🗑️ Dossier dupliqué supprimé: {dup_id}")
+                for dup_id, message in erreurs.items():
+                    write_log(f"⚠️ Impossible de supprimer un doublon {dup_id}: {message}")
         else:
             # Créer le dossier s'il n'existe pas
             meta = {
@@ -323,7 +305,9 @@ def traitement_participation():
             folder_id = folder["id"]
             write_log(f"📂 Dossier créé: {folder_name} ({folder_id})")
 
-        # Purger le contenu du dossier retenu (pas le dossier lui-même)
+        drive_cache.invalider_liste(parent_id)
+
+        # Purger le contenu du dossier retenu (pas le dossier lui-même), par batch
         try:
             res_children = service.files().list(
                 q=f"'{folder_id}' in parents and trashed=false",
@@ -331,28 +315,30 @@ def traitement_participation():
                 supportsAllDrives=True,
                 includeItemsFromAllDrives=True,
             ).execute()
-            for f in res_children.get("files", []):
-                try:
-                    service.files().delete(
-                        fileId=f["id"], supportsAllDrives=True
-                    ).execute()
-                    write_log(f"🧹 Supprimé du dossier {folder_name}: {f['name']}")
-                except Exception as e:
-                    write_log(f"⚠️ Impossible de supprimer {f['name']}: {e}")
+            enfants = {f["id"]: f["name"] for f in res_children.get("files", [])}
+            supprimes, erreurs = delete_drive_files_batch(service, list(enfants))
+            for file_id in supprimes:
+                write_log(f"🧹 Supprimé du dossier {folder_name}: {enfants[file_id]}")
+            for file_id, message in erreurs.items():
+                write_log(f"⚠️ Impossible de supprimer {enfants[file_id]}: {message}")
         except Exception as e:
             write_log(f"⚠️ Purge du dossier échouée: {e}")
+        drive_cache.invalider_liste(folder_id)
 
         return folder_id
 
-    # -------- 1) Lister les .txt dans le dossier d’origine --------
-    results = service.files().list(
-        q=f"'{DOSSIER_PARTICIPATION}' in parents and trashed=false and name contains '.txt'",
-        fields="files(id, name, mimeType)",
-        supportsAllDrives=True,
-        includeItemsFromAllDrives=True,
-    ).execute()
-
-    fichiers = results.get("files", [])
+    # -------- 1) Lister les .txt dans le dossier d’origine (cache drive_cache) --------
+    fichiers = drive_cache.liste(
+        DOSSIER_PARTICIPATION,
+        "txt",
+        lambda: service.files().list(
+            q=f"'{DOSSIER_PARTICIPATION}' in parents and trashed=false and name contains '.txt'",
+            fields="files(id, name, mimeType)",
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True,
+        ).execute().get("files", []),
+        rafraichir=request.args.get("rafraichir") == "1",
+    )
 
     if request.method == "POST":
         file_id = request.form.get("file_id")
@@ -360,9 +346,9 @@ def traitement_participation():
             flash("❌ Aucun fichier sélectionné", "danger")
             return redirect(url_for("traitements.traitement_participation"))
 
-        # -------- 2) Télécharger le fichier source --------
+        # -------- 2) Télécharger le fichier source (sur disque au-delà de 8 Mo) --------
         request_dl = service.files().get_media(fileId=file_id, supportsAllDrives=True)
-        fh = io.BytesIO()
+        fh = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
         from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
         downloader = MediaIoBaseDownload(fh, request_dl)
         done = False
@@ -370,33 +356,18 @@ def traitement_participation():
             status, done = downloader.next_chunk()
         fh.seek(0)
 
-        # -------- 3) Lecture contenu (UTF-8, fallback CP1252) --------
-        try:
-            contenu = fh.read().decode("utf-8")
-        except UnicodeDecodeError:
-            fh.seek(0)
-            contenu = fh.read().decode("cp1252")
-
-        lignes = contenu.splitlines(keepends=True)
+        # -------- 3) Lecture en flux & correction (cf. parsol) --------
+        # Encodage détecté une fois (UTF-8, sinon CP1252), factures traitées
+        # une par une : lignes ven/sam/dim retirées, totaux cumulés.
+        dossier_tmp = tempfile.mkdtemp(prefix="participation_")
+        chemin_corrige = os.path.join(dossier_tmp, "corrige.txt")
+        with fh, open(chemin_corrige, "w", encoding="utf-8", newline="") as sortie:
+            resultat = parsol.corriger_participation(fh, sortie)
 
-        # Utilitaires
-        def jour_semaine(date_str: str):
-            try:
-                d = datetime.strptime(date_str, "%d/%m/%Y")
-                return d.weekday()  # 0=lun … 6=dim
-            except Exception:
-                return None
+        total_general_suppr = resultat["total_supprime"]
 
         # -------- 4) Suffixe & dossier cible TrimN_YYYY --------
-        premiere_date = None
-        for l in lignes:
-            m = re.match(r"^\s*(\d{2}/\d{2}/\d{4})", l)
-            if m:
-                try:
-                    premiere_date = datetime.strptime(m.group(1), "%d/%m/%Y")
-                    break
-                except Exception:
-                    pass
+        premiere_date = resultat["premiere_date"]
 
         suffixe = ""
         folder_id_cible = DOSSIER_PARTICIPATION
@@ -409,104 +380,38 @@ def traitement_participation():
         else:
             folder_name = "(SansDate)"  # info pour le flash
 
-        # -------- 5) Découper en factures --------
-        factures, facture = [], []
-        for ligne in lignes:
-            if ligne.strip().startswith("BA. de l'Isère"):
-                if facture:
-                    factures.append(facture)
-                    facture = []
-            facture.append(ligne)
-        if facture:
-            factures.append(facture)
-
-        pat_detail = re.compile(
-            r"^\s*(\d{2}/\d{2}/\d{4})\s+(\d+)\s+([\d\s.,]+)\s+([\d\s.,]+)\s*$"
-        )
-
-        # -------- 6) Traiter & cumuler les totaux --------
-        factures_corrigees = []
-        suppr_par_assoc = OrderedDict()
-        total_general_suppr = 0.0
-        total_general_corrige = 0.0
-
-        for facture in factures:
-            nouvelle_facture = []
-            assoc = ""
-            garder_facture = False
-            total_assoc_suppr = 0.0
-
-            for l in facture:
-                ls = l.strip()
-
-                if ls.startswith("Association"):
-                    assoc = ls
-                    if assoc not in suppr_par_assoc:
-                        suppr_par_assoc[assoc] = []
-
-                m = pat_detail.match(ls)
-                if m:
-                    date_str, nb_ben, participation, total = m.groups()
-                    try:
-                        total_val = float(total.replace(" ", "").replace(",", "."))
-                    except Exception:
-                        total_val = 0.0
-
-                    wd = jour_semaine(date_str)
-                    if wd in (4, 5, 6):  # ven/sam/dim => suppression
-                        suppr_par_assoc.setdefault(assoc, []).append(ls)
-                        total_assoc_suppr += total_val
-                        total_general_suppr += total_val
-                        continue
-                    else:
-                        garder_facture = True
-                        total_general_corrige += total_val
-                        nouvelle_facture.append(l)
-                else:
-                    nouvelle_facture.append(l)
-
-            if garder_facture:
-                factures_corrigees.append(nouvelle_facture)
-
-            if assoc and total_assoc_suppr > 0:
-                suppr_par_assoc[assoc].append(
-                    f"TOTAL supprimé {assoc} : {total_assoc_suppr:.2f} €"
-                )
-
-        # -------- 7) Construire les sorties --------
-        txt_corrige = "".join("".join(f) for f in factures_corrigees)
-        txt_corrige += f"\n=== TOTAL GÉNÉRAL (corrigé) : {total_general_corrige:.2f} € ===\n"
-
-        blocs = []
-        for a, lignes_s in suppr_par_assoc.items():
-            if not lignes_s:
-                continue
-            blocs.append(a + "\n" + "\n".join("  " + s for s in lignes_s) + "\n")
-        blocs.append(f"\n=== TOTAL GÉNÉRAL SUPPRIMÉ : {total_general_suppr:.2f} € ===\n")
-        txt_suppr = "".join(blocs)
-
-        txt_analyse = (
-            f"Total général corrigé : {total_general_corrige:.2f} €\n"
-            f"Total supprimé : {total_general_suppr:.2f} €\n"
-        )
-
-        # -------- 8) Upload dans le dossier cible (UTF-8) --------
-        def upload_txt(nom: str, contenu_txt: str, folder_id: str):
-            chemin_tmp = f"/tmp/{nom}"
-            with open(chemin_tmp, "w", encoding="utf-8", newline="") as f:
-                f.write(contenu_txt)
+        # -------- 5) Upload dans le dossier cible (UTF-8) --------
+        def upload_txt(nom: str, chemin_tmp: str, folder_id: str):
             media = MediaFileUpload(chemin_tmp, mimetype="text/plain", resumable=False)
             meta = {"name": nom, "parents": [folder_id]}
             service.files().create(
                 body=meta, media_body=media, fields="id", supportsAllDrives=True
             ).execute()
+            drive_cache.invalider_liste(folder_id)
+
+        def ecrire_txt(nom: str, contenu_txt: str) -> str:
+            chemin_tmp = os.path.join(dossier_tmp, nom)
+            with open(chemin_tmp, "w", encoding="utf-8", newline="") as f:
+                f.write(contenu_txt)
+            return chemin_tmp
 
         fichier_nom = next((f["name"] for f in fichiers if f["id"] == file_id), "parsol2l.txt")
         base = fichier_nom[:-4] if fichier_nom.lower().endswith(".txt") else fichier_nom
 
-        upload_txt(f"{base}_corrigé{suffixe}.txt", txt_corrige, folder_id_cible)
-        upload_txt(f"{base}_lignes_supprimees{suffixe}.txt", txt_suppr, folder_id_cible)
-        upload_txt(f"{base}_analyse{suffixe}.txt", txt_analyse, folder_id_cible)
+        try:
+            upload_txt(f"{base}_corrigé{suffixe}.txt", chemin_corrige, folder_id_cible)
+            upload_txt(
+                f"{base}_lignes_supprimees{suffixe}.txt",
+                ecrire_txt("suppr.txt", parsol.texte_suppressions(resultat)),
+                folder_id_cible
+            )
+            upload_txt(
+                f"{base}_analyse{suffixe}.txt",
+                ecrire_txt("analyse.txt", parsol.texte_analyse(resultat)),
+                folder_id_cible
+            )
+        finally:
+            shutil.rmtree(dossier_tmp, ignore_errors=True)
 
         flash(
             f"✅ Traitement terminé — {total_general_suppr:.2f} € supprimés. "
@@ -521,46 +426,33 @@ def traitement_participation():
 # 🗑️ Ancienne fonction simple (conservée pour tests)
 # ===============================
 def traiter_parsol(contenu):
-    lignes = contenu.splitlines(keepends=True)
-    factures, facture = [], []
-    for ligne in lignes:
-        if ligne.strip().startswith("BA. de l'Isère"):
-            if facture:
-                factures.append(facture)
-                facture = []
-        facture.append(ligne)
-    if facture:
-        factures.append(facture)
-
-    factures_corrigees, lignes_supprimees = [], []
+    """Variante texte (str) : mêmes enregistrements que parsol.corriger_participation."""
+    import parsol
+
+    factures_corrigees, facture, garder = [], [], False
+    lignes_supprimees = []
     total_general = 0.0
+    assoc = ""
+
+    for e in parsol.enregistrements(io.BytesIO(contenu.encode("utf-8"))):
+        if type(e) is parsol.Facture:
+            if garder:
+                factures_corrigees.append("".join(facture))
+            facture, garder, assoc = [], False, ""
+        elif type(e) is parsol.Association:
+            assoc = e.libelle
+        elif type(e) is parsol.Passage and e.total is not None:
+            total_general += e.total
+            if e.jour_exclu:
+                lignes_supprimees.append(f"{assoc} → {e.ligne.strip()}\n")
+                continue
+            garder = True
+        facture.append(e.ligne)
 
-    for facture in factures:
-        nouvelle_facture = []
-        assoc = ""
-        garder_facture = False
-
-        for l in facture:
-            if l.strip().startswith("Association"):
-                assoc = l.strip()
-
-            match = re.match(r"(\d{2}/\d{2}/\d{4})\s+(\d+)\s+([\d,]+)\s+([\d,]+)", l.strip())
-            if match:
-                date_str, nb, prix, total = match.groups()
-                total = float(total.replace(",", "."))
-                total_general += total
-                wd = jour_semaine(date_str)
-                if wd in (4, 5, 6):
-                    lignes_supprimees.append(f"{assoc} → {l.strip()}\n")
-                    continue
-                else:
-                    garder_facture = True
-            nouvelle_facture.append(l)
-
-        if garder_facture:
-            factures_corrigees.append(nouvelle_facture)
-
-    txt_corrige = "".join("".join(f) for f in factures_corrigees)
+    if garder:
+        factures_corrigees.append("".join(facture))
+
+    txt_corrige = "".join(factures_corrigees)
     txt_suppr = "".join(lignes_supprimees)
     txt_analyse = f"Total général du fichier original : {total_general:.2f} €\n"
     return txt_corrige, txt_suppr, txt_analyse
@@ -799,6 +691,8 @@ def cotisations():
 
             session.pop("COTISATIONS_JOB_ID", None)
             session.pop("COTISATIONS_ANNEE", None)
+            session.pop("COTISATIONS_PDF_JOB_ID", None)
+            session.pop("COTISATIONS_MAIL_CAMPAGNE_ID", None)
 
             # Année
             annee = int(request.form.get("annee"))
@@ -808,11 +702,8 @@ def cotisations():
             if not fichier:
                 raise ValueError("Fichier PARSOL manquant")
 
-            with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                fichier.save(tmp.name)
-                parsol_path = tmp.name
-
-            benefs = parse_parsol2l_annuel(parsol_path)
+            # Lecture en flux du fichier téléversé (plus de copie temporaire)
+            benefs = parse_parsol2l_annuel(fichier.stream)
 
             data = calculer_cotisations_par_annee(get_db_path(), benefs)
             resultats = data["facturables"]
@@ -850,6 +741,8 @@ def cotisations():
         mail_mode=mail_mode,
         mail_test_to=mail_test_to,
         job_done=job_done,
+        pdf_job_id=session.get("COTISATIONS_PDF_JOB_ID"),
+        mail_campagne_id=session.get("COTISATIONS_MAIL_CAMPAGNE_ID"),
     )
 
 
@@ -879,110 +772,39 @@ def cotisations_toggle_test_mode():
 @traitements_bp.route("/cotisations/generer_pdfs", methods=["POST", "GET"])
 @login_required
 def cotisations_generer_pdfs():
+    """
+    Lance la génération des factures PDF en tâche de fond
+    (voir cotisations_pdf_job) et revient sur la page cotisations,
+    qui suit la progression.
+    """
+    import cotisations_pdf_job
 
-    # ----------------------------
-    # Paramètres
-    # ----------------------------
-    BATCH_SIZE = 20
-
-    # ----------------------------
-    # POST = lancement du job
-    # ----------------------------
-    if request.method == "POST":
-        annee = int(request.form["annee"])
-        lignes = json.loads(request.form["data"])
-        offset = 0
-
-
-        base_drive = f"COTISATIONS/Cotisations {annee}/Factures PDF"
-
-        delete_drive_folder_contents(
-            drive_path=base_drive,
-            wait_until_empty=True,
-            timeout=60
-        )
-
-    # ----------------------------
-    # GET = batch suivant
-    # ----------------------------
-    else:
-        offset = int(request.args.get("offset", 0))
-        job_id = session.get("COTISATIONS_JOB_ID")
-        annee = session.get("COTISATIONS_ANNEE")
-
-        if not job_id or not annee:
-            flash("❌ Session de génération expirée", "danger")
-            return redirect(url_for("traitements.cotisations"))
-
-        job_file = Path(tempfile.gettempdir()) / f"cotisations_{job_id}.json"
-
-        with open(job_file, "r", encoding="utf-8") as f:
-            lignes = json.load(f)
-
-        base_drive = f"COTISATIONS/Cotisations {annee}/Factures PDF"
-
-    # ----------------------------
-    # Traitement du lot
-    # ----------------------------
-    total = len(lignes)
-    end = min(offset + BATCH_SIZE, total)
-
-    write_log(f"📄 PDF {offset+1} à {end} / {total}")
-
-    tmp_dir = Path(tempfile.mkdtemp(prefix="cotisations_pdf_"))
-
-    try:
-        for ligne in lignes[offset:end]:
-            if "code_vif_facture" not in ligne or "nom_association" not in ligne:
-                continue
-
-            nom_asso = slugify_filename(ligne["nom_association"])
-            code_vif = ligne["code_vif_facture"]
-
-            nom_pdf = f"FACTURE_{code_vif}_{nom_asso}.pdf"
-            pdf_path = tmp_dir / nom_pdf
+    # GET : anciens liens ?offset= → la progression est sur la page cotisations
+    if request.method == "GET":
+        return redirect(url_for("traitements.cotisations"))
 
-            generer_facture_pdf(
-                {**ligne, "annee": annee},
-                pdf_path
-            )
+    annee = int(request.form["annee"])
+    lignes = json.loads(request.form["data"])
 
-            upload_file_to_drive_path(
-                local_path=str(pdf_path),
-                drive_path=base_drive,
-                filename=nom_pdf
-            )
+    job_id = cotisations_pdf_job.creer_job(annee, lignes, current_app.root_path)
+    session["COTISATIONS_PDF_JOB_ID"] = job_id
+    write_log(f"📄 Job de génération PDF {job_id} lancé ({len(lignes)} lignes)")
 
-    finally:
-        import shutil
-        shutil.rmtree(tmp_dir, ignore_errors=True)
-
-    # ----------------------------
-    # Encore des PDF ?
-    # ----------------------------
-    if end < total:
-        return redirect(
-            url_for(
-                "traitements.cotisations_generer_pdfs",
-                offset=end
-            )
-        )
-
-    # ----------------------------
-    # FIN
-    # ----------------------------
+    return redirect(url_for("traitements.cotisations"))
 
-    flash(f"✅ {total} factures PDF générées avec succès", "success")
 
-    return redirect(
-        url_for(
-            "traitements.cotisations",
-            job_done=1
-        )
-    )
+@traitements_bp.route("/cotisations/generer_pdfs/progression")
+@login_required
+def cotisations_pdfs_progression():
+    """Progression JSON du job de génération PDF de la session."""
+    import cotisations_pdf_job
+    from flask import jsonify
 
-    import shutil
-    shutil.rmtree(tmp_dir, ignore_errors=True)
+    job_id = request.args.get("job_id") or session.get("COTISATIONS_PDF_JOB_ID")
+    etat = cotisations_pdf_job.etat(job_id) if job_id else None
+    if etat is None:
+        return jsonify({"statut": "inconnu"}), 404
+    return jsonify(etat)
 
 
 
@@ -1001,15 +823,16 @@ def cotisations_envoyer_mails():
         * ajout du préfixe [TEST] dans le sujet
     - En MODE PROD :
         * blocage serveur tant que la double confirmation n’est pas validée
-    - Pour chaque association :
-        * génération du PDF de facture (temporaire)
-        * envoi d’un mail avec le PDF correspondant en pièce jointe
+    - Les messages (avec leur facture PDF en pièce jointe) sont inscrits
+      dans une campagne envoyée en tâche de fond (voir mail_campagnes) ;
+      la page cotisations suit la progression.
+    - En PROD, la campagne est unique par année : la relancer n'envoie
+      que les mails pas encore partis.
     """
 
     import os
     import json
-    import tempfile
-    from pathlib import Path
+    import mail_campagnes
 
     # ============================
     # Données de base
@@ -1044,6 +867,9 @@ def cotisations_envoyer_mails():
         "MAIL_MODE",
         os.getenv("MAIL_MODE", "PROD").upper()
     )
+    # Un serveur configuré en TEST ne passe jamais en PROD via la session
+    if os.getenv("MAIL_MODE", "PROD").upper() == "TEST":
+        mail_mode = "TEST"
     mail_test_to = os.getenv(
         "MAIL_TEST_TO",
         "ba380.informatique2@banquealimentaire.org"
@@ -1062,9 +888,9 @@ def cotisations_envoyer_mails():
         return redirect(url_for("traitements.cotisations"))
 
     # ============================
-    # Envoi des mails
+    # Préparation des messages
     # ============================
-    nb_mails = 0
+    messages = []
 
     for ligne in lignes:
         # Sécurité minimale
@@ -1111,111 +937,91 @@ def cotisations_envoyer_mails():
                 f"🧪 MODE TEST — mail redirigé de {ligne['email']} vers {mail_test_to}"
             )
 
-        # ----------------------------
-        # Génération PDF temporaire
-        # ----------------------------
-        with tempfile.TemporaryDirectory() as tmpdir:
-            nom_asso = slugify_filename(ligne["nom_association"])
-            code_vif = ligne["code_vif_facture"]
-
-            nom_pdf = f"FACTURE_{code_vif}_{nom_asso}.pdf"
-            pdf_path = Path(tmpdir) / nom_pdf
-
-            generer_facture_pdf(
-                {**ligne, "annee": annee},
-                pdf_path
-            )
+        messages.append({
+            "cle": str(ligne["code_vif_facture"]),
+            "destinataires": destinataires,
+            "sujet": sujet,
+            "texte": texte_mail,
+            # Facture rendue par la tâche de fond, juste avant l'envoi
+            "piece_jointe": {"type": "facture_cotisation", "ligne": ligne, "annee": annee},
+        })
 
-            # ----------------------------
-            # Envoi du mail avec PJ
-            # ----------------------------
-            envoyer_mail(
-                sujet=sujet,
-                destinataires=destinataires,
-                texte=texte_mail,
-                sender_override=mail_sender,
-                attachment_path=str(pdf_path)
-            )
+    if not messages:
+        flash("Aucune association avec adresse mail", "warning")
+        return redirect(url_for("traitements.cotisations"))
 
-            nb_mails += 1
+    # ============================
+    # Campagne en tâche de fond
+    # ============================
+    if mail_mode == "PROD":
+        campagne_id = f"cotisations_{annee}_prod"
+    else:
+        campagne_id = f"cotisations_{annee}_test_{uuid.uuid4().hex[:8]}"
+
+    nouveaux, deja_envoyes = mail_campagnes.creer_campagne(
+        get_db_path(),
+        campagne_id,
+        f"Appel de cotisation {annee}",
+        mail_sender,
+        mail_mode,
+        messages,
+    )
+    session["COTISATIONS_MAIL_CAMPAGNE_ID"] = campagne_id
+    write_log(f"📧 Campagne {campagne_id} lancée ({nouveaux} nouveaux, {deja_envoyes} déjà envoyés)")
 
     # ============================
-    # Message final utilisateur
+    # Message utilisateur
     # ============================
+    if deja_envoyes:
+        flash(
+            f"ℹ️ {deja_envoyes} mails déjà envoyés pour {annee} ne seront pas renvoyés",
+            "info"
+        )
     if mail_mode == "TEST":
         flash(
-            f"🧪 {nb_mails} mails envoyés en MODE TEST "
-            f"vers {mail_test_to}",
+            f"🧪 Envoi de {len(messages)} mails en MODE TEST "
+            f"vers {mail_test_to} lancé",
             "warning"
         )
     else:
         flash(
-            f"✅ {nb_mails} mails envoyés aux associations",
+            f"📧 Envoi de {max(len(messages) - deja_envoyes, 0)} mails aux associations lancé",
             "success"
         )
 
     return redirect(url_for("traitements.cotisations"))
 
 
-import re
-from datetime import datetime
-from collections import defaultdict
+@traitements_bp.route("/cotisations/envoyer_mails/progression")
+@login_required
+def cotisations_mails_progression():
+    """Progression JSON de la campagne de mails de la session."""
+    import mail_campagnes
+    from flask import jsonify
 
-DATE_REGEX = re.compile(r"\d{2}/\d{2}/\d{4}")
-ASSO_REGEX = re.compile(r"Association\s*:\s*(\d{8})")
+    campagne_id = request.args.get("campagne_id") or session.get("COTISATIONS_MAIL_CAMPAGNE_ID")
+    etat = mail_campagnes.etat(get_db_path(), campagne_id) if campagne_id else None
+    if etat is None:
+        return jsonify({"statut": "inconnu"}), 404
+    return jsonify(etat)
 
-def parse_parsol2l_annuel(file_path):
+
+def parse_parsol2l_annuel(source):
     """
-    Parse un fichier PARSOL2L annuel (texte)
+    Parse un fichier PARSOL2L annuel (texte), en flux (cf. parsol)
+    source : chemin du fichier ou flux binaire (ex. fichier téléversé)
     Retourne un dict :
         { code_vif (str) : total_beneficiaires (int) }
     """
+    import parsol
 
-    totaux = defaultdict(int)
-    code_vif_courant = None
-
-    with open(file_path, "r", encoding="latin-1", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
-
-            if not line:
-                continue
-
-            # ==========================
-            # Détection nouvelle association
-            # ==========================
-            m_asso = ASSO_REGEX.search(line)
-            if m_asso:
-                code_vif_courant = m_asso.group(1)
-                continue
-
-            if not code_vif_courant:
-                continue
-
-            # ==========================
-            # Ligne de passage (date en début)
-            # ==========================
-            if DATE_REGEX.match(line):
-                parts = re.split(r"\s+", line)
-                if len(parts) < 2:
-                    continue
-
-                try:
-                    nb_benef = int(parts[1])
-                except ValueError:
-                    continue
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return parsol.beneficiaires_par_association(f)
+    return parsol.beneficiaires_par_association(source)
 
-                totaux[code_vif_courant] += nb_benef
 
-    return dict(totaux)
-
-
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
 from datetime import date
-from pathlib import Path
 
 # ============================
 # PARAMÈTRES FIXES BAI
@@ -1231,7 +1037,7 @@ BAI_SIREN = "388 092 132 00033"
 BAI_NAF = "8899B"
 
 
-def generer_facture_pdf(data, output_path):
+def generer_facture_pdf(data, output_path, root_path=None):
     """
     Génère une facture PDF individuelle de cotisation BA38.
 
@@ -1241,7 +1047,14 @@ def generer_facture_pdf(data, output_path):
       - cotisation
       - annee
       - code_vif_facture
+
+    root_path : racine de l'application (hors contexte Flask, ex. pool de
+    processus du job de génération) ; par défaut current_app.root_path.
     """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import mm
+    from reportlab.lib.utils import ImageReader
 
     c = canvas.Canvas(str(output_path), pagesize=A4)
     largeur, hauteur = A4
@@ -1251,7 +1064,7 @@ def generer_facture_pdf(data, output_path):
     # ============================
 
     logo_path = (
-        Path(current_app.root_path)
+        Path(root_path or current_app.root_path)
         / "static"
         / "images"
         / "logo ba complet.png"
@@ -1439,6 +1252,7 @@ def cotisations_export_excel():
     import json
     from io import BytesIO
     from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
     from flask import send_file
 
     annee = request.form.get("annee")
@@ -1504,33 +1318,6 @@ def cotisations_export_excel():
     )
 
 
-def wait_until_drive_folder_empty(service, folder_id, drive_id, timeout=30):
-    """
-    Attend que le dossier Drive soit réellement vide
-    (cohérence Drive), avec timeout en secondes.
-    """
-    import time
-
-    start = time.time()
-
-    while True:
-        results = service.files().list(
-            q=f"'{folder_id}' in parents and trashed=false",
-            corpora="drive",
-            driveId=drive_id,
-            supportsAllDrives=True,
-            includeItemsFromAllDrives=True,
-            fields="files(id)"
-        ).execute()
-
-        if not results.get("files"):
-            return True
-
-        if time.time() - start > timeout:
-            return False
-
-        time.sleep(1)
-
 @traitements_bp.route("/cotisations/start")
 @login_required
 def cotisations_start():
@@ -24,8 +24,8 @@
 #     print(f"❌ Erreur pendant la sauvegarde : {e}")
 
 import os
+import sqlite3
 from datetime import datetime
-import shutil
 from dotenv import load_dotenv
 
 # Charger les variables d'environnement
@@ -54,9 +54,17 @@ os.makedirs(backup_dir, exist_ok=True)
 timestamp = datetime.now().strftime("%Y%m%d_%H%M")
 backup_file = os.path.join(backup_dir, f"{db_filename}.{timestamp}")
 
-# Copie
+# Copie cohérente via l'API de backup en ligne : la base est en WAL, une
+# copie du seul fichier perdrait les transactions encore dans le -wal
 try:
-    shutil.copy2(db_path, backup_file)
+    src = sqlite3.connect(db_path, timeout=30)
+    dst = sqlite3.connect(backup_file)
+    try:
+        src.backup(dst)
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
     print(f"✅ Sauvegarde terminée : {backup_file}")
 except Exception as e:
     print(f"❌ Erreur pendant la sauvegarde : {e}")
@@ -0,0 +1,11 @@
+"""
+Bancs d'essai de l'application sur une base synthétique à l'échelle de la
+production :
+
+- `benchmarks/generer_base.py` : base SQLite compatible (prod_schema.sql +
+  tables de planning), volumes paramétrables ;
+- `benchmarks/test_routes.py` : suite pytest-benchmark des pages les plus
+  fréquentées via le client de test Flask (Google, Mailjet et OpenAI
+  bouchonnés) ; comparaison entre commits par `--benchmark-autosave` /
+  `--benchmark-compare`.
+"""
@@ -0,0 +1,190 @@
+"""
+Fixtures du banc d'essai pytest-benchmark : base synthétique
+(`benchmarks/generer_base.py`), application importée sur une copie de cette
+base (ENVIRONMENT=dev), Google, Mailjet et OpenAI bouchonnés.
+
+Usage :
+    python -m pytest benchmarks --benchmark-autosave
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=median:20%
+    python -m pytest benchmarks -k apercu --bench-base /tmp/ba38_bench.sqlite
+    python -m pytest benchmarks --bench-benevoles 6000 --bench-annees 5
+
+Le fichier .env de l'application doit exister (ba38 le charge au démarrage) ;
+les variables fixées ici (base, sessions, journaux, clés d'API) l'emportent.
+"""
+
+import os
+import sys
+import types
+import logging
+import sqlite3
+import contextlib
+from unittest import mock
+
+import pytest
+
+from benchmarks import generer_base
+
+NOM_BASE = "ba38_bench.sqlite"
+
+
+def pytest_addoption(parser):
+    groupe = parser.getgroup("ba38", "Banc d'essai BA38")
+    groupe.addoption("--bench-base", help="Base générée par benchmarks/generer_base.py (copiée, jamais modifiée)")
+    groupe.addoption("--bench-benevoles", type=int, default=3000, help="Sans --bench-base")
+    groupe.addoption("--bench-associations", type=int, default=400, help="Sans --bench-base")
+    groupe.addoption("--bench-fournisseurs", type=int, default=300, help="Sans --bench-base")
+    groupe.addoption("--bench-annees", type=int, default=3, help="Sans --bench-base")
+
+
+# ============================
+# Environnement et bouchons
+# ============================
+def _environnement(dossier):
+    """Variables fixées avant l'import de ba38 (load_dotenv ne les écrase pas)."""
+    return {
+        "ENVIRONMENT": "dev",
+        "BA38_BASE_DIR": dossier,
+        "SQLITE_DB_DEV": NOM_BASE,
+        "SQLITE_DB_DEV_TEST": "",
+        "TEST_MODE": "0",
+        "FLASK_ENV": "prod",
+        "FLASK_SECRET_KEY": "bench",
+        "MAINTENANCE_MODE": "0",
+        "LOG_FILE": os.path.join(dossier, "app.log"),
+        "SESSION_BACKEND": "sqlite",
+        "SESSION_DB": os.path.join(dossier, "sessions.sqlite"),
+        "MAIL_CAMPAGNES_DIR": os.path.join(dossier, "mail_campagnes"),
+        # Réplication Drive : aucune pour la base de dev, identifiants factices
+        # pour les contrôles de démarrage de ba38
+        "GDRIVE_DB_FILE_ID_DEV": "",
+        "GDRIVE_DB_FILE_ID_DEV_TEST": "",
+        "GDRIVE_DB_FILE_ID_TEST": "bench",
+        "GDRIVE_DB_FILE_ID_PROD": "bench",
+        "MAILJET_API_KEY": "bench",
+        "MAILJET_API_SECRET": "bench",
+        "MAIL_MODE": "TEST",
+        "OPENAI_API_KEY": "bench",
+        "EVENEMENTS_SSE": "0",
+    }
+
+
+class Appels:
+    """Compteur des appels externes interceptés, par service."""
+
+    def __init__(self):
+        self.par_service = {}
+
+    def noter(self, service):
+        self.par_service[service] = self.par_service.get(service, 0) + 1
+
+
+def _reponse_http(appels):
+    import requests
+
+    def repondre(session, method, url, *args, **kwargs):
+        appels.noter("mailjet" if "mailjet" in str(url) else "http")
+        reponse = requests.Response()
+        reponse.status_code = 200
+        reponse.url = str(url)
+        reponse.headers["Content-Type"] = "application/json"
+        reponse._content = b'{"Messages": []}'
+        return reponse
+    return repondre
+
+
+def _client_factice(appels, service):
+    def fabriquer(*args, **kwargs):
+        appels.noter(service)
+        return mock.MagicMock(name=service)
+    return fabriquer
+
+
+@contextlib.contextmanager
+def bouchons(appels):
+    """Google, Mailjet (et tout HTTP sortant) et OpenAI remplacés par des factices."""
+    openai = types.ModuleType("openai")
+    openai.OpenAI = _client_factice(appels, "openai")
+
+    with contextlib.ExitStack() as pile:
+        pile.enter_context(mock.patch.dict(sys.modules, {"openai": openai}))
+        pile.enter_context(mock.patch("requests.sessions.Session.request", _reponse_http(appels)))
+        pile.enter_context(mock.patch("google_clients.credentials", _client_factice(appels, "google")))
+        pile.enter_context(mock.patch("google_clients.service", _client_factice(appels, "google")))
+        pile.enter_context(mock.patch("google_clients.gspread_client", _client_factice(appels, "google")))
+        pile.enter_context(mock.patch("utils.get_drive", _client_factice(appels, "google")))
+        pile.enter_context(mock.patch("drive_replication.mark_dirty", lambda *a, **k: appels.noter("google")))
+        yield
+
+
+# ============================
+# Fixtures
+# ============================
+def _volumes(chemin_base):
+    conn = sqlite3.connect(chemin_base)
+    try:
+        tables = ["benevoles", "associations", "fournisseurs", "absences",
+                  *[f"plannings_{nom}" for nom in generer_base.POSTES]]
+        return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in tables}
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope="session")
+def appels():
+    return Appels()
+
+
+@pytest.fixture(scope="session")
+def base_bench(pytestconfig, tmp_path_factory):
+    """Dossier de travail contenant la base du banc (générée ou copiée)."""
+    dossier = tmp_path_factory.mktemp("ba38_bench")
+    chemin_base = str(dossier / NOM_BASE)
+    source = pytestconfig.getoption("--bench-base")
+    if source:
+        with contextlib.closing(sqlite3.connect(source)) as src, \
+                contextlib.closing(sqlite3.connect(chemin_base)) as copie:
+            src.backup(copie)
+    else:
+        generer_base.generer(
+            chemin_base,
+            benevoles=pytestconfig.getoption("--bench-benevoles"),
+            associations=pytestconfig.getoption("--bench-associations"),
+            fournisseurs=pytestconfig.getoption("--bench-fournisseurs"),
+            annees=pytestconfig.getoption("--bench-annees"),
+        )
+    return str(dossier)
+
+
+@pytest.fixture(scope="session")
+def volumes(base_bench):
+    return _volumes(os.path.join(base_bench, NOM_BASE))
+
+
+@pytest.fixture(scope="session")
+def application(base_bench, appels):
+    with mock.patch.dict(os.environ, _environnement(base_bench)), bouchons(appels):
+        import ba38
+
+        app = ba38.create_app()
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        # Journal applicatif dans le dossier temporaire ; console réservée aux mesures
+        logging.getLogger("BA38").setLevel(logging.WARNING)
+        yield app
+
+        # Dernières présences écrites tant que la copie de la base existe
+        import presence
+        presence.flush()
+
+
+@pytest.fixture(scope="session")
+def client(application):
+    """Client de test connecté avec l'administrateur de la base synthétique."""
+    client = application.test_client()
+    reponse = client.post("/login", data={
+        "email": generer_base.UTILISATEUR_BENCH,
+        "password": generer_base.MOT_DE_PASSE_BENCH,
+    })
+    if reponse.status_code != 302 or "/login" in reponse.headers.get("Location", ""):
+        pytest.fail(f"Connexion de {generer_base.UTILISATEUR_BENCH} impossible ({reponse.status_code})")
+    return client
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Génère une base SQLite synthétique à l'échelle de la production.
+
+Schéma : `prod_schema.sql` (ou --schema, p. ex. `sqlite3 ba380.sqlite .schema`),
+complété des tables et colonnes que l'application attend et que le fichier
+de schéma ne décrit pas : les cinq tables `plannings_*`, leurs modèles
+`planning_standard_*_ids`, rôles, journal des connexions, événements, et les
+colonnes ajoutées au fil du temps (rôles des bénévoles, ordre / durée des
+tournées). Les migrations de `db_migrations` sont ensuite appliquées, puis
+la table de faits `heures_benevoles` est calculée : la base est dans l'état
+d'une base de production au démarrage d'un worker.
+
+Données : bénévoles, associations, fournisseurs, tournées, plusieurs années
+de plannings (les cinq types) et d'absences. Tirage déterministe (--graine).
+
+Usage :
+    python benchmarks/generer_base.py /tmp/ba38_bench.sqlite
+    python benchmarks/generer_base.py /tmp/ba38_bench.sqlite --benevoles 5000 --annees 5
+
+Utilisateur administrateur créé : bench@exemple.fr / bench
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+from datetime import date, timedelta
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+SCHEMA_PROD = os.path.join(RACINE, "prod_schema.sql")
+
+UTILISATEUR_BENCH = "bench@exemple.fr"
+MOT_DE_PASSE_BENCH = "bench"
+
+JOURS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi"]
+
+# Postes par type de planning (mêmes noms que heures_benevoles.POSTES)
+POSTES = {
+    "ramasse": ["chauffeur", "responsable", "equipier",
+                "ramasse_tri1", "ramasse_tri2", "ramasse_tri3"],
+    "distribution": ["froid1", "froid2", "froid3", "froid4",
+                     "frais_sec1", "frais_sec2", "frais_sec3", "frais_sec4"],
+    "pal": [f"pal{str(i).zfill(2)}" for i in range(1, 11)],
+    "pesee": [f"pesee{str(i).zfill(2)}" for i in range(1, 9)],
+    "vif": [f"vif{str(i).zfill(2)}" for i in range(1, 4)],
+}
+
+# Colonnes lues par l'application mais absentes de prod_schema.sql
+COLONNES_COMPLEMENTAIRES = {
+    "benevoles": [
+        "type_benevole TEXT", "ramasse_chauffeur TEXT", "ramasse_equipier TEXT",
+        "ramasse_responsable_tri TEXT", "ramasse_tri_externe TEXT",
+        "distrib_froid TEXT", "distrib_frais_sec TEXT", "saisie_vif TEXT",
+    ],
+    "tournees_fournisseurs": ["ordre INTEGER", "duree INTEGER"],
+    "planning_standard_ramasse_ids": [
+        "ramasse_tri1_id INTEGER", "ramasse_tri2_id INTEGER", "ramasse_tri3_id INTEGER",
+    ],
+}
+
+NOMS = [
+    "Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand",
+    "Leroy", "Moreau", "Simon", "Laurent", "Lefebvre", "Michel", "Garcia", "David",
+    "Bertrand", "Roux", "Vincent", "Fournier", "Morel", "Girard", "André", "Lefèvre",
+    "Mercier", "Dupont", "Lambert", "Bonnet", "François", "Martinez", "Legrand", "Garnier",
+    "Faure", "Rousseau", "Blanc", "Guérin", "Muller", "Henry", "Roussel", "Nicolas",
+    "Perrin", "Morin", "Mathieu", "Clément", "Gauthier", "Dumont", "Lopez", "Fontaine",
+    "Chevalier", "Robin", "Masson", "Sanchez", "Gérard", "Nguyen", "Boyer", "Denis",
+]
+PRENOMS = [
+    "Marie", "Jean", "Pierre", "Michel", "André", "Philippe", "Nathalie", "Isabelle",
+    "Sylvie", "Catherine", "Françoise", "Alain", "Bernard", "Christine", "Monique",
+    "Jacques", "Daniel", "Patrick", "Anne", "Élodie", "Hélène", "Luc", "Sophie",
+    "Chantal", "Gérard", "Thérèse", "Yves", "Agnès", "Bruno", "Céline", "Denis",
+]
+VILLES = [
+    ("38000", "Grenoble"), ("38100", "Grenoble"), ("38130", "Échirolles"),
+    ("38400", "Saint-Martin-d'Hères"), ("38240", "Meylan"), ("38120", "Saint-Égrève"),
+    ("38600", "Fontaine"), ("38170", "Seyssinet-Pariset"), ("38320", "Eybens"),
+    ("38200", "Vienne"), ("38300", "Bourgoin-Jallieu"), ("38500", "Voiron"),
+]
+RUES = ["rue des Alpes", "avenue Jean Jaurès", "cours Berriat", "rue de la Paix",
+        "boulevard Gambetta", "chemin des Vignes", "place Notre-Dame", "allée du Drac"]
+TYPES_BENEVOLE = ["Bénévole", "Salarié", "Service civique", "Stagiaire"]
+
+
+# ============================
+# Schéma
+# ============================
+def _instructions_schema(chemin):
+    """Instructions du fichier de schéma, sans `sqlite_sequence` (table interne)."""
+    with open(chemin, encoding="utf-8") as f:
+        texte = f.read().replace("\r\n", "\n")
+    for instruction in texte.split(";\n"):
+        instruction = instruction.strip().rstrip(";")
+        if instruction and "sqlite_sequence" not in instruction:
+            yield instruction
+
+
+def _colonnes(conn, table):
+    return [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")').fetchall()]
+
+
+def _ddl_planning(table, postes, ramasse=False):
+    colonnes = ["id INTEGER PRIMARY KEY AUTOINCREMENT", "annee INTEGER", "semaine INTEGER", "jour TEXT"]
+    if ramasse:
+        colonnes += ["type TEXT", "tournee_id INTEGER", "tournee TEXT", "camion_id INTEGER"]
+    else:
+        colonnes.append("duree INTEGER")
+    for poste in postes:
+        colonnes += [f"{poste}_id INTEGER", f"{poste}_absent TEXT DEFAULT 'non'"]
+        colonnes.append(f"remplacant_{poste}_id INTEGER" if ramasse else f"{poste}_remplacant INTEGER")
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(colonnes) + "\n)"
+
+
+def _ddl_standard(table, postes):
+    colonnes = ["id INTEGER PRIMARY KEY AUTOINCREMENT", "jour TEXT NOT NULL"]
+    colonnes += [f"{poste}_id INTEGER" for poste in postes]
+    colonnes.append("duree INTEGER")
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(colonnes) + "\n)"
+
+
+TABLES_APPLICATION = [
+    _ddl_planning("plannings_ramasse", POSTES["ramasse"], ramasse=True),
+    *[_ddl_planning(f"plannings_{nom}", POSTES[nom]) for nom in ("distribution", "pal", "pesee", "vif")],
+    *[_ddl_standard(f"planning_standard_{nom}_ids", POSTES[nom]) for nom in ("distribution", "pal", "pesee", "vif")],
+    """CREATE TABLE IF NOT EXISTS roles_utilisateurs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT NOT NULL,
+    appli TEXT NOT NULL,
+    droit TEXT NOT NULL
+)""",
+    """CREATE TABLE IF NOT EXISTS log_connexions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT, username TEXT, environ TEXT, ip TEXT, user_agent TEXT,
+    timestamp TEXT, action TEXT, last_seen TEXT
+)""",
+    """CREATE TABLE IF NOT EXISTS fournisseurs_contacts (
+    id INTEGER PRIMARY KEY,
+    fournisseur_id INTEGER NOT NULL,
+    prenom TEXT, nom TEXT, fonction TEXT, tel_mobile TEXT, tel_fixe TEXT, email TEXT,
+    adresse1 TEXT, adresse2 TEXT, cp TEXT, ville TEXT,
+    est_referent TEXT DEFAULT 'non', actif TEXT DEFAULT 'oui', notes TEXT,
+    date_creation TEXT, date_modif TEXT, user_modif TEXT
+)""",
+    """CREATE TABLE IF NOT EXISTS export_presets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT, preset_name TEXT, appli TEXT, selected_columns TEXT,
+    filters_json TEXT, mode_or INTEGER DEFAULT 0,
+    date_created TEXT DEFAULT CURRENT_TIMESTAMP
+)""",
+    """CREATE TABLE IF NOT EXISTS evenements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT, titre TEXT, contenu TEXT, fichier_path TEXT, benevole_id INTEGER,
+    image_path TEXT, date_debut TEXT, date_fin TEXT, recurrence TEXT,
+    duree_affichage INTEGER, actif INTEGER DEFAULT 1
+)""",
+]
+
+
+def creer_schema(conn, chemin_schema):
+    for instruction in _instructions_schema(chemin_schema):
+        conn.execute(instruction)
+    for ddl in TABLES_APPLICATION:
+        conn.execute(ddl)
+    for table, colonnes in COLONNES_COMPLEMENTAIRES.items():
+        existantes = set(_colonnes(conn, table))
+        for definition in colonnes:
+            if definition.split()[0] not in existantes:
+                conn.execute(f'ALTER TABLE "{table}" ADD COLUMN {definition}')
+
+
+# ============================
+# Données
+# ============================
+def _inserer(conn, table, lignes):
+    """Insère des dicts (colonnes inconnues de la table ignorées). Retourne le nombre de lignes."""
+    colonnes = set(_colonnes(conn, table))
+    lignes = [{k: v for k, v in l.items() if k in colonnes} for l in lignes]
+    if not lignes:
+        return 0
+    noms = list(lignes[0])
+    colonnes_sql = ", ".join(f'"{n}"' for n in noms)
+    conn.executemany(
+        f'INSERT INTO "{table}" ({colonnes_sql}) VALUES ({", ".join("?" * len(noms))})',
+        [tuple(l.get(n) for n in noms) for l in lignes],
+    )
+    return len(lignes)
+
+
+def _oui_non(rnd, proba_oui):
+    return "oui" if rnd.random() < proba_oui else "non"
+
+
+def _telephone(rnd):
+    return "0" + str(rnd.choice([4, 6, 7])) + "".join(str(rnd.randint(0, 9)) for _ in range(8))
+
+
+def _adresse(rnd):
+    cp, ville = rnd.choice(VILLES)
+    return f"{rnd.randint(1, 120)} {rnd.choice(RUES)}", cp, ville
+
+
+def generer_benevoles(conn, rnd, nombre):
+    colonnes = _colonnes(conn, "benevoles")
+    # Colonnes oui/non (rôles, cotisations…) : tout ce qui n'est pas une donnée d'identité
+    identite = {"id", "commentaire", "civilite", "nom", "prenom", "rue", "complement_adresse",
+                "code_postal", "ville", "telephone_fixe", "telephone_portable", "email",
+                "annee_arrivee_bai", "type_benevole"}
+    drapeaux = [c for c in colonnes if c not in identite]
+
+    lignes = []
+    for i in range(nombre):
+        nom, prenom = rnd.choice(NOMS), rnd.choice(PRENOMS)
+        rue, cp, ville = _adresse(rnd)
+        ligne = {
+            "civilite": rnd.choice(["M", "Mme"]),
+            "nom": nom.upper(), "prenom": prenom,
+            "rue": rue, "code_postal": cp, "ville": ville,
+            "telephone_portable": _telephone(rnd),
+            "telephone_fixe": _telephone(rnd) if rnd.random() < 0.3 else None,
+            "email": f"{prenom.lower()}.{nom.lower()}.{i}@exemple.fr",
+            "annee_arrivee_bai": str(rnd.randint(2005, date.today().year)),
+            "type_benevole": rnd.choices(TYPES_BENEVOLE, weights=[90, 4, 4, 2])[0],
+            "commentaire": "Disponible le matin" if rnd.random() < 0.1 else None,
+        }
+        for c in drapeaux:
+            ligne[c] = _oui_non(rnd, 0.15)
+        lignes.append(ligne)
+    return _inserer(conn, "benevoles", lignes)
+
+
+def generer_associations(conn, rnd, nombre, cars):
+    colonnes = [c for c in _colonnes(conn, "associations") if c != "Id"]
+    lignes = []
+    for i in range(nombre):
+        rue, cp, ville = _adresse(rnd)
+        ligne = {c: (f"{c.replace('_', ' ')} {rnd.randint(1, 99)}" if rnd.random() < 0.6 else None)
+                 for c in colonnes}
+        ligne.update({
+            "nom_association": f"{rnd.choice(['Secours', 'Entraide', 'Épicerie solidaire', 'Restos', 'Accueil'])} "
+                               f"{ville} {i:03d}",
+            "code_VIF": f"38{i:05d}",
+            "adresse_association_1": rue, "CP": cp, "COMMUNE": ville,
+            "tel_association": _telephone(rnd),
+            "courriel_association": f"contact{i}@asso-exemple.fr",
+            "validite": "non" if rnd.random() < 0.08 else "oui",
+            "CAR": rnd.choice(cars) if cars else None,
+        })
+        lignes.append(ligne)
+    return _inserer(conn, "associations", lignes)
+
+
+def generer_fournisseurs(conn, rnd, nombre):
+    lignes = []
+    for i in range(nombre):
+        rue, cp, ville = _adresse(rnd)
+        ligne = {
+            "nom": f"{rnd.choice(['Carrefour', 'Leclerc', 'Intermarché', 'Lidl', 'Biocoop', 'Grand Frais', 'Metro'])} "
+                   f"{ville} {i:03d}",
+            "adresse": rue, "cp": cp, "ville": ville,
+            "tel": _telephone(rnd), "mail": f"magasin{i}@fournisseur-exemple.fr",
+        }
+        for jour in JOURS:
+            ouvert = _oui_non(rnd, 0.5)
+            ligne[jour] = ouvert
+            ligne[f"horaire_{jour}"] = f"{rnd.randint(7, 11):02d}:{rnd.choice([0, 30]):02d}" if ouvert == "oui" else None
+        lignes.append(ligne)
+    n = _inserer(conn, "fournisseurs", lignes)
+
+    contacts = []
+    for fournisseur_id in range(1, nombre + 1):
+        for rang in range(rnd.randint(1, 3)):
+            prenom, nom = rnd.choice(PRENOMS), rnd.choice(NOMS)
+            contacts.append({
+                "fournisseur_id": fournisseur_id, "prenom": prenom, "nom": nom.upper(),
+                "fonction": rnd.choice(["Directeur", "Responsable rayon", "Accueil"]),
+                "tel_mobile": _telephone(rnd), "email": f"{prenom.lower()}.{fournisseur_id}.{rang}@fournisseur-exemple.fr",
+                "est_referent": "oui" if rang == 0 else "non",
+            })
+    _inserer(conn, "fournisseurs_contacts", contacts)
+    return n
+
+
+def generer_tournees(conn, rnd, par_jour, nb_fournisseurs, nb_camions, benevoles):
+    """Camions, tournées (tournees_fournisseurs) et modèle de la ramasse."""
+    _inserer(conn, "camions", [
+        {"nom": f"Camion {i + 1}", "immat": f"{rnd.choice('ABCDEFGH')}{rnd.choice('ABCDEFGH')}-"
+                                           f"{rnd.randint(100, 999)}-{rnd.choice('JKLMNP')}{rnd.choice('QRSTUV')}"}
+        for i in range(nb_camions)
+    ])
+
+    tournees, modele = [], []
+    tournee_id = 0
+    for jour in JOURS:
+        for numero in range(1, par_jour + 1):
+            tournee_id += 1
+            for ordre, fournisseur_id in enumerate(rnd.sample(range(1, nb_fournisseurs + 1), rnd.randint(2, 4)), 1):
+                tournees.append({
+                    "tournee_id": tournee_id, "fournisseur_id": fournisseur_id, "ordre": ordre,
+                    "duree": rnd.choice([90, 120, 150, 180, 240]),
+                    "nom": f"Tournée {jour} {numero}" if ordre == 1 else None,
+                })
+            ligne = {"jour": jour, "numero": numero, "tournee_id": tournee_id,
+                     "camion_id": rnd.randint(1, nb_camions)}
+            for poste in POSTES["ramasse"]:
+                ligne[f"{poste}_id"] = rnd.choice(benevoles)
+            modele.append(ligne)
+    _inserer(conn, "tournees_fournisseurs", tournees)
+    _inserer(conn, "planning_standard_ramasse_ids", modele)
+    return modele
+
+
+def generer_modeles(conn, rnd, benevoles):
+    """Modèles (planning_standard_*_ids) des plannings hors ramasse : une ligne par jour."""
+    modeles = {}
+    for nom in ("distribution", "pal", "pesee", "vif"):
+        lignes = []
+        for jour in JOURS:
+            ligne = {"jour": jour, "duree": rnd.choice([120, 180, 240])}
+            for poste in POSTES[nom]:
+                ligne[f"{poste}_id"] = rnd.choice(benevoles) if rnd.random() < 0.9 else None
+            lignes.append(ligne)
+        _inserer(conn, f"planning_standard_{nom}_ids", lignes)
+        modeles[nom] = lignes
+    return modeles
+
+
+def _semaines(annees):
+    """(annee, semaine ISO, lundi) des `annees` dernières années jusqu'à la semaine courante."""
+    lundi = date.today() - timedelta(days=date.today().weekday())
+    debut = lundi - timedelta(weeks=52 * annees)
+    while debut <= lundi:
+        iso = debut.isocalendar()
+        yield iso[0], iso[1], debut
+        debut += timedelta(weeks=1)
+
+
+def _affectation(rnd, titulaire, benevoles, taux_absence):
+    """(titulaire, absent, remplaçant) d'un poste pour une semaine donnée."""
+    if titulaire is None:
+        return None, "non", None
+    if rnd.random() < taux_absence:
+        return titulaire, "oui", rnd.choice(benevoles) if rnd.random() < 0.6 else None
+    return titulaire, "non", None
+
+
+def generer_plannings(conn, rnd, annees, modele_ramasse, modeles, benevoles, taux_absence):
+    totaux = dict.fromkeys(["ramasse", *modeles], 0)
+    for annee, semaine, _ in _semaines(annees):
+        lignes = []
+        for m in modele_ramasse:
+            ligne = {"type": "Ramasse", "annee": annee, "semaine": semaine, "jour": m["jour"],
+                     "tournee_id": m["tournee_id"], "tournee": f"Tournée {m['jour']} {m['numero']}",
+                     "camion_id": m["camion_id"]}
+            for poste in POSTES["ramasse"]:
+                t, absent, r = _affectation(rnd, m[f"{poste}_id"], benevoles, taux_absence)
+                ligne.update({f"{poste}_id": t, f"{poste}_absent": absent, f"remplacant_{poste}_id": r})
+            lignes.append(ligne)
+        totaux["ramasse"] += _inserer(conn, "plannings_ramasse", lignes)
+
+        for nom, modele in modeles.items():
+            lignes = []
+            for m in modele:
+                ligne = {"annee": annee, "semaine": semaine, "jour": m["jour"], "duree": m["duree"]}
+                for poste in POSTES[nom]:
+                    t, absent, r = _affectation(rnd, m[f"{poste}_id"], benevoles, taux_absence)
+                    ligne.update({f"{poste}_id": t, f"{poste}_absent": absent, f"{poste}_remplacant": r})
+                lignes.append(ligne)
+            totaux[nom] += _inserer(conn, f"plannings_{nom}", lignes)
+    return totaux
+
+
+def generer_absences(conn, rnd, annees, benevoles, par_an):
+    debut = date.today() - timedelta(weeks=52 * annees)
+    jours = (date.today() + timedelta(weeks=8) - debut).days
+    lignes = []
+    for benevole_id in benevoles:
+        for _ in range(max(0, round(rnd.gauss(par_an * annees, 1)))):
+            d1 = debut + timedelta(days=rnd.randint(0, jours))
+            d2 = d1 + timedelta(days=rnd.choice([0, 1, 2, 6, 13, 20]))
+            lignes.append({"benevole_id": benevole_id,
+                           "date_debut": d1.strftime("%d/%m/%Y"), "date_fin": d2.strftime("%d/%m/%Y")})
+    return _inserer(conn, "absences", lignes)
+
+
+def generer_configuration(conn, rnd, nb_utilisateurs):
+    """Paramètres, champs affichés (field_groups), utilisateurs et droits. Retourne les noms des CAR."""
+    from werkzeug.security import generate_password_hash
+
+    _inserer(conn, "parametres", [
+        *[{"param_name": "type_benevole", "param_value": t} for t in TYPES_BENEVOLE],
+        {"param_name": "travail_vendredi", "param_value": "oui"},
+    ])
+
+    coordonnees = ("nom", "prenom", "civilite", "rue", "code_postal", "ville", "telephone", "email",
+                   "adresse", "cp", "tel", "mail", "courriel", "COMMUNE", "CP")
+    champs = []
+    for appli, table, exclus in (("benevoles", "benevoles", {"id"}),
+                                 ("associations", "associations", {"Id"}),
+                                 ("fournisseurs", "fournisseurs", {"id"})):
+        for ordre, colonne in enumerate(c for c in _colonnes(conn, table) if c not in exclus):
+            groupe = "Coordonnées" if colonne.startswith(coordonnees) else "Informations"
+            champs.append({"field_name": colonne, "group_name": groupe, "display_order": ordre + 1,
+                           "appli": appli, "type_champ": "text"})
+    _inserer(conn, "field_groups", champs)
+
+    mot_de_passe = generate_password_hash(MOT_DE_PASSE_BENCH)
+    utilisateurs = [{"email": UTILISATEUR_BENCH, "password_hash": mot_de_passe,
+                     "role": "admin", "username": "bench", "actif": "Oui"}]
+    droits = []
+    for i in range(nb_utilisateurs):
+        email = f"utilisateur{i}@exemple.fr"
+        role = "car" if i % 5 == 0 else "user"
+        utilisateurs.append({"email": email, "password_hash": mot_de_passe,
+                             "role": role, "username": f"utilisateur{i}", "actif": "Oui"})
+        for appli in ("benevoles", "associations", "fournisseurs", "distribution"):
+            droits.append({"user_email": email, "appli": appli,
+                           "droit": rnd.choice(["lecture", "ecriture", "aucun"])})
+    _inserer(conn, "users", utilisateurs)
+    _inserer(conn, "roles_utilisateurs", droits)
+    return [u["username"] for u in utilisateurs if u["role"] == "car"]
+
+
+# ============================
+# Assemblage
+# ============================
+def generer(chemin, benevoles=3000, associations=400, fournisseurs=300, annees=3,
+            tournees_par_jour=5, camions=8, absences_par_an=2.0, taux_absence=0.05,
+            utilisateurs=40, graine=38, schema=SCHEMA_PROD):
+    """Crée la base `chemin` (remplacée si elle existe). Retourne les volumes générés."""
+    import db_migrations
+    import heures_benevoles
+
+    rnd = random.Random(graine)
+    os.makedirs(os.path.dirname(os.path.abspath(chemin)), exist_ok=True)
+    for suffixe in ("", "-wal", "-shm"):
+        if os.path.exists(chemin + suffixe):
+            os.remove(chemin + suffixe)
+
+    conn = sqlite3.connect(chemin)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    volumes = {}
+    try:
+        creer_schema(conn, schema)
+        cars = generer_configuration(conn, rnd, utilisateurs)
+        volumes["benevoles"] = generer_benevoles(conn, rnd, benevoles)
+        volumes["associations"] = generer_associations(conn, rnd, associations, cars)
+        volumes["fournisseurs"] = generer_fournisseurs(conn, rnd, fournisseurs)
+
+        ids = list(range(1, benevoles + 1))
+        modele_ramasse = generer_tournees(conn, rnd, tournees_par_jour, fournisseurs, camions, ids)
+        modeles = generer_modeles(conn, rnd, ids)
+        for nom, n in generer_plannings(conn, rnd, annees, modele_ramasse, modeles, ids, taux_absence).items():
+            volumes[f"plannings_{nom}"] = n
+        volumes["absences"] = generer_absences(conn, rnd, annees, ids, absences_par_an)
+        conn.commit()
+
+        # État d'une base de production : index, triggers, FTS, faits du rapport
+        db_migrations.appliquer_migrations(conn)
+        heures_benevoles.rafraichir(conn)
+        volumes["heures_benevoles"] = conn.execute("SELECT COUNT(*) FROM heures_benevoles").fetchone()[0]
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
+    return volumes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Base SQLite synthétique à l'échelle de la production.")
+    parser.add_argument("chemin", help="Fichier SQLite à créer (remplacé s'il existe)")
+    parser.add_argument("--benevoles", type=int, default=3000)
+    parser.add_argument("--associations", type=int, default=400)
+    parser.add_argument("--fournisseurs", type=int, default=300)
+    parser.add_argument("--annees", type=int, default=3, help="Années de plannings et d'absences")
+    parser.add_argument("--tournees-par-jour", type=int, default=5)
+    parser.add_argument("--absences-par-an", type=float, default=2.0, help="Absences par bénévole et par an")
+    parser.add_argument("--taux-absence", type=float, default=0.05, help="Part des postes de planning marqués absents")
+    parser.add_argument("--utilisateurs", type=int, default=40)
+    parser.add_argument("--graine", type=int, default=38)
+    parser.add_argument("--schema", default=SCHEMA_PROD, help="Fichier de schéma (défaut : prod_schema.sql)")
+    args = parser.parse_args()
+
+    debut = time.perf_counter()
+    volumes = generer(
+        args.chemin, benevoles=args.benevoles, associations=args.associations,
+        fournisseurs=args.fournisseurs, annees=args.annees, tournees_par_jour=args.tournees_par_jour,
+        absences_par_an=args.absences_par_an, taux_absence=args.taux_absence,
+        utilisateurs=args.utilisateurs, graine=args.graine, schema=args.schema,
+    )
+    print(f"🗄️ {args.chemin} ({os.path.getsize(args.chemin) / 1024 / 1024:.1f} Mo) "
+          f"en {time.perf_counter() - debut:.1f} s")
+    for table, n in volumes.items():
+        print(f"  {table:<26} {n:>9}")
+    print(f"🔑 Connexion : {UTILISATEUR_BENCH} / {MOT_DE_PASSE_BENCH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
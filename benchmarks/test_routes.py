@@ -0,0 +1,62 @@
+"""
+Temps des pages les plus fréquentées, via le client de test Flask, sur une
+base synthétique à l'échelle de la production (fixtures : conftest.py).
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+
+def _semaine_iso(jour):
+    annee, semaine, _ = jour.isocalendar()
+    return f"{annee}-W{semaine:02d}"
+
+
+# Semaine courante (planning existant) et semaine future (planning à créer)
+SEMAINE = _semaine_iso(date.today())
+SEMAINE_FUTURE = _semaine_iso(date.today() + timedelta(weeks=8))
+
+# (nom, méthode, URL, paramètres GET, données POST)
+SCENARIOS = [
+    ("gestion_planning_ramasse", "GET", "/gestion_planning_ramasse", {"semaine": SEMAINE}, None),
+    ("creation_planning_ramasse", "POST", "/creation_planning_ramasse", None,
+     {"semaine": SEMAINE_FUTURE, "action": "forcer_generation"}),
+    ("creation_planning_distribution", "POST", "/creation_planning_distribution", None,
+     {"semaine": SEMAINE_FUTURE, "action": "forcer_generation"}),
+    ("creation_planning_palettes", "POST", "/creation_planning_palettes", None,
+     {"semaine": SEMAINE_FUTURE, "action": "forcer_generation"}),
+    ("creation_planning_pesee", "POST", "/creation_planning_pesee", None,
+     {"semaine": SEMAINE_FUTURE, "action": "forcer_generation"}),
+    ("creation_planning_vif", "POST", "/creation_planning_vif", None,
+     {"semaine": SEMAINE_FUTURE, "action": "forcer_generation"}),
+    ("apercu_planning_ramasse", "GET", "/apercu_planning_ramasse", {"semaine": SEMAINE}, None),
+    ("apercu_planning_distribution", "GET", "/apercu_planning_distribution", {"semaine": SEMAINE}, None),
+    ("apercu_planning_palettes", "GET", "/apercu_planning_palettes", {"semaine": SEMAINE}, None),
+    ("apercu_planning_pesee", "GET", "/apercu_planning_pesee", {"semaine": SEMAINE}, None),
+    ("apercu_planning_vif", "GET", "/apercu_planning_vif", {"semaine": SEMAINE}, None),
+    ("rapport_benevoles", "POST", "/planning/rapport_benevoles", None, {"periode": "annee_precedente"}),
+    ("partenaires", "GET", "/partenaires", None, None),
+    ("benevoles", "GET", "/benevoles", None, None),
+    ("generateur_excel", "GET", "/generateur_excel", None, None),
+    ("etat_plannings", "GET", "/etat_plannings", None, None),
+]
+
+
+@pytest.mark.parametrize("methode, url, params, donnees", [s[1:] for s in SCENARIOS], ids=[s[0] for s in SCENARIOS])
+def test_page(benchmark, client, appels, volumes, methode, url, params, donnees):
+    requete = client.post if methode == "POST" else client.get
+    options = {"query_string": params}
+    if donnees is not None:
+        options["data"] = donnees
+
+    # Requête de chauffe : une page en erreur ou renvoyée au login n'est pas mesurée
+    chauffe = requete(url, **options)
+    renvoi = chauffe.headers.get("Location", "")
+    assert chauffe.status_code < 400 and "/login" not in renvoi, f"HTTP {chauffe.status_code} {renvoi}"
+
+    benchmark(requete, url, **options)
+    benchmark.extra_info["volumes"] = volumes
+    benchmark.extra_info["appels_externes"] = dict(appels.par_service)
@@ -0,0 +1,152 @@
+"""
+Cache des tables `parametres` et `field_groups`, rechargé quand leur version
+en base change (ou après CONFIG_CACHE_TTL_S secondes).
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+from flask import g, has_app_context
+
+
+NOM_VERSION = "config"
+_G_KEY = "_ba38_config_cache"
+TTL_S = float(os.getenv("CONFIG_CACHE_TTL_S", "300"))
+
+_lock = threading.Lock()
+_caches = {}
+
+
+def _version_courante(conn):
+    try:
+        row = conn.execute(
+            "SELECT version FROM cache_versions WHERE nom = ?", (NOM_VERSION,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # Table pas encore créée (migration 4) : version 0
+        return 0
+    return row[0] if row else 0
+
+
+def _charger(conn, version):
+    conn.row_factory = sqlite3.Row
+    parametres = [dict(r) for r in conn.execute("SELECT * FROM parametres ORDER BY id").fetchall()]
+    champs = [dict(r) for r in conn.execute(
+        "SELECT * FROM field_groups ORDER BY display_order, id"
+    ).fetchall()]
+
+    par_nom = {}
+    for p in parametres:
+        par_nom.setdefault(p["param_name"], []).append(p)
+
+    par_appli = {}
+    for c in champs:
+        par_appli.setdefault(c["appli"], []).append(c)
+
+    return {
+        "version": version, "charge_le": time.monotonic(),
+        "parametres": parametres, "par_nom": par_nom, "par_appli": par_appli,
+    }
+
+
+def _donnees():
+    """Données à jour pour la base courante (vérifiées une fois par requête)."""
+    from utils import get_db_connection, get_db_path
+
+    db_path = get_db_path()
+    memo = g.get(_G_KEY) if has_app_context() else None
+    if memo and db_path in memo:
+        return memo[db_path]
+
+    conn = get_db_connection()
+    try:
+        version = _version_courante(conn)
+        with _lock:
+            donnees = _caches.get(db_path)
+        if (
+            donnees is None
+            or donnees["version"] != version
+            or time.monotonic() - donnees["charge_le"] > TTL_S
+        ):
+            donnees = _charger(conn, version)
+            with _lock:
+                _caches[db_path] = donnees
+    finally:
+        conn.close()
+
+    if has_app_context():
+        if memo is None:
+            memo = {}
+            setattr(g, _G_KEY, memo)
+        memo[db_path] = donnees
+    return donnees
+
+
+# ============================
+# Accesseurs
+# ============================
+def parametre(nom, defaut=""):
+    """Première valeur (par id) du paramètre `nom`."""
+    lignes = _donnees()["par_nom"].get(nom)
+    return lignes[0]["param_value"] if lignes else defaut
+
+
+def valeurs_parametre(nom, ignorer_casse=False):
+    """Toutes les valeurs du paramètre `nom`, dans l'ordre des id."""
+    if not ignorer_casse:
+        return [p["param_value"] for p in _donnees()["par_nom"].get(nom, [])]
+    nom = nom.lower()
+    return [
+        p["param_value"] for p in _donnees()["parametres"]
+        if (p["param_name"] or "").lower() == nom
+    ]
+
+
+def tous_parametres():
+    """Toutes les lignes de `parametres` (dicts), par id."""
+    return [dict(p) for p in _donnees()["parametres"]]
+
+
+def champs(appli):
+    """Lignes de `field_groups` d'une appli (dicts), triées par display_order."""
+    return [dict(c) for c in _donnees()["par_appli"].get(appli, [])]
+
+
+def champs_groupes(appli, defaut="Sans", affichables=False):
+    """
+    Champs d'une appli regroupés par group_name : {groupe: [champs]}.
+    `affichables=True` ne garde que les champs de display_order > 0.
+    """
+    groupes = {}
+    for c in champs(appli):
+        if affichables and not (c["display_order"] and int(c["display_order"]) > 0):
+            continue
+        groupe = (c["group_name"] or "").strip() or defaut
+        groupes.setdefault(groupe, []).append(c)
+    return groupes
+
+
+# ============================
+# Invalidation
+# ============================
+def marquer_modifie(conn):
+    """
+    À appeler après toute écriture dans `parametres` ou `field_groups` :
+    incrémente la version partagée (tous les workers rechargeront).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            nom TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        INSERT INTO cache_versions (nom, version) VALUES (?, 1)
+        ON CONFLICT(nom) DO UPDATE SET version = version + 1
+    """, (NOM_VERSION,))
+    conn.commit()
+
+    if has_app_context():
+        g.pop(_G_KEY, None)
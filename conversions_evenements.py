@@ -0,0 +1,336 @@
+"""
+Conversion des fichiers d'événements (PPTX → PDF → images) en tâche de fond :
+un job par événement (verrou flock), diapos enregistrées au fil des lots.
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import socket
+import logging
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger("BA38")
+
+
+# ============================
+# Paramètres (surchargeables via .env)
+# ============================
+NB_CONVERSIONS = int(os.getenv("EVENEMENTS_CONVERSIONS", "2"))
+NB_THREADS_RENDU = int(os.getenv("EVENEMENTS_RENDU_THREADS", str(min(4, os.cpu_count() or 1))))
+PAGES_PAR_LOT = int(os.getenv("EVENEMENTS_PAGES_PAR_LOT", "4"))
+DPI = int(os.getenv("EVENEMENTS_DPI", "150"))
+TIMEOUT_LIBREOFFICE_S = int(os.getenv("EVENEMENTS_LIBREOFFICE_TIMEOUT_S", "300"))
+PORT_UNOSERVER = int(os.getenv("EVENEMENTS_UNOSERVER_PORT", "2003"))
+
+JOBS_DIR = os.getenv("EVENEMENTS_JOBS_DIR") or os.path.join(tempfile.gettempdir(), "ba38_jobs")
+
+STATUTS_ACTIFS = ("en_attente", "en_cours")
+EXTENSIONS = (".pdf", ".pptx")
+
+_lock = threading.Lock()
+_jobs_locaux = set()
+_pool = None
+
+_lock_unoserver = threading.Lock()
+_unoserver = None
+_profils = threading.local()
+
+
+def installer(conn):
+    """Colonnes de statut de conversion sur `evenements` (idempotent)."""
+    colonnes = [r[1] for r in conn.execute("PRAGMA table_info(evenements)").fetchall()]
+    for colonne in ("conversion_statut", "conversion_message"):
+        if colonne not in colonnes:
+            conn.execute(f"ALTER TABLE evenements ADD COLUMN {colonne} TEXT")
+    conn.commit()
+
+
+def a_convertir(nom_fichier):
+    return os.path.splitext(nom_fichier or "")[1].lower() in EXTENSIONS
+
+
+# ============================
+# Fichiers du job
+# ============================
+def _chemin(evenement_id, suffixe):
+    return os.path.join(JOBS_DIR, f"conversion_evenement_{int(evenement_id)}.{suffixe}")
+
+
+def _ecrire_json(chemin, donnees):
+    tmp = f"{chemin}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(donnees, f, ensure_ascii=False)
+    os.replace(tmp, chemin)
+
+
+def _lire_job(evenement_id):
+    try:
+        with open(_chemin(evenement_id, "json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _connexion(db_path):
+    import db_pool
+    return db_pool.get_connection(db_path)
+
+
+def _statut(db_path, evenement_id, statut, message=None):
+    conn = _connexion(db_path)
+    try:
+        conn.execute(
+            "UPDATE evenements SET conversion_statut = ?, conversion_message = ? WHERE id = ?",
+            (statut, message, evenement_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ============================
+# API appelée par les routes
+# ============================
+def creer_job(db_path, evenement_id, source_abs, fichier_web):
+    """
+    Met en file la conversion du fichier d'un événement (remplace un job
+    précédent du même événement) et la lance dans ce worker.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    _ecrire_json(_chemin(evenement_id, "json"), {
+        "jeton": str(uuid.uuid4()),
+        "db_path": db_path,
+        "evenement_id": int(evenement_id),
+        "source": source_abs,
+        "fichier_web": fichier_web,
+        "debut": datetime.now().isoformat(timespec="seconds"),
+    })
+    _statut(db_path, evenement_id, "en_attente", "Conversion en attente")
+    lancer(evenement_id)
+
+
+def annuler(evenement_id, jeton=None):
+    """
+    Abandonne le job (événement supprimé) : il s'arrête au prochain lot.
+    Avec `jeton`, seulement si c'est toujours ce job (pas un remplaçant).
+    """
+    if jeton is not None and not _job_courant(evenement_id, jeton):
+        return
+    try:
+        os.remove(_chemin(evenement_id, "json"))
+    except FileNotFoundError:
+        pass
+
+
+def lancer(evenement_id):
+    """Soumet le job au pool de ce worker, sauf s'il tourne déjà quelque part."""
+    global _pool
+    evenement_id = int(evenement_id)
+    with _lock:
+        if evenement_id in _jobs_locaux:
+            return False
+        if not os.path.exists(_chemin(evenement_id, "json")):
+            return False
+
+        verrou = open(_chemin(evenement_id, "lock"), "a")
+        try:
+            fcntl.flock(verrou, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            verrou.close()
+            return False  # un autre worker l'exécute
+
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=NB_CONVERSIONS, thread_name_prefix="ba38-conversion")
+        _jobs_locaux.add(evenement_id)
+        _pool.submit(_executer, evenement_id, verrou)
+        return True
+
+
+def etats(conn):
+    """
+    {id: {statut, message}} des événements dont la conversion est en cours
+    ou a échoué ; les jobs actifs abandonnés par un worker sont relancés ici.
+    """
+    try:
+        rows = conn.execute("""
+            SELECT id, conversion_statut, conversion_message FROM evenements
+            WHERE conversion_statut IS NOT NULL AND conversion_statut != 'termine'
+        """).fetchall()
+    except Exception:
+        return {}
+    resultat = {}
+    for r in rows:
+        statut, message = r[1], r[2]
+        if statut in STATUTS_ACTIFS and not lancer(r[0]) and _lire_job(r[0]) is None:
+            # Description du job perdue (JOBS_DIR vidé au redémarrage)
+            statut, message = "erreur", "Conversion interrompue : renvoyer le fichier"
+            conn.execute(
+                "UPDATE evenements SET conversion_statut = ?, conversion_message = ? WHERE id = ?",
+                (statut, message, r[0]),
+            )
+            conn.commit()
+        resultat[r[0]] = {"statut": statut, "message": message}
+    return resultat
+
+
+# ============================
+# PPTX → PDF
+# ============================
+def _port_ouvert(port):
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def _unoserver_pret():
+    """Écouteur unoserver en marche (démarré si besoin) ; False si non installé."""
+    global _unoserver
+    if not (shutil.which("unoserver") and shutil.which("unoconvert")):
+        return False
+    with _lock_unoserver:
+        if _port_ouvert(PORT_UNOSERVER):
+            return True  # lancé par ce worker ou un autre
+        if _unoserver is None or _unoserver.poll() is not None:
+            logger.info(f"🚀 Démarrage de l'écouteur LibreOffice (unoserver, port {PORT_UNOSERVER})")
+            _unoserver = subprocess.Popen(
+                ["unoserver", "--interface", "127.0.0.1", "--port", str(PORT_UNOSERVER)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+            )
+        fin = time.monotonic() + 30
+        while time.monotonic() < fin:
+            if _port_ouvert(PORT_UNOSERVER):
+                return True
+            time.sleep(0.5)
+    logger.warning("⚠️ unoserver ne répond pas : conversion par soffice")
+    return False
+
+
+def _profil_soffice():
+    # Un profil par thread : deux soffice ne peuvent pas partager le même
+    if not hasattr(_profils, "dossier"):
+        _profils.dossier = os.path.join(
+            JOBS_DIR, f"libreoffice_profil_{os.getpid()}_{threading.get_ident()}"
+        )
+    return _profils.dossier
+
+
+def convertir_pptx_en_pdf(pptx_abs):
+    """Chemin du PDF produit à côté du PPTX ; None en cas d'échec."""
+    pdf_abs = os.path.splitext(pptx_abs)[0] + ".pdf"
+    if _unoserver_pret():
+        cmd = ["unoconvert", "--host", "127.0.0.1", "--port", str(PORT_UNOSERVER),
+               "--convert-to", "pdf", pptx_abs, pdf_abs]
+    else:
+        binaire = shutil.which("soffice") or shutil.which("libreoffice")
+        if not binaire:
+            raise RuntimeError("LibreOffice indisponible — conversion PPTX->PDF impossible")
+        cmd = [binaire, f"-env:UserInstallation=file://{_profil_soffice()}",
+               "--headless", "--norestore", "--convert-to", "pdf",
+               "--outdir", os.path.dirname(pptx_abs), pptx_abs]
+
+    res = subprocess.run(cmd, capture_output=True, text=True, check=False, timeout=TIMEOUT_LIBREOFFICE_S)
+    if res.returncode != 0:
+        raise RuntimeError(f"LibreOffice retour {res.returncode} : {res.stderr or res.stdout}")
+    if not os.path.exists(pdf_abs):
+        raise RuntimeError("PDF attendu non trouvé après conversion")
+    return pdf_abs
+
+
+# ============================
+# Exécution
+# ============================
+def _job_courant(evenement_id, jeton):
+    job = _lire_job(evenement_id)
+    return job is not None and job["jeton"] == jeton
+
+
+def _executer(evenement_id, verrou):
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    from utils import write_log
+
+    job = _lire_job(evenement_id)
+    try:
+        if job is None:
+            return
+        db_path, jeton = job["db_path"], job["jeton"]
+        source, fichier_web = job["source"], job["fichier_web"]
+        web_dir = fichier_web.rsplit("/", 1)[0]
+
+        def enregistrer(fichier, diapos, message):
+            """Diapos de l'événement, si son fichier n'a pas changé entre-temps."""
+            conn = _connexion(db_path)
+            try:
+                cur = conn.execute(
+                    "UPDATE evenements SET fichier_path = ?, diapos = ?, conversion_message = ? "
+                    "WHERE id = ? AND fichier_path = ?",
+                    (fichier, json.dumps(diapos, ensure_ascii=False), message, evenement_id, fichier_web),
+                )
+                conn.commit()
+                return cur.rowcount > 0
+            finally:
+                conn.close()
+
+        _statut(db_path, evenement_id, "en_cours", "Conversion en cours")
+        debut = time.monotonic()
+
+        pdf_abs = source
+        if source.lower().endswith(".pptx"):
+            write_log(f"📑 Conversion PPTX -> PDF : {source}")
+            pdf_abs = convertir_pptx_en_pdf(source)
+        pdf_web = f"{web_dir}/{os.path.basename(pdf_abs)}"
+
+        total = int(pdfinfo_from_path(pdf_abs)["Pages"])
+        base = os.path.splitext(os.path.basename(pdf_abs))[0]
+        dossier = os.path.dirname(pdf_abs)
+        diapos = []
+        for premiere in range(1, total + 1, PAGES_PAR_LOT):
+            if not _job_courant(evenement_id, jeton):
+                write_log(f"⏹️ Conversion événement {evenement_id} abandonnée (remplacée ou supprimée)")
+                return
+            derniere = min(premiere + PAGES_PAR_LOT - 1, total)
+            images = convert_from_path(
+                pdf_abs, dpi=DPI, first_page=premiere, last_page=derniere,
+                thread_count=NB_THREADS_RENDU,
+            )
+            for i, img in enumerate(images, start=premiere):
+                nom = f"{base}_page_{i}.jpg"
+                img.save(os.path.join(dossier, nom), "JPEG")
+                diapos.append(f"{web_dir}/{nom}")
+            if not enregistrer(fichier_web, diapos, f"{len(diapos)}/{total} page(s) converties"):
+                write_log(f"⏹️ Conversion événement {evenement_id} abandonnée (fichier modifié)")
+                return
+
+        # PPTX : l'événement pointe désormais sur le PDF
+        if not _job_courant(evenement_id, jeton) or not enregistrer(pdf_web, diapos, None):
+            return
+        _statut(db_path, evenement_id, "termine")
+        write_log(f"✅ Événement {evenement_id} : {total} page(s) converties en {time.monotonic() - debut:.1f} s")
+        annuler(evenement_id, jeton)
+
+    except Exception as e:
+        logger.exception(f"❌ Conversion événement {evenement_id}")
+        if job is not None and _job_courant(evenement_id, job["jeton"]):
+            _statut(job["db_path"], evenement_id, "erreur", str(e)[:500])
+            annuler(evenement_id, job["jeton"])
+
+    finally:
+        fcntl.flock(verrou, fcntl.LOCK_UN)
+        verrou.close()
+        with _lock:
+            _jobs_locaux.discard(evenement_id)
+        # Fichier remplacé pendant ce job : creer_job() n'a pas pu lancer le
+        # remplaçant (job déjà dans _jobs_locaux), on le soumet maintenant
+        suivant = _lire_job(evenement_id)
+        if suivant is not None and (job is None or suivant["jeton"] != job["jeton"]):
+            lancer(evenement_id)
@@ -0,0 +1,363 @@
+"""
+Génération des factures PDF de cotisation en tâche de fond : rendu en pool de
+processus, envoi sur Drive, reprise sur point de contrôle (`*.etat.json`).
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+
+logger = logging.getLogger("BA38")
+
+
+# ============================
+# Paramètres (surchargeables via .env)
+# ============================
+NB_PROCESS = int(os.getenv("COTISATIONS_PDF_PROCESS", str(min(4, os.cpu_count() or 1))))
+NB_UPLOADS = int(os.getenv("COTISATIONS_UPLOAD_WORKERS", "4"))
+MAX_ESSAIS_UPLOAD = 3
+INTERVALLE_CHECKPOINT_S = 2.0
+
+JOBS_DIR = os.getenv("COTISATIONS_JOBS_DIR") or os.path.join(tempfile.gettempdir(), "ba38_jobs")
+
+STATUTS_ACTIFS = ("en_attente", "nettoyage", "en_cours")
+
+_lock = threading.Lock()
+_jobs_locaux = {}
+
+
+# ============================
+# Fichiers du job
+# ============================
+def _chemin(job_id, suffixe):
+    # job_id vient de la session ou de l'URL : on n'accepte qu'un uuid
+    job_id = str(uuid.UUID(str(job_id)))
+    return os.path.join(JOBS_DIR, f"cotisations_pdf_{job_id}.{suffixe}")
+
+
+def _ecrire_json(chemin, donnees):
+    tmp = f"{chemin}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(donnees, f, ensure_ascii=False)
+    os.replace(tmp, chemin)
+
+
+def _lire_json(chemin):
+    with open(chemin, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _maintenant():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# ============================
+# API appelée par les routes
+# ============================
+def creer_job(annee, lignes, root_path):
+    """
+    Enregistre un job (données + point de reprise) et le lance dans ce worker.
+    `root_path` : racine de l'application Flask (logo des factures).
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    job_id = str(uuid.uuid4())
+
+    lignes = [
+        l for l in lignes
+        if "code_vif_facture" in l and "nom_association" in l
+    ]
+
+    _ecrire_json(_chemin(job_id, "json"), {
+        "annee": annee,
+        "lignes": lignes,
+        "root_path": root_path,
+        "base_drive": f"COTISATIONS/Cotisations {annee}/Factures PDF",
+    })
+    _ecrire_json(_chemin(job_id, "etat.json"), {
+        "statut": "en_attente",
+        "total": len(lignes),
+        "faites": [],
+        "erreurs": {},
+        "nettoye": False,
+        "reprises": 0,
+        "debut": _maintenant(),
+        "fin": None,
+        "message": None,
+    })
+
+    lancer(job_id)
+    return job_id
+
+
+def etat(job_id):
+    """
+    Progression publique du job (sans les données).
+    Un job actif dont plus aucun worker ne s'occupe est relancé ici.
+    """
+    try:
+        e = _lire_json(_chemin(job_id, "etat.json"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if e["statut"] in STATUTS_ACTIFS:
+        lancer(job_id)
+
+    faites = len(e["faites"])
+    total = e["total"]
+    return {
+        "job_id": job_id,
+        "statut": e["statut"],
+        "total": total,
+        "faites": faites,
+        "erreurs": len(e["erreurs"]),
+        "details_erreurs": e["erreurs"],
+        "pourcentage": int(100 * (faites + len(e["erreurs"])) / total) if total else 100,
+        "debut": e["debut"],
+        "fin": e["fin"],
+        "message": e.get("message"),
+    }
+
+
+def lancer(job_id):
+    """Démarre le job dans un thread de ce worker, sauf s'il tourne déjà quelque part."""
+    with _lock:
+        thread = _jobs_locaux.get(job_id)
+        if thread and thread.is_alive():
+            return False
+
+        verrou = open(_chemin(job_id, "lock"), "a")
+        try:
+            fcntl.flock(verrou, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            verrou.close()
+            return False  # un autre worker l'exécute
+
+        thread = threading.Thread(
+            target=_executer, args=(job_id, verrou),
+            name=f"ba38-cotisations-{job_id[:8]}", daemon=True,
+        )
+        _jobs_locaux[job_id] = thread
+        thread.start()
+        return True
+
+
+# ============================
+# Rendu (processus du pool)
+# ============================
+def _nom_pdf(ligne):
+    from utils import slugify_filename
+
+    return f"FACTURE_{ligne['code_vif_facture']}_{slugify_filename(ligne['nom_association'])}.pdf"
+
+
+def _rendre_facture(ligne, annee, dossier, root_path):
+    """Exécuté dans un processus du pool : retourne (code_vif, chemin du PDF)."""
+    from ba38_traitements import generer_facture_pdf
+
+    chemin = os.path.join(dossier, _nom_pdf(ligne))
+    generer_facture_pdf({**ligne, "annee": annee}, chemin, root_path=root_path)
+    return ligne["code_vif_facture"], chemin
+
+
+# ============================
+# Envoi Drive (threads du pool)
+# ============================
+def _service_drive():
+    """Un client Drive par thread (les clients googleapiclient ne sont pas thread-safe)."""
+    import google_clients
+
+    return google_clients.drive()
+
+
+def _envoyer(chemin, folder_id):
+    import drive_cache
+    from googleapiclient.http import MediaFileUpload
+
+    nom = os.path.basename(chemin)
+    for essai in range(MAX_ESSAIS_UPLOAD):
+        try:
+            _service_drive().files().create(
+                body={"name": nom, "parents": [folder_id]},
+                media_body=MediaFileUpload(chemin, mimetype="application/pdf"),
+                supportsAllDrives=True,
+                fields="id",
+            ).execute()
+            return
+        except Exception as e:
+            # 404 : dossier en cache supprimé dans Drive, inutile de réessayer
+            if drive_cache.erreur_envoi(folder_id, e) or essai + 1 == MAX_ESSAIS_UPLOAD:
+                raise
+            time.sleep(2 ** essai)
+
+
+def _noms_existants(service, folder_id):
+    """Fichiers déjà présents dans le dossier (reprise : pas de doublons)."""
+    noms, page_token = set(), None
+    while True:
+        reponse = service.files().list(
+            q=f"'{folder_id}' in parents and trashed=false",
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True,
+            fields="nextPageToken, files(name)",
+            pageSize=1000,
+            pageToken=page_token,
+        ).execute()
+        noms.update(f["name"] for f in reponse.get("files", []))
+        page_token = reponse.get("nextPageToken")
+        if not page_token:
+            return noms
+
+
+# ============================
+# Exécution
+# ============================
+class _Checkpoint:
+    """État du job, écrit sur disque au plus toutes les INTERVALLE_CHECKPOINT_S secondes."""
+
+    def __init__(self, job_id):
+        self.chemin = _chemin(job_id, "etat.json")
+        self.etat = _lire_json(self.chemin)
+        self._lock = threading.Lock()
+        self._derniere_ecriture = 0.0
+
+    def maj(self, forcer=False, **champs):
+        with self._lock:
+            self.etat.update(champs)
+            self._sauver(forcer)
+
+    def facture_faite(self, code):
+        with self._lock:
+            if code not in self.etat["faites"]:
+                self.etat["faites"].append(code)
+            self.etat["erreurs"].pop(code, None)
+            self._sauver(False)
+
+    def facture_en_erreur(self, code, message):
+        with self._lock:
+            self.etat["erreurs"][code] = message
+            self._sauver(False)
+
+    def _sauver(self, forcer):
+        maintenant = time.monotonic()
+        if forcer or maintenant - self._derniere_ecriture >= INTERVALLE_CHECKPOINT_S:
+            _ecrire_json(self.chemin, self.etat)
+            self._derniere_ecriture = maintenant
+
+
+def _executer(job_id, verrou):
+    from utils import get_or_create_drive_folder, write_log
+
+    dossier_tmp = tempfile.mkdtemp(prefix="cotisations_pdf_")
+    checkpoint = _Checkpoint(job_id)
+    try:
+        job = _lire_json(_chemin(job_id, "json"))
+        annee, base_drive = job["annee"], job["base_drive"]
+        reprise = checkpoint.etat["nettoye"]
+        if reprise:
+            checkpoint.maj(forcer=True, reprises=checkpoint.etat["reprises"] + 1)
+            write_log(f"🔁 Reprise du job cotisations {job_id} ({len(checkpoint.etat['faites'])} factures déjà déposées)")
+
+        # 1) Dossier Drive : vidé au premier lancement, résolu une seule fois
+        if not reprise:
+            from ba38_traitements import delete_drive_folder_contents
+
+            checkpoint.maj(forcer=True, statut="nettoyage")
+            # Dossier pas entièrement vidé : on réessaie, puis on abandonne plutôt
+            # que de déposer des doublons à côté des anciennes factures
+            for essai in range(MAX_ESSAIS_UPLOAD):
+                if delete_drive_folder_contents(drive_path=base_drive, timeout=60):
+                    break
+                if essai + 1 == MAX_ESSAIS_UPLOAD:
+                    raise RuntimeError(f"Dossier Drive non vidé : {base_drive}")
+                time.sleep(2 ** essai)
+            checkpoint.maj(forcer=True, nettoye=True)
+
+        shared_drive_id = os.getenv("BA380_SHARED_DRIVE_ID")
+        if not shared_drive_id:
+            raise RuntimeError("BA380_SHARED_DRIVE_ID non défini dans l'environnement")
+        folder_id = get_or_create_drive_folder(_service_drive(), base_drive, shared_drive_id)
+
+        # 2) Factures restantes
+        faites = set(checkpoint.etat["faites"])
+        a_faire = [l for l in job["lignes"] if l["code_vif_facture"] not in faites]
+        if reprise and a_faire:
+            deja_sur_drive = _noms_existants(_service_drive(), folder_id)
+            for l in [l for l in a_faire if _nom_pdf(l) in deja_sur_drive]:
+                checkpoint.facture_faite(l["code_vif_facture"])
+                a_faire.remove(l)
+
+        checkpoint.maj(forcer=True, statut="en_cours")
+        write_log(f"📄 Job cotisations {job_id} : {len(a_faire)} factures à générer")
+
+        # 3) Rendu parallèle → envoi borné
+        envois_en_cours = threading.BoundedSemaphore(2 * NB_UPLOADS)
+
+        def fin_envoi(code, chemin):
+            def callback(fut):
+                envois_en_cours.release()
+                try:
+                    fut.result()
+                    checkpoint.facture_faite(code)
+                except Exception as e:
+                    checkpoint.facture_en_erreur(code, f"Envoi Drive : {e}")
+                    logger.warning(f"❌ Envoi facture {code} : {e}")
+                finally:
+                    if os.path.exists(chemin):
+                        os.remove(chemin)
+            return callback
+
+        # spawn : pas de fork d'un worker gunicorn multi-thread
+        contexte_mp = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=NB_PROCESS, mp_context=contexte_mp) as rendu, \
+                ThreadPoolExecutor(max_workers=NB_UPLOADS, thread_name_prefix="ba38-upload") as envoi:
+
+            rendus = {
+                rendu.submit(_rendre_facture, l, annee, dossier_tmp, job["root_path"]): l["code_vif_facture"]
+                for l in a_faire
+            }
+            for fut in as_completed(rendus):
+                code = rendus[fut]
+                try:
+                    code, chemin = fut.result()
+                except Exception as e:
+                    checkpoint.facture_en_erreur(code, f"Rendu PDF : {e}")
+                    logger.warning(f"❌ Rendu facture {code} : {e}")
+                    continue
+
+                envois_en_cours.acquire()
+                envoi.submit(_envoyer, chemin, folder_id).add_done_callback(fin_envoi(code, chemin))
+
+        # Liste du dossier en cache : périmée par les envois
+        import drive_cache
+        drive_cache.invalider_liste(folder_id)
+
+        nb_erreurs = len(checkpoint.etat["erreurs"])
+        checkpoint.maj(
+            forcer=True,
+            statut="termine",
+            fin=_maintenant(),
+            message=f"{len(checkpoint.etat['faites'])} factures déposées"
+            + (f", {nb_erreurs} en erreur" if nb_erreurs else ""),
+        )
+        write_log(f"✅ Job cotisations {job_id} terminé ({checkpoint.etat['message']})")
+
+    except Exception as e:
+        logger.exception(f"❌ Job cotisations {job_id}")
+        checkpoint.maj(forcer=True, statut="erreur", fin=_maintenant(), message=str(e))
+
+    finally:
+        shutil.rmtree(dossier_tmp, ignore_errors=True)
+        fcntl.flock(verrou, fcntl.LOCK_UN)
+        verrou.close()
+        with _lock:
+            _jobs_locaux.pop(job_id, None)
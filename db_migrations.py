@@ -0,0 +1,262 @@
+"""
+Migrations d'index versionnées de la base SQLite et requêtes chaudes passées
+à EXPLAIN QUERY PLAN par `scripts/index_advisor.py`.
+"""
+
+import os
+import sqlite3
+import logging
+from datetime import datetime
+
+
+logger = logging.getLogger("BA38")
+
+TABLES_PLANNINGS = [
+    "plannings_ramasse",
+    "plannings_distribution",
+    "plannings_pal",
+    "plannings_pesee",
+    "plannings_vif",
+]
+
+
+def _migrer_absences(conn):
+    # Colonnes ISO + index de chevauchement (voir ba38_planning_utils)
+    from ba38_planning_utils import migrer_absences_iso
+    migrer_absences_iso(conn)
+
+
+def _installer_heures_benevoles(conn):
+    # Table de faits du rapport d'activité + triggers (voir heures_benevoles)
+    import heures_benevoles
+    heures_benevoles.installer_et_remplir(conn)
+
+
+def _installer_version_apercus(conn):
+    # Version des données lues par les aperçus de planning (voir apercu_cache)
+    import apercu_cache
+    apercu_cache.installer_triggers(conn)
+
+
+def _installer_recherche(table):
+    # Index plein texte FTS5 + triggers de synchronisation (voir recherche_fts)
+    def etape(conn):
+        import recherche_fts
+        recherche_fts.installer(conn, table)
+    return etape
+
+
+def _installer_affichage_evenements(conn):
+    # Diapos stockées + version du document de l'écran public (voir evenements_affichage)
+    import evenements_affichage
+    evenements_affichage.installer(conn)
+
+
+def _installer_conversions_evenements(conn):
+    # Statut des conversions PDF / PPTX en tâche de fond (voir conversions_evenements)
+    import conversions_evenements
+    conversions_evenements.installer(conn)
+
+
+# ============================
+# Migrations (ne jamais renuméroter : on ajoute à la fin)
+# ============================
+MIGRATIONS = [
+    (1, "Index des requêtes chaudes", [
+        *[
+            (table, f"CREATE INDEX IF NOT EXISTS idx_{table}_annee_semaine ON {table} (annee, semaine)")
+            for table in TABLES_PLANNINGS
+        ],
+        ("tournees_fournisseurs",
+         "CREATE INDEX IF NOT EXISTS idx_tournees_fournisseurs_tournee ON tournees_fournisseurs (tournee_id, ordre)"),
+        ("field_groups",
+         "CREATE INDEX IF NOT EXISTS idx_field_groups_appli_ordre ON field_groups (appli, display_order)"),
+        ("parametres",
+         "CREATE INDEX IF NOT EXISTS idx_parametres_nom ON parametres (param_name)"),
+        ("roles_utilisateurs",
+         "CREATE INDEX IF NOT EXISTS idx_roles_utilisateurs_email ON roles_utilisateurs (user_email, appli)"),
+        # get_user_roles() compare LOWER(user_email) : index sur expression
+        ("roles_utilisateurs",
+         "CREATE INDEX IF NOT EXISTS idx_roles_utilisateurs_email_lower ON roles_utilisateurs (LOWER(user_email))"),
+        ("log_connexions",
+         "CREATE INDEX IF NOT EXISTS idx_log_connexions_email_env_ts ON log_connexions (email, environ, timestamp)"),
+        ("photos_benevoles",
+         "CREATE INDEX IF NOT EXISTS idx_photos_benevoles_benevole ON photos_benevoles (benevole_id)"),
+    ]),
+    (2, "Absences : colonnes ISO indexées", [
+        ("absences", _migrer_absences),
+    ]),
+    (3, "Présence : index last_seen", [
+        ("log_connexions",
+         "CREATE INDEX IF NOT EXISTS idx_log_connexions_last_seen ON log_connexions (last_seen)"),
+    ]),
+    (4, "Compteur de version du cache de configuration", [
+        ("parametres",
+         "CREATE TABLE IF NOT EXISTS cache_versions (nom TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"),
+    ]),
+    (5, "Table de faits heures_benevoles", [
+        ("plannings_ramasse", _installer_heures_benevoles),
+    ]),
+    (6, "Version des données des aperçus de planning", [
+        ("plannings_ramasse", _installer_version_apercus),
+    ]),
+    (7, "Index plein texte (FTS5) associations / bénévoles / fournisseurs / contacts", [
+        (table, _installer_recherche(table))
+        for table in ("associations", "benevoles", "fournisseurs", "fournisseurs_contacts")
+    ]),
+    (8, "Événements : diapos stockées et version de l'écran d'affichage", [
+        ("evenements", _installer_affichage_evenements),
+    ]),
+    (9, "Événements : statut des conversions en tâche de fond", [
+        ("evenements", _installer_conversions_evenements),
+    ]),
+    (10, "heures_benevoles : triggers insert / delete sur tournees_fournisseurs", [
+        ("plannings_ramasse", _installer_heures_benevoles),
+    ]),
+    (11, "Aperçus de planning : versions par semaine et par type", [
+        ("plannings_ramasse", _installer_version_apercus),
+    ]),
+]
+
+
+# ============================
+# Catalogue des requêtes réelles (pour l'advisor)
+# ============================
+REQUETES_CHAUDES = [
+    *[
+        (f"{table} de la semaine", f"SELECT * FROM {table} WHERE annee = ? AND semaine = ?", (2025, 1))
+        for table in TABLES_PLANNINGS
+    ],
+    ("Fournisseurs d'une tournée",
+     "SELECT f.nom FROM tournees_fournisseurs tf JOIN fournisseurs f ON f.id = tf.fournisseur_id "
+     "WHERE tf.tournee_id = ? ORDER BY tf.ordre", (1,)),
+    ("Champs d'une appli",
+     "SELECT * FROM field_groups WHERE appli = ? ORDER BY display_order", ("benevoles",)),
+    ("Paramètre",
+     "SELECT param_value FROM parametres WHERE param_name = ?", ("travail_vendredi",)),
+    ("Rôles d'un utilisateur (connexion)",
+     "SELECT appli, droit FROM roles_utilisateurs WHERE LOWER(user_email)=LOWER(?)", ("a@b.fr",)),
+    ("Rôles d'un utilisateur (admin)",
+     "SELECT 1 FROM roles_utilisateurs WHERE user_email = ? AND appli = ?", ("a@b.fr", "benevoles")),
+    ("Dernière connexion (last_seen)",
+     "SELECT id FROM log_connexions WHERE email = ? AND environ = ? ORDER BY timestamp DESC LIMIT 1",
+     ("a@b.fr", "prod")),
+    ("Utilisateurs actifs (presence)",
+     "SELECT email, environ, MAX(last_seen) FROM log_connexions WHERE last_seen >= ? GROUP BY email, environ",
+     ("2025-01-01T00:00:00",)),
+    ("Photo d'un bénévole",
+     "SELECT filename FROM photos_benevoles WHERE benevole_id = ?", (1,)),
+    ("Heures par type de planning (rapport)",
+     "SELECT type_planning, SUM(minutes) FROM heures_benevoles WHERE date_jour BETWEEN ? AND ? GROUP BY type_planning",
+     ("2025-01-01", "2025-12-31")),
+    ("Absences d'une semaine",
+     "SELECT benevole_id, debut_iso, fin_iso FROM absences WHERE fin_iso >= ? AND debut_iso <= ?",
+     ("2025-01-06", "2025-01-10")),
+]
+
+
+def _table_existe(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone() is not None
+
+
+def _versions_appliquees(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    """)
+    return {r[0] for r in conn.execute("SELECT version FROM schema_migrations").fetchall()}
+
+
+def appliquer_migrations(conn):
+    """
+    Applique les migrations manquantes sur une connexion ouverte.
+    Retourne la liste des versions nouvellement enregistrées.
+    """
+    faites = _versions_appliquees(conn)
+    nouvelles = []
+
+    for version, description, etapes in MIGRATIONS:
+        if version in faites:
+            continue
+
+        complete = True
+        for table, etape in etapes:
+            if not _table_existe(conn, table):
+                complete = False
+                continue
+            try:
+                if callable(etape):
+                    etape(conn)
+                else:
+                    conn.execute(etape)
+            except sqlite3.Error as e:
+                complete = False
+                logger.warning(f"⚠️ Migration {version} ({table}) : {e}")
+
+        if complete:
+            conn.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().isoformat(timespec="seconds")),
+            )
+            nouvelles.append(version)
+        conn.commit()
+
+    if nouvelles:
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    return nouvelles
+
+
+def bases_de_l_environnement():
+    """Bases SQLite (principale + test) de l'environnement courant."""
+    env = os.getenv("ENVIRONMENT", "prod").lower()
+    base_dir = os.getenv("BA38_BASE_DIR")
+    if not base_dir:
+        return []
+
+    suffixe = "DEV" if env == "dev" else "PROD"
+    noms = [os.getenv(f"SQLITE_DB_{suffixe}"), os.getenv(f"SQLITE_DB_{suffixe}_TEST")]
+    chemins = [os.path.join(base_dir, n) for n in noms if n]
+    return [c for c in chemins if os.path.exists(c)]
+
+
+def appliquer_migrations_env():
+    """Démarrage : migre les bases de l'environnement sans jamais bloquer l'app."""
+    for db_path in bases_de_l_environnement():
+        try:
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                nouvelles = appliquer_migrations(conn)
+            finally:
+                conn.close()
+            if nouvelles:
+                logger.info(f"🗂️ Migrations appliquées sur {os.path.basename(db_path)} : {nouvelles}")
+        except Exception as e:
+            logger.warning(f"⚠️ Migrations impossibles sur {db_path} : {e}")
+
+
+def analyser_requetes(conn, requetes=None):
+    """
+    EXPLAIN QUERY PLAN sur le catalogue de requêtes.
+    Retourne une liste de dicts {nom, plan, scans, erreur}, où `scans`
+    liste les parcours complets de table (SCAN sans index).
+    """
+    resultats = []
+    for nom, sql, params in (requetes or REQUETES_CHAUDES):
+        try:
+            plan = [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        except sqlite3.Error as e:
+            resultats.append({"nom": nom, "plan": [], "scans": [], "erreur": str(e)})
+            continue
+        scans = [
+            ligne for ligne in plan
+            if ligne.startswith("SCAN ") and "INDEX" not in ligne
+        ]
+        resultats.append({"nom": nom, "plan": plan, "scans": scans, "erreur": None})
+    return resultats
@@ -0,0 +1,191 @@
+"""
+Pool de connexions SQLite : une connexion partagée par requête Flask et par base.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+
+from flask import g, has_app_context
+
+
+logger = logging.getLogger("BA38")
+
+
+# ============================
+# Paramètres (surchargeables via .env)
+# ============================
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16000"))
+
+_G_KEY = "_ba38_db_connections"
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Connexion SQLite partagée par une requête : chaque `get_connection()` est
+    un emprunt, chaque `close()` le rend. Quand le dernier emprunt est rendu,
+    une écriture non validée est annulée, comme avec une connexion dédiée
+    fermée sans commit. La vraie fermeture / restitution est faite par
+    `release_request_connections()`.
+    """
+
+    _in_request = False
+    _emprunts = 0
+
+    def close(self):
+        if not self._in_request:
+            super().close()
+            return
+        self._emprunts = max(self._emprunts - 1, 0)
+        if self._emprunts == 0 and self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        self._in_request = False
+        self._emprunts = 0
+        super().close()
+
+
+class _ConnectionPool:
+    """Pool de connexions inactives, par chemin de base, propre au process."""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._wal_done = set()
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        # Après un fork (gunicorn --preload), on repart d'un pool vide :
+        # une connexion SQLite ne doit jamais traverser un fork.
+        if self._pid != os.getpid():
+            self._idle = {}
+            self._wal_done = set()
+            self._pid = os.getpid()
+
+    def _open(self, db_path):
+        conn = sqlite3.connect(
+            db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        configure_connection(conn)
+
+        if db_path not in self._wal_done:
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                self._wal_done.add(db_path)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Passage en WAL impossible pour {db_path} : {e}")
+
+        return conn
+
+    def acquire(self, db_path):
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.get(db_path)
+            conn = idle.pop() if idle else None
+
+        if conn is None:
+            conn = self._open(db_path)
+
+        conn.row_factory = sqlite3.Row
+        conn._in_request = True
+        return conn
+
+    def release(self, db_path, conn):
+        try:
+            # Une écriture jamais validée ne doit pas fuiter vers la requête suivante
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.really_close()
+            return
+
+        conn._in_request = False
+        conn._emprunts = 0
+        conn.row_factory = sqlite3.Row
+
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.setdefault(db_path, [])
+            if len(idle) < self.size:
+                idle.append(conn)
+                return
+
+        conn.really_close()
+
+    def stats(self):
+        with self._lock:
+            return {path: len(idle) for path, idle in self._idle.items()}
+
+
+_pool = _ConnectionPool(POOL_SIZE)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_pool._check_pid)
+
+
+def configure_connection(conn):
+    """Applique les PRAGMA de performance à une connexion neuve."""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def get_connection(db_path):
+    """
+    Retourne la connexion de la requête courante pour `db_path`.
+    Hors contexte Flask, retourne une connexion dédiée que l'appelant ferme.
+    """
+    if not has_app_context():
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        configure_connection(conn)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    connections = g.get(_G_KEY)
+    if connections is None:
+        connections = {}
+        setattr(g, _G_KEY, connections)
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = _pool.acquire(db_path)
+        connections[db_path] = conn
+    else:
+        # Chaque appelant repart avec le row_factory par défaut
+        conn.row_factory = sqlite3.Row
+
+    conn._emprunts += 1
+    return conn
+
+
+def release_request_connections(exc=None):
+    """Teardown : rend au pool les connexions empruntées par la requête."""
+    connections = g.pop(_G_KEY, None)
+    if not connections:
+        return
+    for db_path, conn in connections.items():
+        try:
+            _pool.release(db_path, conn)
+        except Exception as e:
+            logger.warning(f"⚠️ Erreur restitution connexion SQLite ({db_path}) : {e}")
+
+
+def pool_stats():
+    """Nombre de connexions inactives par base, pour ce worker."""
+    return _pool.stats()
+
+
+def init_app(app):
+    """Branche la restitution des connexions sur le teardown de l'application."""
+    app.teardown_appcontext(release_request_connections)
@@ -394,6 +394,20 @@ def debug_env():
 
 
 
+@debug_bp.route('/drive_replication_status')
+@login_required
+def drive_replication_status():
+    """
+    🔄 État de la réplication Drive de la base (worker courant).
+    """
+    if session.get("user_role") != "admin":
+        flash("⛔ Accès interdit.", "danger")
+        return redirect(url_for("index"))
+
+    from drive_replication import replication_status
+    return replication_status()
+
+
 @debug_bp.route('/check_drive_ids')
 def check_drive_ids():
     from google.oauth2 import service_account
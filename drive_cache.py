@@ -0,0 +1,216 @@
+"""
+Cache SQLite des métadonnées Google Drive (ID de dossiers par chemin, listes de
+fichiers), partagé par les workers ; jamais bloquant en cas d'erreur.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+
+
+logger = logging.getLogger("BA38")
+
+DOSSIERS_TTL_S = float(os.getenv("DRIVE_CACHE_DOSSIERS_TTL_S", str(7 * 24 * 3600)))
+LISTES_TTL_S = float(os.getenv("DRIVE_CACHE_LISTES_TTL_S", "300"))
+
+_lock = threading.Lock()
+_installes = set()
+_local = threading.local()
+
+
+# ============================
+# Stockage
+# ============================
+def _chemin_cache():
+    chemin = os.getenv("DRIVE_CACHE_PATH")
+    if chemin:
+        return chemin
+    base_dir = os.getenv("BA38_BASE_DIR") or tempfile.gettempdir()
+    return os.path.join(base_dir, "drive_cache.sqlite")
+
+
+def _installer(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dossiers (
+            drive_id TEXT NOT NULL,
+            chemin TEXT NOT NULL,
+            folder_id TEXT NOT NULL,
+            expire_le REAL NOT NULL,
+            PRIMARY KEY (drive_id, chemin)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dossiers_folder ON dossiers (folder_id)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS listes (
+            folder_id TEXT NOT NULL,
+            cle TEXT NOT NULL,
+            fichiers TEXT NOT NULL,
+            expire_le REAL NOT NULL,
+            PRIMARY KEY (folder_id, cle)
+        )
+    """)
+    conn.commit()
+
+
+def _connexion():
+    """Connexion au cache, une par thread (et par process) ; schéma installé une fois."""
+    chemin = _chemin_cache()
+    cache = getattr(_local, "connexions", None)
+    if cache is None or _local.pid != os.getpid():
+        cache = _local.connexions = {}
+        _local.pid = os.getpid()
+    conn = cache.get(chemin)
+    if conn is None:
+        conn = sqlite3.connect(chemin, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _lock:
+            a_installer = chemin not in _installes
+        if a_installer:
+            _installer(conn)
+            with _lock:
+                _installes.add(chemin)
+        cache[chemin] = conn
+    return conn
+
+
+def _executer(sql, params=(), lecture=False):
+    """Exécute une requête sur le cache ; None (lecture) ou rien en cas d'erreur."""
+    try:
+        conn = _connexion()
+        try:
+            cur = conn.execute(sql, params)
+            if lecture:
+                return cur.fetchall()
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Cache Drive indisponible : {e}")
+    return None
+
+
+def normaliser(chemin):
+    return "/".join(p for p in chemin.strip("/").split("/") if p)
+
+
+# ============================
+# Dossiers (chemin → ID)
+# ============================
+def prefixe_connu(drive_id, chemin):
+    """
+    Plus long préfixe du chemin dont l'ID est en cache.
+    Retourne (nombre de segments résolus, ID du dossier) ; (0, drive_id) si aucun.
+    """
+    parts = normaliser(chemin).split("/")
+    candidats = ["/".join(parts[:i]) for i in range(len(parts), 0, -1)]
+    lignes = _executer(
+        f"SELECT chemin, folder_id FROM dossiers WHERE drive_id = ? AND expire_le > ? "
+        f"AND chemin IN ({','.join('?' * len(candidats))})",
+        (drive_id, time.time(), *candidats),
+        lecture=True,
+    ) or []
+    connus = dict(lignes)
+    for chemin_candidat in candidats:
+        if chemin_candidat in connus:
+            return chemin_candidat.count("/") + 1, connus[chemin_candidat]
+    return 0, drive_id
+
+
+def memoriser_dossier(drive_id, chemin, folder_id):
+    _executer(
+        "INSERT OR REPLACE INTO dossiers (drive_id, chemin, folder_id, expire_le) VALUES (?, ?, ?, ?)",
+        (drive_id, normaliser(chemin), folder_id, time.time() + DOSSIERS_TTL_S),
+    )
+
+
+def oublier_dossier(folder_id):
+    """Dossier supprimé (ou introuvable) : son chemin, ses sous-chemins et sa liste."""
+    lignes = _executer(
+        "SELECT drive_id, chemin FROM dossiers WHERE folder_id = ?", (folder_id,), lecture=True
+    ) or []
+    for drive_id, chemin in lignes:
+        _executer(
+            "DELETE FROM dossiers WHERE drive_id = ? AND (chemin = ? OR chemin LIKE ? ESCAPE '\\')",
+            (drive_id, chemin, chemin.replace("%", r"\%").replace("_", r"\_") + "/%"),
+        )
+    invalider_liste(folder_id)
+
+
+def erreur_envoi(folder_id, erreur):
+    """
+    Échec d'un envoi vers `folder_id` : sur un 404, l'ID en cache est périmé
+    (dossier supprimé dans Drive), il est oublié. Retourne True dans ce cas.
+    """
+    if getattr(getattr(erreur, "resp", None), "status", None) == 404:
+        oublier_dossier(folder_id)
+        return True
+    return False
+
+
+# ============================
+# Listes de fichiers
+# ============================
+def liste(folder_id, cle, charger, rafraichir=False):
+    """
+    Fichiers du dossier `folder_id` pour la requête identifiée par `cle`
+    (ex. "txt") : lus dans le cache, sinon `charger()` (liste de dicts
+    sérialisables en JSON) puis mémorisés.
+    """
+    if not rafraichir:
+        lignes = _executer(
+            "SELECT fichiers FROM listes WHERE folder_id = ? AND cle = ? AND expire_le > ?",
+            (folder_id, cle, time.time()),
+            lecture=True,
+        )
+        if lignes:
+            return json.loads(lignes[0][0])
+
+    fichiers = charger()
+    _executer(
+        "INSERT OR REPLACE INTO listes (folder_id, cle, fichiers, expire_le) VALUES (?, ?, ?, ?)",
+        (folder_id, cle, json.dumps(fichiers), time.time() + LISTES_TTL_S),
+    )
+    return fichiers
+
+
+def invalider_liste(folder_id):
+    _executer("DELETE FROM listes WHERE folder_id = ?", (folder_id,))
+
+
+def fichier_supprime(file_id):
+    """Fichier ou dossier supprimé hors de tout dossier connu : listes qui le contiennent."""
+    fichiers_supprimes([file_id])
+
+
+def fichiers_supprimes(file_ids):
+    """Variante groupée (suppressions batch) : une seule connexion au cache."""
+    if not file_ids:
+        return
+    try:
+        conn = _connexion()
+        try:
+            for file_id in file_ids:
+                conn.execute("DELETE FROM listes WHERE instr(fichiers, ?) > 0", (json.dumps(file_id),))
+            ids = list(file_ids)
+            dossiers = []
+            for i in range(0, len(ids), 500):
+                paquet = ids[i:i + 500]
+                dossiers += conn.execute(
+                    f"SELECT folder_id FROM dossiers WHERE folder_id IN ({','.join('?' * len(paquet))})",
+                    paquet,
+                ).fetchall()
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Cache Drive indisponible : {e}")
+        return
+    for (folder_id,) in dossiers:
+        oublier_dossier(folder_id)
@@ -0,0 +1,188 @@
+"""
+Réplication différée (regroupée, avec relances) de la base SQLite vers Google Drive.
+"""
+
+import os
+import time
+import fcntl
+import atexit
+import random
+import sqlite3
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+
+logger = logging.getLogger("BA38")
+
+
+# ============================
+# Paramètres (surchargeables via .env)
+# ============================
+DEBOUNCE_S = float(os.getenv("DRIVE_SYNC_DEBOUNCE_S", "30"))
+MAX_DELAY_S = float(os.getenv("DRIVE_SYNC_MAX_DELAY_S", "300"))
+MAX_RETRIES = int(os.getenv("DRIVE_SYNC_MAX_RETRIES", "5"))
+BACKOFF_BASE_S = float(os.getenv("DRIVE_SYNC_BACKOFF_S", "2"))
+BACKOFF_MAX_S = float(os.getenv("DRIVE_SYNC_BACKOFF_MAX_S", "120"))
+
+
+def snapshot_database(db_path):
+    """
+    Copie cohérente de la base (WAL compris) dans un fichier temporaire,
+    via l'API de backup en ligne. Retourne le chemin du snapshot.
+    """
+    fd, snapshot_path = tempfile.mkstemp(prefix="ba38_snapshot_", suffix=".sqlite")
+    os.close(fd)
+
+    src = sqlite3.connect(db_path, timeout=30)
+    dst = sqlite3.connect(snapshot_path)
+    try:
+        src.backup(dst)
+        # Le fichier envoyé doit être autonome (pas de -wal à côté)
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+
+    return snapshot_path
+
+
+class DriveReplicator:
+    """File des bases à répliquer, vidée par un thread de fond."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._thread = None
+        self._pid = None
+        self.last_success = None
+        self.last_error = None
+        self.uploads = 0
+
+    # ----------------------------
+    # API appelée par les routes
+    # ----------------------------
+    def mark_dirty(self, db_path, file_id):
+        now = time.monotonic()
+        with self._cond:
+            entry = self._pending.get((db_path, file_id))
+            if entry is None:
+                self._pending[(db_path, file_id)] = {"first": now, "last": now, "writes": 1}
+            else:
+                entry["last"] = now
+                entry["writes"] += 1
+            self._ensure_thread()
+            self._cond.notify()
+
+    def status(self):
+        with self._cond:
+            return {
+                "queue_depth": sum(e["writes"] for e in self._pending.values()),
+                "pending_targets": len(self._pending),
+                "uploads": self.uploads,
+                "last_success": self.last_success,
+                "last_error": self.last_error,
+                "debounce_s": DEBOUNCE_S,
+                "worker_alive": bool(self._thread and self._thread.is_alive()),
+            }
+
+    def flush(self):
+        """Réplique immédiatement tout ce qui est en attente (arrêt du worker)."""
+        with self._cond:
+            targets = list(self._pending)
+            self._pending.clear()
+        for db_path, file_id in targets:
+            self._replicate(db_path, file_id, retries=1)
+
+    # ----------------------------
+    # Thread de fond
+    # ----------------------------
+    def _ensure_thread(self):
+        # Un thread par process : après un fork, l'ancien n'existe plus
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="ba38-drive-sync", daemon=True)
+        self._thread.start()
+
+    def _next_due(self, now):
+        """Retourne (cible échue ou None, délai avant la prochaine échéance)."""
+        wait = None
+        for target, entry in self._pending.items():
+            due = min(entry["last"] + DEBOUNCE_S, entry["first"] + MAX_DELAY_S)
+            if due <= now:
+                return target, 0
+            wait = due - now if wait is None else min(wait, due - now)
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    target, wait = self._next_due(time.monotonic())
+                    if target is not None:
+                        entry = self._pending.pop(target)
+                        break
+                    self._cond.wait(timeout=wait)
+
+            db_path, file_id = target
+            if not self._replicate(db_path, file_id, retries=MAX_RETRIES):
+                # Échec définitif : la base reste marquée modifiée
+                with self._cond:
+                    current = self._pending.setdefault(target, entry)
+                    if current is not entry:
+                        current["writes"] += entry["writes"]
+                    current["first"] = current["last"] = time.monotonic()
+
+    def _replicate(self, db_path, file_id, retries):
+        from utils import upload_database_file
+
+        for attempt in range(retries):
+            snapshot_path = None
+            try:
+                # Verrou commun à tous les workers : snapshot et envoi se suivent
+                # sans qu'un autre process n'intercale un snapshot plus ancien,
+                # le dernier envoi porte donc toujours l'état le plus récent.
+                with open(f"{db_path}.drive-sync.lock", "a") as verrou:
+                    fcntl.flock(verrou, fcntl.LOCK_EX)
+                    try:
+                        snapshot_path = snapshot_database(db_path)
+                        upload_database_file(snapshot_path, file_id)
+                    finally:
+                        fcntl.flock(verrou, fcntl.LOCK_UN)
+                with self._cond:
+                    self.uploads += 1
+                    self.last_success = datetime.now().isoformat(timespec="seconds")
+                return True
+            except Exception as e:
+                with self._cond:
+                    self.last_error = f"{datetime.now().isoformat(timespec='seconds')} {e}"
+                logger.warning(f"❌ Réplication Drive échouée (essai {attempt + 1}/{retries}) : {e}")
+                if attempt + 1 < retries:
+                    delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt))
+                    time.sleep(delay + random.uniform(0, delay / 2))
+            finally:
+                if snapshot_path and os.path.exists(snapshot_path):
+                    os.remove(snapshot_path)
+
+        return False
+
+
+_replicator = DriveReplicator()
+atexit.register(_replicator.flush)
+
+
+def mark_dirty(db_path, file_id):
+    """Marque la base comme modifiée : elle sera répliquée sur Drive."""
+    _replicator.mark_dirty(db_path, file_id)
+
+
+def replication_status():
+    """Profondeur de file, dernier succès / erreur pour ce worker."""
+    return _replicator.status()
+
+
+def flush():
+    """Force la réplication immédiate de ce qui est en attente."""
+    _replicator.flush()
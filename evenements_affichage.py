@@ -0,0 +1,99 @@
+"""
+Document des événements actifs servi à l'écran public, versionné par triggers
+et gardé en mémoire (ETag, 304 sans corps).
+"""
+
+import json
+import hashlib
+import sqlite3
+import logging
+import threading
+
+
+logger = logging.getLogger("BA38")
+
+NOM_VERSION = "evenements"
+
+_lock = threading.Lock()
+_documents = {}
+
+
+# ============================
+# Installation (migration 8)
+# ============================
+def _nom_trigger(operation):
+    return f"trg_version_evenements_{operation.lower()}"
+
+
+def installer(conn):
+    """Colonne `diapos` + triggers de version sur `evenements` (idempotent)."""
+    colonnes = [r[1] for r in conn.execute("PRAGMA table_info(evenements)").fetchall()]
+    if "diapos" not in colonnes:
+        conn.execute("ALTER TABLE evenements ADD COLUMN diapos TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            nom TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {_nom_trigger(operation)}
+            AFTER {operation} ON evenements
+            BEGIN
+                INSERT OR IGNORE INTO cache_versions (nom, version) VALUES ('{NOM_VERSION}', 0);
+                UPDATE cache_versions SET version = version + 1 WHERE nom = '{NOM_VERSION}';
+            END
+        """)
+    conn.commit()
+
+
+def version_donnees(conn):
+    try:
+        row = conn.execute(
+            "SELECT version FROM cache_versions WHERE nom = ?", (NOM_VERSION,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+# ============================
+# Diapos stockées
+# ============================
+def encoder_diapos(diapos):
+    return json.dumps(list(diapos or []), ensure_ascii=False)
+
+
+def decoder_diapos(valeur):
+    """Liste des diapos stockées ; None si pas encore calculées."""
+    if valeur is None:
+        return None
+    try:
+        diapos = json.loads(valeur)
+    except (TypeError, ValueError):
+        return None
+    return diapos if isinstance(diapos, list) else None
+
+
+# ============================
+# Document versionné
+# ============================
+def document(conn, db_path, maintenant, construire):
+    """
+    (corps JSON, ETag) des événements actifs à `maintenant`.
+    `construire(conn, maintenant)` renvoie la liste des événements ; elle
+    n'est appelée que si la version des données ou la minute a changé.
+    """
+    cle = (version_donnees(conn), maintenant)
+    with _lock:
+        memo = _documents.get(db_path)
+    if memo and memo["cle"] == cle:
+        return memo["corps"], memo["etag"]
+
+    donnees = construire(conn, maintenant)
+    corps = json.dumps(donnees, ensure_ascii=False, separators=(",", ":"), default=str)
+    etag = hashlib.sha1(corps.encode("utf-8")).hexdigest()
+    with _lock:
+        _documents[db_path] = {"cle": cle, "corps": corps, "etag": etag}
+    return corps, etag
@@ -0,0 +1,124 @@
+"""
+Moteur d'export en flux (CSV, Excel write-only) et aperçu limité, pour le
+générateur Excel et les extractions standards.
+"""
+
+import io
+import csv
+import sqlite3
+import tempfile
+
+from flask import Response
+
+
+TAILLE_PAQUET = 500
+TAILLE_BLOC = 64 * 1024
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MIME_CSV = "text/csv; charset=utf-8"
+
+
+# ============================
+# Aperçu
+# ============================
+def apercu(conn, query, params=(), limite=20):
+    """
+    Retourne (colonnes, lignes, total) : les `limite` premières lignes
+    de la requête et le nombre total de résultats.
+    """
+    cur = conn.execute(f"SELECT * FROM ({query}) LIMIT ?", (*params, limite))
+    colonnes = [d[0] for d in cur.description]
+    lignes = [tuple(r) for r in cur.fetchall()]
+    total = conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+    return colonnes, lignes, total
+
+
+# ============================
+# Lecture par paquets
+# ============================
+def _paquets(db_path, query, params):
+    """Génère l'en-tête puis les lignes par paquets, sur une connexion dédiée."""
+    from db_pool import configure_connection
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        configure_connection(conn)
+        cur = conn.execute(query, params)
+        yield [d[0] for d in cur.description]
+        while True:
+            paquet = cur.fetchmany(TAILLE_PAQUET)
+            if not paquet:
+                break
+            yield paquet
+    finally:
+        conn.close()
+
+
+# ============================
+# Écrivains
+# ============================
+def _flux_csv(db_path, query, params):
+    tampon = io.StringIO()
+    writer = csv.writer(tampon, delimiter=";")
+    paquets = _paquets(db_path, query, params)
+
+    # BOM : Excel reconnaît ainsi l'UTF-8 des accents
+    writer.writerow(next(paquets))
+    yield "\ufeff" + tampon.getvalue()
+
+    for paquet in paquets:
+        tampon.seek(0)
+        tampon.truncate()
+        writer.writerows(paquet)
+        yield tampon.getvalue()
+
+
+def _nettoyer(valeur):
+    # Caractères de contrôle refusés par openpyxl (ex. copier-coller depuis Word)
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    if isinstance(valeur, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", valeur)
+    return valeur
+
+
+def _flux_xlsx(db_path, query, params, feuille):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=feuille[:31])
+    paquets = _paquets(db_path, query, params)
+    ws.append(next(paquets))
+    for paquet in paquets:
+        for ligne in paquet:
+            ws.append([_nettoyer(v) for v in ligne])
+
+    # Le format zip impose d'écrire le classeur complet avant l'envoi :
+    # il passe par un fichier temporaire (au-delà de 8 Mo) et non par la RAM
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as fichier:
+        wb.save(fichier)
+        fichier.seek(0)
+        while True:
+            bloc = fichier.read(TAILLE_BLOC)
+            if not bloc:
+                break
+            yield bloc
+
+
+def reponse_export(db_path, query, params=(), nom_fichier="export", format="xlsx", feuille="Export"):
+    """
+    Réponse Flask en flux pour `query`.
+    `nom_fichier` est donné sans extension ; `format` vaut "xlsx" ou "csv".
+    """
+    params = tuple(params)
+    if format == "csv":
+        corps, mimetype = _flux_csv(db_path, query, params), MIME_CSV
+    else:
+        format = "xlsx"
+        corps, mimetype = _flux_xlsx(db_path, query, params, feuille), MIME_XLSX
+
+    return Response(
+        corps,
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={nom_fichier}.{format}"},
+    )
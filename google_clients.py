@@ -0,0 +1,94 @@
+"""
+Fabrique de clients Google (Drive, Sheets, gspread) : identifiants chargés une
+fois par processus, services par thread.
+"""
+
+import os
+import threading
+
+
+SCOPES = [
+    "https://www.googleapis.com/auth/drive",
+    "https://www.googleapis.com/auth/spreadsheets",
+]
+TIMEOUT_S = int(os.getenv("GOOGLE_API_TIMEOUT_S", "120"))
+
+_lock = threading.Lock()
+_credentials = {}
+_local = threading.local()
+
+
+def _fichier_compte_service():
+    from utils import SERVICE_ACCOUNT_FILE
+
+    if not SERVICE_ACCOUNT_FILE or not os.path.exists(SERVICE_ACCOUNT_FILE):
+        raise FileNotFoundError(f"Fichier manquant : {SERVICE_ACCOUNT_FILE}")
+    return SERVICE_ACCOUNT_FILE
+
+
+def credentials():
+    """Identifiants du compte de service (un seul chargement par processus et par fichier)."""
+    from google.oauth2 import service_account
+
+    fichier = _fichier_compte_service()
+    with _lock:
+        creds = _credentials.get(fichier)
+        if creds is None:
+            creds = service_account.Credentials.from_service_account_file(fichier, scopes=SCOPES)
+            _credentials[fichier] = creds
+        return creds
+
+
+def _clients_du_thread():
+    clients = getattr(_local, "clients", None)
+    if clients is None or clients.get("_pid") != os.getpid():
+        # Nouveau thread, ou processus forké : pas de socket partagée avec le parent
+        clients = _local.clients = {"_pid": os.getpid()}
+    return clients
+
+
+def _http():
+    """Transport HTTP autorisé du thread (rafraîchit le jeton si besoin)."""
+    clients = _clients_du_thread()
+    if "_http" not in clients:
+        import httplib2
+        import google_auth_httplib2
+
+        clients["_http"] = google_auth_httplib2.AuthorizedHttp(
+            credentials(), http=httplib2.Http(timeout=TIMEOUT_S)
+        )
+    return clients["_http"]
+
+
+def service(nom, version):
+    """Client googleapiclient `nom`/`version` du thread courant."""
+    clients = _clients_du_thread()
+    cle = (nom, version)
+    if cle not in clients:
+        from googleapiclient.discovery import build
+
+        clients[cle] = build(
+            nom, version,
+            http=_http(),
+            cache_discovery=False,
+            static_discovery=True,
+        )
+    return clients[cle]
+
+
+def drive():
+    return service("drive", "v3")
+
+
+def sheets():
+    return service("sheets", "v4")
+
+
+def gspread_client():
+    """Client gspread du thread courant (mêmes identifiants)."""
+    clients = _clients_du_thread()
+    if "_gspread" not in clients:
+        import gspread
+
+        clients["_gspread"] = gspread.authorize(credentials())
+    return clients["_gspread"]
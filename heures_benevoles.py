@@ -0,0 +1,385 @@
+"""
+Table de faits `heures_benevoles` du rapport d'activité, tenue à jour semaine
+par semaine à partir des triggers sur les plannings.
+"""
+
+import logging
+from datetime import date
+
+
+logger = logging.getLogger("BA38")
+
+DUREE_PAR_DEFAUT = 120
+
+# ------------------------------------------------------------
+#  POSTES PAR PLANNING
+# ------------------------------------------------------------
+
+POSTES = {
+    "ramasse": ["chauffeur", "responsable", "equipier",
+                "ramasse_tri1", "ramasse_tri2", "ramasse_tri3"],
+
+    "distribution": ["froid1", "froid2", "froid3", "froid4",
+                     "frais_sec1", "frais_sec2", "frais_sec3", "frais_sec4"],
+
+    "palettes": [f"pal{str(i).zfill(2)}" for i in range(1, 11)],
+
+    "pesee": [f"pesee{str(i).zfill(2)}" for i in range(1, 9)],
+
+    "vif": [f"vif{str(i).zfill(2)}" for i in range(1, 4)],
+}
+
+# ------------------------------------------------------------
+#  TABLES PAR PLANNING
+# ------------------------------------------------------------
+
+TABLES = {
+    "ramasse": ("planning_standard_ramasse_ids", "plannings_ramasse"),
+    "distribution": ("planning_standard_distribution_ids", "plannings_distribution"),
+    "palettes": ("planning_standard_pal_ids", "plannings_pal"),
+    "pesee": ("planning_standard_pesee_ids", "plannings_pesee"),
+    "vif": ("planning_standard_vif_ids", "plannings_vif"),
+}
+
+JOUR_VERS_ISO = {
+    "lundi": 1,
+    "mardi": 2,
+    "mercredi": 3,
+    "jeudi": 4,
+    "vendredi": 5,
+}
+
+
+# ------------------------------------------------------------
+#  SCHÉMA
+# ------------------------------------------------------------
+
+def _table_existe(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone() is not None
+
+
+def installer(conn):
+    """Crée la table de faits, la file des semaines à recalculer et les triggers (idempotent)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS heures_benevoles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date_jour TEXT NOT NULL,
+            annee INTEGER NOT NULL,
+            semaine INTEGER NOT NULL,
+            jour TEXT,
+            type_planning TEXT NOT NULL,
+            planning_id INTEGER,
+            poste TEXT NOT NULL,
+            benevole_id INTEGER,
+            remplacant_id INTEGER,
+            absent INTEGER NOT NULL DEFAULT 0,
+            minutes_brutes INTEGER NOT NULL DEFAULT 0,
+            minutes INTEGER NOT NULL DEFAULT 0,
+            raison_rejet TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_heures_benevoles_date
+        ON heures_benevoles (date_jour, type_planning, minutes)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_heures_benevoles_semaine
+        ON heures_benevoles (type_planning, annee, semaine)
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS heures_benevoles_a_recalculer (
+            type_planning TEXT NOT NULL,
+            annee INTEGER NOT NULL,
+            semaine INTEGER NOT NULL,
+            PRIMARY KEY (type_planning, annee, semaine)
+        )
+    """)
+
+    for nom, (_, table) in TABLES.items():
+        if not _table_existe(conn, table):
+            continue
+
+        def marque(ref):
+            return (
+                "INSERT OR IGNORE INTO heures_benevoles_a_recalculer (type_planning, annee, semaine) "
+                f"VALUES ('{nom}', CAST({ref}.annee AS INTEGER), CAST({ref}.semaine AS INTEGER));"
+            )
+
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_hb_{table}_insert AFTER INSERT ON {table}
+            BEGIN {marque("NEW")} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_hb_{table}_update AFTER UPDATE ON {table}
+            BEGIN {marque("OLD")} {marque("NEW")} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_hb_{table}_delete AFTER DELETE ON {table}
+            BEGIN {marque("OLD")} END
+        """)
+
+    # Tournée modifiée (durée, composition réécrite par DELETE + INSERT,
+    # changement de tournee_id) → toutes les semaines de ramasse concernées
+    if _table_existe(conn, "tournees_fournisseurs") and _table_existe(conn, "plannings_ramasse"):
+
+        def marque_tournee(ref):
+            return (
+                "INSERT OR IGNORE INTO heures_benevoles_a_recalculer (type_planning, annee, semaine) "
+                "SELECT DISTINCT 'ramasse', CAST(annee AS INTEGER), CAST(semaine AS INTEGER) "
+                f"FROM plannings_ramasse WHERE tournee_id = {ref}.tournee_id;"
+            )
+
+        conn.execute("DROP TRIGGER IF EXISTS trg_hb_tournees_fournisseurs_duree")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_hb_tournees_fournisseurs_insert
+            AFTER INSERT ON tournees_fournisseurs
+            BEGIN {marque_tournee("NEW")} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_hb_tournees_fournisseurs_update
+            AFTER UPDATE OF duree, tournee_id ON tournees_fournisseurs
+            BEGIN {marque_tournee("OLD")} {marque_tournee("NEW")} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_hb_tournees_fournisseurs_delete
+            AFTER DELETE ON tournees_fournisseurs
+            BEGIN {marque_tournee("OLD")} END
+        """)
+
+    conn.commit()
+
+
+def marquer_tout(conn):
+    """Place toutes les semaines existantes dans la file de recalcul."""
+    for nom, (_, table) in TABLES.items():
+        if not _table_existe(conn, table):
+            continue
+        conn.execute(f"""
+            INSERT OR IGNORE INTO heures_benevoles_a_recalculer (type_planning, annee, semaine)
+            SELECT DISTINCT ?, CAST(annee AS INTEGER), CAST(semaine AS INTEGER)
+            FROM {table}
+            WHERE annee IS NOT NULL AND semaine IS NOT NULL
+        """, (nom,))
+    conn.commit()
+
+
+def installer_et_remplir(conn):
+    """Migration : schéma + remplissage complet au prochain rafraîchissement."""
+    installer(conn)
+    marquer_tout(conn)
+
+
+# ------------------------------------------------------------
+#  CALCUL (règles du rapport)
+# ------------------------------------------------------------
+
+def _durees_tournees(conn):
+    """{tournee_id: MAX(duree)} en une requête."""
+    if not _table_existe(conn, "tournees_fournisseurs"):
+        return {}
+    try:
+        rows = conn.execute(
+            "SELECT tournee_id, MAX(duree) FROM tournees_fournisseurs GROUP BY tournee_id"
+        ).fetchall()
+    except Exception:
+        return {}
+    return {r[0]: r[1] for r in rows}
+
+
+def duree_minutes(nom, ligne, durees_tournees):
+    """
+    Durée d'une ligne de planning, en minutes.
+    Ramasse : MAX(duree) des fournisseurs de la tournée ; autres : colonne duree.
+    À défaut : DUREE_PAR_DEFAUT.
+    """
+    if nom == "ramasse":
+        valeur = durees_tournees.get(ligne.get("tournee_id")) if ligne.get("tournee_id") else None
+    else:
+        valeur = ligne.get("duree")
+
+    try:
+        duree = int(valeur) if valeur not in (None, "") else 0
+    except (TypeError, ValueError):
+        duree = 0
+    return duree if duree > 0 else DUREE_PAR_DEFAUT
+
+
+def _remplacant(nom, ligne, poste):
+    remplacant = ligne.get(f"{poste}_remplacant")
+    # Compatibilité des anciens noms de colonnes de la ramasse
+    if nom == "ramasse" and not remplacant:
+        if poste in ("chauffeur", "responsable", "equipier"):
+            remplacant = ligne.get(f"remplacant_{poste}_id")
+        if poste.startswith("ramasse_tri"):
+            remplacant = ligne.get(f"remplacant_ramasse_tri{poste[-1]}_id")
+    return remplacant
+
+
+def faits_ligne(nom, ligne, durees_tournees):
+    """
+    Faits d'une ligne de planning (un par poste) :
+      - absent + remplaçant → crédit remplaçant
+      - absent sans remplaçant → rejet
+      - sinon → crédit titulaire
+    """
+    duree = duree_minutes(nom, ligne, durees_tournees)
+    faits = []
+
+    for poste in POSTES[nom]:
+        titulaire = ligne.get(f"{poste}_id")
+        absent = str(ligne.get(f"{poste}_absent", "non")).strip().lower() == "oui"
+        remplacant = _remplacant(nom, ligne, poste)
+
+        raison = None
+        if not titulaire and not remplacant:
+            benevole_id, remplacant_id, raison = None, None, "Aucun bénévole"
+        elif absent and not remplacant:
+            benevole_id, remplacant_id, raison = titulaire, None, "Absent sans remplaçant"
+        else:
+            benevole_id = remplacant if absent else titulaire
+            remplacant_id = remplacant
+            if not benevole_id:
+                benevole_id, raison = None, "ID bénévole vide"
+
+        faits.append({
+            "poste": poste,
+            "benevole_id": benevole_id,
+            "remplacant_id": remplacant_id,
+            "absent": 1 if absent else 0,
+            "minutes_brutes": duree,
+            "minutes": 0 if raison else duree,
+            "raison_rejet": raison,
+        })
+
+    return faits
+
+
+def _recalculer_semaine(conn, nom, annee, semaine, durees_tournees):
+    table = TABLES[nom][1]
+    conn.execute(
+        "DELETE FROM heures_benevoles WHERE type_planning = ? AND annee = ? AND semaine = ?",
+        (nom, annee, semaine),
+    )
+
+    # annee / semaine peuvent être stockés en texte selon l'historique de la base :
+    # IN (entier, texte) couvre les deux cas en gardant l'index (annee, semaine)
+    lignes = conn.execute(
+        f"SELECT * FROM {table} WHERE annee IN (?, ?) AND semaine IN (?, ?)",
+        (annee, str(annee), semaine, str(semaine)),
+    ).fetchall()
+
+    a_inserer = []
+    for r in lignes:
+        ligne = dict(r)
+        jour = str(ligne.get("jour") or "").strip().lower()
+        if jour not in JOUR_VERS_ISO:
+            continue
+        try:
+            date_jour = date.fromisocalendar(int(annee), int(semaine), JOUR_VERS_ISO[jour])
+        except ValueError:
+            continue
+
+        for f in faits_ligne(nom, ligne, durees_tournees):
+            a_inserer.append((
+                date_jour.isoformat(), annee, semaine, jour, nom, ligne.get("id"),
+                f["poste"], f["benevole_id"], f["remplacant_id"], f["absent"],
+                f["minutes_brutes"], f["minutes"], f["raison_rejet"],
+            ))
+
+    conn.executemany("""
+        INSERT INTO heures_benevoles (
+            date_jour, annee, semaine, jour, type_planning, planning_id,
+            poste, benevole_id, remplacant_id, absent,
+            minutes_brutes, minutes, raison_rejet
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, a_inserer)
+
+
+def rafraichir(conn):
+    """Recalcule les semaines en attente. Retourne le nombre de semaines traitées."""
+    import sqlite3
+
+    if not _table_existe(conn, "heures_benevoles_a_recalculer"):
+        installer_et_remplir(conn)
+
+    conn.row_factory = sqlite3.Row
+    semaines = conn.execute(
+        "SELECT type_planning, annee, semaine FROM heures_benevoles_a_recalculer"
+    ).fetchall()
+    if not semaines:
+        return 0
+
+    durees_tournees = _durees_tournees(conn)
+    for s in semaines:
+        if s["type_planning"] not in TABLES:
+            continue
+        conn.execute(
+            "DELETE FROM heures_benevoles_a_recalculer WHERE type_planning = ? AND annee = ? AND semaine = ?",
+            (s["type_planning"], s["annee"], s["semaine"]),
+        )
+        _recalculer_semaine(conn, s["type_planning"], s["annee"], s["semaine"], durees_tournees)
+
+    conn.commit()
+    logger.info(f"🧮 heures_benevoles : {len(semaines)} semaine(s) recalculée(s)")
+    return len(semaines)
+
+
+def reconstruire(conn):
+    """Reconstruction complète de la table de faits."""
+    installer(conn)
+    conn.execute("DELETE FROM heures_benevoles")
+    marquer_tout(conn)
+    return rafraichir(conn)
+
+
+# ------------------------------------------------------------
+#  LECTURES (requêtes agrégées indexées)
+# ------------------------------------------------------------
+
+def minutes_par_type(conn, debut, fin):
+    """{type_planning: minutes retenues} sur [debut, fin]."""
+    rows = conn.execute("""
+        SELECT type_planning, SUM(minutes)
+        FROM heures_benevoles
+        WHERE date_jour BETWEEN ? AND ?
+        GROUP BY type_planning
+    """, (debut.isoformat(), fin.isoformat())).fetchall()
+    totaux = {nom: 0 for nom in TABLES}
+    totaux.update({r[0]: r[1] or 0 for r in rows})
+    return totaux
+
+
+def lignes_controle(conn, debut, fin):
+    """Postes retenus et rejetés sur [debut, fin], pour l'Excel de contrôle."""
+    import sqlite3
+
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("""
+        SELECT type_planning, semaine, jour, benevole_id, remplacant_id, absent,
+               minutes_brutes, minutes, raison_rejet
+        FROM heures_benevoles
+        WHERE date_jour BETWEEN ? AND ?
+        ORDER BY date_jour, type_planning, planning_id, id
+    """, (debut.isoformat(), fin.isoformat())).fetchall()
+
+    ok, rejetees = [], []
+    for r in rows:
+        ligne = {
+            "type_planning": r["type_planning"],
+            "semaine": r["semaine"],
+            "jour": r["jour"],
+            "benevole_id": r["benevole_id"],
+            "remplacant_id": r["remplacant_id"],
+            "absent": bool(r["absent"]),
+            "duree_brute_minutes": r["minutes_brutes"],
+            "duree_retendue_minutes": r["minutes"],
+            "duree_retendue_heures": round(r["minutes"] / 60, 2),
+        }
+        if r["raison_rejet"]:
+            ligne["raison_rejet"] = r["raison_rejet"]
+            rejetees.append(ligne)
+        else:
+            ok.append(ligne)
+    return ok, rejetees
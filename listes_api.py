@@ -0,0 +1,155 @@
+"""
+Pagination par clé (keyset) et recherche des listes bénévoles / partenaires /
+fournisseurs, pour les pages et leurs API JSON.
+"""
+
+import json
+import base64
+
+import recherche_fts
+
+
+TAILLE_PAGE = 100
+TAILLE_PAGE_MAX = 500
+
+
+# ============================
+# Colonnes
+# ============================
+def colonnes_table(conn, table):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _q(colonne):
+    return '"' + colonne.replace('"', '""') + '"'
+
+
+# ============================
+# Curseur
+# ============================
+def encoder_curseur(valeur, cle):
+    brut = json.dumps([valeur, cle], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(brut).decode("ascii")
+
+
+def decoder_curseur(curseur):
+    """(valeur de tri, clé) ou None si le curseur est absent ou illisible."""
+    if not curseur:
+        return None
+    try:
+        valeur, cle = json.loads(base64.urlsafe_b64decode(curseur.encode("ascii")))
+        return valeur, cle
+    except (ValueError, TypeError):
+        return None
+
+
+# ============================
+# Paramètres HTTP
+# ============================
+def parametres(args, tri_defaut):
+    """tri, sens, recherche, curseur et limite lus dans `request.args`."""
+    try:
+        limite = int(args.get("limite", TAILLE_PAGE))
+    except ValueError:
+        limite = TAILLE_PAGE
+    return {
+        "tri": args.get("tri") or tri_defaut,
+        "sens": "desc" if args.get("sens") == "desc" else "asc",
+        "recherche": (args.get("q") or "").strip(),
+        "apres": args.get("apres") or None,
+        "limite": max(1, min(limite, TAILLE_PAGE_MAX)),
+    }
+
+
+# ============================
+# Requête
+# ============================
+def page(conn, table, colonnes, *, cle="id", tri, sens="asc", recherche="",
+         colonnes_recherche=None, where="", params=(), apres=None, limite=TAILLE_PAGE,
+         tri_defaut=None):
+    """
+    Une page de `table` : colonnes `cle` (aliasée en id) + `colonnes`.
+
+    Retourne un dict :
+      - lignes : sqlite3.Row (la connexion doit utiliser ce row_factory)
+      - colonnes : colonnes effectivement lues (id en tête)
+      - suivant : curseur de la page suivante, None en fin de liste
+      - total : nombre de lignes filtrées (première page seulement, sinon None)
+      - tri, sens : tri effectivement appliqué
+    """
+    existantes = colonnes_table(conn, table)
+    colonnes = [c for c in colonnes if c in existantes]
+    if tri not in existantes:
+        tri = tri_defaut if tri_defaut in existantes else cle
+    desc = sens == "desc"
+
+    expr_tri = f"IFNULL({_q(tri)}, '') COLLATE NOCASE"
+    conditions = [f"({where})"] if where else []
+    valeurs = list(params)
+
+    # 🔎 Recherche : chaque mot dans au moins une colonne.
+    # Index plein texte (recherche_fts) quand il existe : préfixes de mots,
+    # sans accents ; LIKE seulement pour les colonnes qu'il ne couvre pas.
+    cibles = [c for c in (colonnes_recherche or colonnes) if c in existantes]
+    if recherche and cibles:
+        indexees = recherche_fts.colonnes_indexees(conn, table) if recherche_fts.disponible(conn, table) else []
+        hors_index = [c for c in cibles if c not in indexees]
+        for mot in recherche.split():
+            alternatives = []
+            fts = recherche_fts.condition(conn, table, mot, cle=cle) if indexees else None
+            if fts:
+                alternatives.append(fts[0])
+                valeurs += fts[1]
+            for c in (hors_index if fts else cibles):
+                motif = "%" + mot.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                alternatives.append(f"{_q(c)} LIKE ? ESCAPE '\\'")
+                valeurs.append(motif)
+            conditions.append("(" + " OR ".join(alternatives) + ")")
+
+    clause = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    total = None
+    position = decoder_curseur(apres)
+    if position is None:
+        total = conn.execute(f"SELECT COUNT(*) FROM {table}{clause}", valeurs).fetchone()[0]
+    else:
+        conditions.append(f"({expr_tri}, {_q(cle)}) {'<' if desc else '>'} (?, ?)")
+        valeurs += list(position)
+        clause = " WHERE " + " AND ".join(conditions)
+
+    ordre = "DESC" if desc else "ASC"
+    select = ", ".join([f"{_q(cle)} AS id"] + [_q(c) for c in colonnes if c != cle])
+    lignes = conn.execute(
+        f"SELECT {select}, {expr_tri} AS _tri FROM {table}{clause} "
+        f"ORDER BY {expr_tri} {ordre}, {_q(cle)} {ordre} LIMIT ?",
+        valeurs + [limite + 1],
+    ).fetchall()
+
+    suivant = None
+    if len(lignes) > limite:
+        lignes = lignes[:limite]
+        derniere = lignes[-1]
+        suivant = encoder_curseur(derniere[-1], derniere[0])
+
+    return {
+        "lignes": lignes,
+        "colonnes": ["id"] + [c for c in colonnes if c != cle],
+        "suivant": suivant,
+        "total": total,
+        "tri": tri,
+        "sens": sens,
+    }
+
+
+def reponse(resultat, html):
+    """Corps JSON commun des endpoints `.../api/liste` (données + lignes HTML rendues)."""
+    colonnes = resultat["colonnes"]
+    return {
+        "colonnes": colonnes,
+        "lignes": [{c: r[c] for c in colonnes} for r in resultat["lignes"]],
+        "suivant": resultat["suivant"],
+        "total": resultat["total"],
+        "tri": resultat["tri"],
+        "sens": resultat["sens"],
+        "html": html,
+    }
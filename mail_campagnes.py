@@ -0,0 +1,580 @@
+"""
+Campagnes de mails Mailjet en tâche de fond : boîte d'envoi en base
+(`mail_outbox`), envoi groupé et reprenable.
+"""
+
+import os
+import json
+import time
+import base64
+import fcntl
+import shutil
+import sqlite3
+import logging
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+
+logger = logging.getLogger("BA38")
+
+
+# ============================
+# Paramètres (surchargeables via .env)
+# ============================
+# MAILJET_API_URL : faux Mailjet local (scripts/mailjet_local.py) pour les mesures hors ligne
+API_URL = os.getenv("MAILJET_API_URL", "https://api.mailjet.com/v3.1/send")
+API_MESSAGES_URL = os.getenv("MAILJET_API_MESSAGES_URL", "https://api.mailjet.com/v3/REST/message")
+MESSAGES_PAR_APPEL = min(50, int(os.getenv("MAILJET_MESSAGES_PAR_APPEL", "50")))
+OCTETS_PAR_APPEL = int(os.getenv("MAILJET_OCTETS_PAR_APPEL", str(14 * 1024 * 1024)))
+APPELS_PAR_S = float(os.getenv("MAILJET_APPELS_PAR_S", "3"))
+APPELS_SIMULTANES = int(os.getenv("MAILJET_APPELS_SIMULTANES", "2"))
+MAX_ESSAIS = int(os.getenv("MAILJET_MAX_ESSAIS", "5"))
+# Un envoi incertain absent de Mailjet après ce délai n'a pas été accepté
+DELAI_VERIFICATION_S = int(os.getenv("MAILJET_DELAI_VERIFICATION_S", "900"))
+TIMEOUT_S = 30
+
+CAMPAGNES_DIR = os.getenv("MAIL_CAMPAGNES_DIR") or os.path.join(tempfile.gettempdir(), "ba38_campagnes")
+
+_lock = threading.Lock()
+_campagnes_locales = {}
+_installees = set()
+
+
+# ============================
+# Schéma
+# ============================
+def installer(conn):
+    """Tables des campagnes et de la boîte d'envoi (idempotent)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mail_campagnes (
+            id TEXT PRIMARY KEY,
+            libelle TEXT,
+            expediteur TEXT NOT NULL,
+            mode TEXT,
+            statut TEXT NOT NULL DEFAULT 'en_attente',
+            cree_le TEXT,
+            termine_le TEXT,
+            message TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mail_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            campagne_id TEXT NOT NULL,
+            cle TEXT NOT NULL,
+            destinataires TEXT NOT NULL,
+            sujet TEXT NOT NULL,
+            texte TEXT NOT NULL,
+            piece_jointe TEXT,
+            statut TEXT NOT NULL DEFAULT 'a_envoyer',
+            essais INTEGER NOT NULL DEFAULT 0,
+            message_id TEXT,
+            erreur TEXT,
+            envoye_le TEXT,
+            tente_le TEXT,
+            UNIQUE (campagne_id, cle)
+        )
+    """)
+    colonnes = {r[1] for r in conn.execute("PRAGMA table_info(mail_outbox)").fetchall()}
+    if "tente_le" not in colonnes:
+        conn.execute("ALTER TABLE mail_outbox ADD COLUMN tente_le TEXT")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mail_outbox_campagne_statut
+        ON mail_outbox (campagne_id, statut)
+    """)
+    conn.commit()
+
+
+def _connexion(db_path):
+    from db_pool import configure_connection
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    configure_connection(conn)
+    conn.row_factory = sqlite3.Row
+    # Schéma installé une fois par base et par process (pas à chaque appel à etat())
+    with _lock:
+        a_installer = db_path not in _installees
+    if a_installer:
+        installer(conn)
+        with _lock:
+            _installees.add(db_path)
+    return conn
+
+
+def _maintenant():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# ============================
+# API appelée par les routes
+# ============================
+def creer_campagne(db_path, campagne_id, libelle, expediteur, mode, messages):
+    """
+    Inscrit une campagne et ses messages, puis la lance dans ce worker.
+
+    messages : liste de dicts {cle, destinataires, sujet, texte, piece_jointe}
+      où piece_jointe est None ou {"type": "facture_cotisation", "ligne": ..., "annee": ...}.
+
+    Relancer une campagne met à jour le contenu des messages non encore
+    envoyés (pièce jointe rendue à nouveau) et retire ceux qui ne sont plus
+    dans la liste. Les envois incertains sont vérifiés auprès de Mailjet
+    avant tout renvoi.
+
+    Retourne (nouveaux messages, messages déjà envoyés ignorés).
+    """
+    conn = _connexion(db_path)
+    try:
+        conn.execute("""
+            INSERT INTO mail_campagnes (id, libelle, expediteur, mode, statut, cree_le)
+            VALUES (?, ?, ?, ?, 'en_attente', ?)
+            ON CONFLICT(id) DO UPDATE SET expediteur = excluded.expediteur, statut = 'en_attente',
+                                          termine_le = NULL, message = NULL
+        """, (campagne_id, libelle, expediteur, mode, _maintenant()))
+
+        existantes = {
+            r["cle"] for r in conn.execute(
+                "SELECT cle FROM mail_outbox WHERE campagne_id = ?", (campagne_id,)
+            ).fetchall()
+        }
+        cles = {str(m["cle"]) for m in messages}
+        nouveaux = len(cles - existantes)
+
+        # Messages non envoyés : contenu remplacé par celui du nouveau lancement
+        # (le chemin du PDF déjà rendu disparaît avec l'ancienne pièce jointe)
+        conn.executemany("""
+            INSERT INTO mail_outbox (campagne_id, cle, destinataires, sujet, texte, piece_jointe)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(campagne_id, cle) DO UPDATE SET
+                destinataires = excluded.destinataires, sujet = excluded.sujet,
+                texte = excluded.texte, piece_jointe = excluded.piece_jointe
+            WHERE mail_outbox.statut != 'envoye'
+        """, [
+            (
+                campagne_id, str(m["cle"]), json.dumps(m["destinataires"]), m["sujet"], m["texte"],
+                json.dumps(m["piece_jointe"], ensure_ascii=False) if m.get("piece_jointe") else None,
+            )
+            for m in messages
+        ])
+
+        # Destinataires retirés de la liste depuis le lancement précédent
+        conn.executemany(
+            "DELETE FROM mail_outbox WHERE campagne_id = ? AND cle = ? AND statut != 'envoye'",
+            [(campagne_id, cle) for cle in existantes - cles],
+        )
+
+        # Les messages en erreur d'un lancement précédent sont retentés
+        conn.execute("""
+            UPDATE mail_outbox SET statut = 'a_envoyer', essais = 0, erreur = NULL
+            WHERE campagne_id = ? AND statut = 'erreur'
+        """, (campagne_id,))
+
+        deja_envoyes = conn.execute(
+            "SELECT COUNT(*) FROM mail_outbox WHERE campagne_id = ? AND statut = 'envoye'",
+            (campagne_id,),
+        ).fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+
+    lancer(db_path, campagne_id)
+    return nouveaux, deja_envoyes
+
+
+def etat(db_path, campagne_id):
+    """Progression de la campagne ; une campagne active abandonnée est relancée ici."""
+    conn = _connexion(db_path)
+    try:
+        campagne = conn.execute("SELECT * FROM mail_campagnes WHERE id = ?", (campagne_id,)).fetchone()
+        if campagne is None:
+            return None
+        compteurs = dict(conn.execute("""
+            SELECT statut, COUNT(*) FROM mail_outbox WHERE campagne_id = ? GROUP BY statut
+        """, (campagne_id,)).fetchall())
+        erreurs = {
+            r["cle"]: r["erreur"] for r in conn.execute(
+                "SELECT cle, erreur FROM mail_outbox WHERE campagne_id = ? AND statut IN ('erreur', 'incertain')",
+                (campagne_id,),
+            ).fetchall()
+        }
+    finally:
+        conn.close()
+
+    if campagne["statut"] in ("en_attente", "en_cours"):
+        lancer(db_path, campagne_id)
+
+    total = sum(compteurs.values())
+    envoyes = compteurs.get("envoye", 0)
+    return {
+        "campagne_id": campagne_id,
+        "statut": campagne["statut"],
+        "total": total,
+        "faites": envoyes,
+        "erreurs": len(erreurs),
+        "incertains": compteurs.get("incertain", 0),
+        "details_erreurs": erreurs,
+        "pourcentage": int(100 * (envoyes + len(erreurs)) / total) if total else 100,
+        "message": campagne["message"],
+    }
+
+
+def lancer(db_path, campagne_id):
+    """Démarre l'envoi dans un thread de ce worker, sauf s'il tourne déjà quelque part."""
+    os.makedirs(CAMPAGNES_DIR, exist_ok=True)
+    nom_verrou = _nom_fichier(campagne_id)
+
+    with _lock:
+        thread = _campagnes_locales.get((db_path, campagne_id))
+        if thread and thread.is_alive():
+            return False
+
+        verrou = open(os.path.join(CAMPAGNES_DIR, f"{nom_verrou}.lock"), "a")
+        try:
+            fcntl.flock(verrou, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            verrou.close()
+            return False
+
+        thread = threading.Thread(
+            target=_executer, args=(db_path, campagne_id, verrou),
+            name=f"ba38-campagne-{nom_verrou[:16]}", daemon=True,
+        )
+        _campagnes_locales[(db_path, campagne_id)] = thread
+        thread.start()
+        return True
+
+
+# ============================
+# Pièces jointes
+# ============================
+def _rendre_piece_jointe(piece_jointe, dossier, root_path):
+    """Exécuté dans un processus du pool : retourne le chemin du PDF."""
+    from cotisations_pdf_job import _rendre_facture
+
+    _, chemin = _rendre_facture(piece_jointe["ligne"], piece_jointe["annee"], dossier, root_path)
+    return chemin
+
+
+def _preparer_pieces_jointes(conn, campagne_id, dossier, root_path):
+    """Rend en parallèle les pièces jointes manquantes des messages à envoyer."""
+    from cotisations_pdf_job import NB_PROCESS
+
+    a_rendre = []
+    for r in conn.execute("""
+        SELECT id, piece_jointe FROM mail_outbox
+        WHERE campagne_id = ? AND statut = 'a_envoyer' AND piece_jointe IS NOT NULL
+    """, (campagne_id,)).fetchall():
+        pj = json.loads(r["piece_jointe"])
+        if not pj.get("chemin") or not os.path.exists(pj["chemin"]):
+            a_rendre.append((r["id"], pj))
+
+    if not a_rendre:
+        return
+
+    contexte_mp = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=NB_PROCESS, mp_context=contexte_mp) as pool:
+        futures = {pool.submit(_rendre_piece_jointe, pj, dossier, root_path): (id_, pj) for id_, pj in a_rendre}
+        for fut in as_completed(futures):
+            id_, pj = futures[fut]
+            try:
+                pj["chemin"] = fut.result()
+                conn.execute("UPDATE mail_outbox SET piece_jointe = ? WHERE id = ?",
+                             (json.dumps(pj, ensure_ascii=False), id_))
+            except Exception as e:
+                conn.execute("UPDATE mail_outbox SET statut = 'erreur', erreur = ? WHERE id = ?",
+                             (f"Rendu pièce jointe : {e}", id_))
+    conn.commit()
+
+
+# ============================
+# Envoi
+# ============================
+class LimiteurDebit:
+    """Au plus `par_seconde` appels par seconde, partagé entre threads."""
+
+    def __init__(self, par_seconde):
+        self.intervalle = 1.0 / par_seconde if par_seconde > 0 else 0
+        self._lock = threading.Lock()
+        self._prochain = 0.0
+
+    def attendre(self):
+        with self._lock:
+            maintenant = time.monotonic()
+            attente = self._prochain - maintenant
+            self._prochain = max(maintenant, self._prochain) + self.intervalle
+        if attente > 0:
+            time.sleep(attente)
+
+
+def _session_http():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.auth = (os.getenv("MAILJET_API_KEY"), os.getenv("MAILJET_API_SECRET"))
+    adaptateur = HTTPAdapter(pool_connections=1, pool_maxsize=max(APPELS_SIMULTANES, 1))
+    session.mount("https://", adaptateur)
+    session.mount("http://", adaptateur)
+    return session
+
+
+def _message_mailjet(ligne, expediteur):
+    message = {
+        "From": {"Email": expediteur, "Name": "BA380"},
+        "To": [{"Email": d} for d in json.loads(ligne["destinataires"])],
+        "Subject": ligne["sujet"],
+        "TextPart": ligne["texte"],
+        "CustomID": f"{ligne['campagne_id']}:{ligne['id']}",
+    }
+    if ligne["piece_jointe"]:
+        chemin = json.loads(ligne["piece_jointe"]).get("chemin")
+        with open(chemin, "rb") as f:
+            message["Attachments"] = [{
+                "ContentType": "application/pdf",
+                "Filename": os.path.basename(chemin),
+                "Base64Content": base64.b64encode(f.read()).decode("ascii"),
+            }]
+    return message
+
+
+def _lots(lignes, expediteur):
+    """Regroupe les messages par appel (nombre et taille bornés)."""
+    lot, taille = [], 0
+    for ligne in lignes:
+        message = _message_mailjet(ligne, expediteur)
+        poids = len(json.dumps(message))
+        if lot and (len(lot) >= MESSAGES_PAR_APPEL or taille + poids > OCTETS_PAR_APPEL):
+            yield lot
+            lot, taille = [], 0
+        lot.append((ligne["id"], message))
+        taille += poids
+    if lot:
+        yield lot
+
+
+def _non_transmis(exception):
+    """Erreur survenue avant l'envoi de la requête (connexion impossible) : relance sans risque."""
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(exception, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exception, requests.exceptions.ConnectionError) and exception.args:
+        return isinstance(getattr(exception.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+def _poster(session, limiteur, lot):
+    """
+    Envoie un lot ; retourne [(id, statut, message_id, erreur)] dans l'ordre du lot.
+    Relances avec backoff uniquement quand le lot n'a pas pu être accepté
+    (connexion impossible, 429, 503). Une coupure ou une erreur serveur après
+    l'envoi laisse le lot « incertain » : il n'est jamais renvoyé sans
+    vérification auprès de Mailjet.
+    """
+    for essai in range(MAX_ESSAIS):
+        limiteur.attendre()
+        try:
+            reponse = session.post(API_URL, json={"Messages": [m for _, m in lot]}, timeout=TIMEOUT_S)
+        except Exception as e:
+            if not _non_transmis(e):
+                return [(id_, "incertain", None, f"Réseau : {e}") for id_, _ in lot]
+            erreur = f"Réseau : {e}"
+        else:
+            if reponse.status_code in (429, 503):
+                erreur = f"HTTP {reponse.status_code}"
+            elif reponse.status_code >= 500:
+                return [(id_, "incertain", None, f"HTTP {reponse.status_code}") for id_, _ in lot]
+            else:
+                try:
+                    resultats = reponse.json().get("Messages", [])
+                except ValueError:
+                    resultats = []
+                if len(resultats) != len(lot):
+                    # Rejet global (400 sur le lot, JSON illisible...)
+                    message = f"HTTP {reponse.status_code} : {reponse.text[:300]}"
+                    return [(id_, "erreur", None, message) for id_, _ in lot]
+
+                retour = []
+                for (id_, _), r in zip(lot, resultats):
+                    if r.get("Status") == "success":
+                        ids = [str(t.get("MessageID")) for t in r.get("To", [])]
+                        retour.append((id_, "envoye", ",".join(ids), None))
+                    else:
+                        erreur = json.dumps(r.get("Errors", r), ensure_ascii=False)[:500]
+                        retour.append((id_, "erreur", None, erreur))
+                return retour
+
+        if essai + 1 < MAX_ESSAIS:
+            time.sleep(min(60, 2 ** essai))
+
+    return [(id_, "erreur", None, erreur) for id_, _ in lot]
+
+
+def _verifier_incertains(conn, campagne_id):
+    """
+    Envois interrompus (`en_cours` d'un worker arrêté) ou incertains : recherchés
+    dans Mailjet par CustomID. Trouvés → envoyés ; absents depuis plus de
+    DELAI_VERIFICATION_S → à renvoyer ; sinon laissés incertains.
+    """
+    lignes = conn.execute("""
+        SELECT id, tente_le, piece_jointe FROM mail_outbox
+        WHERE campagne_id = ? AND statut IN ('en_cours', 'incertain')
+    """, (campagne_id,)).fetchall()
+    if not lignes:
+        return
+
+    session = _session_http()
+    limiteur = LimiteurDebit(APPELS_PAR_S)
+    try:
+        for ligne in lignes:
+            limiteur.attendre()
+            try:
+                reponse = session.get(
+                    API_MESSAGES_URL, params={"CustomID": f"{campagne_id}:{ligne['id']}"}, timeout=TIMEOUT_S,
+                )
+                reponse.raise_for_status()
+                trouves = reponse.json().get("Data", [])
+            except Exception as e:
+                conn.execute("UPDATE mail_outbox SET statut = 'incertain', erreur = ? WHERE id = ?",
+                             (f"Vérification Mailjet impossible : {e}", ligne["id"]))
+                continue
+
+            if trouves:
+                conn.execute("""
+                    UPDATE mail_outbox SET statut = 'envoye', message_id = ?, erreur = NULL, envoye_le = ?
+                    WHERE id = ?
+                """, (",".join(str(m.get("ID")) for m in trouves), _maintenant(), ligne["id"]))
+                _supprimer_piece_jointe(ligne["piece_jointe"])
+            elif _plus_ancien_que(ligne["tente_le"], DELAI_VERIFICATION_S):
+                conn.execute("UPDATE mail_outbox SET statut = 'a_envoyer', erreur = NULL WHERE id = ?",
+                             (ligne["id"],))
+            else:
+                conn.execute("""
+                    UPDATE mail_outbox SET statut = 'incertain',
+                           erreur = 'Envoi incertain, pas encore visible dans Mailjet : vérifié au prochain lancement'
+                    WHERE id = ?
+                """, (ligne["id"],))
+        conn.commit()
+    finally:
+        session.close()
+
+
+def _plus_ancien_que(horodatage, secondes):
+    if not horodatage:
+        return True
+    try:
+        return (datetime.now() - datetime.fromisoformat(horodatage)).total_seconds() > secondes
+    except ValueError:
+        return True
+
+
+def _supprimer_piece_jointe(piece_jointe):
+    chemin = json.loads(piece_jointe).get("chemin") if piece_jointe else None
+    if chemin and os.path.exists(chemin):
+        os.remove(chemin)
+
+
+def _envoyer_campagne(conn, campagne_id, expediteur):
+    lignes = conn.execute("""
+        SELECT * FROM mail_outbox
+        WHERE campagne_id = ? AND statut = 'a_envoyer'
+        ORDER BY id
+    """, (campagne_id,)).fetchall()
+    if not lignes:
+        return
+
+    session = _session_http()
+    limiteur = LimiteurDebit(APPELS_PAR_S)
+    pieces_jointes = {ligne["id"]: ligne["piece_jointe"] for ligne in lignes}
+
+    # Les threads du pool ne font que les appels HTTP : toutes les écritures
+    # en base restent dans ce thread
+    def enregistrer(resultats):
+        for id_, statut, message_id, erreur in resultats:
+            if statut != "envoye":
+                conn.execute("""
+                    UPDATE mail_outbox SET statut = ?, erreur = ?, essais = essais + 1 WHERE id = ?
+                """, (statut, erreur, id_))
+            else:
+                conn.execute("""
+                    UPDATE mail_outbox SET statut = 'envoye', message_id = ?, erreur = NULL,
+                           essais = essais + 1, envoye_le = ? WHERE id = ?
+                """, (message_id, _maintenant(), id_))
+                # Pièce jointe partie : le PDF rendu n'est plus utile
+                _supprimer_piece_jointe(pieces_jointes.get(id_))
+        conn.commit()
+
+    try:
+        with ThreadPoolExecutor(max_workers=APPELS_SIMULTANES, thread_name_prefix="ba38-mailjet") as pool:
+            en_vol = set()
+            for lot in _lots(lignes, expediteur):
+                conn.executemany("UPDATE mail_outbox SET statut = 'en_cours', tente_le = ? WHERE id = ?",
+                                 [(_maintenant(), id_) for id_, _ in lot])
+                conn.commit()
+                en_vol.add(pool.submit(_poster, session, limiteur, lot))
+                # Lots en mémoire bornés (les pièces jointes sont encodées)
+                if len(en_vol) >= 2 * APPELS_SIMULTANES:
+                    fini = next(as_completed(en_vol))
+                    en_vol.remove(fini)
+                    enregistrer(fini.result())
+            for fut in as_completed(en_vol):
+                enregistrer(fut.result())
+    finally:
+        session.close()
+
+
+def _nom_fichier(campagne_id):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in campagne_id)
+
+
+def _executer(db_path, campagne_id, verrou):
+    conn = _connexion(db_path)
+    dossier = os.path.join(CAMPAGNES_DIR, _nom_fichier(campagne_id))
+    os.makedirs(dossier, exist_ok=True)
+    # Racine de l'application (logo des factures) : dossier de ce module
+    root_path = os.path.dirname(os.path.abspath(__file__))
+    try:
+        campagne = conn.execute("SELECT * FROM mail_campagnes WHERE id = ?", (campagne_id,)).fetchone()
+        conn.execute("UPDATE mail_campagnes SET statut = 'en_cours' WHERE id = ?", (campagne_id,))
+        conn.commit()
+
+        debut = time.monotonic()
+        _verifier_incertains(conn, campagne_id)
+        _preparer_pieces_jointes(conn, campagne_id, dossier, root_path)
+        _envoyer_campagne(conn, campagne_id, campagne["expediteur"])
+
+        compteurs = dict(conn.execute("""
+            SELECT statut, COUNT(*) FROM mail_outbox WHERE campagne_id = ? GROUP BY statut
+        """, (campagne_id,)).fetchall())
+        message = f"{compteurs.get('envoye', 0)} mails envoyés"
+        if compteurs.get("erreur"):
+            message += f", {compteurs['erreur']} en erreur"
+        if compteurs.get("incertain"):
+            message += f", {compteurs['incertain']} incertains (vérifiés au prochain lancement)"
+
+        conn.execute("""
+            UPDATE mail_campagnes SET statut = 'termine', termine_le = ?, message = ? WHERE id = ?
+        """, (_maintenant(), message, campagne_id))
+        conn.commit()
+        logger.info(f"📧 Campagne {campagne_id} : {message} en {time.monotonic() - debut:.1f} s")
+
+        # Tout est parti : plus rien à relancer, dossier des PDF supprimé
+        if set(compteurs) <= {"envoye"}:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+    except Exception as e:
+        logger.exception(f"❌ Campagne {campagne_id}")
+        conn.execute("""
+            UPDATE mail_campagnes SET statut = 'erreur', termine_le = ?, message = ? WHERE id = ?
+        """, (_maintenant(), str(e), campagne_id))
+        conn.commit()
+
+    finally:
+        conn.close()
+        fcntl.flock(verrou, fcntl.LOCK_UN)
+        verrou.close()
+        with _lock:
+            _campagnes_locales.pop((db_path, campagne_id), None)
@@ -0,0 +1,235 @@
+"""
+Lecture en flux des fichiers PARSOL2L (édition VIF des participations).
+"""
+
+import re
+import codecs
+from datetime import date
+from functools import lru_cache
+from collections import OrderedDict, defaultdict, namedtuple
+
+
+TAILLE_BLOC = 64 * 1024
+
+# Encodage de repli quand le décodage strict échoue
+REPLIS = {"utf-8": "cp1252", "cp1252": "latin-1"}
+
+DEBUT_FACTURE = "BA. de l'Isère"
+JOURS_EXCLUS = (4, 5, 6)  # ven/sam/dim
+
+PAT_ASSOCIATION = re.compile(r"Association\s*:\s*(\d{8})")
+PAT_DATE = re.compile(r"(\d{2}/\d{2}/\d{4})(?:\s+(\d+)(?=\s|$))?")
+PAT_MONTANTS = re.compile(
+    r"^\s*(\d{2}/\d{2}/\d{4})\s+(\d+)\s+([\d\s.,]+)\s+([\d\s.,]+)\s*$"
+)
+
+
+# ============================
+# Enregistrements
+# ============================
+Facture = namedtuple("Facture", "ligne")
+Association = namedtuple("Association", "ligne libelle code_vif")
+# nb_beneficiaires : None si la date n'est pas suivie d'un nombre
+# total : None si la ligne n'est pas une ligne de détail complète
+Passage = namedtuple("Passage", "ligne date nb_beneficiaires total jour_exclu")
+Texte = namedtuple("Texte", "ligne")
+
+
+# ============================
+# Décodage
+# ============================
+def detecter_encodage(echantillon):
+    """UTF-8 si l'échantillon est valide (dernier caractère éventuellement coupé), sinon CP1252 / Latin-1."""
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(echantillon, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        echantillon.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def lignes(flux, taille_bloc=TAILLE_BLOC):
+    """
+    Lignes décodées (fins de ligne conservées) d'un flux binaire, par blocs.
+    Décodage strict : sur un octet invalide, le bloc en cours (et les octets
+    en attente du précédent) est redécodé avec l'encodage de repli.
+    """
+    bloc = flux.read(taille_bloc)
+    encodage = detecter_encodage(bloc)
+    decodeur = codecs.getincrementaldecoder(encodage)()
+    reste = ""
+    final = not bloc
+    while True:
+        en_attente = decodeur.getstate()[0]
+        donnees = bloc
+        while True:
+            try:
+                texte = decodeur.decode(donnees, final=final)
+                break
+            except UnicodeDecodeError:
+                encodage = REPLIS[encodage]
+                decodeur = codecs.getincrementaldecoder(encodage)()
+                donnees = en_attente + bloc
+
+        texte = reste + texte
+        morceaux = texte.split("\n")
+        reste = morceaux.pop()
+        for morceau in morceaux:
+            yield morceau + "\n"
+        if final:
+            break
+        bloc = flux.read(taille_bloc)
+        final = not bloc
+    if reste:
+        yield reste
+
+
+@lru_cache(maxsize=8192)
+def _jour(texte_date):
+    """(date, jour exclu) d'une date jj/mm/aaaa ; les mêmes dates reviennent pour chaque association."""
+    jour, mois, annee = texte_date.split("/")
+    try:
+        d = date(int(annee), int(mois), int(jour))
+    except ValueError:
+        return None, False
+    return d, d.weekday() in JOURS_EXCLUS
+
+
+def _montant(texte):
+    try:
+        return float(texte.replace(" ", "").replace(",", "."))
+    except ValueError:
+        return 0.0
+
+
+def enregistrements(flux):
+    """Enregistrements typés (Facture, Association, Passage, Texte) du fichier, en un passage."""
+    for ligne in lignes(flux):
+        ls = ligne.strip()
+
+        if ls.startswith(DEBUT_FACTURE):
+            yield Facture(ligne)
+            continue
+
+        if "Association" in ls:
+            m = PAT_ASSOCIATION.search(ls)
+            if m or ls.startswith("Association"):
+                yield Association(ligne, ls, m.group(1) if m else None)
+                continue
+
+        m = PAT_DATE.match(ls)
+        if m:
+            texte_date, nb = m.groups()
+            d, exclu = _jour(texte_date)
+            detail = PAT_MONTANTS.match(ls) if nb else None
+            yield Passage(
+                ligne,
+                d,
+                int(nb) if nb else None,
+                _montant(detail.group(4)) if detail else None,
+                exclu,
+            )
+            continue
+
+        yield Texte(ligne)
+
+
+# ============================
+# Cotisations : bénéficiaires par association
+# ============================
+def beneficiaires_par_association(flux):
+    """{ code_vif : total des bénéficiaires } sur toutes les lignes de passage."""
+    totaux = defaultdict(int)
+    code_vif = None
+    for e in enregistrements(flux):
+        if type(e) is Association:
+            if e.code_vif:
+                code_vif = e.code_vif
+        elif type(e) is Passage and code_vif and e.nb_beneficiaires is not None:
+            totaux[code_vif] += e.nb_beneficiaires
+    return dict(totaux)
+
+
+# ============================
+# Participation : retrait des ven/sam/dim
+# ============================
+def corriger_participation(flux, sortie_corrigee):
+    """
+    Recopie dans `sortie_corrigee` (fichier texte) les factures sans leurs
+    lignes de détail du vendredi, samedi ou dimanche ; une facture dont
+    toutes les lignes de détail sont retirées disparaît.
+
+    Retourne un dict :
+      - premiere_date : date de la première ligne datée (ou None)
+      - total_corrige, total_supprime : montants cumulés
+      - suppressions : OrderedDict { ligne Association : [lignes retirées..., total] }
+    """
+    premiere_date = None
+    total_corrige = total_supprime = 0.0
+    suppressions = OrderedDict()
+
+    facture, garder, assoc, total_assoc = [], False, "", 0.0
+
+    def fin_facture():
+        if garder:
+            sortie_corrigee.writelines(facture)
+        if assoc and total_assoc > 0:
+            suppressions[assoc].append(f"TOTAL supprimé {assoc} : {total_assoc:.2f} €")
+
+    for e in enregistrements(flux):
+        if type(e) is Facture:
+            if facture:
+                fin_facture()
+            facture, garder, assoc, total_assoc = [], False, "", 0.0
+
+        elif type(e) is Association:
+            assoc = e.libelle
+            suppressions.setdefault(assoc, [])
+
+        elif type(e) is Passage:
+            if premiere_date is None and e.date is not None:
+                premiere_date = e.date
+            if e.total is not None:
+                if e.jour_exclu:
+                    suppressions.setdefault(assoc, []).append(e.ligne.strip())
+                    total_assoc += e.total
+                    total_supprime += e.total
+                    continue
+                garder = True
+                total_corrige += e.total
+
+        facture.append(e.ligne)
+
+    if facture:
+        fin_facture()
+
+    sortie_corrigee.write(f"\n=== TOTAL GÉNÉRAL (corrigé) : {total_corrige:.2f} € ===\n")
+
+    return {
+        "premiere_date": premiere_date,
+        "total_corrige": total_corrige,
+        "total_supprime": total_supprime,
+        "suppressions": suppressions,
+    }
+
+
+def texte_suppressions(resultat):
+    """Contenu du fichier des lignes supprimées, regroupées par association."""
+    blocs = []
+    for assoc, lignes_s in resultat["suppressions"].items():
+        if not lignes_s:
+            continue
+        blocs.append(assoc + "\n" + "\n".join("  " + s for s in lignes_s) + "\n")
+    blocs.append(f"\n=== TOTAL GÉNÉRAL SUPPRIMÉ : {resultat['total_supprime']:.2f} € ===\n")
+    return "".join(blocs)
+
+
+def texte_analyse(resultat):
+    return (
+        f"Total général corrigé : {resultat['total_corrige']:.2f} €\n"
+        f"Total supprimé : {resultat['total_supprime']:.2f} €\n"
+    )
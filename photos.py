@@ -0,0 +1,197 @@
+"""
+Photos des bénévoles : enregistrement, variantes (tailles + WebP) et manifeste
+gardé en mémoire.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import tempfile
+import threading
+
+
+logger = logging.getLogger("BA38")
+
+PHOTO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "photos_benevoles")
+VARIANTES_DIR = os.path.join(PHOTO_DIR, "variantes")
+
+TAILLE_REFERENCE = 400
+TAILLES = {
+    "mini": 64,
+    "vignette": 200,
+    "moyenne": 400,
+}
+QUALITE = {"jpg": 82, "webp": 80}
+CACHE_MAX_AGE_S = 365 * 24 * 3600
+
+PAT_REFERENCE = re.compile(r"^(\d+)\.jpg$")
+PAT_VARIANTE = re.compile(r"^(\d+)_([a-z]+)_([0-9a-f]+)\.(jpg|webp)$")
+
+_lock = threading.Lock()
+_manifeste = {"cle": None, "photos": {}}
+
+
+def _webp_disponible():
+    from PIL import features
+    return features.check("webp")
+
+
+# ============================
+# Écriture
+# ============================
+def _sauver(img, chemin, format_, **options):
+    """Écriture atomique (fichier temporaire + rename) : met à jour la date du dossier."""
+    dossier = os.path.dirname(chemin)
+    fd, tmp = tempfile.mkstemp(dir=dossier, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format_, **options)
+        os.replace(tmp, chemin)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _empreinte(chemin):
+    h = hashlib.sha1()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(64 * 1024), b""):
+            h.update(bloc)
+    return h.hexdigest()[:12]
+
+
+def _supprimer_variantes(benevole_id, sauf=None):
+    if not os.path.isdir(VARIANTES_DIR):
+        return
+    for nom in os.listdir(VARIANTES_DIR):
+        m = PAT_VARIANTE.match(nom)
+        if m and int(m.group(1)) == int(benevole_id) and m.group(3) != sauf:
+            try:
+                os.remove(os.path.join(VARIANTES_DIR, nom))
+            except OSError:
+                pass
+
+
+def generer_variantes(benevole_id, img=None):
+    """
+    Variantes (toutes tailles, JPEG + WebP si Pillow le gère) de la photo de
+    référence `<id>.jpg`. Retourne l'empreinte, ou None s'il n'y a pas de photo.
+    """
+    from PIL import Image
+
+    reference = os.path.join(PHOTO_DIR, f"{benevole_id}.jpg")
+    if not os.path.exists(reference):
+        return None
+    if img is None:
+        with Image.open(reference) as source:
+            img = source.convert("RGB")
+
+    os.makedirs(VARIANTES_DIR, exist_ok=True)
+    empreinte = _empreinte(reference)
+    formats = ["jpg", "webp"] if _webp_disponible() else ["jpg"]
+
+    for taille, cote in TAILLES.items():
+        variante = img.copy()
+        variante.thumbnail((cote, cote), Image.LANCZOS)
+        for ext in formats:
+            chemin = os.path.join(VARIANTES_DIR, f"{benevole_id}_{taille}_{empreinte}.{ext}")
+            if ext == "webp":
+                _sauver(variante, chemin, "WEBP", quality=QUALITE[ext], method=4)
+            else:
+                _sauver(variante, chemin, "JPEG", quality=QUALITE[ext], optimize=True, progressive=True)
+
+    _supprimer_variantes(benevole_id, sauf=empreinte)
+    return empreinte
+
+
+def enregistrer(benevole_id, flux):
+    """
+    Nouvelle photo (fichier envoyé) : orientation EXIF appliquée, photo de
+    référence 400 px sans métadonnées, puis variantes. Retourne le nom du
+    fichier de référence (`<id>.jpg`, table photos_benevoles).
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(flux) as source:
+        img = ImageOps.exif_transpose(source).convert("RGB")
+    img.thumbnail((TAILLE_REFERENCE, TAILLE_REFERENCE), Image.LANCZOS)
+
+    os.makedirs(PHOTO_DIR, exist_ok=True)
+    nom = f"{benevole_id}.jpg"
+    _sauver(img, os.path.join(PHOTO_DIR, nom), "JPEG", quality=85)
+    generer_variantes(benevole_id, img)
+    return nom
+
+
+def supprimer(benevole_id):
+    """Photo de référence et variantes."""
+    reference = os.path.join(PHOTO_DIR, f"{benevole_id}.jpg")
+    if os.path.exists(reference):
+        os.remove(reference)
+    _supprimer_variantes(benevole_id)
+
+
+# ============================
+# Manifeste
+# ============================
+def _mtime(dossier):
+    try:
+        return os.stat(dossier).st_mtime_ns
+    except OSError:
+        return None
+
+
+def manifeste():
+    """
+    { id : {"variantes": {taille: {format: nom}}} } pour chaque bénévole
+    ayant une photo de référence ; relu seulement si un dossier a changé.
+    """
+    cle = (_mtime(PHOTO_DIR), _mtime(VARIANTES_DIR))
+    with _lock:
+        if _manifeste["cle"] == cle:
+            return _manifeste["photos"]
+
+    photos = {}
+    if cle[0] is not None:
+        for nom in os.listdir(PHOTO_DIR):
+            m = PAT_REFERENCE.match(nom)
+            if m:
+                photos[int(m.group(1))] = {"variantes": {}}
+    if cle[1] is not None:
+        for nom in os.listdir(VARIANTES_DIR):
+            m = PAT_VARIANTE.match(nom)
+            if m and int(m.group(1)) in photos:
+                variantes = photos[int(m.group(1))]["variantes"]
+                variantes.setdefault(m.group(2), {})[m.group(4)] = nom
+
+    with _lock:
+        _manifeste.update(cle=cle, photos=photos)
+    return photos
+
+
+def ids_avec_photo():
+    return set(manifeste())
+
+
+def url(benevole_id, taille="vignette", format_="webp"):
+    """
+    URL de la photo à la taille demandée (variante à empreinte si elle
+    existe, sinon photo de référence statique) ; None sans photo.
+    À appeler dans un contexte de requête Flask.
+    """
+    from flask import url_for
+
+    try:
+        benevole_id = int(benevole_id)
+    except (TypeError, ValueError):
+        return None
+    photo = manifeste().get(benevole_id)
+    if photo is None:
+        return None
+    formats = photo["variantes"].get(taille, {})
+    nom = formats.get(format_) or formats.get("jpg")
+    if nom:
+        return url_for("benevoles.photo_variante", nom=nom)
+    return url_for("static", filename=f"photos_benevoles/{benevole_id}.jpg")
@@ -0,0 +1,146 @@
+"""
+Suivi de présence des utilisateurs connectés : passages notés en mémoire,
+écrits par lots dans log_connexions.
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+
+logger = logging.getLogger("BA38")
+
+
+# ============================
+# Paramètres (surchargeables via .env)
+# ============================
+FLUSH_S = float(os.getenv("PRESENCE_FLUSH_S", "30"))
+FENETRE_ACTIF_MIN = int(os.getenv("PRESENCE_ACTIF_MIN", "15"))
+
+
+class PresenceTracker:
+    """Derniers passages en attente d'écriture, par base."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+        self._pid = None
+
+    def touch(self, db_path, email, environ, username=None):
+        with self._lock:
+            self._pending[(db_path, email, environ)] = {
+                "last_seen": datetime.utcnow().isoformat(),
+                "username": username,
+            }
+            self._ensure_thread()
+
+    def en_attente(self, db_path):
+        """Passages non encore écrits pour une base : {(email, environ): infos}."""
+        with self._lock:
+            return {
+                (email, environ): dict(infos)
+                for (path, email, environ), infos in self._pending.items()
+                if path == db_path
+            }
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        par_base = {}
+        for (db_path, email, environ), infos in pending.items():
+            par_base.setdefault(db_path, []).append((infos["last_seen"], email, environ))
+
+        for db_path, lignes in par_base.items():
+            try:
+                self._ecrire(db_path, lignes)
+            except Exception as e:
+                logger.warning(f"⚠️ Écriture last_seen impossible ({db_path}) : {e}")
+
+    def _ecrire(self, db_path, lignes):
+        from db_pool import configure_connection
+
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            configure_connection(conn)
+            conn.executemany("""
+                UPDATE log_connexions
+                SET last_seen = ?
+                WHERE id = (
+                    SELECT id FROM log_connexions
+                    WHERE email = ? AND environ = ?
+                    ORDER BY timestamp DESC
+                    LIMIT 1
+                )
+            """, lignes)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _ensure_thread(self):
+        # Un thread par process : après un fork, l'ancien n'existe plus
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="ba38-presence", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_S)
+            self.flush()
+
+
+_tracker = PresenceTracker()
+atexit.register(_tracker.flush)
+
+
+def touch(db_path, email, environ, username=None):
+    """Note le passage d'un utilisateur (écrit en base au prochain lot)."""
+    _tracker.touch(db_path, email, environ, username)
+
+
+def flush():
+    """Écrit immédiatement les passages en attente."""
+    _tracker.flush()
+
+
+def utilisateurs_actifs(db_path, fenetre_min=FENETRE_ACTIF_MIN):
+    """
+    Utilisateurs vus depuis moins de `fenetre_min` minutes sur cette base.
+    Retourne une liste de dicts triée du plus récent au plus ancien.
+    """
+    limite = (datetime.utcnow() - timedelta(minutes=fenetre_min)).isoformat()
+    actifs = {}
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute("""
+            SELECT email, environ, MAX(username) AS username, MAX(ip) AS ip,
+                   MAX(timestamp) AS connexion_time, MAX(last_seen) AS last_seen
+            FROM log_connexions
+            WHERE last_seen >= ?
+            GROUP BY email, environ
+        """, (limite,)).fetchall()
+    finally:
+        conn.close()
+
+    for r in rows:
+        actifs[(r["email"], r["environ"])] = dict(r)
+
+    # Passages de ce worker pas encore écrits
+    for (email, environ), infos in _tracker.en_attente(db_path).items():
+        actif = actifs.setdefault((email, environ), {
+            "email": email, "environ": environ, "username": infos["username"],
+            "ip": None, "connexion_time": None, "last_seen": None,
+        })
+        if not actif["last_seen"] or infos["last_seen"] > actif["last_seen"]:
+            actif["last_seen"] = infos["last_seen"]
+
+    return sorted(actifs.values(), key=lambda a: a["last_seen"] or "", reverse=True)
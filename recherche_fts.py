@@ -0,0 +1,241 @@
+"""
+Index plein texte (SQLite FTS5) des associations, bénévoles, fournisseurs et
+contacts fournisseurs, tenu à jour par triggers.
+"""
+
+import re
+import logging
+
+
+logger = logging.getLogger("BA38")
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+PREFIXES = "2 3"
+
+# table : clé primaire, colonnes indexées (titre d'abord), colonnes stockées non indexées,
+# nombre de colonnes « titre » (poids fort dans le classement)
+ENTITES = {
+    "associations": {
+        "cle": "Id",
+        "colonnes": [
+            "nom_association", "code_VIF", "raison_sociale_VIF", "COMMUNE", "CP",
+            "courriel_association", "nom_president_ou_officiel", "responsable_operationnel", "CAR",
+        ],
+        "non_indexees": [],
+        "titre": 1,
+    },
+    "benevoles": {
+        "cle": "id",
+        "colonnes": ["nom", "prenom", "email", "ville", "code_postal", "telephone_portable"],
+        "non_indexees": [],
+        "titre": 2,
+    },
+    "fournisseurs": {
+        "cle": "id",
+        "colonnes": ["nom", "enseigne", "societe", "code_vif", "ville", "cp", "mail"],
+        "non_indexees": [],
+        "titre": 1,
+    },
+    "fournisseurs_contacts": {
+        "cle": "id",
+        "colonnes": ["nom", "prenom", "fonction", "email", "ville"],
+        "non_indexees": ["fournisseur_id"],
+        "titre": 2,
+    },
+}
+
+POIDS_TITRE = 10.0
+
+
+def _q(colonne):
+    return '"' + colonne.replace('"', '""') + '"'
+
+
+def table_fts(table):
+    return f"fts_{table}"
+
+
+def _colonnes_table(conn, table):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({_q(table)})").fetchall()]
+
+
+def colonnes_indexees(conn, table):
+    """Colonnes de la table FTS (indexées et stockées), dans l'ordre ; [] si absente."""
+    try:
+        return _colonnes_table(conn, table_fts(table))
+    except Exception:
+        return []
+
+
+# ============================
+# Installation
+# ============================
+def _nom_trigger(table, operation):
+    return f"trg_fts_{table}_{operation.lower()}"
+
+
+def installer(conn, table):
+    """Table FTS5 + triggers + remplissage initial pour `table` (idempotent)."""
+    config = ENTITES[table]
+    existantes = _colonnes_table(conn, table)
+    colonnes = [c for c in config["colonnes"] + config["non_indexees"] if c in existantes]
+    if not colonnes:
+        return
+
+    fts = table_fts(table)
+    anciennes = colonnes_indexees(conn, table)
+    if anciennes and anciennes != colonnes:
+        # Colonnes de la table source modifiées depuis la création de l'index : on le refait
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {_nom_trigger(table, operation)}")
+        conn.execute(f"DROP TABLE {fts}")
+
+    definitions = ", ".join(
+        _q(c) + (" UNINDEXED" if c in config["non_indexees"] else "") for c in colonnes
+    )
+    conn.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{definitions}, tokenize=\"{TOKENIZER}\", prefix='{PREFIXES}')"
+    )
+
+    liste = ", ".join(_q(c) for c in colonnes)
+    nouvelles = ", ".join(f"new.{_q(c)}" for c in colonnes)
+    cle = _q(config["cle"])
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {_nom_trigger(table, "INSERT")}
+        AFTER INSERT ON {_q(table)}
+        BEGIN
+            INSERT INTO {fts} (rowid, {liste}) VALUES (new.{cle}, {nouvelles});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {_nom_trigger(table, "UPDATE")}
+        AFTER UPDATE OF {cle}, {liste} ON {_q(table)}
+        BEGIN
+            DELETE FROM {fts} WHERE rowid = old.{cle};
+            INSERT INTO {fts} (rowid, {liste}) VALUES (new.{cle}, {nouvelles});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {_nom_trigger(table, "DELETE")}
+        AFTER DELETE ON {_q(table)}
+        BEGIN
+            DELETE FROM {fts} WHERE rowid = old.{cle};
+        END
+    """)
+    reconstruire(conn, table)
+
+
+def reconstruire(conn, table):
+    """Recopie complète de la table source dans son index."""
+    colonnes = colonnes_indexees(conn, table)
+    if not colonnes:
+        return 0
+    liste = ", ".join(_q(c) for c in colonnes)
+    fts = table_fts(table)
+    conn.execute(f"DELETE FROM {fts}")
+    conn.execute(
+        f"INSERT INTO {fts} (rowid, {liste}) "
+        f"SELECT {_q(ENTITES[table]['cle'])}, {liste} FROM {_q(table)}"
+    )
+    conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+    conn.commit()
+    return conn.execute(f"SELECT COUNT(*) FROM {fts}").fetchone()[0]
+
+
+def disponible(conn, table):
+    """
+    Index présent et tenu à jour (triggers en place) pour `table`. Une table
+    source recréée perd ses triggers : False (repli en LIKE) jusqu'à
+    `scripts/reconstruire_recherche.py`.
+    """
+    if table not in ENTITES:
+        return False
+    n = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE (type='table' AND name=?) OR (type='trigger' AND name IN (?, ?, ?))",
+        (
+            table_fts(table),
+            _nom_trigger(table, "INSERT"),
+            _nom_trigger(table, "UPDATE"),
+            _nom_trigger(table, "DELETE"),
+        ),
+    ).fetchone()[0]
+    return n == 4
+
+
+# ============================
+# Requêtes
+# ============================
+def expression(texte, colonnes=None):
+    """
+    Expression MATCH : chaque mot saisi devient un préfixe entre guillemets
+    (aucun opérateur FTS5 n'est interprété). None si rien à chercher.
+    `colonnes` restreint la recherche à ces colonnes de l'index.
+    """
+    mots = [m for m in re.split(r"\s+", texte or "") if m.strip("\"*")]
+    if not mots:
+        return None
+    termes = " ".join('"' + m.replace('"', '""') + '"*' for m in mots)
+    if colonnes:
+        return "{" + " ".join(_q(c) for c in colonnes) + "} : (" + termes + ")"
+    return termes
+
+
+def condition(conn, table, texte, colonnes=None, cle=None):
+    """
+    (clause SQL, paramètres) restreignant `table` aux lignes trouvées par
+    l'index, à ajouter à un WHERE ; None si l'index n'est pas disponible
+    (l'appelant garde alors son LIKE).
+    """
+    if not disponible(conn, table):
+        return None
+    if colonnes:
+        colonnes = [c for c in colonnes if c in colonnes_indexees(conn, table)]
+        if not colonnes:
+            return None
+    expr = expression(texte, colonnes)
+    if expr is None:
+        return None
+    fts = table_fts(table)
+    cle = cle or ENTITES[table]["cle"]
+    return f"{_q(cle)} IN (SELECT rowid FROM {fts} WHERE {fts} MATCH ?)", [expr]
+
+
+def rechercher(conn, texte, tables=None, limite=20):
+    """
+    Recherche classée sur plusieurs entités.
+    Retourne une liste de dicts {table, id, score, valeurs} triée par score
+    bm25 croissant (le plus pertinent d'abord), `limite` résultats au plus.
+    """
+    expr = expression(texte)
+    if expr is None:
+        return []
+
+    resultats = []
+    for table in tables or ENTITES:
+        if not disponible(conn, table):
+            continue
+        colonnes = colonnes_indexees(conn, table)
+        nb_titre = ENTITES[table]["titre"]
+        poids = ", ".join(str(POIDS_TITRE if i < nb_titre else 1.0) for i in range(len(colonnes)))
+        fts = table_fts(table)
+        try:
+            lignes = conn.execute(
+                f"SELECT rowid, bm25({fts}, {poids}) AS score, {', '.join(_q(c) for c in colonnes)} "
+                f"FROM {fts} WHERE {fts} MATCH ? ORDER BY score LIMIT ?",
+                (expr, limite),
+            ).fetchall()
+        except Exception as e:
+            logger.warning(f"⚠️ Recherche plein texte {table} : {e}")
+            continue
+        for ligne in lignes:
+            resultats.append({
+                "table": table,
+                "id": ligne[0],
+                "score": ligne[1],
+                "valeurs": dict(zip(colonnes, tuple(ligne)[2:])),
+            })
+
+    resultats.sort(key=lambda r: r["score"])
+    return resultats[:limite]
@@ -0,0 +1,124 @@
+"""
+Banc d'essai du démarrage d'un worker : temps d'import de `ba38`
+(`python -X importtime`) et détection des dépendances lourdes chargées
+avant la première requête.
+
+Échoue (code 1) si un module lourd (pandas, reportlab, WeasyPrint, …) est
+importé au démarrage, si le temps total dépasse --max-ms, ou s'il régresse
+de plus de --tolerance par rapport à la référence enregistrée
+(scripts/bench_demarrage_reference.json, versionnée avec le code).
+
+Usage :
+    python scripts/bench_demarrage.py
+    python scripts/bench_demarrage.py --top 30 --max-ms 1500
+    python scripts/bench_demarrage.py --enregistrer     # nouvelle référence
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFERENCE = os.path.join(RACINE, "scripts", "bench_demarrage_reference.json")
+
+# Paquets à ne charger qu'à la première utilisation (imports locaux)
+MODULES_LOURDS = (
+    "pandas", "numpy", "reportlab", "weasyprint", "pdf2image", "openai",
+    "gspread", "pydrive2", "oauth2client", "googleapiclient", "docx",
+    "fpdf", "pypdf", "openpyxl",
+)
+
+
+def _importtime(code):
+    """{module: cumul µs} des imports faits par `python -X importtime -c code`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=RACINE, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"❌ Échec de : {code}")
+
+    cumuls = {}
+    for ligne in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not ligne.startswith("import time:") or "self [us]" in ligne:
+            continue
+        try:
+            _, cumul, nom = ligne[len("import time:"):].split("|")
+            cumuls[nom.strip()] = int(cumul)
+        except ValueError:
+            continue
+    return cumuls
+
+
+def mesurer(module, repetitions):
+    """
+    Importe `module` dans un interpréteur neuf, `repetitions` fois.
+    Retourne (meilleur total en µs, {module: cumul µs} de ce passage),
+    sans les modules déjà chargés par l'interpréteur seul (site, …).
+    """
+    demarrage = set(_importtime("pass"))
+    meilleur = None
+    for _ in range(repetitions):
+        cumuls = {
+            nom: cumul for nom, cumul in _importtime(f"import {module}").items()
+            if nom not in demarrage
+        }
+        total = cumuls.get(module, 0)
+        if meilleur is None or total < meilleur[0]:
+            meilleur = (total, cumuls)
+    return meilleur
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de démarrage de l'application.")
+    parser.add_argument("--module", default="ba38", help="Module à importer (défaut : ba38)")
+    parser.add_argument("--repetitions", type=int, default=3, help="Passages (on garde le meilleur)")
+    parser.add_argument("--top", type=int, default=15, help="Modules les plus lents affichés")
+    parser.add_argument("--max-ms", type=float, default=None, help="Temps d'import maximal accepté")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Régression acceptée / référence (0.25 = +25 %%)")
+    parser.add_argument("--enregistrer", action="store_true", help="Enregistre le résultat comme référence")
+    args = parser.parse_args()
+
+    total_us, cumuls = mesurer(args.module, args.repetitions)
+    total_ms = total_us / 1000
+    print(f"🚀 import {args.module} : {total_ms:.0f} ms ({len(cumuls)} modules)")
+
+    print(f"\n  {'module':<48} {'cumul':>10}")
+    for nom, cumul in sorted(cumuls.items(), key=lambda x: -x[1])[:args.top]:
+        print(f"  {nom:<48} {cumul / 1000:7.1f} ms")
+
+    echecs = []
+    racines = sorted({n.split(".")[0] for n in cumuls if n.split(".")[0] in MODULES_LOURDS})
+    if racines:
+        echecs.append(f"modules lourds importés au démarrage : {', '.join(racines)}")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        echecs.append(f"{total_ms:.0f} ms > --max-ms {args.max_ms:.0f} ms")
+
+    if args.enregistrer:
+        with open(REFERENCE, "w", encoding="utf-8") as f:
+            json.dump({"module": args.module, "total_ms": round(total_ms, 1)}, f, indent=2)
+        print(f"\n💾 Référence enregistrée : {REFERENCE}")
+    elif os.path.exists(REFERENCE):
+        with open(REFERENCE, encoding="utf-8") as f:
+            reference = json.load(f)
+        if reference.get("module") == args.module:
+            limite = reference["total_ms"] * (1 + args.tolerance)
+            print(f"\n📏 Référence : {reference['total_ms']:.0f} ms (limite {limite:.0f} ms)")
+            if total_ms > limite:
+                echecs.append(f"régression : {total_ms:.0f} ms > {limite:.0f} ms")
+
+    if echecs:
+        for e in echecs:
+            print(f"❌ {e}")
+        return 1
+    print("\n✅ Démarrage conforme")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
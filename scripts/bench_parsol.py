@@ -0,0 +1,101 @@
+"""
+Banc d'essai du lecteur PARSOL2L (parsol.py) sur un fichier synthétique.
+
+Génère un fichier PARSOL2L de N années (factures mensuelles par association,
+une ligne de détail par jour de distribution), puis mesure pour chaque
+traitement le temps et le pic mémoire Python (tracemalloc).
+
+Usage :
+    python scripts/bench_parsol.py --annees 3 --associations 120
+    python scripts/bench_parsol.py --garder /tmp/parsol_synthetique.txt
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsol
+
+
+def generer(chemin, annees, associations, encodage="cp1252", graine=38):
+    """Fichier PARSOL2L synthétique ; retourne sa taille en octets."""
+    rnd = random.Random(graine)
+    debut = date(date.today().year - annees, 1, 1)
+    noms = [f"Association {i:03d} – Épicerie solidaire" for i in range(associations)]
+
+    with open(chemin, "w", encoding=encodage, newline="") as f:
+        for mois in range(annees * 12):
+            premier = date(debut.year + mois // 12, mois % 12 + 1, 1)
+            suivant = date(premier.year + (premier.month == 12), premier.month % 12 + 1, 1)
+            for i, nom in enumerate(noms):
+                f.write("BA. de l'Isère                         FACTURE DE PARTICIPATION\r\n")
+                f.write(f"Période du {premier:%d/%m/%Y} au {suivant - timedelta(days=1):%d/%m/%Y}\r\n")
+                f.write(f"Association : {38000000 + i:08d} {nom}\r\n")
+                f.write("Date         Bénéf.   Participation      Total\r\n")
+                jour = premier
+                while jour < suivant:
+                    if rnd.random() < 0.35:
+                        nb = rnd.randint(5, 120)
+                        prix = rnd.choice([0.5, 0.8, 1.2])
+                        f.write(f"{jour:%d/%m/%Y}   {nb:6d}   {prix:10.2f}   {nb * prix:10.2f}\r\n".replace(".", ","))
+                    jour += timedelta(days=1)
+                f.write("\f\r\n")
+    return os.path.getsize(chemin)
+
+
+def mesurer(nom, fonction):
+    tracemalloc.start()
+    debut = time.perf_counter()
+    resultat = fonction()
+    duree = time.perf_counter() - debut
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {nom:<34} {duree:7.2f} s   pic mémoire {pic / 1024 / 1024:7.1f} Mo")
+    return resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai du lecteur PARSOL2L.")
+    parser.add_argument("--annees", type=int, default=3)
+    parser.add_argument("--associations", type=int, default=120)
+    parser.add_argument("--garder", help="Chemin où conserver le fichier généré")
+    args = parser.parse_args()
+
+    chemin = args.garder or os.path.join(tempfile.mkdtemp(prefix="bench_parsol_"), "parsol2l.txt")
+    taille = generer(chemin, args.annees, args.associations)
+    print(f"📄 {chemin} : {taille / 1024 / 1024:.1f} Mo ({args.annees} an(s), {args.associations} associations)")
+
+    def enregistrements():
+        with open(chemin, "rb") as f:
+            return sum(1 for _ in parsol.enregistrements(f))
+
+    def cotisations():
+        with open(chemin, "rb") as f:
+            return parsol.beneficiaires_par_association(f)
+
+    def participation():
+        with open(chemin, "rb") as f, open(os.devnull, "w", encoding="utf-8", newline="") as sortie:
+            return parsol.corriger_participation(f, sortie)
+
+    nb = mesurer("lecture des enregistrements", enregistrements)
+    benefs = mesurer("cotisations (bénéficiaires)", cotisations)
+    resultat = mesurer("participation (ven/sam/dim)", participation)
+
+    print(f"🔢 {nb} enregistrements, {len(benefs)} associations, "
+          f"{sum(benefs.values())} bénéficiaires")
+    print(f"💶 corrigé {resultat['total_corrige']:.2f} €, supprimé {resultat['total_supprime']:.2f} €")
+
+    if not args.garder:
+        os.remove(chemin)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
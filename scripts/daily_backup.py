@@ -6,13 +6,17 @@ from datetime import datetime
 sys.path.append("/home/ndprz/ba380")
 
 from utils import write_log, get_drive
+from drive_replication import snapshot_database
 
 # Chemin vers la base à sauvegarder
 LOCAL_DB_PATH = "/home/ndprz/ba380/ba380.sqlite"
 FOLDER_ID_BACKUP = "1tBHcdUcMog7CiMQqM9mX-DEvA0hpI3aa"  # dossier Google Drive
 
 def upload_backup():
+    snapshot_path = None
     try:
+        # Snapshot cohérent (WAL compris) plutôt que le fichier de la base vivante
+        snapshot_path = snapshot_database(LOCAL_DB_PATH)
         drive = get_drive()
         today = datetime.now().strftime("%Y-%m-%d")
         filename = f"ba380_backup_{today}.sqlite"
@@ -21,11 +25,14 @@ def upload_backup():
             'parents': [{'id': FOLDER_ID_BACKUP}],
             'supportsAllDrives': True
         })
-        file_drive.SetContentFile(LOCAL_DB_PATH)
+        file_drive.SetContentFile(snapshot_path)
         file_drive.Upload(param={'supportsAllDrives': True})
         write_log(f"✅ Sauvegarde quotidienne envoyée : {filename}")
     except Exception as e:
         write_log(f"❌ Erreur dans daily_backup : {e}")
+    finally:
+        if snapshot_path and os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
 
 if __name__ == "__main__":
     upload_backup()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Génère les variantes (tailles + WebP) des photos de bénévoles qui n'en ont
+pas encore : photos enregistrées avant le module photos, ou copiées à la
+main dans static/photos_benevoles.
+
+Usage :
+    python scripts/generer_variantes_photos.py            # photos sans variantes
+    python scripts/generer_variantes_photos.py --toutes   # régénère tout
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import photos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variantes des photos de bénévoles.")
+    parser.add_argument("--toutes", action="store_true", help="Régénère aussi les photos qui ont déjà des variantes")
+    args = parser.parse_args()
+
+    manifeste = photos.manifeste()
+    a_faire = sorted(
+        i for i, p in manifeste.items()
+        if args.toutes or set(p["variantes"]) != set(photos.TAILLES)
+    )
+    print(f"📸 {len(manifeste)} photo(s), {len(a_faire)} à traiter")
+
+    erreurs = 0
+    for benevole_id in a_faire:
+        try:
+            photos.generer_variantes(benevole_id)
+        except Exception as e:
+            erreurs += 1
+            print(f"❌ {benevole_id} : {e}")
+    print("✅ Terminé" if not erreurs else f"⚠️ {erreurs} erreur(s)")
+    return 1 if erreurs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
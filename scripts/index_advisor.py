@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Advisor d'index : passe les requêtes chaudes de l'application à
+EXPLAIN QUERY PLAN et signale les parcours complets de table.
+
+Usage :
+    python scripts/index_advisor.py                 # bases de l'environnement
+    python scripts/index_advisor.py chemin.sqlite   # base précise
+    python scripts/index_advisor.py --migrer ...    # applique d'abord les migrations
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from db_migrations import analyser_requetes, appliquer_migrations, bases_de_l_environnement
+
+
+def auditer(db_path, migrer=False):
+    print(f"\n📂 {db_path}")
+    conn = sqlite3.connect(db_path)
+    try:
+        if migrer:
+            nouvelles = appliquer_migrations(conn)
+            print(f"🗂️ Migrations appliquées : {nouvelles or 'aucune'}")
+
+        nb_scans = 0
+        for r in analyser_requetes(conn):
+            if r["erreur"]:
+                print(f"⚪ {r['nom']} : ignorée ({r['erreur']})")
+            elif r["scans"]:
+                nb_scans += 1
+                print(f"❌ {r['nom']} : {' | '.join(r['scans'])}")
+            else:
+                print(f"✅ {r['nom']} : {' | '.join(r['plan'])}")
+        return nb_scans
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Détecte les parcours complets de table sur les requêtes chaudes.")
+    parser.add_argument("bases", nargs="*", help="Bases SQLite à auditer (défaut : celles de l'environnement)")
+    parser.add_argument("--migrer", action="store_true", help="Applique les migrations d'index avant l'audit")
+    args = parser.parse_args()
+
+    load_dotenv()
+    bases = args.bases or bases_de_l_environnement()
+    if not bases:
+        print("❌ Aucune base trouvée (BA38_BASE_DIR / SQLITE_DB_* non définis ?)")
+        return 1
+
+    total = sum(auditer(b, migrer=args.migrer) for b in bases)
+    print(f"\n{'✅ Aucun parcours complet.' if not total else f'⚠️ {total} requête(s) en parcours complet.'}")
+    return 1 if total else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Faux Mailjet local (API v3.1 /send et recherche v3 /REST/message par
+CustomID) pour tester et mesurer l'envoi de campagnes hors ligne, sans
+envoyer de vrais mails.
+
+Usage :
+    # 1) Serveur seul (puis MAILJET_API_URL=http://127.0.0.1:8025/v3.1/send
+    #    et MAILJET_API_MESSAGES_URL=http://127.0.0.1:8025/v3/REST/message)
+    python scripts/mailjet_local.py serve --port 8025 --latence-ms 150 --taux-429 0.05
+
+    # 2) Banc d'essai : serveur + campagne synthétique sur une base temporaire
+    python scripts/mailjet_local.py bench --messages 500 --latence-ms 150
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FauxMailjet(BaseHTTPRequestHandler):
+    latence_s = 0.0
+    taux_429 = 0.0
+    taux_erreur = 0.0
+    compteurs = {"appels": 0, "messages": 0, "429": 0}
+    acceptes = {}
+    _lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _repondre(self, code, corps):
+        donnees = json.dumps(corps).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(donnees)))
+        self.end_headers()
+        self.wfile.write(donnees)
+
+    def do_GET(self):
+        from urllib.parse import urlparse, parse_qs
+
+        url = urlparse(self.path)
+        if url.path != "/v3/REST/message":
+            return self._repondre(404, {"ErrorMessage": "Inconnu"})
+        custom_id = parse_qs(url.query).get("CustomID", [""])[0]
+        with self._lock:
+            ids = list(self.acceptes.get(custom_id, []))
+        self._repondre(200, {"Count": len(ids), "Data": [{"ID": i, "CustomID": custom_id} for i in ids]})
+
+    def do_POST(self):
+        longueur = int(self.headers.get("Content-Length", 0))
+        corps = json.loads(self.rfile.read(longueur) or b"{}")
+        time.sleep(self.latence_s)
+
+        if not self.headers.get("Authorization"):
+            return self._repondre(401, {"ErrorMessage": "API key authentication/authorization failure"})
+
+        if random.random() < self.taux_429:
+            with self._lock:
+                self.compteurs["429"] += 1
+            return self._repondre(429, {"ErrorMessage": "Too many requests"})
+
+        messages = corps.get("Messages", [])
+        if not messages or len(messages) > 50:
+            return self._repondre(400, {"ErrorMessage": "Messages : entre 1 et 50"})
+
+        resultats = []
+        for m in messages:
+            if random.random() < self.taux_erreur:
+                resultats.append({"Status": "error", "Errors": [{"ErrorCode": "mj-0013", "ErrorMessage": "Simulé"}]})
+            else:
+                ids = [random.randint(10**15, 10**16) for _ in m.get("To", [])]
+                with self._lock:
+                    self.acceptes.setdefault(m.get("CustomID", ""), []).extend(ids)
+                resultats.append({
+                    "Status": "success",
+                    "CustomID": m.get("CustomID", ""),
+                    "To": [{"Email": t["Email"], "MessageID": i} for t, i in zip(m.get("To", []), ids)],
+                })
+
+        with self._lock:
+            self.compteurs["appels"] += 1
+            self.compteurs["messages"] += len(messages)
+        self._repondre(200, {"Messages": resultats})
+
+
+def demarrer(port, latence_ms, taux_429, taux_erreur):
+    FauxMailjet.latence_s = latence_ms / 1000
+    FauxMailjet.taux_429 = taux_429
+    FauxMailjet.taux_erreur = taux_erreur
+    serveur = ThreadingHTTPServer(("127.0.0.1", port), FauxMailjet)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def bench(args):
+    serveur = demarrer(args.port, args.latence_ms, args.taux_429, args.taux_erreur)
+    os.environ["MAILJET_API_URL"] = f"http://127.0.0.1:{serveur.server_address[1]}/v3.1/send"
+    os.environ["MAILJET_API_MESSAGES_URL"] = f"http://127.0.0.1:{serveur.server_address[1]}/v3/REST/message"
+    os.environ.setdefault("MAILJET_API_KEY", "local")
+    os.environ.setdefault("MAILJET_API_SECRET", "local")
+    os.environ["MAIL_CAMPAGNES_DIR"] = tempfile.mkdtemp(prefix="ba38_bench_campagnes_")
+
+    import mail_campagnes
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="ba38_bench_"), "bench.sqlite")
+    # Un PDF par message : chacun est supprimé une fois son mail parti
+    contenu = os.urandom(args.taille_pj_ko * 1024)
+    messages = []
+    for i in range(args.messages):
+        pj = os.path.join(os.environ["MAIL_CAMPAGNES_DIR"], f"facture_{i:05d}.pdf")
+        with open(pj, "wb") as f:
+            f.write(contenu)
+        messages.append({
+            "cle": f"ASSO{i:05d}",
+            "destinataires": [f"asso{i}@exemple.org"],
+            "sujet": f"Appel de cotisation – Association {i}",
+            "texte": "Madame, Monsieur,\n\nVotre cotisation...\n",
+            "piece_jointe": {"chemin": pj},
+        })
+
+    debut = time.perf_counter()
+    mail_campagnes.creer_campagne(db_path, "bench", "Banc d'essai", "bench@exemple.org", "TEST", messages)
+    while True:
+        etat = mail_campagnes.etat(db_path, "bench")
+        if etat["statut"] in ("termine", "erreur"):
+            break
+        time.sleep(0.1)
+    duree = time.perf_counter() - debut
+
+    print(f"📧 {etat['faites']} envoyés, {etat['erreurs']} en erreur en {duree:.2f} s "
+          f"→ {etat['faites'] / duree:.1f} msg/s")
+    print(f"🌐 {FauxMailjet.compteurs['appels']} appels HTTP acceptés, {FauxMailjet.compteurs['429']} réponses 429")
+
+    # Idempotence : relancer la campagne n'envoie rien de plus
+    avant = FauxMailjet.compteurs["messages"]
+    nouveaux, deja = mail_campagnes.creer_campagne(db_path, "bench", "Banc d'essai", "bench@exemple.org", "TEST", messages)
+    while mail_campagnes.etat(db_path, "bench")["statut"] not in ("termine", "erreur"):
+        time.sleep(0.1)
+    print(f"🔁 Relance : {nouveaux} nouveau(x), {deja} déjà envoyé(s), "
+          f"{FauxMailjet.compteurs['messages'] - avant} message(s) renvoyé(s)")
+    serveur.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux Mailjet local (API v3.1).")
+    sous = parser.add_subparsers(dest="commande", required=True)
+    for nom in ("serve", "bench"):
+        p = sous.add_parser(nom)
+        p.add_argument("--port", type=int, default=8025 if nom == "serve" else 0)
+        p.add_argument("--latence-ms", type=float, default=100)
+        p.add_argument("--taux-429", type=float, default=0.0)
+        p.add_argument("--taux-erreur", type=float, default=0.0)
+    sous.choices["bench"].add_argument("--messages", type=int, default=300)
+    sous.choices["bench"].add_argument("--taille-pj-ko", type=int, default=40)
+    args = parser.parse_args()
+
+    if args.commande == "serve":
+        serveur = demarrer(args.port, args.latence_ms, args.taux_429, args.taux_erreur)
+        print(f"📮 Faux Mailjet sur http://127.0.0.1:{serveur.server_address[1]}/v3.1/send (Ctrl+C pour arrêter)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            serveur.shutdown()
+    else:
+        bench(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,7 @@ sys.path.append('/home/ndprz/ba380')
 
 
 from utils import get_db_path, upload_database, write_log
+import config_cache
 
 import sqlite3
 
@@ -95,6 +96,8 @@ def migrate_benevoles_ramasse_fields():
             """, (field, 'Ramasse - Tri', i, 'benevoles'))
 
         conn.commit()
+        # Les workers en cours rechargent field_groups
+        config_cache.marquer_modifie(conn)
         write_log("✅ field_groups mis à jour.")
         upload_database()
         write_log("📤 Base sauvegardée sur Google Drive.")
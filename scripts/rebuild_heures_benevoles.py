@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Reconstruction complète de la table de faits `heures_benevoles`
+(rapport d'activité des bénévoles).
+
+En temps normal la table est tenue à jour par les triggers et recalculée
+à la volée par le rapport ; ce script sert après un import massif, une
+modification des règles de calcul ou en cas de doute.
+
+Usage :
+    python scripts/rebuild_heures_benevoles.py                 # bases de l'environnement
+    python scripts/rebuild_heures_benevoles.py chemin.sqlite   # base précise
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from db_migrations import bases_de_l_environnement
+import heures_benevoles
+
+
+def reconstruire(db_path):
+    print(f"\n📂 {db_path}")
+    debut = time.perf_counter()
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        nb_semaines = heures_benevoles.reconstruire(conn)
+        nb_lignes = conn.execute("SELECT COUNT(*) FROM heures_benevoles").fetchone()[0]
+    finally:
+        conn.close()
+    print(f"✅ {nb_semaines} semaine(s), {nb_lignes} poste(s) en {time.perf_counter() - debut:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruit la table de faits heures_benevoles.")
+    parser.add_argument("bases", nargs="*", help="Bases SQLite à traiter (défaut : celles de l'environnement)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    bases = args.bases or bases_de_l_environnement()
+    if not bases:
+        print("❌ Aucune base trouvée (BA38_BASE_DIR / SQLITE_DB_* non définis ?)")
+        return 1
+
+    for b in bases:
+        reconstruire(b)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
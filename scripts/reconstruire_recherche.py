@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+(Ré)installe l'index plein texte FTS5 (recherche_fts) : tables fts_*,
+triggers de synchronisation et remplissage complet.
+
+À lancer après un script qui recrée une table indexée (rename_field,
+migrate_associations_autoincrement...) : les triggers disparaissent avec
+l'ancienne table et la recherche repasse en LIKE jusque-là.
+
+Usage :
+    python scripts/reconstruire_recherche.py                 # bases de l'environnement
+    python scripts/reconstruire_recherche.py chemin.sqlite   # base précise
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from db_migrations import bases_de_l_environnement
+import recherche_fts
+
+
+def reconstruire(db_path):
+    print(f"\n📂 {db_path}")
+    conn = sqlite3.connect(db_path)
+    try:
+        for table in recherche_fts.ENTITES:
+            existe = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+            ).fetchone()
+            if not existe:
+                print(f"⚪ {table} : table absente")
+                continue
+            recherche_fts.installer(conn, table)
+            n = conn.execute(f"SELECT COUNT(*) FROM {recherche_fts.table_fts(table)}").fetchone()[0]
+            print(f"✅ {table} : {n} ligne(s) indexée(s)")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réinstalle l'index plein texte FTS5.")
+    parser.add_argument("bases", nargs="*", help="Bases SQLite (défaut : celles de l'environnement)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    bases = args.bases or bases_de_l_environnement()
+    if not bases:
+        print("❌ Aucune base trouvée (BA38_BASE_DIR / SQLITE_DB_* non définis ?)")
+        return 1
+
+    for b in bases:
+        reconstruire(b)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ import sqlite3
 from flask import Blueprint, request, render_template, redirect, url_for, flash
 from dotenv import dotenv_values
 from utils import write_log
+import config_cache
 
 env_vars = dotenv_values('/home/ndprz/dev/.env')
 rename_bp = Blueprint("rename", __name__)
@@ -120,6 +121,7 @@ def rename_field():
                             WHERE field_name = ? AND appli = ?
                         """, (new_col, display_order, old_col, table))
                         conn.commit()
+                        config_cache.marquer_modifie(conn)
                         write_log(f"✏️ field_groups mis à jour : {old_col} → {new_col}, display_order = {display_order}")
 
                 # 🔁 Renommage de la colonne SQL
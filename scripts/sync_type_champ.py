@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
+import sys
 import sqlite3
 from pathlib import Path
 
+sys.path.append("/home/ndprz/ba380")
+
+import config_cache
+
 db_path = Path("/home/ndprz/ba380/ba380.sqlite")
 values = ["text", "email", "tel", "number", "oui_non"]
 
@@ -20,5 +25,8 @@ with sqlite3.connect(db_path) as conn:
             )
             inserted += 1
     conn.commit()
+    if inserted:
+        # Les workers en cours rechargent les paramètres
+        config_cache.marquer_modifie(conn)
 
 print(f"✅ Paramètres insérés : {inserted}")
@@ -0,0 +1,260 @@
+"""
+Sessions Flask stockées dans une base SQLite dédiée, indexée et purgée par lots.
+"""
+
+import os
+import time
+import secrets
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+from flask import request
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+
+
+logger = logging.getLogger("BA38")
+
+
+# ============================
+# Paramètres (surchargeables via .env)
+# ============================
+RAFRAICHIR_S = int(os.getenv("SESSION_RAFRAICHIR_S", "60"))
+BALAYAGE_S = int(os.getenv("SESSION_BALAYAGE_S", "300"))
+BALAYAGE_LOT = int(os.getenv("SESSION_BALAYAGE_LOT", "500"))
+BALAYAGE_MAX_LOTS = 20
+FENETRE_ACTIF_MIN = int(os.getenv("PRESENCE_ACTIF_MIN", "15"))
+
+
+# ============================
+# Base des sessions
+# ============================
+_local = threading.local()
+_lock = threading.Lock()
+_installees = set()
+
+
+def _installer(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            donnees TEXT NOT NULL,
+            user_id TEXT,
+            username TEXT,
+            role TEXT,
+            environ TEXT,
+            ip TEXT,
+            cree REAL NOT NULL,
+            maj REAL NOT NULL,
+            expire REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expire ON sessions (expire)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id, environ)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_environ_maj ON sessions (environ, maj)")
+    conn.commit()
+
+
+def connexion(chemin):
+    """Connexion à la base des sessions, une par thread (et par process)."""
+    cache = getattr(_local, "connexions", None)
+    if cache is None or _local.pid != os.getpid():
+        cache = _local.connexions = {}
+        _local.pid = os.getpid()
+    conn = cache.get(chemin)
+    if conn is None:
+        os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+        conn = sqlite3.connect(chemin, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _lock:
+            a_installer = chemin not in _installees
+        if a_installer:
+            _installer(conn)
+            with _lock:
+                _installees.add(chemin)
+        cache[chemin] = conn
+    return conn
+
+
+# ============================
+# Interface de session Flask
+# ============================
+class SessionSQLite(CallbackDict, SessionMixin):
+    """Session serveur : dictionnaire qui note ses modifications."""
+
+    def __init__(self, initial=None, sid=None, nouvelle=False, maj=None):
+        def on_update(s):
+            s.modified = True
+            s.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = nouvelle
+        self.maj = maj
+        self.modified = False
+        self.accessed = False
+
+
+class SessionInterfaceSQLite(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, chemin, environ):
+        self.chemin = chemin
+        self.environ = environ
+        self._dernier_balayage = 0.0
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="ba38-session", key_derivation="hmac")
+
+    def _nouvelle(self):
+        return SessionSQLite(sid=secrets.token_urlsafe(32), nouvelle=True)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self._nouvelle()
+        try:
+            sid = self._signer(app).unsign(cookie).decode("utf-8")
+        except BadSignature:
+            return self._nouvelle()
+
+        try:
+            row = connexion(self.chemin).execute(
+                "SELECT donnees, maj FROM sessions WHERE id = ? AND expire > ?",
+                (sid, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Lecture de session impossible : {e}")
+            return self._nouvelle()
+        if row is None:
+            return self._nouvelle()
+        try:
+            donnees = self.serializer.loads(row[0])
+        except Exception:
+            return self._nouvelle()
+        return SessionSQLite(donnees, sid=sid, maj=row[1])
+
+    def save_session(self, app, session, response):
+        nom = self.get_cookie_name(app)
+        domaine = self.get_cookie_domain(app)
+        chemin_cookie = self.get_cookie_path(app)
+        conn = connexion(self.chemin)
+
+        if not session:
+            # Session vidée (déconnexion) : ligne et cookie supprimés
+            if session.modified and not session.new:
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session.sid,))
+                conn.commit()
+                response.delete_cookie(nom, domain=domaine, path=chemin_cookie)
+            return
+
+        maintenant = time.time()
+        expire = maintenant + app.permanent_session_lifetime.total_seconds()
+        ecrire = session.modified or session.new
+        try:
+            if ecrire:
+                conn.execute("""
+                    INSERT INTO sessions (id, donnees, user_id, username, role, environ, ip, cree, maj, expire)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        donnees = excluded.donnees, user_id = excluded.user_id,
+                        username = excluded.username, role = excluded.role,
+                        environ = excluded.environ, ip = excluded.ip,
+                        maj = excluded.maj, expire = excluded.expire
+                """, (
+                    session.sid, self.serializer.dumps(dict(session)),
+                    session.get("user_id"), session.get("username"), session.get("user_role"),
+                    self.environ, request.remote_addr, maintenant, maintenant, expire,
+                ))
+                conn.commit()
+            elif maintenant - (session.maj or 0) >= RAFRAICHIR_S:
+                conn.execute(
+                    "UPDATE sessions SET maj = ?, expire = ?, ip = ? WHERE id = ?",
+                    (maintenant, expire, request.remote_addr, session.sid),
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Écriture de session impossible : {e}")
+            return
+
+        if ecrire or self.should_set_cookie(app, session):
+            response.set_cookie(
+                nom,
+                self._signer(app).sign(session.sid.encode("utf-8")).decode("utf-8"),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domaine,
+                path=chemin_cookie,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+        if maintenant - self._dernier_balayage >= BALAYAGE_S:
+            self._dernier_balayage = maintenant
+            balayer(self.chemin)
+
+
+def init_app(app, chemin, environ):
+    app.config["SESSION_SQLITE_PATH"] = chemin
+    app.session_interface = SessionInterfaceSQLite(chemin, environ)
+
+
+# ============================
+# Purge et consultation
+# ============================
+def balayer(chemin):
+    """Supprime les sessions expirées par lots (transactions courtes). Retourne le nombre supprimé."""
+    conn = connexion(chemin)
+    total = 0
+    try:
+        for _ in range(BALAYAGE_MAX_LOTS):
+            cur = conn.execute(
+                "DELETE FROM sessions WHERE id IN "
+                "(SELECT id FROM sessions WHERE expire <= ? LIMIT ?)",
+                (time.time(), BALAYAGE_LOT),
+            )
+            conn.commit()
+            total += cur.rowcount
+            if cur.rowcount < BALAYAGE_LOT:
+                break
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Purge des sessions impossible : {e}")
+    if total:
+        logger.info(f"🧹 {total} session(s) expirée(s) supprimée(s)")
+    return total
+
+
+def _iso(horodatage):
+    return datetime.utcfromtimestamp(horodatage).isoformat(timespec="seconds") if horodatage else None
+
+
+def connectes(chemin, environ=None, fenetre_min=FENETRE_ACTIF_MIN):
+    """
+    Utilisateurs actifs depuis moins de `fenetre_min` minutes (un par
+    utilisateur et environnement), du plus récent au plus ancien.
+    """
+    maintenant = time.time()
+    conditions = ["maj >= ?", "expire > ?", "user_id IS NOT NULL"]
+    params = [maintenant - 60 * fenetre_min, maintenant]
+    if environ:
+        conditions.insert(0, "environ = ?")
+        params.insert(0, environ)
+    rows = connexion(chemin).execute(f"""
+        SELECT user_id, MAX(username), MAX(role), environ, MAX(ip), MAX(maj), COUNT(*)
+        FROM sessions
+        WHERE {" AND ".join(conditions)}
+        GROUP BY user_id, environ
+        ORDER BY MAX(maj) DESC
+    """, params).fetchall()
+    return [
+        {
+            "user_id": r[0], "username": r[1], "role": r[2], "environ": r[3],
+            "ip": r[4], "last_seen": _iso(r[5]), "nb_sessions": r[6],
+        }
+        for r in rows
+    ]
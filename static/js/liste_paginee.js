@@ -0,0 +1,142 @@
+/*
+ * Listes paginées (bénévoles, partenaires, fournisseurs).
+ *
+ * La page rend la première page du tableau ; les suivantes sont demandées
+ * à l'API JSON de la liste (`.../api/liste`) quand le bouton « Charger
+ * plus » devient visible (ou au clic). La recherche et le tri (clic sur un
+ * en-tête `th[data-tri]`) sont faits côté serveur et repartent du début.
+ *
+ * <table id="..." data-api="/benevoles/api/liste"
+ *        data-params="has_interacted=1&columns=..."   (paramètres fixes)
+ *        data-suivant="<curseur>" data-total="123"
+ *        data-tri="nom" data-sens="asc">
+ */
+function initListePaginee(tableId, options) {
+    options = options || {};
+    const table = document.getElementById(tableId);
+    if (!table) return null;
+
+    const tbody = table.tBodies[0];
+    const bouton = document.getElementById(options.bouton || "liste-charger-plus");
+    const compteur = document.getElementById(options.compteur || "liste-compteur");
+    const vide = document.getElementById(options.vide || "liste-vide");
+    const recherche = options.recherche ? document.getElementById(options.recherche) : null;
+
+    const etat = {
+        suivant: table.dataset.suivant || null,
+        total: parseInt(table.dataset.total || "0", 10),
+        tri: table.dataset.tri || "",
+        sens: table.dataset.sens || "asc",
+        q: recherche ? recherche.value.trim() : "",
+        enCours: null,
+    };
+
+    if (!document.getElementById("style-liste-paginee")) {
+        const style = document.createElement("style");
+        style.id = "style-liste-paginee";
+        style.textContent =
+            "th[data-tri] { cursor: pointer; user-select: none; }" +
+            "th[data-tri]::after { content: attr(data-indicateur); }";
+        document.head.appendChild(style);
+    }
+
+    function url(apres) {
+        const p = new URLSearchParams(table.dataset.params || "");
+        if (etat.q) p.set("q", etat.q);
+        if (etat.tri) p.set("tri", etat.tri);
+        p.set("sens", etat.sens);
+        if (apres) p.set("apres", apres);
+        return table.dataset.api + "?" + p.toString();
+    }
+
+    function majInterface() {
+        if (compteur) compteur.textContent = `${tbody.rows.length} / ${etat.total} affiché(s)`;
+        if (bouton) bouton.style.display = etat.suivant ? "" : "none";
+        if (vide) vide.style.display = etat.total ? "none" : "";
+        table.querySelectorAll("th[data-tri]").forEach(th => {
+            th.dataset.indicateur = th.dataset.tri === etat.tri ? (etat.sens === "desc" ? " ▼" : " ▲") : "";
+        });
+        if (options.apresRendu) options.apresRendu(table);
+    }
+
+    function charger(depuisDebut) {
+        if (!depuisDebut && (!etat.suivant || etat.enCours)) return;
+        if (etat.enCours) etat.enCours.abort();
+        const ctrl = new AbortController();
+        etat.enCours = ctrl;
+        let reussi = false;
+
+        fetch(url(depuisDebut ? null : etat.suivant), {
+            signal: ctrl.signal,
+            headers: { "Accept": "application/json" },
+        })
+            .then(r => {
+                if (!r.ok) throw new Error("HTTP " + r.status);
+                return r.json();
+            })
+            .then(data => {
+                if (depuisDebut) {
+                    tbody.innerHTML = data.html;
+                    etat.total = data.total || 0;
+                } else {
+                    tbody.insertAdjacentHTML("beforeend", data.html);
+                }
+                etat.suivant = data.suivant;
+                etat.tri = data.tri;
+                etat.sens = data.sens;
+                reussi = true;
+                majInterface();
+            })
+            .catch(err => {
+                if (err.name !== "AbortError") console.error("❌ Chargement de la liste :", err);
+            })
+            .finally(() => {
+                if (etat.enCours === ctrl) {
+                    etat.enCours = null;
+                    // Bouton encore visible (grand écran) : page suivante sans attendre le défilement
+                    if (reussi && bouton && etat.suivant && bouton.getBoundingClientRect().top < window.innerHeight + 400) {
+                        charger(false);
+                    }
+                }
+            });
+    }
+
+    function rechercher(valeur) {
+        etat.q = (valeur || "").trim();
+        charger(true);
+    }
+
+    // 🔎 Recherche serveur (saisie regroupée)
+    if (recherche) {
+        let minuteur = null;
+        recherche.addEventListener("input", () => {
+            clearTimeout(minuteur);
+            minuteur = setTimeout(() => {
+                if (options.surRecherche) options.surRecherche(recherche.value);
+                rechercher(recherche.value);
+            }, 300);
+        });
+    }
+
+    // ↕️ Tri serveur
+    table.querySelectorAll("th[data-tri]").forEach(th => {
+        th.addEventListener("click", () => {
+            etat.sens = (etat.tri === th.dataset.tri && etat.sens === "asc") ? "desc" : "asc";
+            etat.tri = th.dataset.tri;
+            charger(true);
+        });
+    });
+
+    // ⬇️ Pages suivantes
+    if (bouton) {
+        bouton.addEventListener("click", () => charger(false));
+        if ("IntersectionObserver" in window) {
+            new IntersectionObserver(entrees => {
+                if (entrees.some(e => e.isIntersecting)) charger(false);
+            }, { rootMargin: "400px" }).observe(bouton);
+        }
+    }
+
+    majInterface();
+    return { charger, rechercher, etat };
+}
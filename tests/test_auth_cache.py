@@ -0,0 +1,42 @@
+import sqlite3
+
+from flask import Flask
+
+import auth_cache
+import db_pool
+
+
+def _incrementer(chemin):
+    # Invalidation faite par un autre worker : seule la version en base change
+    conn = sqlite3.connect(chemin)
+    conn.execute("""
+        INSERT INTO cache_versions (nom, version) VALUES (?, 1)
+        ON CONFLICT(nom) DO UPDATE SET version = version + 1
+    """, (auth_cache.NOM_VERSION,))
+    conn.commit()
+    conn.close()
+
+
+def test_version_partagee_invalide_le_cache_des_autres_workers(tmp_path):
+    chemin = str(tmp_path / "base.sqlite")
+    conn = sqlite3.connect(chemin)
+    conn.execute("CREATE TABLE cache_versions (nom TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)")
+    conn.close()
+
+    app = Flask(__name__)
+    db_pool.init_app(app)
+
+    with app.app_context():
+        assert auth_cache.roles_en_cache(chemin, "A@b.fr") == (False, None)
+        auth_cache.memoriser_roles(chemin, "A@b.fr", [("benevoles", "ecriture")])
+        auth_cache.memoriser_user(chemin, 3, {"id": 3, "email": "a@b.fr"})
+
+    with app.app_context():
+        assert auth_cache.roles_en_cache(chemin, "a@b.fr") == (True, [("benevoles", "ecriture")])
+        assert auth_cache.user_en_cache(chemin, "3") == (True, {"id": 3, "email": "a@b.fr"})
+
+    _incrementer(chemin)
+
+    with app.app_context():
+        assert auth_cache.roles_en_cache(chemin, "a@b.fr") == (False, None)
+        assert auth_cache.user_en_cache(chemin, 3) == (False, None)
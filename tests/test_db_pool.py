@@ -0,0 +1,56 @@
+import sqlite3
+
+from flask import Flask
+
+import db_pool
+
+
+def _app():
+    app = Flask(__name__)
+    db_pool.init_app(app)
+    return app
+
+
+def _valeurs(chemin):
+    conn = sqlite3.connect(chemin)
+    try:
+        return [r[0] for r in conn.execute("SELECT x FROM t ORDER BY x")]
+    finally:
+        conn.close()
+
+
+def test_close_sans_commit_annule_l_ecriture(tmp_path):
+    chemin = str(tmp_path / "base.sqlite")
+    sqlite3.connect(chemin).execute("CREATE TABLE t (x INTEGER)").connection.close()
+
+    with _app().app_context():
+        conn = db_pool.get_connection(chemin)
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.close()
+
+        # Un commit ultérieur de la même requête ne valide pas l'écriture abandonnée
+        conn = db_pool.get_connection(chemin)
+        conn.execute("INSERT INTO t VALUES (2)")
+        conn.commit()
+        conn.close()
+
+    assert _valeurs(chemin) == [2]
+
+
+def test_close_d_un_emprunt_imbrique_garde_la_transaction(tmp_path):
+    chemin = str(tmp_path / "base.sqlite")
+    sqlite3.connect(chemin).execute("CREATE TABLE t (x INTEGER)").connection.close()
+
+    with _app().app_context():
+        appelant = db_pool.get_connection(chemin)
+        appelant.execute("INSERT INTO t VALUES (1)")
+
+        helper = db_pool.get_connection(chemin)
+        assert helper is appelant
+        helper.execute("SELECT COUNT(*) FROM t").fetchone()
+        helper.close()
+
+        appelant.commit()
+        appelant.close()
+
+    assert _valeurs(chemin) == [1]
@@ -0,0 +1,57 @@
+import io
+import csv
+import sqlite3
+
+import openpyxl
+
+import export_engine
+
+REQUETE = "SELECT id, nom, ville FROM associations WHERE ville = ? ORDER BY id"
+
+
+def _base(tmp_path, lignes=1200):
+    chemin = str(tmp_path / "export.sqlite")
+    conn = sqlite3.connect(chemin)
+    conn.execute("CREATE TABLE associations (id INTEGER PRIMARY KEY, nom TEXT, ville TEXT)")
+    conn.executemany("INSERT INTO associations (nom, ville) VALUES (?, ?)", [
+        (f"Épicerie n°{i}; «solidaire»", "Grenoble" if i % 2 else "Vif") for i in range(lignes)
+    ])
+    conn.commit()
+    return chemin, conn
+
+
+def test_apercu_limite_et_total(tmp_path):
+    _, conn = _base(tmp_path)
+    colonnes, lignes, total = export_engine.apercu(conn, REQUETE, ("Grenoble",), limite=5)
+    assert colonnes == ["id", "nom", "ville"]
+    assert [l[0] for l in lignes] == [2, 4, 6, 8, 10]
+    assert total == 600
+
+
+def test_export_csv_en_plusieurs_paquets(tmp_path):
+    chemin, _ = _base(tmp_path)
+    reponse = export_engine.reponse_export(chemin, REQUETE, ["Grenoble"], nom_fichier="assos", format="csv")
+    assert reponse.mimetype == "text/csv"
+    assert reponse.headers["Content-Disposition"] == "attachment; filename=assos.csv"
+
+    texte = reponse.get_data(as_text=True)
+    assert texte.startswith("\ufeff")
+    lignes = list(csv.reader(io.StringIO(texte[1:]), delimiter=";"))
+    assert lignes[0] == ["id", "nom", "ville"]
+    assert len(lignes) == 1 + 600 > export_engine.TAILLE_PAQUET
+    assert lignes[1] == ["2", "Épicerie n°1; «solidaire»", "Grenoble"]
+
+
+def test_export_xlsx(tmp_path):
+    chemin, conn = _base(tmp_path, lignes=3)
+    # Caractère de contrôle refusé par openpyxl (copier-coller depuis Word)
+    conn.execute("UPDATE associations SET nom = 'Avec\x0bcontrôle' WHERE id = 2")
+    conn.commit()
+
+    reponse = export_engine.reponse_export(chemin, REQUETE, ("Grenoble",), format="autre", feuille="x" * 40)
+    assert reponse.headers["Content-Disposition"] == "attachment; filename=export.xlsx"
+
+    classeur = openpyxl.load_workbook(io.BytesIO(reponse.get_data()))
+    feuille = classeur.worksheets[0]
+    assert feuille.title == "x" * 31
+    assert list(feuille.iter_rows(values_only=True)) == [("id", "nom", "ville"), (2, "Aveccontrôle", "Grenoble")]
@@ -0,0 +1,132 @@
+import sqlite3
+from datetime import date
+
+import heures_benevoles
+
+
+def _base():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE plannings_ramasse (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            annee INTEGER, semaine INTEGER, jour TEXT,
+            tournee_id INTEGER,
+            chauffeur_id INTEGER, chauffeur_absent TEXT,
+            responsable_id INTEGER, equipier_id INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE tournees_fournisseurs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tournee_id INTEGER, fournisseur_id INTEGER,
+            ordre INTEGER, nom TEXT, duree INTEGER
+        )
+    """)
+    heures_benevoles.installer(conn)
+    return conn
+
+
+def _totaux(conn):
+    return heures_benevoles.minutes_par_type(conn, date(2020, 1, 1), date(2030, 12, 31))
+
+
+def _reecrire_tournee(conn, tournee_id, fournisseurs, duree):
+    # Même séquence que ba38_planning_tournees : DELETE puis INSERT
+    conn.execute("DELETE FROM tournees_fournisseurs WHERE tournee_id = ?", (tournee_id,))
+    for ordre, fid in enumerate(fournisseurs, 1):
+        conn.execute(
+            "INSERT INTO tournees_fournisseurs (tournee_id, fournisseur_id, ordre, duree) VALUES (?, ?, ?, ?)",
+            (tournee_id, fid, ordre, duree),
+        )
+    conn.commit()
+
+
+def test_increment_suit_la_reecriture_des_tournees():
+    conn = _base()
+    _reecrire_tournee(conn, 1, [10, 11], 90)
+    _reecrire_tournee(conn, 2, [12], 150)
+    for semaine in (10, 11):
+        for jour, tournee in (("lundi", 1), ("mardi", 2), ("jeudi", 1)):
+            conn.execute(
+                "INSERT INTO plannings_ramasse (annee, semaine, jour, tournee_id, chauffeur_id, responsable_id) "
+                "VALUES (2025, ?, ?, ?, 1, 2)",
+                (semaine, jour, tournee),
+            )
+    conn.commit()
+    heures_benevoles.rafraichir(conn)
+
+    # Réécriture complète d'une tournée, puis tournée déplacée vers un autre id
+    _reecrire_tournee(conn, 1, [10, 11, 13], 240)
+    conn.execute("UPDATE tournees_fournisseurs SET tournee_id = 3 WHERE tournee_id = 2")
+    conn.commit()
+    heures_benevoles.rafraichir(conn)
+    incremental = _totaux(conn)
+
+    heures_benevoles.reconstruire(conn)
+    assert incremental == _totaux(conn)
+    # 2 postes x 2 semaines x (2 x 240 + DUREE_PAR_DEFAUT pour la tournée 2 disparue)
+    assert incremental["ramasse"] == 2 * 2 * (2 * 240 + heures_benevoles.DUREE_PAR_DEFAUT)
+
+
+def test_suppression_de_tournee_remet_la_duree_par_defaut():
+    conn = _base()
+    _reecrire_tournee(conn, 1, [10], 60)
+    conn.execute(
+        "INSERT INTO plannings_ramasse (annee, semaine, jour, tournee_id, chauffeur_id) "
+        "VALUES (2025, 3, 'mercredi', 1, 1)"
+    )
+    conn.commit()
+    heures_benevoles.rafraichir(conn)
+    assert _totaux(conn)["ramasse"] == 60
+
+    conn.execute("DELETE FROM tournees_fournisseurs WHERE tournee_id = 1")
+    conn.commit()
+    heures_benevoles.rafraichir(conn)
+    assert _totaux(conn)["ramasse"] == heures_benevoles.DUREE_PAR_DEFAUT
+
+
+def _par_poste(faits):
+    return {f["poste"]: f for f in faits}
+
+
+def test_faits_ligne_absences_et_remplacants():
+    ligne = {
+        "duree": 90,
+        "froid1_id": 1, "froid1_absent": "Oui", "froid1_remplacant": 5,
+        "froid2_id": 2, "froid2_absent": "oui",
+        "froid3_id": 3, "froid3_absent": "non",
+    }
+    faits = _par_poste(heures_benevoles.faits_ligne("distribution", ligne, {}))
+    assert len(faits) == len(heures_benevoles.POSTES["distribution"])
+
+    assert faits["froid1"]["benevole_id"] == 5
+    assert faits["froid1"]["remplacant_id"] == 5
+    assert (faits["froid1"]["absent"], faits["froid1"]["minutes"]) == (1, 90)
+
+    assert faits["froid2"]["benevole_id"] == 2
+    assert faits["froid2"]["raison_rejet"] == "Absent sans remplaçant"
+    assert (faits["froid2"]["minutes_brutes"], faits["froid2"]["minutes"]) == (90, 0)
+
+    assert faits["froid3"]["benevole_id"] == 3
+    assert faits["froid3"]["raison_rejet"] is None
+    assert faits["froid3"]["minutes"] == 90
+
+    assert faits["froid4"]["benevole_id"] is None
+    assert faits["froid4"]["raison_rejet"] == "Aucun bénévole"
+    assert faits["froid4"]["minutes"] == 0
+
+
+def test_faits_ligne_ramasse_duree_et_anciennes_colonnes():
+    ligne = {
+        "tournee_id": 7,
+        "chauffeur_id": 1, "chauffeur_absent": "oui", "remplacant_chauffeur_id": 4,
+        "ramasse_tri2_id": 2, "ramasse_tri2_absent": "oui", "remplacant_ramasse_tri2_id": 6,
+    }
+    faits = _par_poste(heures_benevoles.faits_ligne("ramasse", ligne, {7: 45}))
+    assert faits["chauffeur"]["benevole_id"] == 4
+    assert faits["chauffeur"]["minutes"] == 45
+    assert faits["ramasse_tri2"]["benevole_id"] == 6
+
+    # Tournée sans durée connue : durée par défaut
+    faits = _par_poste(heures_benevoles.faits_ligne("ramasse", ligne, {}))
+    assert faits["chauffeur"]["minutes"] == heures_benevoles.DUREE_PAR_DEFAUT
@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+import listes_api
+
+
+def test_curseur_aller_retour():
+    curseur = listes_api.encoder_curseur("Hélène d'Arc", 42)
+    assert listes_api.decoder_curseur(curseur) == ("Hélène d'Arc", 42)
+
+
+@pytest.mark.parametrize("curseur", [None, "", "pas-du-base64!", "W10="])
+def test_curseur_absent_ou_illisible(curseur):
+    assert listes_api.decoder_curseur(curseur) is None
+
+
+def test_parametres_bornes():
+    p = listes_api.parametres({"limite": "100000", "sens": "n'importe", "q": "  dup "}, "nom")
+    assert p == {"tri": "nom", "sens": "asc", "recherche": "dup", "apres": None,
+                 "limite": listes_api.TAILLE_PAGE_MAX}
+    assert listes_api.parametres({"limite": "x"}, "nom")["limite"] == listes_api.TAILLE_PAGE
+
+
+def _base():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE benevoles (id INTEGER PRIMARY KEY, nom TEXT, ville TEXT)")
+    # Doublons, NULL et casse mélangée : l'ordre doit rester total et stable
+    conn.executemany("INSERT INTO benevoles (nom, ville) VALUES (?, ?)", [
+        ("martin", "Grenoble"), ("Dupont", "Meylan"), (None, "Grenoble"), ("dupont", "Voiron"),
+        ("Bernard", None), ("Martin", "Meylan"), ("", "Vif"), ("Dupont", "Grenoble"),
+    ])
+    return conn
+
+
+def _toutes_les_pages(conn, **options):
+    ids, apres, totaux = [], None, []
+    while True:
+        resultat = listes_api.page(conn, "benevoles", ["nom", "ville"], tri="nom",
+                                   apres=apres, limite=3, **options)
+        ids += [r["id"] for r in resultat["lignes"]]
+        totaux.append(resultat["total"])
+        apres = resultat["suivant"]
+        if apres is None:
+            return ids, totaux
+
+
+@pytest.mark.parametrize("sens", ["asc", "desc"])
+def test_pages_par_curseur(sens):
+    conn = _base()
+    attendu = [r[0] for r in conn.execute(
+        f"SELECT id FROM benevoles ORDER BY IFNULL(nom, '') COLLATE NOCASE {sens}, id {sens}"
+    )]
+    ids, totaux = _toutes_les_pages(conn, sens=sens)
+    assert ids == attendu
+    # Total calculé sur la première page seulement
+    assert totaux == [8, None, None]
+
+
+def test_recherche_et_colonnes_inconnues():
+    conn = _base()
+    resultat = listes_api.page(conn, "benevoles", ["nom", "ville", "colonne_inconnue"],
+                               tri="colonne_inconnue", recherche="dup gren", limite=10)
+    assert resultat["colonnes"] == ["id", "nom", "ville"]
+    assert resultat["tri"] == "id"
+    assert [r["id"] for r in resultat["lignes"]] == [8]
+    assert resultat["total"] == 1
+
+
+def test_recherche_echappe_les_jokers_like():
+    conn = _base()
+    conn.execute("INSERT INTO benevoles (nom) VALUES ('100% bio')")
+    resultat = listes_api.page(conn, "benevoles", ["nom"], tri="nom", recherche="%")
+    assert [r["nom"] for r in resultat["lignes"]] == ["100% bio"]
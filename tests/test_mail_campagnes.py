@@ -0,0 +1,115 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+requests = pytest.importorskip("requests")
+from urllib3.exceptions import NewConnectionError, MaxRetryError  # noqa: E402
+
+import mail_campagnes  # noqa: E402
+
+
+class Reponse:
+    def __init__(self, code, corps):
+        self.status_code = code
+        self._corps = corps
+        self.text = json.dumps(corps)
+
+    def json(self):
+        return self._corps
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+
+class Session:
+    """Session HTTP factice : rejoue les réponses (ou exceptions) prévues."""
+
+    def __init__(self, reponses):
+        self.reponses = list(reponses)
+        self.appels = []
+
+    def _suivante(self, *args, **kwargs):
+        self.appels.append((args, kwargs))
+        reponse = self.reponses.pop(0)
+        if isinstance(reponse, Exception):
+            raise reponse
+        return reponse
+
+    post = get = _suivante
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def sans_attente(monkeypatch):
+    monkeypatch.setattr(mail_campagnes.time, "sleep", lambda s: None)
+
+
+def _succes(lot):
+    return Reponse(200, {"Messages": [
+        {"Status": "success", "To": [{"MessageID": 100 + id_}]} for id_, _ in lot
+    ]})
+
+
+LOT = [(1, {"CustomID": "c:1"}), (2, {"CustomID": "c:2"})]
+
+
+def _connexion_refusee():
+    raison = NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/v3.1/send", raison))
+
+
+def test_poster_relance_si_le_lot_n_est_pas_parti():
+    session = Session([_connexion_refusee(), Reponse(429, {}), Reponse(503, {}), _succes(LOT)])
+    resultats = mail_campagnes._poster(session, mail_campagnes.LimiteurDebit(0), LOT)
+    assert len(session.appels) == 4
+    assert resultats == [(1, "envoye", "101", None), (2, "envoye", "102", None)]
+
+
+@pytest.mark.parametrize("echec", [
+    requests.exceptions.ReadTimeout("lecture"),
+    requests.exceptions.ConnectionError("Connection aborted"),
+    Reponse(500, {}),
+])
+def test_poster_ne_renvoie_pas_un_lot_peut_etre_accepte(echec):
+    session = Session([echec, _succes(LOT)])
+    resultats = mail_campagnes._poster(session, mail_campagnes.LimiteurDebit(0), LOT)
+    assert len(session.appels) == 1
+    assert [r[1] for r in resultats] == ["incertain", "incertain"]
+
+
+def _base(tmp_path, lignes):
+    conn = mail_campagnes._connexion(str(tmp_path / "base.sqlite"))
+    conn.executemany("""
+        INSERT INTO mail_outbox (id, campagne_id, cle, destinataires, sujet, texte, statut, tente_le)
+        VALUES (?, 'c', ?, '[]', 's', 't', ?, ?)
+    """, lignes)
+    conn.commit()
+    return conn
+
+
+def test_envois_incertains_verifies_par_custom_id(tmp_path, monkeypatch):
+    recent = datetime.now().isoformat(timespec="seconds")
+    ancien = (datetime.now() - timedelta(seconds=mail_campagnes.DELAI_VERIFICATION_S + 60)).isoformat()
+    conn = _base(tmp_path, [
+        (1, "A", "en_cours", recent),    # accepté avant l'arrêt du worker
+        (2, "B", "incertain", ancien),   # jamais arrivé chez Mailjet
+        (3, "C", "incertain", recent),   # pas encore visible
+        (4, "D", "a_envoyer", None),
+    ])
+    session = Session([
+        Reponse(200, {"Count": 1, "Data": [{"ID": 555}]}),
+        Reponse(200, {"Count": 0, "Data": []}),
+        Reponse(200, {"Count": 0, "Data": []}),
+    ])
+    monkeypatch.setattr(mail_campagnes, "_session_http", lambda: session)
+
+    mail_campagnes._verifier_incertains(conn, "c")
+
+    assert [kw["params"]["CustomID"] for _, kw in session.appels] == ["c:1", "c:2", "c:3"]
+    statuts = dict(conn.execute("SELECT id, statut FROM mail_outbox").fetchall())
+    assert statuts == {1: "envoye", 2: "a_envoyer", 3: "incertain", 4: "a_envoyer"}
+    assert conn.execute("SELECT message_id FROM mail_outbox WHERE id = 1").fetchone()[0] == "555"
@@ -0,0 +1,82 @@
+import io
+
+import parsol
+
+
+def _lignes(contenu, taille_bloc=parsol.TAILLE_BLOC):
+    return list(parsol.lignes(io.BytesIO(contenu), taille_bloc=taille_bloc))
+
+
+def test_cp1252_apres_le_premier_bloc():
+    # Premier bloc en ASCII pur (détecté UTF-8), accent CP1252 au-delà
+    debut = b"x" * 99 + b"\n"
+    contenu = debut * (parsol.TAILLE_BLOC // len(debut) + 1) + "Épicerie sociale\n".encode("cp1252")
+    assert len(contenu) > parsol.TAILLE_BLOC
+
+    lues = _lignes(contenu)
+    assert lues[-1] == "Épicerie sociale\n"
+    assert "�" not in "".join(lues)
+
+
+def test_utf8_coupe_entre_deux_blocs():
+    contenu = "Association : 38000123 Épicerie\n".encode("utf-8")
+    coupure = contenu.index("É".encode("utf-8")) + 1
+    assert _lignes(contenu, taille_bloc=coupure) == ["Association : 38000123 Épicerie\n"]
+
+
+def test_octet_invalide_en_cp1252_et_utf8_tronque_en_fin():
+    # 0x81 n'existe pas en CP1252 : repli Latin-1
+    assert _lignes(b"abc\n\x81\n", taille_bloc=4) == ["abc\n", "\x81\n"]
+    # Séquence UTF-8 incomplète en fin de fichier
+    assert _lignes(b"abc\n\xc3", taille_bloc=4) == ["abc\n", "Ã"]
+
+
+FICHIER = "\r\n".join([
+    "BA. de l'Isère                FACTURE DE PARTICIPATION",
+    "Association : 38000001 Épicerie A",
+    "Date         Bénéf.   Participation      Total",
+    "03/03/2025       10         1,20        12,00",   # lundi
+    "07/03/2025        5         1,20         6,00",   # vendredi : retiré
+    "04/03/2025        7",                             # sans montants
+    "BA. de l'Isère                FACTURE DE PARTICIPATION",
+    "Association : 38000002 Épicerie B",
+    "08/03/2025        4         1,00         4,00",   # samedi : facture vide
+    "",
+]).encode("cp1252")
+
+
+def test_enregistrements_types():
+    types = [type(e).__name__ for e in parsol.enregistrements(io.BytesIO(FICHIER))]
+    assert types == [
+        "Facture", "Association", "Texte", "Passage", "Passage", "Passage",
+        "Facture", "Association", "Passage",
+    ]
+
+    passages = [e for e in parsol.enregistrements(io.BytesIO(FICHIER)) if type(e) is parsol.Passage]
+    assert [(p.nb_beneficiaires, p.total, p.jour_exclu) for p in passages] == [
+        (10, 12.0, False), (5, 6.0, True), (7, None, False), (4, 4.0, True),
+    ]
+
+
+def test_beneficiaires_par_association():
+    assert parsol.beneficiaires_par_association(io.BytesIO(FICHIER)) == {
+        "38000001": 22,
+        "38000002": 4,
+    }
+
+
+def test_corriger_participation():
+    sortie = io.StringIO()
+    resultat = parsol.corriger_participation(io.BytesIO(FICHIER), sortie)
+    corrige = sortie.getvalue()
+
+    assert resultat["premiere_date"].isoformat() == "2025-03-03"
+    assert resultat["total_corrige"] == 12.0
+    assert resultat["total_supprime"] == 10.0
+    assert "03/03/2025" in corrige
+    assert "07/03/2025" not in corrige
+    assert "Épicerie B" not in corrige
+
+    suppressions = parsol.texte_suppressions(resultat)
+    assert "07/03/2025" in suppressions and "08/03/2025" in suppressions
+    assert "TOTAL GÉNÉRAL SUPPRIMÉ : 10.00 €" in suppressions
@@ -0,0 +1,117 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+# Module de blueprint : flask_login et dotenv (via utils) sont importés au chargement
+pytest.importorskip("flask_login")
+pytest.importorskip("dotenv")
+
+from ba38_planning_utils import ResolveurNoms, charger_absents_par_jour, get_absents_par_jour  # noqa: E402
+
+
+def _base_noms():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE benevoles (id INTEGER PRIMARY KEY, prenom TEXT, nom TEXT);
+        CREATE TABLE camions (id INTEGER PRIMARY KEY, nom TEXT, immat TEXT);
+        CREATE TABLE fournisseurs (id INTEGER PRIMARY KEY, nom TEXT);
+        CREATE TABLE tournees_fournisseurs (
+            id INTEGER PRIMARY KEY, tournee_id INTEGER, fournisseur_id INTEGER, ordre INTEGER, nom TEXT
+        );
+        INSERT INTO benevoles VALUES (1, 'Hélène', 'Dupont'), (2, NULL, 'Martin');
+        INSERT INTO camions VALUES (1, 'Master', 'AB-123-CD'), (2, 'Jumpy', NULL);
+        INSERT INTO fournisseurs VALUES (10, 'Carrefour'), (11, 'Lidl'), (12, 'Metro');
+        INSERT INTO tournees_fournisseurs (tournee_id, fournisseur_id, ordre, nom) VALUES
+            (7, 11, 2, 'Tournée nord'), (7, 10, 1, NULL), (8, 12, 1, NULL);
+    """)
+    return conn
+
+
+def test_resolveur_noms_depuis_lignes():
+    lignes = [
+        {"chauffeur_id": "1", "equipier_id": 2, "camion_id": 1, "tournee_id": 7},
+        {"chauffeur_id": "", "equipier_id": None, "camion_id": "2", "tournee_id": "8"},
+        {"chauffeur_id": "99", "autre": 3},
+    ]
+    noms = ResolveurNoms.depuis_lignes(
+        _base_noms(), lignes,
+        champs_benevoles=["chauffeur_id", "equipier_id"],
+        champs_camions=["camion_id"],
+        champs_tournees=["tournee_id"],
+    )
+
+    assert noms.benevole("1") == "Hélène Dupont"
+    assert noms.benevole(1, nom_d_abord=True) == "Dupont Hélène"
+    assert noms.benevole(2) == "Martin"
+    assert noms.benevole(99) == "-"
+    assert noms.benevole(None, defaut="") == ""
+    # ID présent en base mais pas dans les champs demandés : non chargé
+    assert 3 not in noms.benevoles
+
+    assert noms.camion(1) == "Master AB-123-CD"
+    assert noms.camion("1", parentheses=True) == "Master (AB-123-CD)"
+    assert noms.camion(2) == "Jumpy"
+
+    assert noms.tournee(7) == "Tournée nord"
+    assert noms.tournee("8") == "Tournée 8"
+    assert noms.tournee(None) == ""
+    assert noms.fournisseurs(7) == "Carrefour / Lidl"
+    assert noms.fournisseurs(9) == "-"
+
+
+def _base_absences(tmp_path):
+    # Fichier (et non :memory:) : la migration ISO est mémorisée par chemin de base
+    conn = sqlite3.connect(str(tmp_path / "absences.sqlite"))
+    conn.execute(
+        "CREATE TABLE absences (id INTEGER PRIMARY KEY AUTOINCREMENT, benevole_id INTEGER, "
+        "date_debut TEXT, date_fin TEXT)"
+    )
+    conn.executemany("INSERT INTO absences (benevole_id, date_debut, date_fin) VALUES (?, ?, ?)", [
+        (1, "28/02/2025", "04/03/2025"),   # chevauche le début de semaine
+        (2, "05/03/2025", "05/03/2025"),   # un seul jour
+        (3, "06/03/2025", "20/03/2025"),   # déborde après la semaine
+        (4, "01/01/2025", "31/12/2025"),   # englobe la semaine
+        (5, "10/03/2025", "12/03/2025"),   # semaine suivante
+        (6, "2025-03-03", "2025-03-04"),   # format invalide : ignoré
+        ("", "03/03/2025", "07/03/2025"),  # sans bénévole : ignoré
+    ])
+    conn.commit()
+    return conn
+
+
+JOURS = {j: date(2025, 3, 3) + timedelta(days=i)
+         for i, j in enumerate(["lundi", "mardi", "mercredi", "jeudi", "vendredi"])}
+
+
+def test_absents_par_jour_chevauchement(tmp_path):
+    conn = _base_absences(tmp_path)
+    assert charger_absents_par_jour(conn, JOURS) == {
+        "lundi": {1, 4},
+        "mardi": {1, 4},
+        "mercredi": {2, 4},
+        "jeudi": {3, 4},
+        "vendredi": {3, 4},
+    }
+
+
+def test_absents_par_jour_suit_les_modifications(tmp_path):
+    conn = _base_absences(tmp_path)
+    charger_absents_par_jour(conn, JOURS)
+    # Colonnes ISO tenues à jour par triggers après la migration
+    conn.execute("UPDATE absences SET date_fin = '06/03/2025' WHERE benevole_id = 2")
+    conn.execute("INSERT INTO absences (benevole_id, date_debut, date_fin) VALUES (7, '07/03/2025', '07/03/2025')")
+    absents = charger_absents_par_jour(conn, JOURS)
+    assert absents["jeudi"] == {2, 3, 4}
+    assert absents["vendredi"] == {3, 4, 7}
+
+
+def test_absents_par_jour_identique_au_calcul_historique(tmp_path):
+    conn = _base_absences(tmp_path)
+    lignes = conn.execute("SELECT benevole_id, date_debut, date_fin FROM absences WHERE benevole_id != ''")
+    assert charger_absents_par_jour(conn, JOURS) == get_absents_par_jour(lignes.fetchall(), JOURS)
+
+
+def test_absents_sans_jours(tmp_path):
+    assert charger_absents_par_jour(_base_absences(tmp_path), {}) == {}
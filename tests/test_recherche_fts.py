@@ -0,0 +1,54 @@
+import sqlite3
+
+import recherche_fts
+
+
+def test_expression_mots_en_prefixes():
+    assert recherche_fts.expression("hel  dup") == '"hel"* "dup"*'
+    assert recherche_fts.expression("") is None
+    assert recherche_fts.expression('  "*  ') is None
+
+
+def test_expression_neutralise_les_operateurs():
+    # Guillemets doublés, OR / NEAR / * traités comme du texte
+    assert recherche_fts.expression('a"b OR') == '"a""b"* "OR"*'
+    assert recherche_fts.expression("x", colonnes=["nom", "prenom"]) == '{"nom" "prenom"} : ("x"*)'
+
+
+def _base():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE benevoles (
+            id INTEGER PRIMARY KEY, nom TEXT, prenom TEXT, email TEXT, ville TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO benevoles (nom, prenom, ville) VALUES (?, ?, ?)", [
+        ("Dupont", "Hélène", "Grenoble"),
+        ("Durand", "Helena", "Échirolles"),
+        ("Martin", "Éloïse", "Meylan"),
+    ])
+    recherche_fts.installer(conn, "benevoles")
+    return conn
+
+
+def _ids(conn, texte, colonnes=None):
+    clause, params = recherche_fts.condition(conn, "benevoles", texte, colonnes)
+    return [r[0] for r in conn.execute(f"SELECT id FROM benevoles WHERE {clause} ORDER BY id", params)]
+
+
+def test_recherche_sans_accents_et_par_prefixe():
+    conn = _base()
+    assert recherche_fts.disponible(conn, "benevoles")
+    assert _ids(conn, "helene") == [1]
+    assert _ids(conn, "HEL") == [1, 2]
+    assert _ids(conn, "echirol") == [2]
+    assert _ids(conn, "eloise meylan") == [3]
+    assert _ids(conn, "du gre") == [1]
+
+
+def test_recherche_restreinte_aux_colonnes_et_triggers():
+    conn = _base()
+    assert _ids(conn, "meylan", colonnes=["nom"]) == []
+    conn.execute("UPDATE benevoles SET nom = 'Meylanais' WHERE id = 1")
+    conn.execute("DELETE FROM benevoles WHERE id = 3")
+    assert _ids(conn, "meylan") == [1]
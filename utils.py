@@ -1,23 +1,13 @@
 import os
 import sqlite3
-import gspread
 import re
 import logging
 
-from pydrive2.auth import GoogleAuth
-from pydrive2.drive import GoogleDrive
-from oauth2client.service_account import ServiceAccountCredentials
+# ⏱️ Pas d'import lourd (Google, reportlab...) au niveau du module : utils
+# est chargé par tous les blueprints au démarrage de chaque worker
 from dotenv import load_dotenv
 from datetime import datetime
-from googleapiclient.discovery import build
-from googleapiclient.discovery_cache.base import Cache
-from google.oauth2 import service_account
-from google.oauth2.service_account import Credentials
 from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.utils import simpleSplit
 from flask import send_file
 from pathlib import Path
 
@@ -103,11 +93,11 @@ def write_log(message: str):
 #         pass
 
 # Connexion à la base de données SQLite
+# (une connexion poolée par requête, cf. db_pool.py)
 def get_db_connection():
+    import db_pool
     db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db_pool.get_connection(db_path)
 
 
 # Vérification validité des emails
@@ -221,11 +211,15 @@ def get_drive_folder_id_from_path(service, path, shared_drive_id):
     Résout un chemin Drive dans un Drive partagé
     SANS créer les dossiers manquants.
     Retourne None si le chemin n'existe pas.
+    Les dossiers déjà résolus sont lus dans drive_cache.
     """
-    parts = path.strip("/").split("/")
-    current_parent = shared_drive_id
+    import drive_cache
 
-    for part in parts:
+    parts = drive_cache.normaliser(path).split("/")
+    deja_resolus, current_parent = drive_cache.prefixe_connu(shared_drive_id, path)
+
+    for i in range(deja_resolus, len(parts)):
+        part = parts[i]
         query = (
             f"name = '{part}' and "
             f"mimeType = 'application/vnd.google-apps.folder' and "
@@ -247,37 +241,115 @@ def get_drive_folder_id_from_path(service, path, shared_drive_id):
             return None
 
         current_parent = files[0]["id"]
+        drive_cache.memoriser_dossier(shared_drive_id, "/".join(parts[:i + 1]), current_parent)
 
     return current_parent
 
 
 # Authentification PyDrive2 avec service account
+# (PyDrive2 n'accepte que des identifiants oauth2client : instance unique par processus)
+_pydrive = None
+
+
 def get_drive():
-    gauth = GoogleAuth()
-    gauth.credentials = ServiceAccountCredentials.from_json_keyfile_name(
-        SERVICE_ACCOUNT_FILE,
-        scopes=["https://www.googleapis.com/auth/drive"]
-    )
-    return GoogleDrive(gauth)
+    global _pydrive
+    if _pydrive is None:
+        from pydrive2.auth import GoogleAuth
+        from pydrive2.drive import GoogleDrive
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        gauth = GoogleAuth()
+        gauth.credentials = ServiceAccountCredentials.from_json_keyfile_name(
+            SERVICE_ACCOUNT_FILE,
+            scopes=["https://www.googleapis.com/auth/drive"]
+        )
+        _pydrive = GoogleDrive(gauth)
+    return _pydrive
 
 # Suppression robuste via API Google Drive
 def delete_file_directly(file_id):
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE,
-            scopes=["https://www.googleapis.com/auth/drive"]
-        )
-        class NoCache(Cache):
-            def get(self, url): return None
-            def set(self, url, content): pass
+        import google_clients
 
-        service = build('drive', 'v3', credentials=credentials, cache=NoCache())
+        service = google_clients.drive()
         service.files().delete(fileId=file_id, supportsAllDrives=True).execute()
 
+        import drive_cache
+        drive_cache.fichier_supprime(file_id)
+
         write_log(f"🗑️ Suppression directe réussie pour le fichier ID: {file_id}")
     except Exception as e:
         write_log(f"❌ Erreur suppression directe fichier {file_id} : {e}")
 
+
+# Suppression groupée via l'endpoint batch de l'API Google (100 appels max par lot)
+DRIVE_BATCH_MAX = 100
+DRIVE_BATCH_MAX_ESSAIS = 5
+
+
+def delete_drive_files_batch(service, file_ids, timeout=60):
+    """
+    Supprime une liste de fichiers Drive par requêtes batch (DRIVE_BATCH_MAX
+    suppressions par aller-retour HTTP). Chaque réponse du lot confirme ou
+    non la suppression de son fichier : plus besoin de relister le dossier.
+
+    - 404 : fichier déjà supprimé → considéré comme fait ;
+    - 403 (quota) / 429 / 5xx : retenté dans un lot suivant, avec backoff,
+      dans la limite de `timeout` secondes ;
+    - autres erreurs : collectées.
+
+    Retourne (ids supprimés, {id: message d'erreur}).
+    """
+    import time
+    import drive_cache
+
+    supprimes, erreurs = [], {}
+    a_faire = list(dict.fromkeys(file_ids))
+    debut = time.time()
+
+    for essai in range(DRIVE_BATCH_MAX_ESSAIS):
+        a_retenter = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                supprimes.append(request_id)
+                return
+            statut = getattr(getattr(exception, "resp", None), "status", None)
+            if statut == 404:
+                supprimes.append(request_id)
+            elif statut in (403, 429) or (statut or 0) >= 500:
+                a_retenter.append(request_id)
+                erreurs[request_id] = str(exception)
+            else:
+                erreurs[request_id] = str(exception)
+
+        for i in range(0, len(a_faire), DRIVE_BATCH_MAX):
+            batch = service.new_batch_http_request(callback=callback)
+            for file_id in a_faire[i:i + DRIVE_BATCH_MAX]:
+                batch.add(
+                    service.files().delete(fileId=file_id, supportsAllDrives=True),
+                    request_id=file_id,
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                # Lot entier en échec (réseau…) : tout le lot est retenté
+                for file_id in a_faire[i:i + DRIVE_BATCH_MAX]:
+                    if file_id not in supprimes and file_id not in a_retenter:
+                        a_retenter.append(file_id)
+                        erreurs[file_id] = str(e)
+
+        a_faire = a_retenter
+        if not a_faire or time.time() - debut > timeout:
+            break
+        time.sleep(min(2 ** essai, 30))
+
+    for file_id in supprimes:
+        erreurs.pop(file_id, None)
+    drive_cache.fichiers_supprimes(supprimes)
+
+    return supprimes, erreurs
+
 # Sauvegarde automatique d'un fichier (ajoute un timestamp au nom)
 def backup_file(local_path):
     backup_path = local_path + ".bak." + datetime.now().strftime("%Y%m%d%H%M%S")
@@ -288,20 +360,16 @@ def backup_file(local_path):
         write_log(f"❌ Erreur sauvegarde fichier local : {e}")
 
 
-from googleapiclient.http import MediaFileUpload
-
-
 def upload_database():
     """
-    Upload de la base SQLite vers Google Drive.
+    Demande la réplication de la base SQLite vers Google Drive.
     Version verrouillée : impossible d'appeler Drive sans file_id.
-    Compatible PythonAnywhere + Debian.
+    L'envoi est fait en tâche de fond (cf. drive_replication.py) :
+    ici on se contente de marquer la base comme modifiée.
     """
     from utils import write_log
     import os
 
-    write_log("🚨 upload_database VERSION 3 VERROUILLÉE APPELÉE")
-
     # ============================
     # 1️⃣ Détermination du contexte
     # ============================
@@ -331,8 +399,6 @@ def upload_database():
     else:
         file_id = None
 
-    write_log(f"🔍 upload_database debug → env={env}, test_mode={test_mode}, file_id={file_id!r}")
-
     # ============================
     # 🛑 GARDE-FOU ABSOLU
     # ============================
@@ -341,47 +407,36 @@ def upload_database():
         return
 
     # ============================
-    # 2️⃣ APPEL GOOGLE DRIVE
+    # 2️⃣ RÉPLICATION DIFFÉRÉE
     # ============================
-    try:
-        from google.oauth2 import service_account
-        from googleapiclient.discovery import build
-        from googleapiclient.http import MediaFileUpload
-        from googleapiclient.discovery_cache.base import Cache
+    import drive_replication
+    drive_replication.mark_dirty(local_path, file_id)
 
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE,
-            scopes=["https://www.googleapis.com/auth/drive"]
-        )
-
-        class NoCache(Cache):
-            def get(self, url): return None
-            def set(self, url, content): pass
-
-        service = build("drive", "v3", credentials=credentials, cache=NoCache())
 
-        media = MediaFileUpload(
-            local_path,
-            mimetype="application/x-sqlite3",
-            resumable=True
-        )
+def upload_database_file(local_path, file_id):
+    """
+    Envoie un fichier SQLite (snapshot) sur Drive à la place du fichier `file_id`.
+    Lève une exception en cas d'échec (les relances sont gérées par l'appelant).
+    """
+    import google_clients
+    from googleapiclient.http import MediaFileUpload
 
-        write_log(
-            f"🧪 file_id type={type(file_id)} "
-            f"len={len(file_id) if file_id is not None else 'None'} "
-            f"repr={file_id!r}"
-        )
+    service = google_clients.drive()
 
-        updated_file = service.files().update(
-            fileId=file_id,
-            media_body=media,
-            supportsAllDrives=True
-        ).execute()
+    media = MediaFileUpload(
+        local_path,
+        mimetype="application/x-sqlite3",
+        resumable=True
+    )
 
-        write_log(f"✅ Base envoyée sur Drive (id={updated_file.get('id')})")
+    updated_file = service.files().update(
+        fileId=file_id,
+        media_body=media,
+        supportsAllDrives=True
+    ).execute()
 
-    except Exception as e:
-        write_log(f"❌ Erreur Google Drive upload_database() : {e}")
+    write_log(f"✅ Base envoyée sur Drive (id={updated_file.get('id')})")
+    return updated_file.get("id")
 
 
 def get_db_info():
@@ -442,12 +497,13 @@ def get_git_commits(repo_path, max_commits=20):
         return [{"error": str(e)}]
 
 import os
-import requests
 from flask import url_for
 
 
 def send_reset_email(email, token):
     """Envoie un email de réinitialisation via l’API Mailjet"""
+    import requests
+
     api_key = os.getenv("MAILJET_API_KEY")
     api_secret = os.getenv("MAILJET_API_SECRET")
     sender = os.getenv("MAILJET_SENDER")
@@ -495,7 +551,28 @@ def get_user_roles(user_email):
     Retourne la liste complète des rôles pour un utilisateur.
     Si l'utilisateur est admin global (table users.role = 'admin'),
     il obtient automatiquement l'accès à toutes les applis.
+    Résultat mis en cache (auth_cache) : invalider après modification.
     """
+    import auth_cache
+
+    try:
+        db_path = get_db_path()
+    except Exception as e:
+        write_log(f"❌ Erreur get_user_roles({user_email}) : {e}")
+        return []
+
+    trouve, roles = auth_cache.roles_en_cache(db_path, user_email)
+    if trouve:
+        return list(roles)
+
+    roles = _lire_user_roles(user_email)
+    if roles is not None:
+        auth_cache.memoriser_roles(db_path, user_email, roles)
+    return list(roles or [])
+
+
+def _lire_user_roles(user_email):
+    """Lecture des rôles en base (None en cas d'erreur, pour ne pas la mettre en cache)."""
     roles = []
     try:
         conn = get_db_connection()
@@ -531,6 +608,7 @@ def get_user_roles(user_email):
 
     except Exception as e:
         write_log(f"❌ Erreur get_user_roles({user_email}) : {e}")
+        return None
     return roles
 
 
@@ -588,13 +666,15 @@ def has_access(appli, level):
 
 # ✅ Connexion Google
 def get_google_services():
+    """Clients gspread et Drive du thread courant (cf. google_clients) et identifiants."""
+    import google_clients
+
     if not os.path.exists(SERVICE_ACCOUNT_FILE):
         raise FileNotFoundError(f"Fichier manquant : {SERVICE_ACCOUNT_FILE}")
     try:
-        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        client = gspread.authorize(creds)
-        drive_service = build("drive", "v3", credentials=creds)
-        write_log("✅ Connexion à Google Sheets et Drive réussie.")
+        creds = google_clients.credentials()
+        client = google_clients.gspread_client()
+        drive_service = google_clients.drive()
         return client, drive_service, creds
     except Exception as e:
         write_log(f"❌ Erreur de connexion Google Sheets/Drive : {e}")
@@ -832,10 +912,8 @@ def get_static_factures_dir():
 
 def get_param_value(name):
     """Retourne la valeur d’un paramètre global depuis la table `parametres`."""
-    conn = get_db_connection()
-    row = conn.execute("SELECT param_value FROM parametres WHERE param_name = ?", (name,)).fetchone()
-    conn.close()
-    return row["param_value"] if row else ""
+    import config_cache
+    return config_cache.parametre(name, "")
 
 
 def get_user_info(user):
@@ -852,10 +930,6 @@ def get_user_info(user):
     return None, None
 
 
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.discovery_cache.base import Cache
-
-
 
 
 def upload_file_to_drive(local_path, folder_id, filename=None):
@@ -874,16 +948,10 @@ def upload_file_to_drive(local_path, folder_id, filename=None):
     filename = filename or os.path.basename(local_path)
 
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE,
-            scopes=["https://www.googleapis.com/auth/drive"]
-        )
-
-        class NoCache(Cache):
-            def get(self, url): return None
-            def set(self, url, content): pass
+        import google_clients
+        from googleapiclient.http import MediaFileUpload
 
-        service = build("drive", "v3", credentials=credentials, cache=NoCache())
+        service = google_clients.drive()
 
         file_metadata = {
             "name": filename,
@@ -907,21 +975,32 @@ def upload_file_to_drive(local_path, folder_id, filename=None):
         file_id = created.get("id")
         write_log(f"✅ Upload terminé : {filename} (id={file_id})")
 
+        import drive_cache
+        drive_cache.invalider_liste(folder_id)
+
         return file_id
 
     except Exception as e:
         write_log(f"❌ Erreur upload_file_to_drive({filename}) : {e}")
+        # Dossier introuvable : l'ID en cache est périmé (dossier supprimé dans Drive)
+        import drive_cache
+        drive_cache.erreur_envoi(folder_id, e)
         return None
 
 
 def get_or_create_drive_folder(service, path, shared_drive_id):
     """
     Résout un chemin Drive dans un Drive partagé donné
+    (les dossiers déjà résolus sont lus dans drive_cache)
     """
-    parts = path.strip("/").split("/")
-    current_parent = shared_drive_id   # 🔥 POINT CLÉ
+    import drive_cache
+
+    parts = drive_cache.normaliser(path).split("/")
+    # 🔥 POINT CLÉ : on part du Drive partagé, ou du plus long préfixe connu
+    deja_resolus, current_parent = drive_cache.prefixe_connu(shared_drive_id, path)
 
-    for part in parts:
+    for i in range(deja_resolus, len(parts)):
+        part = parts[i]
         query = (
             f"name = '{part}' and "
             f"mimeType = 'application/vnd.google-apps.folder' and "
@@ -952,8 +1031,10 @@ def get_or_create_drive_folder(service, path, shared_drive_id):
                 supportsAllDrives=True,
                 fields="id"
             ).execute()
+            drive_cache.invalider_liste(current_parent)
 
         current_parent = folder["id"]
+        drive_cache.memoriser_dossier(shared_drive_id, "/".join(parts[:i + 1]), current_parent)
 
     return current_parent
 
@@ -982,18 +1063,11 @@ def upload_file_to_drive_path(local_path, drive_path, filename=None):
             )
 
         # ============================
-        # Initialisation Drive
+        # Initialisation Drive (client partagé du thread)
         # ============================
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE,
-            scopes=["https://www.googleapis.com/auth/drive"]
-        )
-
-        class NoCache(Cache):
-            def get(self, url): return None
-            def set(self, url, content): pass
+        import google_clients
 
-        service = build("drive", "v3", credentials=credentials, cache=NoCache())
+        service = google_clients.drive()
 
         # ============================
         # Résolution du chemin Drive
@@ -0,0 +1,9 @@
+"""
+Point d'entrée WSGI (gunicorn) :
+
+    gunicorn wsgi:application
+"""
+
+from ba38 import create_app
+
+application = create_app()